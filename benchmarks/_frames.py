@@ -0,0 +1,32 @@
+"""
+Frames sintéticos compartidos por los benchmarks.
+"""
+
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+def synthetic_frame(width: int, height: int, shift: float = 0.0,
+                    seed: Optional[int] = 0) -> np.ndarray:
+    """
+    Genera un frame BGR con gradientes y ruido (comprime como una escena real).
+
+    Args:
+        width: Ancho del frame
+        height: Alto del frame
+        shift: Desplazamiento de los gradientes (0-255), para simular
+            movimiento entre frames
+        seed: Semilla del ruido (None = aleatoria); con la misma semilla
+            el frame es idéntico entre ejecuciones
+
+    Returns:
+        Frame de height x width x 3 en uint8
+    """
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = ((x[None, :] * 0.6 + y * 0.4 + shift) % 256).astype(np.uint8)
+    frame = np.dstack([base, np.flipud(base), np.fliplr(base)])
+    noise = np.random.default_rng(seed).integers(0, 24, frame.shape, dtype=np.uint8)
+    return cv2.add(frame, noise)
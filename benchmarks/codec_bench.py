@@ -0,0 +1,63 @@
+"""
+Benchmark de los backends JPEG.
+===============================
+
+Compara, para cada backend disponible (OpenCV y libjpeg-turbo), la
+decodificación completa seguida de resize frente a la decodificación
+escalada en el dominio DCT, y el coste de codificar la previsualización.
+
+Uso:
+    python -m benchmarks.codec_bench --width 1920 --height 1080 --iterations 100
+"""
+
+import argparse
+import time
+
+import cv2
+
+from benchmarks._frames import synthetic_frame
+from src.camera.codec import HAS_TURBOJPEG, OpenCVJpegCodec, create_codec
+
+
+def _time_ms(func, iterations: int) -> float:
+    """Tiempo medio por llamada en milisegundos."""
+    func()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) * 1000.0 / iterations
+
+
+def main():
+    """Función principal del benchmark."""
+    parser = argparse.ArgumentParser(description="Backends JPEG: decodificación completa vs escalada")
+    parser.add_argument('--width', type=int, default=1920, help="Ancho del frame de origen")
+    parser.add_argument('--height', type=int, default=1080, help="Alto del frame de origen")
+    parser.add_argument('--iterations', type=int, default=100, help="Repeticiones por medición")
+    args = parser.parse_args()
+
+    target = (640, 480)
+    frame = synthetic_frame(args.width, args.height)
+    jpeg = OpenCVJpegCodec().encode(frame, quality=85)
+    preview = cv2.resize(frame, target)
+
+    codecs = [OpenCVJpegCodec()]
+    if HAS_TURBOJPEG:
+        turbo = create_codec('turbojpeg')
+        if turbo.name == 'turbojpeg':
+            codecs.append(turbo)
+    else:
+        print("PyTurboJPEG no instalado: solo se mide OpenCV")
+
+    print(f"Origen {args.width}x{args.height} ({len(jpeg) / 1024:.0f} KB) -> {target[0]}x{target[1]}")
+    print(f"{'backend':<10} {'completa+resize':>16} {'escalada':>10} {'encode':>8}")
+
+    for codec in codecs:
+        full = _time_ms(lambda: cv2.resize(codec.decode(jpeg), target), args.iterations)
+        scaled = _time_ms(lambda: codec.decode_to_size(jpeg, target), args.iterations)
+        encode = _time_ms(lambda: codec.encode(preview, quality=85), args.iterations)
+        print(f"{codec.name:<10} {full:13.2f} ms {scaled:7.2f} ms {encode:5.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
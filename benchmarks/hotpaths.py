@@ -0,0 +1,305 @@
+"""
+Micro-benchmarks de las operaciones por frame, con baselines de regresión.
+==========================================================================
+
+Mide a 480p, 720p y 1080p las operaciones que se ejecutan por cada frame:
+decodificación base64 de data URLs, cv2.imdecode, decodificación escalada
+del codec, cv2.resize, conversión BGR→RGB, imencode PNG frente a JPEG,
+base64 para Flet y VideoWriter.write con cada codec de grabación.
+
+Los resultados se guardan como baseline JSON en benchmarks/baselines/ y
+las ejecuciones posteriores se comparan con ella: una operación cuyo
+mejor tiempo empeora más que el umbral se marca como regresión y el
+proceso termina con código 1. No necesita cámara ni pantalla.
+
+Uso:
+    python -m benchmarks.hotpaths --save-baseline
+    python -m benchmarks.hotpaths --threshold 0.15
+    python -m benchmarks.hotpaths --resolutions 720p --filter encode
+"""
+
+import argparse
+import base64
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from benchmarks._frames import synthetic_frame
+from src.camera.codec import get_codec
+
+
+RESOLUTIONS = {
+    '480p': (640, 480),
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+}
+
+# Codecs de grabación que se prueban si el build de OpenCV los soporta
+VIDEO_CODECS = ('mp4v', 'XVID', 'MJPG')
+
+# Tamaño de la previsualización de los receptores
+PREVIEW_SIZE = (640, 480)
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+DEFAULT_BASELINE = BASELINE_DIR / "hotpaths.json"
+
+# Cada caso recibe el frame y su JPEG y devuelve la función a medir
+# (o None si no aplica en esta máquina)
+Case = Callable[[np.ndarray, bytes], Optional[Callable[[], object]]]
+CASES: Dict[str, Case] = {}
+
+
+def benchmark(name: str):
+    """Registra un caso de benchmark."""
+    def register(case: Case) -> Case:
+        CASES[name] = case
+        return case
+    return register
+
+
+@benchmark('base64_decode_data_url')
+def _base64_decode(frame, jpeg):
+    data_url = "data:image/jpeg;base64," + base64.b64encode(jpeg).decode('ascii')
+    return lambda: base64.b64decode(data_url.split(',', 1)[1])
+
+
+@benchmark('imdecode')
+def _imdecode(frame, jpeg):
+    buffer = np.frombuffer(jpeg, dtype=np.uint8)
+    return lambda: cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+@benchmark('codec_decode_to_preview')
+def _decode_to_preview(frame, jpeg):
+    codec = get_codec()
+    return lambda: codec.decode_to_size(jpeg, PREVIEW_SIZE)
+
+
+@benchmark('resize_to_preview')
+def _resize(frame, jpeg):
+    return lambda: cv2.resize(frame, PREVIEW_SIZE)
+
+
+@benchmark('bgr_to_rgb')
+def _bgr_to_rgb(frame, jpeg):
+    return lambda: cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+@benchmark('imencode_png')
+def _imencode_png(frame, jpeg):
+    return lambda: cv2.imencode('.png', frame)
+
+
+@benchmark('imencode_jpeg_q85')
+def _imencode_jpeg(frame, jpeg):
+    return lambda: cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+
+
+@benchmark('base64_encode_for_flet')
+def _base64_encode(frame, jpeg):
+    return lambda: base64.b64encode(jpeg).decode('ascii')
+
+
+def _video_writer_case(fourcc: str) -> Case:
+    """Caso de VideoWriter.write para un codec."""
+    def case(frame, jpeg):
+        height, width = frame.shape[:2]
+        extension = 'mp4' if fourcc == 'mp4v' else 'avi'
+        path = os.path.join(tempfile.mkdtemp(prefix="hotpaths-"), f"bench_{fourcc}.{extension}")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), 15.0, (width, height))
+        if not writer.isOpened():
+            return None
+        _open_writers.append((writer, path))
+        return lambda: writer.write(frame)
+    return case
+
+
+_open_writers: List[Tuple[cv2.VideoWriter, str]] = []
+
+for _fourcc in VIDEO_CODECS:
+    benchmark(f'video_write_{_fourcc}')(_video_writer_case(_fourcc))
+
+
+def _close_writers() -> None:
+    """Cierra y borra los ficheros de vídeo temporales."""
+    while _open_writers:
+        writer, path = _open_writers.pop()
+        writer.release()
+        try:
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass
+
+
+def measure(func: Callable[[], object], min_time: float = 0.2, rounds: int = 5) -> Dict[str, float]:
+    """
+    Mide una operación en varias rondas.
+
+    El número de iteraciones por ronda se calibra para que cada ronda
+    dure al menos `min_time`. El mínimo entre rondas (el coste con menos
+    interferencias de otros procesos) es la cifra que se compara con la
+    baseline; la mediana se guarda como referencia.
+
+    Args:
+        func: Operación a medir
+        min_time: Duración mínima de cada ronda en segundos
+        rounds: Número de rondas
+
+    Returns:
+        Diccionario con median_ms, min_ms e iterations
+    """
+    func()
+    iterations = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or iterations >= 100000:
+            break
+        iterations = max(iterations * 2, int(iterations * min_time / max(elapsed, 1e-9)))
+
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        samples.append((time.perf_counter() - started) * 1000.0 / iterations)
+
+    return {
+        'median_ms': round(statistics.median(samples), 4),
+        'min_ms': round(min(samples), 4),
+        'iterations': iterations,
+    }
+
+
+def run(resolutions: List[str], name_filter: Optional[str] = None,
+        min_time: float = 0.2, rounds: int = 5) -> Dict[str, Dict[str, float]]:
+    """
+    Ejecuta los casos registrados en cada resolución.
+
+    Returns:
+        Resultados por clave "caso@resolución"
+    """
+    results = {}
+    try:
+        for resolution in resolutions:
+            width, height = RESOLUTIONS[resolution]
+            frame = synthetic_frame(width, height)
+            jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes()
+
+            for name, case in CASES.items():
+                if name_filter and name_filter not in name:
+                    continue
+                func = case(frame, jpeg)
+                key = f"{name}@{resolution}"
+                if func is None:
+                    print(f"  {key:<40} no disponible")
+                    continue
+                results[key] = measure(func, min_time, rounds)
+                print(f"  {key:<40} {results[key]['min_ms']:9.3f} ms "
+                      f"(mediana {results[key]['median_ms']:.3f})")
+            _close_writers()
+    finally:
+        _close_writers()
+    return results
+
+
+def environment() -> Dict[str, str]:
+    """Describe la máquina en la que se tomó la medición."""
+    return {
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'codec': get_codec().name,
+        'machine': platform.machine(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': str(os.cpu_count()),
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict, threshold: float) -> List[str]:
+    """
+    Compara los resultados con una baseline.
+
+    Args:
+        results: Resultados actuales
+        baseline: Contenido del JSON de baseline
+        threshold: Empeoramiento relativo tolerado (0.2 = 20 %)
+
+    Returns:
+        Claves que empeoraron más que el umbral
+    """
+    regressions = []
+    reference = baseline.get('results', {})
+    print(f"\n{'operación':<40} {'baseline':>10} {'actual':>10} {'cambio':>8}")
+    for key, result in results.items():
+        previous = reference.get(key)
+        if previous is None:
+            continue
+        change = result['min_ms'] / previous['min_ms'] - 1.0
+        flag = ""
+        if change > threshold:
+            regressions.append(key)
+            flag = "  REGRESIÓN"
+        print(f"{key:<40} {previous['min_ms']:8.3f}ms {result['min_ms']:8.3f}ms "
+              f"{change:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    """Función principal de la suite."""
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de las operaciones por frame")
+    parser.add_argument('--resolutions', nargs='+', choices=list(RESOLUTIONS), default=list(RESOLUTIONS),
+                        help="Resoluciones a medir")
+    parser.add_argument('--filter', help="Medir solo los casos cuyo nombre contenga este texto")
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE, help="Fichero de baseline")
+    parser.add_argument('--save-baseline', action='store_true', help="Guardar los resultados como baseline")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Empeoramiento relativo que se considera regresión")
+    parser.add_argument('--min-time', type=float, default=0.2, help="Duración mínima de cada ronda (s)")
+    parser.add_argument('--rounds', type=int, default=5, help="Rondas por operación")
+    args = parser.parse_args()
+
+    env = environment()
+    print(f"OpenCV {env['opencv']} | codec {env['codec']} | {env['processor']} x{env['cpus']}")
+    results = run(args.resolutions, args.filter, args.min_time, args.rounds)
+
+    if args.save_baseline:
+        existing = {}
+        if args.baseline.exists():
+            existing = json.loads(args.baseline.read_text()).get('results', {})
+        existing.update(results)
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(
+            {'environment': env, 'results': dict(sorted(existing.items()))}, indent=2
+        ) + "\n")
+        print(f"\nBaseline guardada en {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"\nSin baseline en {args.baseline}: ejecuta con --save-baseline para crearla")
+        return
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get('environment') != env:
+        print("\nAviso: la baseline se tomó en otro entorno; las diferencias pueden no ser regresiones")
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regresiones por encima del {args.threshold:.0%}")
+        sys.exit(1)
+    print("\nSin regresiones")
+
+
+if __name__ == "__main__":
+    main()
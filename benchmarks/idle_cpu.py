@@ -0,0 +1,88 @@
+"""
+Benchmark de CPU en reposo del actualizador de frames.
+=====================================================
+
+Compara el antiguo bucle de sondeo (~30 Hz) con el actualizador dirigido
+por el FrameSlot cuando no hay emisores activos.
+
+Uso:
+    python -m benchmarks.idle_cpu --seconds 5
+"""
+
+import argparse
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from src.camera.frame_bus import FrameSlot
+
+
+def _polling_updater(stop_event: threading.Event, state: dict) -> None:
+    """Réplica del actualizador anterior: re-codifica el frame cada 33 ms."""
+    while not stop_event.is_set():
+        frame = state.get('frame')
+        if frame is not None:
+            cv2.imencode('.jpg', frame)
+        time.sleep(0.033)
+
+
+def _slot_updater(stop_event: threading.Event, slot: FrameSlot) -> None:
+    """Actualizador actual: solo despierta cuando hay un frame nuevo."""
+    last_sequence = 0
+    while not stop_event.is_set():
+        packet = slot.wait_for_next(last_sequence, timeout=1.0)
+        if packet is None:
+            continue
+        last_sequence = packet.sequence
+        cv2.imencode('.jpg', packet.frame)
+
+
+def measure(target, args, seconds: float) -> float:
+    """
+    Mide el porcentaje de CPU consumido por un actualizador en reposo.
+
+    Args:
+        target: Función del actualizador
+        args: Argumentos adicionales del actualizador
+        seconds: Duración de la medición
+
+    Returns:
+        Porcentaje de CPU de un núcleo
+    """
+    stop_event = threading.Event()
+    thread = threading.Thread(target=target, args=(stop_event, *args), daemon=True)
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    thread.start()
+    time.sleep(seconds)
+    stop_event.set()
+    cpu_used = time.process_time() - cpu_start
+    wall_used = time.perf_counter() - wall_start
+    return 100.0 * cpu_used / wall_used
+
+
+def main():
+    """Función principal del benchmark."""
+    parser = argparse.ArgumentParser(description="CPU en reposo del actualizador de frames")
+    parser.add_argument('--seconds', type=float, default=5.0, help="Duración de cada medición")
+    args = parser.parse_args()
+
+    # Un único frame ya recibido y ningún emisor activo
+    frame = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+    slot = FrameSlot()
+    slot.publish(frame)
+
+    polling = measure(_polling_updater, ({'frame': frame},), args.seconds)
+    # El actualizador consume el frame pendiente y luego queda en reposo
+    driven = measure(_slot_updater, (slot,), args.seconds)
+    slot.close()
+
+    print(f"Sondeo 30 Hz:        {polling:6.2f}% CPU")
+    print(f"Dirigido por cambios: {driven:6.2f}% CPU")
+
+
+if __name__ == "__main__":
+    main()
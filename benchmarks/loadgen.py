@@ -0,0 +1,415 @@
+"""
+Generador de carga que simula móviles enviando frames.
+======================================================
+
+Lanza M emisores que publican frames a los fps, resolución y calidad JPEG
+indicados contra pc_receiver, desktop_receiver o el relay, y resume el
+throughput conseguido, los percentiles de latencia y la tasa de errores.
+
+Los frames salen de un corpus pequeño pre-codificado (y, para cada
+formato, pre-serializado) para que el generador no sea el cuello de
+botella. Con --spawn el receptor se arranca sin UI en otro proceso y todo
+el tráfico va por loopback.
+
+Uso:
+    python -m benchmarks.loadgen --spawn --target desktop --phones 4 --fps 15 --seconds 10
+    python -m benchmarks.loadgen --url http://127.0.0.1:8080/ --format json --json resultados.json
+"""
+
+import argparse
+import base64
+import http.client
+import json
+import math
+import multiprocessing
+import socket
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import cv2
+
+from benchmarks._frames import synthetic_frame
+
+
+# Puertos y rutas de ingesta de cada receptor
+TARGETS = {
+    'pc': ('http://127.0.0.1:8080/', 8080),
+    'desktop': ('http://127.0.0.1:8081/', 8081),
+    'relay': ('http://127.0.0.1:8787/api/frame', 8787),
+}
+
+
+class FrameFormat:
+    """
+    Formato de ingesta: cómo se serializa un frame en el cuerpo del POST.
+
+    `prepare` se llama una vez por frame del corpus; `body` una vez por
+    envío y solo debe añadir los campos que cambian (número de frame,
+    timestamp y dispositivo).
+    """
+
+    name = ""
+    content_type = ""
+
+    def prepare(self, jpeg: bytes):
+        """Pre-serializa un frame del corpus."""
+        return jpeg
+
+    def body(self, prepared, timestamp: float, frame_number: int, device_id: str) -> bytes:
+        """Cuerpo de la petición para un envío."""
+        raise NotImplementedError
+
+    def headers(self, timestamp: float, frame_number: int, device_id: str) -> Dict[str, str]:
+        """Cabeceras adicionales de la petición."""
+        return {}
+
+
+FORMATS: Dict[str, FrameFormat] = {}
+
+
+def register_format(cls):
+    """Registra un formato de ingesta por su nombre."""
+    FORMATS[cls.name] = cls()
+    return cls
+
+
+@register_format
+class JsonFormat(FrameFormat):
+    """JSON {frame, timestamp, frameNumber, deviceId} con el JPEG en data URL base64."""
+
+    name = 'json'
+    content_type = 'application/json'
+
+    def prepare(self, jpeg: bytes):
+        return b'{"frame":"data:image/jpeg;base64,' + base64.b64encode(jpeg) + b'",'
+
+    def body(self, prepared, timestamp: float, frame_number: int, device_id: str) -> bytes:
+        tail = json.dumps({'timestamp': timestamp, 'frameNumber': frame_number, 'deviceId': device_id})
+        return prepared + tail[1:].encode()
+
+
+@register_format
+class JpegFormat(FrameFormat):
+    """JPEG binario (image/jpeg) con los metadatos en cabeceras X-*."""
+
+    name = 'jpeg'
+    content_type = 'image/jpeg'
+
+    def body(self, prepared, timestamp: float, frame_number: int, device_id: str) -> bytes:
+        return prepared
+
+    def headers(self, timestamp: float, frame_number: int, device_id: str) -> Dict[str, str]:
+        return {
+            'X-Timestamp': str(timestamp),
+            'X-Frame-Number': str(frame_number),
+            'X-Device-Id': device_id,
+        }
+
+
+def build_corpus(width: int, height: int, quality: int, frames: int = 8) -> List[bytes]:
+    """
+    Genera un corpus de frames JPEG con movimiento (no se comprimen de forma trivial).
+
+    Args:
+        width: Ancho de los frames
+        height: Alto de los frames
+        quality: Calidad JPEG (0-100)
+        frames: Número de frames distintos
+
+    Returns:
+        Lista de JPEG
+    """
+    corpus = []
+    for index in range(frames):
+        frame = synthetic_frame(width, height, shift=index * 255.0 / frames, seed=index)
+        success, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if success:
+            corpus.append(buffer.tobytes())
+    return corpus
+
+
+@dataclass
+class PhoneResult:
+    """Resultados de un emisor simulado."""
+    device_id: str
+    sent: int = 0
+    ok: int = 0
+    skipped: int = 0
+    bytes_sent: int = 0
+    latencies_ms: List[float] = field(default_factory=list)
+    errors: Counter = field(default_factory=Counter)
+
+
+class SimulatedPhone:
+    """
+    Emisor que envía frames a ritmo fijo, como la página móvil.
+
+    Si una petición tarda más que el intervalo entre frames, los frames
+    que ya no llegan a tiempo se omiten (el móvil solo envía el actual).
+    Con `follow_control` aplica los fps que el receptor devuelve en el ack.
+    """
+
+    def __init__(self, url: str, fmt: FrameFormat, corpus: List, fps: float, device_id: str,
+                 follow_control: bool = False, timeout: float = 5.0):
+        self.url = urllib.parse.urlsplit(url)
+        self.path = self.url.path or '/'
+        self.fmt = fmt
+        self.corpus = corpus
+        self.fps = fps
+        self.follow_control = follow_control
+        self.timeout = timeout
+        self.result = PhoneResult(device_id)
+
+    def run(self, stop_event: threading.Event, start_at: float) -> None:
+        """Envía frames hasta que se active `stop_event`."""
+        connection = None
+        frame_number = 0
+        next_send = start_at
+
+        while not stop_event.is_set():
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                if stop_event.wait(delay):
+                    break
+
+            if connection is None:
+                connection = http.client.HTTPConnection(self.url.hostname, self.url.port or 80,
+                                                        timeout=self.timeout)
+            prepared = self.corpus[frame_number % len(self.corpus)]
+            timestamp = time.time() * 1000.0
+            body = self.fmt.body(prepared, timestamp, frame_number, self.result.device_id)
+            headers = {'Content-Type': self.fmt.content_type}
+            headers.update(self.fmt.headers(timestamp, frame_number, self.result.device_id))
+
+            started = time.perf_counter()
+            try:
+                connection.request('POST', self.path, body, headers)
+                response = connection.getresponse()
+                payload = response.read()
+                elapsed_ms = (time.perf_counter() - started) * 1000.0
+                self.result.sent += 1
+                self.result.bytes_sent += len(body)
+                if response.status == 200:
+                    self.result.ok += 1
+                    self.result.latencies_ms.append(elapsed_ms)
+                    if self.follow_control:
+                        self._apply_control(payload)
+                else:
+                    self.result.errors[str(response.status)] += 1
+                if response.will_close:
+                    connection.close()
+                    connection = None
+            except (OSError, http.client.HTTPException) as e:
+                self.result.sent += 1
+                self.result.errors[type(e).__name__] += 1
+                connection.close()
+                connection = None
+
+            frame_number += 1
+            interval = 1.0 / self.fps
+            next_send += interval
+            now = time.perf_counter()
+            if next_send < now:
+                missed = int((now - next_send) / interval) + 1
+                self.result.skipped += missed
+                frame_number += missed
+                next_send += missed * interval
+
+        if connection is not None:
+            connection.close()
+
+    def _apply_control(self, payload: bytes) -> None:
+        """Aplica los fps pedidos por el receptor en el ack."""
+        try:
+            control = json.loads(payload).get('control') or {}
+            fps = float(control.get('fps', self.fps))
+            if fps > 0:
+                self.fps = fps
+        except (ValueError, AttributeError):
+            pass
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Percentil por el método del rango más cercano."""
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(math.ceil(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(results: List[PhoneResult], seconds: float, requested_fps: float) -> Dict:
+    """Agrega los resultados de todos los emisores."""
+    latencies = [latency for result in results for latency in result.latencies_ms]
+    errors = Counter()
+    for result in results:
+        errors.update(result.errors)
+    sent = sum(result.sent for result in results)
+    ok = sum(result.ok for result in results)
+    return {
+        'phones': len(results),
+        'seconds': round(seconds, 2),
+        'requested_fps': requested_fps * len(results),
+        'achieved_fps': round(ok / seconds, 2) if seconds else 0.0,
+        'mbit_per_second': round(sum(r.bytes_sent for r in results) * 8 / seconds / 1e6, 2) if seconds else 0.0,
+        'sent': sent,
+        'ok': ok,
+        'skipped': sum(result.skipped for result in results),
+        'error_rate': round((sent - ok) / sent, 4) if sent else 0.0,
+        'errors': dict(errors),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50), 2),
+            'p90': round(percentile(latencies, 0.90), 2),
+            'p99': round(percentile(latencies, 0.99), 2),
+            'max': round(max(latencies), 2) if latencies else math.nan,
+        },
+    }
+
+
+def run_load(url: str, fmt: str = 'json', phones: int = 1, fps: float = 10.0,
+             width: int = 640, height: int = 480, quality: int = 80, seconds: float = 10.0,
+             follow_control: bool = False) -> Dict:
+    """
+    Ejecuta una prueba de carga.
+
+    Args:
+        url: URL de ingesta del receptor
+        fmt: Formato de ingesta registrado en FORMATS
+        phones: Número de emisores simultáneos
+        fps: Fps por emisor
+        width: Ancho de los frames
+        height: Alto de los frames
+        quality: Calidad JPEG
+        seconds: Duración de la prueba
+        follow_control: Aplicar los fps devueltos por el receptor
+
+    Returns:
+        Resumen de resultados
+    """
+    frame_format = FORMATS[fmt]
+    corpus = [frame_format.prepare(jpeg) for jpeg in build_corpus(width, height, quality)]
+
+    stop_event = threading.Event()
+    start_at = time.perf_counter() + 0.2
+    senders = [
+        SimulatedPhone(url, frame_format, corpus, fps, f"loadgen-{index}", follow_control)
+        for index in range(phones)
+    ]
+    threads = [threading.Thread(target=phone.run, args=(stop_event, start_at), daemon=True)
+               for phone in senders]
+    for thread in threads:
+        thread.start()
+
+    time.sleep(max(0.0, start_at - time.perf_counter()) + seconds)
+    stop_event.set()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    summary = summarize([phone.result for phone in senders], seconds, fps)
+    summary.update({'url': url, 'format': fmt, 'width': width, 'height': height, 'quality': quality})
+    return summary
+
+
+def _serve_receiver(target: str, port: int) -> None:
+    """Arranca un receptor sin UI (proceso hijo de --spawn)."""
+    if target == 'desktop':
+        from desktop_receiver import CameraReceiver
+        receiver = CameraReceiver()
+        receiver.start_server(port)
+    elif target == 'pc':
+        from pc_receiver import MobileFrameHandler, PCReceiverApp
+        from src.network.mjpeg_server import StreamingHTTPServer
+        app = PCReceiverApp()
+        server = StreamingHTTPServer(('127.0.0.1', port), MobileFrameHandler)
+        server.app = app
+        app.broadcaster.start()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    elif target == 'relay':
+        from src.network.relay_server import RelayServer
+        RelayServer('127.0.0.1', port).serve_forever()
+    else:
+        raise ValueError(f"Receptor no soportado para --spawn: {target}")
+    threading.Event().wait()
+
+
+def _wait_for_port(port: int, timeout: float = 15.0) -> bool:
+    """Espera a que el receptor acepte conexiones."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def _print_summary(summary: Dict) -> None:
+    """Muestra el resumen en texto."""
+    latency = summary['latency_ms']
+    print(f"{summary['phones']} emisores x {summary['requested_fps'] / max(1, summary['phones']):.0f} fps "
+          f"({summary['width']}x{summary['height']} q{summary['quality']}, formato {summary['format']}) "
+          f"-> {summary['url']}")
+    print(f"  throughput: {summary['achieved_fps']:.1f} frames/s de {summary['requested_fps']:.0f} pedidos, "
+          f"{summary['mbit_per_second']:.1f} Mbit/s")
+    print(f"  latencia:   p50 {latency['p50']:.1f} ms | p90 {latency['p90']:.1f} ms | "
+          f"p99 {latency['p99']:.1f} ms | máx {latency['max']:.1f} ms")
+    print(f"  errores:    {summary['error_rate']:.2%} de {summary['sent']} envíos {summary['errors'] or ''}"
+          f" | omitidos por retraso: {summary['skipped']}")
+
+
+def main():
+    """Función principal del generador de carga."""
+    parser = argparse.ArgumentParser(description="Simula móviles enviando frames a un receptor")
+    parser.add_argument('--target', choices=sorted(TARGETS), default='desktop',
+                        help="Receptor (define la URL por defecto)")
+    parser.add_argument('--url', help="URL de ingesta (sustituye a la de --target)")
+    parser.add_argument('--spawn', action='store_true',
+                        help="Arrancar el receptor (pc, desktop o relay) sin UI en otro proceso")
+    parser.add_argument('--format', choices=sorted(FORMATS), default='json', help="Formato de ingesta")
+    parser.add_argument('--phones', type=int, default=1, help="Emisores simultáneos")
+    parser.add_argument('--fps', type=float, default=10.0, help="Fps por emisor")
+    parser.add_argument('--width', type=int, default=640, help="Ancho de los frames")
+    parser.add_argument('--height', type=int, default=480, help="Alto de los frames")
+    parser.add_argument('--quality', type=int, default=80, help="Calidad JPEG (0-100)")
+    parser.add_argument('--seconds', type=float, default=10.0, help="Duración de la prueba")
+    parser.add_argument('--follow-control', action='store_true',
+                        help="Aplicar los fps que devuelve el receptor en el ack")
+    parser.add_argument('--json', dest='json_path', help="Guardar el resumen en este fichero JSON")
+    args = parser.parse_args()
+
+    url, port = TARGETS[args.target]
+    if args.url:
+        url = args.url
+        port = urllib.parse.urlsplit(url).port or 80
+
+    process = None
+    if args.spawn:
+        process = multiprocessing.get_context('spawn').Process(
+            target=_serve_receiver, args=(args.target, port), daemon=True
+        )
+        process.start()
+        if not _wait_for_port(port):
+            process.terminate()
+            raise SystemExit(f"El receptor no respondió en el puerto {port}")
+
+    try:
+        summary = run_load(url, args.format, args.phones, args.fps, args.width, args.height,
+                           args.quality, args.seconds, args.follow_control)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.join(timeout=5)
+
+    _print_summary(summary)
+    if args.json_path:
+        with open(args.json_path, 'w') as handle:
+            json.dump(summary, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Reproducción de capturas de ingesta.
+====================================
+
+Reproduce una captura grabada con INGEST_CAPTURE (ver
+src/network/traffic_capture.py) contra una FrameIngest en este proceso o
+contra un receptor por HTTP, con los tiempos originales o sin esperas.
+Con la misma captura, dos ejecuciones reciben exactamente la misma
+entrada, así que las diferencias se deben al código.
+
+Uso:
+    INGEST_CAPTURE=capturas/sesion python desktop_receiver.py
+    python -m benchmarks.replay capturas/sesion --speed 0
+    python -m benchmarks.replay capturas/sesion --url http://127.0.0.1:8081/ --speed 1
+    python -m benchmarks.replay capturas/sesion.worker0 capturas/sesion.worker1 --speed 0
+"""
+
+import argparse
+import time
+
+from src.camera.frame_bus import FrameSlot
+from src.network.ingest import FrameIngest
+from src.network.traffic_capture import TrafficReplayer
+
+
+def replay_ingest(replayer: TrafficReplayer, target_size) -> None:
+    """Reproduce contra una FrameIngest local y espera a que se vacíe el pool."""
+    slot = FrameSlot()
+    ingest = FrameIngest(slot, target_size=target_size)
+    started = time.perf_counter()
+    stats = replayer.replay_to(ingest.submit)
+
+    # Esperar a que el pool termine lo pendiente antes de contar
+    deadline = time.monotonic() + 10.0
+    while time.monotonic() < deadline:
+        pool = ingest.decode_pool.get_stats()
+        if pool.completed + pool.coalesced >= pool.submitted:
+            break
+        time.sleep(0.005)
+    total = time.perf_counter() - started
+
+    pool = ingest.decode_pool.get_stats()
+    jitter = ingest.get_totals()
+    ingest.close()
+
+    print(f"  entregados:   {stats.frames} frames en {stats.elapsed:.2f} s ({stats.fps:.1f} fps)")
+    print(f"  procesados:   en {total:.2f} s hasta vaciar el pool de decodificación")
+    print(f"  publicados:   {ingest.frame_count} | coalescidos en el pool: {pool.coalesced} | "
+          f"descartados por jitter: {jitter.dropped}")
+    print(f"  retraso máx. respecto a la captura: {stats.max_lag_ms:.1f} ms")
+
+
+def main():
+    """Función principal del reproductor."""
+    parser = argparse.ArgumentParser(description="Reproduce una captura de tráfico de ingesta")
+    parser.add_argument('captures', nargs='+', help="Ruta base de la captura (varias se mezclan)")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Factor de velocidad (1 = tiempo real, 0 = sin esperas)")
+    parser.add_argument('--url', help="Reproducir por HTTP contra esta URL de ingesta")
+    parser.add_argument('--width', type=int, default=640, help="Ancho de publicación (solo en local)")
+    parser.add_argument('--height', type=int, default=480, help="Alto de publicación (solo en local)")
+    args = parser.parse_args()
+
+    replayer = TrafficReplayer(args.captures, speed=args.speed)
+    mode = "sin esperas" if args.speed <= 0 else f"velocidad x{args.speed:g}"
+
+    if args.url:
+        print(f"Reproduciendo {', '.join(args.captures)} contra {args.url} ({mode})")
+        stats = replayer.replay_http(args.url)
+        print(f"  enviados: {stats.frames} frames en {stats.elapsed:.2f} s ({stats.fps:.1f} fps)")
+        print(f"  aceptados: {stats.accepted} | errores: {stats.errors} | "
+              f"retraso máx.: {stats.max_lag_ms:.1f} ms")
+    else:
+        print(f"Reproduciendo {', '.join(args.captures)} en una FrameIngest local ({mode})")
+        replay_ingest(replayer, (args.width, args.height))
+
+
+if __name__ == "__main__":
+    main()
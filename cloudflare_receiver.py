@@ -3,7 +3,8 @@ Receptor Desktop para Cloudflare Worker
 =======================================
 
 Aplicación desktop que recibe frames desde tu Worker de Cloudflare.
-Se conecta a tu deployment para ver la cámara del móvil.
+Se conecta a tu deployment para ver la cámara del móvil; si hay varios
+móviles enviando al mismo Worker se elige cuál ver.
 """
 
 import base64
@@ -11,99 +12,208 @@ import json
 import logging
 import threading
 import time
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple, Union
 import requests
-import cv2
-import numpy as np
 import flet as ft
 
+from src.camera.codec import get_codec
+from src.camera.frame_bus import FrameSlot
+from src.camera.stream_manager import StreamRecorder
+from src.network.http_transport import get_session
+from src.network.relay_client import RelayClient, RelaySubscription
+from src.utils.media_writer import MediaWriter, capture_burst, photo_path
+
+
+# Fotos por ráfaga
+BURST_SIZE = 10
+
+
+@dataclass
+class DeviceFeed:
+    """Último frame recibido de un dispositivo (sin decodificar)."""
+    jpeg: bytes
+    timestamp: Optional[float] = None
+    frames: int = 0
+
 
 class CloudflareReceiver:
     """Receptor que se conecta al Worker de Cloudflare."""
     
-    def __init__(self, worker_url: str):
+    def __init__(self, worker_url: str, frame_slot: Optional[FrameSlot] = None,
+                 target_size: Optional[Tuple[int, int]] = None):
         """
         Inicializa el receptor.
         
         Args:
             worker_url: URL del Worker de Cloudflare
+            frame_slot: Slot donde publicar los frames (se crea uno si no se indica)
+            target_size: Tamaño (ancho, alto) de los frames publicados, o None
         """
         self.worker_url = worker_url.rstrip('/')
         self.is_receiving = False
         self.current_frame = None
+        self.current_jpeg = None
         self.frame_count = 0
-        self.session = requests.Session()
+        # Solo se decodifican los frames del dispositivo seleccionado
+        self.feeds: Dict[str, DeviceFeed] = {}
+        self.selected_device: Optional[str] = None
+        self._feeds_lock = threading.Lock()
+        self.frame_slot = frame_slot or FrameSlot()
+        self.target_size = target_size
+        self.codec = get_codec()
+        self.session = get_session('cloudflare_receiver', base_url=self.worker_url)
+        # Con target_size el relay envía una variante de ese ancho
+        self.relay = RelayClient(self.worker_url, self.session, timeout=5,
+                                 width=target_size[0] if target_size else None)
+        self.subscription: Optional[RelaySubscription] = None
         
     def start_polling(self):
-        """Inicia el polling de frames."""
-        self.is_receiving = True
-        
-        def poll_frames():
-            while self.is_receiving:
-                try:
-                    # Hacer request al API de frames
-                    response = self.session.get(
-                        f"{self.worker_url}/api/frames",
-                        timeout=5
-                    )
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        frames = data.get('frames', [])
-                        
-                        # Procesar último frame si hay
-                        if frames:
-                            latest_frame = frames[-1]
-                            self.process_frame(latest_frame.get('frame', ''))
-                    
-                except Exception as e:
-                    logging.error(f"Error polling frames: {e}")
-                
-                time.sleep(0.1)  # Poll cada 100ms
+        """
+        Inicia la recepción de frames.
         
-        thread = threading.Thread(target=poll_frames, daemon=True)
-        thread.start()
+        Usa el mejor modo de entrega del Worker (JPEG binario por
+        long-poll, Server-Sent Events, long-poll JSON o, en Workers
+        antiguos, polling al ritmo del emisor con varias peticiones en
+        vuelo). Con Workers que distinguen dispositivos se reciben los
+        frames de todos los móviles en un único long-poll.
+        """
+        self.is_receiving = True
+        self.subscription = RelaySubscription(
+            self.relay,
+            lambda frame: self.process_frame(frame.payload, frame.timestamp, frame.device_id),
+            poll_interval=0.1,
+            fleet=True
+        )
+        self.subscription.start()
     
     def stop_polling(self):
-        """Detiene el polling."""
+        """Detiene la recepción."""
         self.is_receiving = False
+        if self.subscription:
+            self.subscription.stop()
+            self.subscription = None
     
-    def process_frame(self, frame_data: str):
+    @property
+    def delivery_mode(self) -> str:
+        """Modo de entrega en uso (uno de DELIVERY_MODES)."""
+        return self.subscription.mode if self.subscription else ""
+    
+    @property
+    def devices(self) -> List[str]:
+        """Dispositivos de los que se han recibido frames, por orden de llegada."""
+        with self._feeds_lock:
+            return list(self.feeds)
+    
+    def device_frames(self, device_id: str) -> int:
+        """Frames recibidos de un dispositivo."""
+        with self._feeds_lock:
+            feed = self.feeds.get(device_id)
+            return feed.frames if feed else 0
+    
+    def select_device(self, device_id: str):
+        """
+        Cambia el dispositivo que se decodifica y publica.
+        
+        Su último frame se publica enseguida para no esperar al siguiente.
+        
+        Args:
+            device_id: Identificador del dispositivo
+        """
+        with self._feeds_lock:
+            self.selected_device = device_id
+            feed = self.feeds.get(device_id)
+        if feed is not None:
+            self._publish(feed.jpeg, feed.timestamp)
+    
+    def process_frame(self, frame_data: Union[str, bytes], timestamp: Optional[float] = None,
+                      device_id: str = ""):
         """
         Procesa un frame recibido.
         
         Args:
-            frame_data: Frame en formato base64
+            frame_data: JPEG binario o frame en formato base64
+            timestamp: Timestamp del emisor en milisegundos (opcional)
+            device_id: Dispositivo que envió el frame (opcional)
         """
         try:
             if not frame_data:
                 return False
-                
-            # Decodificar base64
-            if frame_data.startswith('data:image'):
-                frame_data = frame_data.split(',')[1]
             
-            img_data = base64.b64decode(frame_data)
+            if isinstance(frame_data, bytes):
+                # Endpoint binario: el JPEG llega tal cual
+                img_data = frame_data
+            else:
+                # Decodificar base64
+                if frame_data.startswith('data:image'):
+                    frame_data = frame_data.split(',')[1]
+                
+                img_data = base64.b64decode(frame_data)
             
-            # Convertir a numpy array
-            nparr = np.frombuffer(img_data, np.uint8)
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            self.frame_count += 1
+            with self._feeds_lock:
+                feed = self.feeds.get(device_id)
+                if feed is None:
+                    feed = self.feeds[device_id] = DeviceFeed(img_data)
+                feed.jpeg = img_data
+                feed.timestamp = timestamp
+                feed.frames += 1
+                
+                # El primer dispositivo que aparece queda seleccionado
+                if self.selected_device is None:
+                    self.selected_device = device_id
+                if device_id != self.selected_device:
+                    return True
             
-            if frame is not None:
-                self.current_frame = frame
-                self.frame_count += 1
-                return True
+            return self._publish(img_data, timestamp)
                 
         except Exception as e:
             logging.error(f"Error procesando frame: {e}")
             
         return False
     
+    def _publish(self, img_data: bytes, timestamp: Optional[float]) -> bool:
+        """Decodifica un JPEG del dispositivo seleccionado y lo publica."""
+        # Decodificar (escalado en el dominio DCT si hay tamaño objetivo)
+        frame = self.codec.decode_to_size(img_data, self.target_size)
+        if frame is None:
+            return False
+        
+        self.current_frame = frame
+        self.current_jpeg = img_data
+        self.frame_slot.publish(frame, timestamp=timestamp, jpeg=img_data)
+        return True
+    
     def get_latest_frame(self):
-        """Obtiene el último frame recibido."""
-        return self.current_frame
+        """Obtiene el último frame recibido a la resolución en que llegó."""
+        jpeg = self.current_jpeg
+        if jpeg is None:
+            return None
+        return self.codec.decode(jpeg)
+    
+    def fetch_original_jpeg(self) -> Optional[bytes]:
+        """
+        Descarga el último frame a resolución completa.
+        
+        Los frames recibidos pueden ser variantes reducidas al tamaño de
+        la vista; para fotos se pide el original (sin ?w=) del
+        dispositivo seleccionado.
+        
+        Returns:
+            JPEG original, o el último recibido si el relay no lo sirve
+        """
+        device = self.selected_device
+        url = (f"{self.worker_url}/api/devices/{device}/latest-frame.jpg" if device
+               else f"{self.worker_url}/api/latest-frame.jpg")
+        try:
+            response = self.session.get(url, timeout=5)
+            if response.status_code == 200 and response.content:
+                return response.content
+        except requests.RequestException as e:
+            logging.warning(f"No se pudo descargar el frame original: {e}")
+        return self.current_jpeg
     
     def check_health(self):
         """Verifica si el Worker está disponible."""
@@ -120,8 +230,10 @@ class CloudflareReceiverApp:
     def __init__(self):
         """Inicializa la aplicación."""
         self.receiver = None
+        self.frame_slot = FrameSlot()
+        self.media_writer = MediaWriter()
         self.is_recording = False
-        self.video_writer = None
+        self.recorder: Optional[StreamRecorder] = None
         self.worker_url = ""
         
     def run(self, page: ft.Page):
@@ -181,6 +293,15 @@ class CloudflareReceiverApp:
             disabled=True
         )
         
+        # Selector de cámara (se rellena al llegar frames de cada móvil)
+        self.device_dropdown = ft.Dropdown(
+            label="Cámara",
+            width=250,
+            options=[],
+            on_change=self._select_device,
+            disabled=True
+        )
+        
         # Vista de video
         self.video_view = ft.Image(
             src="",
@@ -227,6 +348,14 @@ class CloudflareReceiverApp:
             disabled=True
         )
         
+        self.burst_btn = ft.ElevatedButton(
+            "📸 Ráfaga",
+            icon=ft.Icons.BURST_MODE,
+            on_click=self._take_burst,
+            style=ft.ButtonStyle(bgcolor=ft.Colors.GREEN_500, color=ft.Colors.WHITE),
+            disabled=True
+        )
+        
         # Estado
         self.status_text = ft.Text(
             "⏸️ Desconectado",
@@ -270,6 +399,8 @@ class CloudflareReceiverApp:
             
             ft.Divider(height=10),
             
+            self.device_dropdown,
+            
             # Video
             ft.Container(
                 content=ft.Stack([
@@ -282,7 +413,8 @@ class CloudflareReceiverApp:
             # Controles
             ft.Row([
                 self.record_btn,
-                self.photo_btn
+                self.photo_btn,
+                self.burst_btn
             ], alignment=ft.MainAxisAlignment.CENTER),
             
             # Estado
@@ -311,7 +443,7 @@ class CloudflareReceiverApp:
             return
         
         # Crear receptor
-        self.receiver = CloudflareReceiver(url)
+        self.receiver = CloudflareReceiver(url, self.frame_slot, target_size=(640, 480))
         
         # Verificar conexión
         if not self.receiver.check_health():
@@ -328,6 +460,7 @@ class CloudflareReceiverApp:
         self.disconnect_btn.disabled = False
         self.record_btn.disabled = False
         self.photo_btn.disabled = False
+        self.burst_btn.disabled = False
         self.url_input.disabled = True
         
         self.status_text.value = "🟢 Conectado - Esperando frames..."
@@ -351,17 +484,37 @@ class CloudflareReceiverApp:
         self.disconnect_btn.disabled = True
         self.record_btn.disabled = True
         self.photo_btn.disabled = True
+        self.burst_btn.disabled = True
         self.url_input.disabled = False
         
         self.status_text.value = "⏸️ Desconectado"
         self.status_text.color = ft.Colors.GREY_600
         
+        self.device_dropdown.options = []
+        self.device_dropdown.value = None
+        self.device_dropdown.disabled = True
+        
         # Limpiar video
         self.video_view.src_base64 = ""
         self.video_view.update()
         
         self.page.update()
     
+    def _select_device(self, e):
+        """Muestra la cámara elegida en el selector."""
+        if self.receiver and self.device_dropdown.value is not None:
+            self.receiver.select_device(self.device_dropdown.value)
+    
+    def _update_devices(self, receiver: CloudflareReceiver):
+        """Actualiza el selector con los dispositivos conocidos (hilo de la UI)."""
+        self.device_dropdown.options = [
+            ft.dropdown.Option(key=device, text=f"{device or 'Sin ID'} ({receiver.device_frames(device)} frames)")
+            for device in receiver.devices
+        ]
+        self.device_dropdown.value = receiver.selected_device
+        self.device_dropdown.disabled = len(self.device_dropdown.options) < 2
+        self.device_dropdown.update()
+    
     def _toggle_recording(self, e):
         """Alterna grabación de video."""
         if not self.is_recording:
@@ -370,17 +523,18 @@ class CloudflareReceiverApp:
             filename = f"recordings/cloudflare_stream_{timestamp}.mp4"
             Path("recordings").mkdir(exist_ok=True)
             
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            self.video_writer = cv2.VideoWriter(filename, fourcc, 15.0, (640, 480))
+            # Grabación con pacing por timestamp del emisor
+            self.recorder = StreamRecorder(Path(filename), fps=15.0)
+            self.recorder.start((640, 480))
             
             self.is_recording = True
             self.record_btn.text = "⏹️ Detener Grabación"
             self.record_btn.style.bgcolor = ft.Colors.RED_600
         else:
             # Detener grabación
-            if self.video_writer:
-                self.video_writer.release()
-                self.video_writer = None
+            if self.recorder:
+                self.recorder.stop()
+                self.recorder = None
             
             self.is_recording = False
             self.record_btn.text = "🔴 Grabar"
@@ -389,42 +543,89 @@ class CloudflareReceiverApp:
         self.page.update()
     
     def _take_photo(self, e):
-        """Captura una foto."""
+        """Captura una foto (la escritura se hace en segundo plano)."""
         if self.receiver:
-            frame = self.receiver.get_latest_frame()
-            if frame is not None:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"photos/cloudflare_photo_{timestamp}.jpg"
-                Path("photos").mkdir(exist_ok=True)
-                
-                cv2.imwrite(filename, frame)
-                
-                self.status_text.value = f"📸 Foto guardada: {filename}"
+            receiver = self.receiver
+            path = photo_path("photos", "cloudflare_photo")
+            
+            def fetch_and_save():
+                # JPEG original del Worker a resolución completa (sin recodificar)
+                jpeg = receiver.fetch_original_jpeg()
+                if jpeg is not None:
+                    self._submit_photo(path, jpeg)
+            
+            threading.Thread(target=fetch_and_save, daemon=True).start()
+    
+    def _take_burst(self, e):
+        """Captura una ráfaga con los próximos frames sin bloquear la UI."""
+        capture_burst(self.media_writer, self.frame_slot, "photos", "cloudflare_burst",
+                      count=BURST_SIZE, on_done=self._on_burst_done)
+        self.status_text.value = f"📸 Capturando ráfaga de {BURST_SIZE} fotos..."
+        self.status_text.color = ft.Colors.BLUE_600
+        self.page.update()
+    
+    def _submit_photo(self, filename, data):
+        """Encola una foto en el escritor en segundo plano."""
+        if self.media_writer.submit(filename, data, callback=self._on_photo_saved):
+            self.status_text.value = f"💾 Guardando foto: {filename}"
+            self.status_text.color = ft.Colors.BLUE_600
+        else:
+            self.status_text.value = "⚠️ Cola de escritura llena, foto descartada"
+            self.status_text.color = ft.Colors.ORANGE_600
+        self.page.update()
+    
+    def _on_photo_saved(self, result):
+        """Notifica en la UI que la foto ya está en disco (hilo del escritor)."""
+        def update_status():
+            if result.success:
+                self.status_text.value = f"📸 Foto guardada: {result.path}"
                 self.status_text.color = ft.Colors.BLUE_600
-                self.page.update()
+            else:
+                self.status_text.value = f"❌ Error guardando foto: {result.error}"
+                self.status_text.color = ft.Colors.RED_600
+            self.page.update()
+        
+        self.page.invoke_later(update_status)
+    
+    def _on_burst_done(self, saved, requested):
+        """Notifica en la UI el resultado de la ráfaga."""
+        def update_status():
+            self.status_text.value = f"📸 Ráfaga guardada: {saved}/{requested} fotos"
+            self.status_text.color = ft.Colors.BLUE_600 if saved == requested else ft.Colors.ORANGE_600
+            self.page.update()
+        
+        self.page.invoke_later(update_status)
     
     def _start_frame_updater(self):
-        """Inicia el actualizador de frames."""
+        """Inicia el actualizador de frames dirigido por nuevos frames."""
         def update_frames():
-            last_frame_count = 0
+            last_sequence = 0
             last_time = time.time()
+            last_stats = ""
             
             while True:
                 try:
-                    if self.receiver and self.receiver.is_receiving:
-                        frame = self.receiver.get_latest_frame()
+                    # Esperar un frame nuevo (los bursts se coalescen al más reciente)
+                    packet = self.frame_slot.wait_for_next(last_sequence, timeout=1.0)
+                    receiver = self.receiver
+                    
+                    if packet is not None:
+                        last_sequence = packet.sequence
                         
-                        if frame is not None:
-                            # Redimensionar frame
-                            frame_resized = cv2.resize(frame, (640, 480))
+                        if receiver and receiver.is_receiving:
+                            # El frame ya llega a 640x480 desde el receptor
+                            frame = packet.frame
                             
                             # Grabar si está activo
-                            if self.is_recording and self.video_writer:
-                                self.video_writer.write(frame_resized)
+                            recorder = self.recorder
+                            if self.is_recording and recorder:
+                                recorder.write_frame_at(frame, packet.timestamp)
                             
                             # Convertir a base64 para mostrar
-                            _, buffer = cv2.imencode('.jpg', frame_resized)
-                            img_b64 = base64.b64encode(buffer).decode()
+                            jpeg = receiver.codec.encode(frame, quality=95)
+                            if jpeg is None:
+                                continue
+                            img_b64 = base64.b64encode(jpeg).decode()
                             
                             # Actualizar UI
                             def update_ui():
@@ -432,27 +633,29 @@ class CloudflareReceiverApp:
                                 self.video_view.update()
                                 
                                 # Actualizar estado
-                                if self.receiver.frame_count > 0:
-                                    self.status_text.value = "🔴 Recibiendo desde Cloudflare"
-                                    self.status_text.color = ft.Colors.RED_600
+                                self.status_text.value = "🔴 Recibiendo desde Cloudflare"
+                                self.status_text.color = ft.Colors.RED_600
                             
                             self.page.invoke_later(update_ui)
+                    
+                    # Calcular stats (solo se envían a la UI si cambiaron)
+                    current_time = time.time()
+                    if receiver and receiver.is_receiving and current_time - last_time >= 1.0:
+                        devices = receiver.devices
+                        stats = (f"Frames: {receiver.frame_count} | Cámaras: {len(devices)} | "
+                                 f"Modo: {receiver.delivery_mode} | "
+                                 f"Worker: {self.worker_url.split('//')[-1]}")
                         
-                        # Calcular stats
-                        current_time = time.time()
-                        if current_time - last_time >= 1.0:
-                            frames_diff = self.receiver.frame_count - last_frame_count
-                            
-                            def update_stats():
-                                self.stats_text.value = f"Frames: {self.receiver.frame_count} | Worker: {self.worker_url.split('//')[-1]}"
+                        if stats != last_stats:
+                            def update_stats(stats=stats, receiver=receiver):
+                                self.stats_text.value = stats
                                 self.stats_text.update()
+                                self._update_devices(receiver)
                             
                             self.page.invoke_later(update_stats)
-                            
-                            last_frame_count = self.receiver.frame_count
-                            last_time = current_time
-                    
-                    time.sleep(0.1)  # 10 FPS check
+                            last_stats = stats
+                        
+                        last_time = current_time
                     
                 except Exception as e:
                     logging.error(f"Error en actualizador: {e}")
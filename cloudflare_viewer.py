@@ -11,97 +11,171 @@ import threading
 import time
 import json
 import base64
-import cv2
-import numpy as np
 from datetime import datetime
 from pathlib import Path
-import requests
 import socket
+from typing import Optional, Tuple, Union
+
+from src.camera.codec import get_codec
+from src.camera.frame_bus import FrameSlot
+from src.camera.stream_manager import StreamRecorder
+from src.network.http_transport import get_session
+from src.network.relay_client import ConditionalFetcher, RelayClient, RelayFrame, RelaySubscription
+from src.utils.media_writer import MediaWriter, capture_burst, photo_path
+
+
+# Fotos por ráfaga
+BURST_SIZE = 10
+
+# Tamaño del vídeo en pantalla (se pide al relay una variante de este ancho)
+DISPLAY_SIZE = (640, 480)
 
 
 class CloudflareReceiver:
     """Receptor que obtiene frames desde Cloudflare Worker."""
     
-    def __init__(self, worker_url: str):
+    def __init__(self, worker_url: str, frame_slot: Optional[FrameSlot] = None,
+                 display_size: Tuple[int, int] = DISPLAY_SIZE):
         """
         Inicializa el receptor.
         
         Args:
             worker_url: URL del Worker de Cloudflare
+            frame_slot: Slot donde publicar los frames (se crea uno si no se indica)
+            display_size: Tamaño (ancho, alto) con el que se muestran los frames
         """
         self.worker_url = worker_url.rstrip('/')
         self.is_receiving = False
         self.current_frame = None
         self.frame_count = 0
-        self.session = requests.Session()
-        self.session.timeout = 5
+        self.frame_slot = frame_slot or FrameSlot()
+        self.codec = get_codec()
+        self.session = get_session('cloudflare_viewer', base_url=self.worker_url)
+        self.display_size = display_size
+        # El relay envía una variante del ancho mostrado en lugar del frame completo
+        self.relay = RelayClient(self.worker_url, self.session, timeout=5, width=display_size[0])
+        self.conditional = ConditionalFetcher(self.session)
+        self.subscription: Optional[RelaySubscription] = None
+        self._last_frame_key = None
+        self._binary_supported = True
         
     def start_receiving(self):
-        """Inicia la recepción de frames."""
+        """
+        Inicia la recepción de frames.
+        
+        Usa el mejor modo de entrega del Worker (JPEG binario por
+        long-poll, Server-Sent Events o long-poll JSON) y, en Workers
+        antiguos, el polling del último frame al ritmo del emisor y con
+        varias peticiones en vuelo.
+        """
         self.is_receiving = True
+        self._last_frame_key = None
+        self.subscription = RelaySubscription(
+            self.relay,
+            lambda frame: self.process_frame(frame.payload, frame.timestamp),
+            poll=self._poll_latest_frame,
+            poll_interval=0.1  # Hasta estimar el ritmo del emisor
+        )
+        self.subscription.start()
+    
+    def _poll_latest_frame(self) -> Optional[RelayFrame]:
+        """
+        Obtiene el último frame con el endpoint de polling.
         
-        def receive_loop():
-            """Loop principal de recepción."""
-            while self.is_receiving:
-                try:
-                    # Usar el endpoint más eficiente para obtener solo el último frame
-                    response = self.session.get(
-                        f"{self.worker_url}/api/latest-frame",
-                        timeout=3
-                    )
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        
-                        if data.get('success') and data.get('frame'):
-                            frame_info = data['frame']
-                            frame_data = frame_info.get('frame', '')
-                            if frame_data:
-                                self.process_frame(frame_data)
-                    
-                    # También intentar obtener el stream directo desde la página principal
-                    # (esto simula lo que haría un navegador)
-                    
-                except requests.exceptions.RequestException as e:
-                    print(f"Error conectando a Cloudflare: {e}")
-                except Exception as e:
-                    print(f"Error general: {e}")
-                
-                time.sleep(0.1)  # 10 FPS polling
+        Returns:
+            El frame si es distinto del último procesado, o None
+        """
+        # Preferir el JPEG binario (sin JSON ni base64); con el ETag del
+        # anterior, si no cambió llega un 304 sin cuerpo
+        if self._binary_supported:
+            response = self.conditional.get(
+                f"{self.worker_url}/api/latest-frame.jpg",
+                params={'w': self.display_size[0]},
+                timeout=3
+            )
+            if response is None or response.status_code == 204:
+                return None
+            if response.status_code == 200:
+                frame_number = response.headers.get('X-Frame-Number')
+                timestamp = response.headers.get('X-Timestamp')
+                frame = RelayFrame(
+                    frame="",
+                    timestamp=float(timestamp) if timestamp else None,
+                    frame_number=int(frame_number) if frame_number else None,
+                    jpeg=response.content
+                )
+                return self._if_new(frame)
+            if response.status_code == 404:
+                # Worker antiguo sin endpoint binario
+                self._binary_supported = False
+        
+        # Usar el endpoint más eficiente para obtener solo el último frame
+        response = self.conditional.get(
+            f"{self.worker_url}/api/latest-frame",
+            params={'w': self.display_size[0]},
+            timeout=3
+        )
+        
+        if response is not None and response.status_code == 200:
+            data = response.json()
+            
+            if data.get('success') and data.get('frame'):
+                frame = RelayFrame.from_json(data['frame'])
+                if frame.frame:
+                    return self._if_new(frame)
         
-        # Iniciar thread de recepción
-        self.receive_thread = threading.Thread(target=receive_loop, daemon=True)
-        self.receive_thread.start()
+        return None
+    
+    def _if_new(self, frame: RelayFrame) -> Optional[RelayFrame]:
+        """Devuelve el frame salvo que sea el mismo que ya se procesó."""
+        frame_key = (frame.frame_number, frame.timestamp)
+        if frame_key == self._last_frame_key:
+            return None
+        self._last_frame_key = frame_key
+        return frame
     
     def stop_receiving(self):
         """Detiene la recepción."""
         self.is_receiving = False
+        if self.subscription:
+            self.subscription.stop()
+            self.subscription = None
+    
+    @property
+    def delivery_mode(self) -> str:
+        """Modo de entrega en uso (uno de DELIVERY_MODES)."""
+        return self.subscription.mode if self.subscription else ""
     
-    def process_frame(self, frame_data: str):
+    def process_frame(self, frame_data: Union[str, bytes], timestamp: Optional[float] = None):
         """
         Procesa un frame recibido.
         
         Args:
-            frame_data: Frame en base64
+            frame_data: JPEG binario o frame en base64
+            timestamp: Timestamp del emisor en milisegundos (opcional)
         """
         try:
             if not frame_data:
                 return False
             
-            # Limpiar data URL si está presente
-            if frame_data.startswith('data:image'):
-                frame_data = frame_data.split(',')[1]
-            
-            # Decodificar base64
-            img_data = base64.b64decode(frame_data)
+            if isinstance(frame_data, bytes):
+                # Endpoint binario: el JPEG llega tal cual
+                img_data = frame_data
+            else:
+                # Limpiar data URL si está presente
+                if frame_data.startswith('data:image'):
+                    frame_data = frame_data.split(',')[1]
+                
+                # Decodificar base64
+                img_data = base64.b64decode(frame_data)
             
-            # Convertir a OpenCV frame
-            nparr = np.frombuffer(img_data, np.uint8)
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            # Decodificar al tamaño mostrado (escalado en el dominio DCT)
+            frame = self.codec.decode_to_size(img_data, self.display_size)
             
             if frame is not None:
-                self.current_frame = cv2.resize(frame, (640, 480))
+                self.current_frame = frame
                 self.frame_count += 1
+                self.frame_slot.publish(self.current_frame, timestamp=timestamp)
                 return True
                 
         except Exception as e:
@@ -128,8 +202,10 @@ class CloudflareViewerApp:
     def __init__(self):
         """Inicializa la aplicación."""
         self.receiver = None
+        self.frame_slot = FrameSlot()
+        self.media_writer = MediaWriter()
         self.is_recording = False
-        self.video_writer = None
+        self.recorder: Optional[StreamRecorder] = None
         
     def run(self, page: ft.Page):
         """Ejecuta la aplicación."""
@@ -248,6 +324,17 @@ class CloudflareViewerApp:
             disabled=True
         )
         
+        self.burst_btn = ft.ElevatedButton(
+            "📸 Ráfaga",
+            icon=ft.Icons.BURST_MODE,
+            on_click=self._take_burst,
+            style=ft.ButtonStyle(
+                bgcolor=ft.Colors.GREEN_600,
+                color=ft.Colors.WHITE
+            ),
+            disabled=True
+        )
+        
         # Estado y estadísticas
         self.status_text = ft.Text(
             "⏸️ Desconectado de Cloudflare",
@@ -324,7 +411,8 @@ class CloudflareViewerApp:
             # Controles
             ft.Row([
                 self.record_btn,
-                self.photo_btn
+                self.photo_btn,
+                self.burst_btn
             ], alignment=ft.MainAxisAlignment.CENTER, spacing=20),
             
             ft.Divider(height=10, color=ft.Colors.TRANSPARENT),
@@ -360,7 +448,7 @@ class CloudflareViewerApp:
             return
         
         # Crear receptor
-        self.receiver = CloudflareReceiver(url)
+        self.receiver = CloudflareReceiver(url, self.frame_slot)
         
         # Verificar conexión
         self.status_text.value = "🔄 Conectando a Cloudflare..."
@@ -381,6 +469,7 @@ class CloudflareViewerApp:
         self.disconnect_btn.disabled = False
         self.record_btn.disabled = False
         self.photo_btn.disabled = False
+        self.burst_btn.disabled = False
         self.url_input.disabled = True
         
         self.status_text.value = "🟢 Conectado a Cloudflare - Esperando frames del móvil..."
@@ -403,6 +492,7 @@ class CloudflareViewerApp:
         self.disconnect_btn.disabled = True
         self.record_btn.disabled = True
         self.photo_btn.disabled = True
+        self.burst_btn.disabled = True
         self.url_input.disabled = False
         
         self.status_text.value = "⏸️ Desconectado de Cloudflare"
@@ -422,8 +512,9 @@ class CloudflareViewerApp:
             filename = f"recordings/cloudflare_stream_{timestamp}.mp4"
             Path("recordings").mkdir(exist_ok=True)
             
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            self.video_writer = cv2.VideoWriter(filename, fourcc, 15.0, (640, 480))
+            # Grabación con pacing por timestamp del emisor
+            self.recorder = StreamRecorder(Path(filename), fps=15.0)
+            self.recorder.start((640, 480))
             
             self.is_recording = True
             self.record_btn.text = "⏹️ Detener Grabación"
@@ -433,9 +524,9 @@ class CloudflareViewerApp:
             self.status_text.color = ft.Colors.RED_600
         else:
             # Detener grabación
-            if self.video_writer:
-                self.video_writer.release()
-                self.video_writer = None
+            if self.recorder:
+                self.recorder.stop()
+                self.recorder = None
             
             self.is_recording = False
             self.record_btn.text = "🔴 Grabar Video"
@@ -447,43 +538,87 @@ class CloudflareViewerApp:
         self.page.update()
     
     def _take_photo(self, e):
-        """Captura una foto del stream."""
+        """Captura una foto del stream (se codifica y escribe en segundo plano)."""
         if self.receiver:
             frame = self.receiver.get_latest_frame()
             if frame is not None:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"photos/cloudflare_photo_{timestamp}.jpg"
-                Path("photos").mkdir(exist_ok=True)
-                
-                cv2.imwrite(filename, frame)
-                
-                self.status_text.value = f"📸 Foto guardada: {filename}"
-                self.status_text.color = ft.Colors.BLUE_600
-                self.page.update()
+                self._submit_photo(photo_path("photos", "cloudflare_photo"), frame)
             else:
                 self.status_text.value = "❌ No hay frame disponible para capturar"
                 self.status_text.color = ft.Colors.ORANGE_600
                 self.page.update()
     
+    def _take_burst(self, e):
+        """Captura una ráfaga con los próximos frames sin bloquear la UI."""
+        capture_burst(self.media_writer, self.frame_slot, "photos", "cloudflare_burst",
+                      count=BURST_SIZE, to_data=lambda packet: packet.frame,
+                      on_done=self._on_burst_done)
+        self.status_text.value = f"📸 Capturando ráfaga de {BURST_SIZE} fotos..."
+        self.status_text.color = ft.Colors.BLUE_600
+        self.page.update()
+    
+    def _submit_photo(self, filename, data):
+        """Encola una foto en el escritor en segundo plano."""
+        if self.media_writer.submit(filename, data, callback=self._on_photo_saved):
+            self.status_text.value = f"💾 Guardando foto: {filename}"
+            self.status_text.color = ft.Colors.BLUE_600
+        else:
+            self.status_text.value = "⚠️ Cola de escritura llena, foto descartada"
+            self.status_text.color = ft.Colors.ORANGE_600
+        self.page.update()
+    
+    def _on_photo_saved(self, result):
+        """Notifica en la UI que la foto ya está en disco (hilo del escritor)."""
+        def update_status():
+            if result.success:
+                self.status_text.value = f"📸 Foto guardada: {result.path}"
+                self.status_text.color = ft.Colors.BLUE_600
+            else:
+                self.status_text.value = f"❌ Error guardando foto: {result.error}"
+                self.status_text.color = ft.Colors.RED_600
+            self.page.update()
+        
+        self.page.invoke_later(update_status)
+    
+    def _on_burst_done(self, saved, requested):
+        """Notifica en la UI el resultado de la ráfaga."""
+        def update_status():
+            self.status_text.value = f"📸 Ráfaga guardada: {saved}/{requested} fotos"
+            self.status_text.color = ft.Colors.BLUE_600 if saved == requested else ft.Colors.ORANGE_600
+            self.page.update()
+        
+        self.page.invoke_later(update_status)
+    
     def _start_frame_updater(self):
-        """Inicia el actualizador de frames en la UI."""
+        """Inicia el actualizador de frames en la UI, dirigido por nuevos frames."""
         def update_frames():
+            last_sequence = 0
             last_frame_count = 0
             last_time = time.time()
+            last_stats = ""
             
             while True:
                 try:
-                    if self.receiver and self.receiver.is_receiving:
-                        frame = self.receiver.get_latest_frame()
+                    # Esperar un frame nuevo (los bursts se coalescen al más reciente)
+                    packet = self.frame_slot.wait_for_next(last_sequence, timeout=1.0)
+                    receiver = self.receiver
+                    
+                    if packet is not None:
+                        last_sequence = packet.sequence
                         
-                        if frame is not None:
+                        if receiver and receiver.is_receiving:
+                            frame = packet.frame
+                            
                             # Grabar si está activo
-                            if self.is_recording and self.video_writer:
-                                self.video_writer.write(frame)
+                            recorder = self.recorder
+                            if self.is_recording and recorder:
+                                recorder.write_frame_at(frame, packet.timestamp)
                             
                             # Convertir a base64 para mostrar en UI
-                            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-                            img_b64 = base64.b64encode(buffer).decode()
+                            jpeg = receiver.codec.encode(frame, quality=85)
+                            if jpeg is None:
+                                continue
+                            img_b64 = base64.b64encode(jpeg).decode()
                             
                             # Actualizar UI en thread principal
                             def update_ui():
@@ -496,23 +631,27 @@ class CloudflareViewerApp:
                                     self.status_text.color = ft.Colors.RED_600
                             
                             self.page.invoke_later(update_ui)
+                    
+                    # Calcular estadísticas cada segundo (solo se envían si cambiaron)
+                    current_time = time.time()
+                    if receiver and receiver.is_receiving and current_time - last_time >= 1.0:
+                        frame_diff = receiver.frame_count - last_frame_count
+                        fps = frame_diff / (current_time - last_time)
+                        stats = f"Frames: {receiver.frame_count} | FPS: {fps:.1f} | Modo: {receiver.delivery_mode}"
+                        if receiver.conditional.requests:
+                            # Peticiones de polling resueltas con 304 (sin decodificar)
+                            stats += f" | Sin cambios: {receiver.conditional.hit_rate:.0%}"
                         
-                        # Calcular estadísticas cada segundo
-                        current_time = time.time()
-                        if current_time - last_time >= 1.0:
-                            frame_diff = self.receiver.frame_count - last_frame_count
-                            fps = frame_diff / (current_time - last_time)
-                            
-                            def update_stats():
-                                self.stats_text.value = f"Frames: {self.receiver.frame_count} | FPS: {fps:.1f}"
+                        if stats != last_stats:
+                            def update_stats(stats=stats):
+                                self.stats_text.value = stats
                                 self.stats_text.update()
                             
                             self.page.invoke_later(update_stats)
-                            
-                            last_frame_count = self.receiver.frame_count
-                            last_time = current_time
-                    
-                    time.sleep(0.033)  # ~30 FPS check
+                            last_stats = stats
+                        
+                        last_frame_count = receiver.frame_count
+                        last_time = current_time
                     
                 except Exception as e:
                     print(f"Error en frame updater: {e}")
@@ -0,0 +1,7 @@
+"""
+Configuración de pytest: las pruebas importan el paquete `src` desde la
+raíz del repositorio.
+"""
+
+# test_system.py es un script de humo que arranca los servidores reales
+collect_ignore = ["test_system.py"]
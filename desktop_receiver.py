@@ -13,14 +13,27 @@ import threading
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Union
 import socket
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import BaseHTTPRequestHandler
 import urllib.parse
 
 import flet as ft
-import cv2
-import numpy as np
+
+from src.camera.encoded_cache import EncodedFrameCache
+from src.camera.frame_bus import FrameSlot
+from src.camera.stream_manager import StreamRecorder
+from src.network.frame_request import BodyTooLarge, FrameRequestError, FrameRequestParser, parse_content_length
+from src.network.ingest import FrameIngest
+from src.network.mjpeg_server import MjpegBroadcaster, StreamingHTTPServer
+from src.network.multiprocess_ingest import MultiProcessIngest, ingest_workers_from_env
+from src.network.traffic_capture import capture_path_from_env
+from src.utils.media_writer import MediaWriter, capture_burst, photo_path
+from src.utils.metrics import serve_metrics
+
+
+# Fotos por ráfaga
+BURST_SIZE = 10
 
 
 class CameraReceiver:
@@ -29,16 +42,42 @@ class CameraReceiver:
     def __init__(self):
         """Inicializa el receptor."""
         self.is_receiving = False
-        self.current_frame = None
-        self.frame_count = 0
+        self.frame_slot = FrameSlot()
+        # Previsualización a 640x480 con decodificación escalada
+        self.ingest = FrameIngest(self.frame_slot, target_size=(640, 480),
+                                  capture_path=capture_path_from_env())
+        self.request_parser = FrameRequestParser()
+        self.encoded_cache = EncodedFrameCache()
+        self.broadcaster = MjpegBroadcaster(self.frame_slot, encoded_cache=self.encoded_cache)
+        # Modo producción: INGEST_WORKERS procesos aceptando en el mismo puerto
+        self.workers = ingest_workers_from_env()
+        self.multiprocess: Optional[MultiProcessIngest] = None
         self.server = None
         self.server_thread = None
+    
+    @property
+    def current_frame(self):
+        """Último frame decodificado."""
+        return self.ingest.current_frame
+    
+    @property
+    def frame_count(self) -> int:
+        """Número de frames decodificados."""
+        return self.ingest.frame_count
         
     def start_server(self, port: int = 8081):
         """Inicia el servidor HTTP para recibir frames."""
         try:
-            self.server = HTTPServer(('', port), CameraHandler)
+            if self.workers > 0:
+                self.multiprocess = MultiProcessIngest(CameraHandler, 'receiver', port,
+                                                       self.workers, self.ingest)
+                self.multiprocess.start()
+                self.is_receiving = True
+                return True
+            
+            self.server = StreamingHTTPServer(('', port), CameraHandler)
             self.server.receiver = self  # Referencia al receptor
+            self.broadcaster.start()
             
             self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
             self.server_thread.start()
@@ -53,43 +92,35 @@ class CameraReceiver:
     def stop_server(self):
         """Detiene el servidor."""
         self.is_receiving = False
+        if self.multiprocess:
+            self.multiprocess.stop()
+            self.multiprocess = None
         if self.server:
             self.server.shutdown()
             self.server = None
+        self.broadcaster.stop()
         if self.server_thread:
             self.server_thread.join(timeout=1)
     
-    def process_frame(self, frame_data: str):
+    def process_frame(self, frame_data: Union[str, bytes], timestamp: Optional[float] = None,
+                      frame_number: Optional[int] = None, device_id: str = ""):
         """
         Procesa un frame recibido del móvil.
         
         Args:
-            frame_data: Frame en formato base64
+            frame_data: Frame JPEG en bytes o en formato base64
+            timestamp: Timestamp del emisor en milisegundos (opcional)
+            frame_number: Número de frame del emisor (opcional)
+            device_id: Identificador del dispositivo de origen
         """
-        try:
-            # Decodificar base64
-            if frame_data.startswith('data:image'):
-                frame_data = frame_data.split(',')[1]
-            
-            img_data = base64.b64decode(frame_data)
-            
-            # Convertir a numpy array
-            nparr = np.frombuffer(img_data, np.uint8)
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            if frame is not None:
-                self.current_frame = frame
-                self.frame_count += 1
-                return True
-                
-        except Exception as e:
-            logging.error(f"Error procesando frame: {e}")
-            
-        return False
+        return self.ingest.submit(frame_data, timestamp, frame_number, device_id)
     
     def get_latest_frame(self):
-        """Obtiene el último frame recibido."""
-        return self.current_frame
+        """Obtiene el último frame recibido a resolución completa."""
+        jpeg = self.ingest.current_jpeg
+        if jpeg is None:
+            return None
+        return self.ingest.codec.decode(jpeg)
 
 
 class CameraHandler(BaseHTTPRequestHandler):
@@ -98,37 +129,66 @@ class CameraHandler(BaseHTTPRequestHandler):
     def do_POST(self):
         """Maneja requests POST con frames."""
         try:
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
+            request = self.server.receiver.request_parser.parse(
+                self.rfile, parse_content_length(self.headers.get('Content-Length')), self.headers
+            )
             
-            # Parsear datos
-            data = json.loads(post_data.decode('utf-8'))
+            device_id = request.device_id or self.client_address[0]
             
-            if 'frame' in data:
-                # Procesar frame
-                success = self.server.receiver.process_frame(data['frame'])
+            # Procesar frame (JPEG ya decodificado)
+            success = self.server.receiver.process_frame(
+                request.jpeg,
+                request.timestamp,
+                request.frame_number,
+                device_id
+            )
+            
+            if success:
+                # Parámetros de envío calculados por el receptor
+                response = {
+                    'status': 'ok',
+                    'control': self.server.receiver.ingest.control_for(device_id)
+                }
                 
-                if success:
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({'status': 'ok'}).encode())
-                else:
-                    self.send_error(400, 'Error processing frame')
+                self.send_response(200)
+                self.send_header('Content-type', 'application/json')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.end_headers()
+                self.wfile.write(json.dumps(response).encode())
             else:
-                self.send_error(400, 'No frame data')
+                self.send_error(400, 'Error processing frame')
                 
+        except BodyTooLarge as e:
+            # El cuerpo no se ha leído: cerrar la conexión tras responder
+            self.close_connection = True
+            self.send_error(413, str(e))
+        except FrameRequestError as e:
+            self.send_error(400, str(e))
+        except TimeoutError as e:
+            # Todos los buffers de ingesta ocupados
+            self.close_connection = True
+            self.send_error(503, str(e))
         except Exception as e:
             logging.error(f"Error en handler: {e}")
             self.send_error(500, str(e))
     
+    def do_GET(self):
+        """Sirve la retransmisión MJPEG, la última captura y las métricas."""
+        if self.path == '/stream.mjpg':
+            self.server.receiver.broadcaster.serve_stream(self)
+        elif self.path == '/snapshot.jpg':
+            self.server.receiver.broadcaster.serve_snapshot(self)
+        elif self.path == '/metrics':
+            serve_metrics(self)
+        else:
+            self.send_error(404, 'Not found')
+    
     def do_OPTIONS(self):
         """Maneja requests OPTIONS para CORS."""
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-Timestamp, X-Frame-Number, X-Device-Id')
         self.end_headers()
     
     def log_message(self, format, *args):
@@ -142,8 +202,9 @@ class DesktopReceiverApp:
     def __init__(self):
         """Inicializa la aplicación desktop."""
         self.receiver = CameraReceiver()
+        self.media_writer = MediaWriter()
         self.is_recording = False
-        self.video_writer = None
+        self.recorder: Optional[StreamRecorder] = None
         
     def run(self, page: ft.Page):
         """
@@ -265,6 +326,14 @@ class DesktopReceiverApp:
             disabled=True
         )
         
+        self.burst_btn = ft.ElevatedButton(
+            "📸 Ráfaga",
+            icon=ft.Icons.BURST_MODE,
+            on_click=self._take_burst,
+            style=ft.ButtonStyle(bgcolor=ft.Colors.BLUE_500, color=ft.Colors.WHITE),
+            disabled=True
+        )
+        
         # Estado
         self.status_text = ft.Text(
             "⏸️ Servidor detenido",
@@ -297,7 +366,8 @@ class DesktopReceiverApp:
                 self.start_server_btn,
                 self.stop_server_btn,
                 self.record_btn,
-                self.photo_btn
+                self.photo_btn,
+                self.burst_btn
             ], alignment=ft.MainAxisAlignment.CENTER),
             
             # Estado
@@ -333,6 +403,7 @@ class DesktopReceiverApp:
             self.stop_server_btn.disabled = False
             self.record_btn.disabled = False
             self.photo_btn.disabled = False
+            self.burst_btn.disabled = False
             
             self.status_text.value = "🟢 Servidor activo - Esperando conexiones..."
             self.status_text.color = ft.Colors.GREEN_600
@@ -347,6 +418,7 @@ class DesktopReceiverApp:
         self.stop_server_btn.disabled = True
         self.record_btn.disabled = True
         self.photo_btn.disabled = True
+        self.burst_btn.disabled = True
         
         self.status_text.value = "⏸️ Servidor detenido"
         self.status_text.color = ft.Colors.GREY_600
@@ -361,17 +433,18 @@ class DesktopReceiverApp:
             filename = f"recordings/mobile_stream_{timestamp}.mp4"
             Path("recordings").mkdir(exist_ok=True)
             
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            self.video_writer = cv2.VideoWriter(filename, fourcc, 15.0, (640, 480))
+            # Grabación con pacing por timestamp del emisor
+            self.recorder = StreamRecorder(Path(filename), fps=15.0)
+            self.recorder.start((640, 480))
             
             self.is_recording = True
             self.record_btn.text = "⏹️ Detener Grabación"
             self.record_btn.style.bgcolor = ft.Colors.RED_600
         else:
             # Detener grabación
-            if self.video_writer:
-                self.video_writer.release()
-                self.video_writer = None
+            if self.recorder:
+                self.recorder.stop()
+                self.recorder = None
             
             self.is_recording = False
             self.record_btn.text = "🔴 Grabar"
@@ -380,69 +453,118 @@ class DesktopReceiverApp:
         self.page.update()
     
     def _take_photo(self, e):
-        """Captura una foto."""
-        frame = self.receiver.get_latest_frame()
-        if frame is not None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"photos/mobile_photo_{timestamp}.jpg"
-            Path("photos").mkdir(exist_ok=True)
-            
-            cv2.imwrite(filename, frame)
-            
-            self.status_text.value = f"📸 Foto guardada: {filename}"
+        """Captura una foto (la escritura se hace en segundo plano)."""
+        packet = self.receiver.frame_slot.latest()
+        if packet is not None:
+            # JPEG original del móvil a resolución completa (sin recodificar)
+            self._submit_photo(photo_path("photos", "mobile_photo"),
+                               lambda: self.receiver.encoded_cache.get(packet, 'jpeg', None))
+    
+    def _take_burst(self, e):
+        """Captura una ráfaga con los próximos frames sin bloquear la UI."""
+        capture_burst(self.media_writer, self.receiver.frame_slot, "photos", "mobile_burst",
+                      count=BURST_SIZE, on_done=self._on_burst_done)
+        self.status_text.value = f"📸 Capturando ráfaga de {BURST_SIZE} fotos..."
+        self.status_text.color = ft.Colors.BLUE_600
+        self.page.update()
+    
+    def _submit_photo(self, filename, data):
+        """Encola una foto en el escritor en segundo plano."""
+        if self.media_writer.submit(filename, data, callback=self._on_photo_saved):
+            self.status_text.value = f"💾 Guardando foto: {filename}"
             self.status_text.color = ft.Colors.BLUE_600
+        else:
+            self.status_text.value = "⚠️ Cola de escritura llena, foto descartada"
+            self.status_text.color = ft.Colors.ORANGE_600
+        self.page.update()
+    
+    def _on_photo_saved(self, result):
+        """Notifica en la UI que la foto ya está en disco (hilo del escritor)."""
+        def update_status():
+            if result.success:
+                self.status_text.value = f"📸 Foto guardada: {result.path}"
+                self.status_text.color = ft.Colors.BLUE_600
+            else:
+                self.status_text.value = f"❌ Error guardando foto: {result.error}"
+                self.status_text.color = ft.Colors.RED_600
+            self.page.update()
+        
+        self.page.invoke_later(update_status)
+    
+    def _on_burst_done(self, saved, requested):
+        """Notifica en la UI el resultado de la ráfaga."""
+        def update_status():
+            self.status_text.value = f"📸 Ráfaga guardada: {saved}/{requested} fotos"
+            self.status_text.color = ft.Colors.BLUE_600 if saved == requested else ft.Colors.ORANGE_600
             self.page.update()
+        
+        self.page.invoke_later(update_status)
     
     def _start_frame_updater(self):
-        """Inicia el actualizador de frames."""
+        """Inicia el actualizador de frames dirigido por nuevos frames."""
         def update_frames():
+            last_sequence = 0
             last_frame_count = 0
             last_time = time.time()
+            last_stats = ""
             
             while True:
                 try:
-                    if self.receiver.is_receiving:
-                        frame = self.receiver.get_latest_frame()
+                    # Esperar un frame nuevo (los bursts se coalescen al más reciente)
+                    packet = self.receiver.frame_slot.wait_for_next(last_sequence, timeout=1.0)
+                    
+                    if packet is not None:
+                        last_sequence = packet.sequence
                         
-                        if frame is not None:
-                            # Redimensionar frame
-                            frame_resized = cv2.resize(frame, (640, 480))
-                            
-                            # Grabar si está activo
-                            if self.is_recording and self.video_writer:
-                                self.video_writer.write(frame_resized)
-                            
-                            # Convertir a base64 para mostrar
-                            _, buffer = cv2.imencode('.jpg', frame_resized)
-                            img_b64 = base64.b64encode(buffer).decode()
-                            
-                            # Actualizar UI
-                            def update_ui():
-                                self.video_view.src_base64 = f"data:image/jpeg;base64,{img_b64}"
-                                self.video_view.update()
-                                
-                                # Actualizar estado
-                                if self.receiver.frame_count > 0:
-                                    self.status_text.value = "🔴 Recibiendo video del móvil"
-                                    self.status_text.color = ft.Colors.RED_600
-                            
-                            self.page.invoke_later(update_ui)
+                        # El frame ya llega a 640x480 desde la ingesta
+                        frame = packet.frame
+                        
+                        # Grabar si está activo
+                        recorder = self.recorder
+                        if self.is_recording and recorder:
+                            recorder.write_frame_at(frame, packet.timestamp)
+                        
+                        # Convertir a base64 para mostrar
+                        jpeg = self.receiver.encoded_cache.get(packet, 'jpeg', 95)
+                        if jpeg is None:
+                            continue
+                        img_b64 = base64.b64encode(jpeg).decode()
                         
-                        # Calcular FPS
-                        current_time = time.time()
-                        if current_time - last_time >= 1.0:
-                            fps = (self.receiver.frame_count - last_frame_count) / (current_time - last_time)
+                        # Actualizar UI
+                        def update_ui():
+                            self.video_view.src_base64 = f"data:image/jpeg;base64,{img_b64}"
+                            self.video_view.update()
                             
-                            def update_stats():
-                                self.stats_text.value = f"Frames: {self.receiver.frame_count} | FPS: {fps:.1f}"
+                            # Actualizar estado
+                            if self.receiver.frame_count > 0:
+                                self.status_text.value = "🔴 Recibiendo video del móvil"
+                                self.status_text.color = ft.Colors.RED_600
+                        
+                        self.page.invoke_later(update_ui)
+                    
+                    # Calcular FPS (solo se envía a la UI si cambió)
+                    current_time = time.time()
+                    if self.receiver.is_receiving and current_time - last_time >= 1.0:
+                        fps = (self.receiver.frame_count - last_frame_count) / (current_time - last_time)
+                        jitter = self.receiver.ingest.get_totals()
+                        pool = self.receiver.ingest.decode_pool.get_stats()
+                        stats = (
+                            f"Frames: {self.receiver.frame_count} | FPS: {fps:.1f} | "
+                            f"Tarde: {jitter.late} | Descartados: {jitter.dropped} | "
+                            f"Reordenados: {jitter.reordered} | "
+                            f"Decodificación: {pool.utilization:.0%} ({pool.coalesced} omitidos)"
+                        )
+                        
+                        if stats != last_stats:
+                            def update_stats(stats=stats):
+                                self.stats_text.value = stats
                                 self.stats_text.update()
                             
                             self.page.invoke_later(update_stats)
-                            
-                            last_frame_count = self.receiver.frame_count
-                            last_time = current_time
-                    
-                    time.sleep(0.033)  # ~30 FPS
+                            last_stats = stats
+                        
+                        last_frame_count = self.receiver.frame_count
+                        last_time = current_time
                     
                 except Exception as e:
                     logging.error(f"Error en actualizador de frames: {e}")
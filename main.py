@@ -22,6 +22,7 @@ from src.camera.stream_manager import StreamManager
 from src.network.discovery import NetworkDiscovery
 from src.utils.config_manager import ConfigManager
 from src.utils.logger import setup_logger
+from src.utils.metrics import metrics_port_from_env, start_metrics_server
 
 
 class IPCameraApp:
@@ -35,6 +36,7 @@ class IPCameraApp:
         self.stream_manager = StreamManager()
         self.network_discovery = NetworkDiscovery()
         self.main_window: Optional[MainWindow] = None
+        self.metrics_server = None
         
     def run(self, page: ft.Page):
         """
@@ -63,6 +65,9 @@ class IPCameraApp:
             # Configurar eventos de la ventana
             self._setup_window_events(page)
             
+            # Puerto lateral de métricas (METRICS_PORT)
+            self._start_metrics_server()
+            
             self.logger.info("Aplicación iniciada exitosamente")
             
         except Exception as e:
@@ -107,11 +112,25 @@ class IPCameraApp:
             if self.network_discovery:
                 self.network_discovery.stop()
                 
+            if self.metrics_server:
+                self.metrics_server.shutdown()
+                self.metrics_server.server_close()
+                self.metrics_server = None
+                
             self.logger.info("Aplicación cerrada correctamente")
             
         except Exception as e:
             self.logger.error(f"Error durante la limpieza: {e}")
     
+    def _start_metrics_server(self):
+        """Expone /metrics en el puerto de METRICS_PORT, si está definido."""
+        port = metrics_port_from_env()
+        if port and self.metrics_server is None:
+            try:
+                self.metrics_server = start_metrics_server(port)
+            except OSError as e:
+                self.logger.error(f"No se pudo abrir el puerto de métricas {port}: {e}")
+    
     def _show_error_dialog(self, page: ft.Page, message: str):
         """Muestra un diálogo de error."""
         dialog = ft.AlertDialog(
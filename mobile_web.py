@@ -173,6 +173,17 @@ class SimpleMobileApp:
         var stream = null;
         var intervalId = null;
         var frameCount = 0;
+        var inFlight = false;
+        
+        // Parámetros de envío; el receptor los ajusta en cada ack
+        var control = {{ fps: 10, width: 640, height: 480, quality: 0.8 }};
+        
+        // Identificador estable del dispositivo
+        var deviceId = localStorage.getItem('ipcamDeviceId');
+        if (!deviceId) {{
+            deviceId = 'mobile-' + Math.random().toString(36).slice(2, 10);
+            localStorage.setItem('ipcamDeviceId', deviceId);
+        }}
         
         // Función para iniciar cámara
         async function startMobileCamera() {{
@@ -190,28 +201,8 @@ class SimpleMobileApp:
                 
                 // Esperar a que el video esté listo
                 video.onloadedmetadata = function() {{
-                    // Crear canvas para captura
-                    canvas.width = video.videoWidth;
-                    canvas.height = video.videoHeight;
-                    
                     // Iniciar envío de frames
-                    intervalId = setInterval(function() {{
-                        if (video.videoWidth > 0) {{
-                            ctx.drawImage(video, 0, 0);
-                            
-                            canvas.toBlob(function(blob) {{
-                                if (blob) {{
-                                    var reader = new FileReader();
-                                    reader.onload = function() {{
-                                        sendFrameToDesktop(reader.result);
-                                    }};
-                                    reader.readAsDataURL(blob);
-                                }}
-                            }}, 'image/jpeg', 0.8);
-                            
-                            frameCount++;
-                        }}
-                    }}, 100); // 10 FPS
+                    scheduleNextFrame();
                     
                     console.log('Cámara iniciada correctamente');
                 }};
@@ -222,6 +213,39 @@ class SimpleMobileApp:
             }}
         }}
         
+        // Programa la siguiente captura según los fps pedidos por el receptor
+        function scheduleNextFrame() {{
+            intervalId = setTimeout(function() {{
+                if (!stream) return;
+                scheduleNextFrame();
+                captureFrame();
+            }}, 1000 / control.fps);
+        }}
+        
+        // Captura y envía un frame con la resolución y calidad actuales
+        function captureFrame() {{
+            // Si el frame anterior sigue en vuelo se omite este (no se encolan envíos)
+            if (inFlight || video.videoWidth === 0) return;
+            inFlight = true;
+            
+            canvas.width = control.width;
+            canvas.height = control.height;
+            ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
+            
+            canvas.toBlob(function(blob) {{
+                if (blob) {{
+                    var reader = new FileReader();
+                    reader.onload = function() {{
+                        frameCount++;
+                        sendFrameToDesktop(reader.result);
+                    }};
+                    reader.readAsDataURL(blob);
+                }} else {{
+                    inFlight = false;
+                }}
+            }}, 'image/jpeg', control.quality);
+        }}
+        
         // Función para enviar frames al desktop
         function sendFrameToDesktop(frameData) {{
             var url = 'http://' + desktopIP + ':8081/frame';
@@ -234,18 +258,27 @@ class SimpleMobileApp:
                 body: JSON.stringify({{
                     frame: frameData,
                     timestamp: Date.now(),
-                    frameNumber: frameCount
+                    frameNumber: frameCount,
+                    deviceId: deviceId
                 }})
             }})
             .then(response => {{
                 if (response.ok) {{
-                    console.log('Frame enviado correctamente:', frameCount);
+                    return response.json().then(ack => {{
+                        if (ack.control) {{
+                            control = ack.control;
+                        }}
+                        console.log('Frame enviado correctamente:', frameCount);
+                    }});
                 }} else {{
                     console.warn('Error del servidor:', response.status);
                 }}
             }})
             .catch(err => {{
                 console.error('Error de conexión:', err);
+            }})
+            .finally(() => {{
+                inFlight = false;
             }});
         }}
         
@@ -281,7 +314,7 @@ class SimpleMobileApp:
         }
         
         if (typeof intervalId !== 'undefined' && intervalId) {
-            clearInterval(intervalId);
+            clearTimeout(intervalId);
             intervalId = null;
         }
         
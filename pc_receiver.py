@@ -17,14 +17,28 @@ import threading
 import time
 import json
 import base64
-import cv2
-import numpy as np
 from datetime import datetime
 from pathlib import Path
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import BaseHTTPRequestHandler
 import socketserver
 import urllib.parse
 import socket
+from typing import Optional
+
+from src.camera.encoded_cache import EncodedFrameCache
+from src.camera.frame_bus import FrameSlot
+from src.camera.stream_manager import StreamRecorder
+from src.network.frame_request import BodyTooLarge, FrameRequestError, FrameRequestParser, parse_content_length
+from src.network.ingest import FrameIngest
+from src.network.mjpeg_server import MjpegBroadcaster, StreamingHTTPServer
+from src.network.multiprocess_ingest import MultiProcessIngest, ingest_workers_from_env
+from src.network.traffic_capture import capture_path_from_env
+from src.utils.media_writer import MediaWriter, capture_burst, photo_path
+from src.utils.metrics import serve_metrics
+
+
+# Fotos por ráfaga
+BURST_SIZE = 10
 
 
 class MobileFrameHandler(BaseHTTPRequestHandler):
@@ -33,32 +47,58 @@ class MobileFrameHandler(BaseHTTPRequestHandler):
     def do_POST(self):
         """Recibe frames POST desde móvil."""
         try:
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
+            request = self.server.app.request_parser.parse(
+                self.rfile, parse_content_length(self.headers.get('Content-Length')), self.headers
+            )
             
-            data = json.loads(post_data.decode('utf-8'))
+            device_id = request.device_id or self.client_address[0]
             
-            if 'frame' in data:
-                # Pasar frame a la app principal
-                if hasattr(self.server, 'app'):
-                    self.server.app.process_frame(data['frame'])
-                
-                # Respuesta exitosa
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-                self.wfile.write(json.dumps({'status': 'ok'}).encode())
-            else:
-                self.send_error(400, 'No frame data')
-                
+            # Pasar frame (JPEG ya decodificado) a la app principal
+            self.server.app.process_frame(
+                request.jpeg,
+                request.timestamp,
+                request.frame_number,
+                device_id
+            )
+            # Parámetros de envío calculados por el receptor
+            response = {
+                'status': 'ok',
+                'control': self.server.app.ingest.control_for(device_id)
+            }
+            
+            # Respuesta exitosa
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(json.dumps(response).encode())
+            
+        except BodyTooLarge as e:
+            # El cuerpo no se ha leído: cerrar la conexión tras responder
+            self.close_connection = True
+            self.send_error(413, str(e))
+        except FrameRequestError as e:
+            self.send_error(400, str(e))
+        except TimeoutError as e:
+            # Todos los buffers de ingesta ocupados
+            self.close_connection = True
+            self.send_error(503, str(e))
         except Exception as e:
             print(f"Error en frame handler: {e}")
             self.send_error(500, str(e))
     
     def do_GET(self):
-        """Sirve la página web para móviles."""
-        if self.path == '/' or self.path == '/mobile':
+        """Sirve la página web para móviles, la retransmisión MJPEG y las métricas."""
+        if self.path == '/stream.mjpg':
+            self.server.app.broadcaster.serve_stream(self)
+        
+        elif self.path == '/snapshot.jpg':
+            self.server.app.broadcaster.serve_snapshot(self)
+        
+        elif self.path == '/metrics':
+            serve_metrics(self)
+        
+        elif self.path == '/' or self.path == '/mobile':
             self.send_response(200)
             self.send_header('Content-Type', 'text/html')
             self.send_header('Access-Control-Allow-Origin', '*')
@@ -156,6 +196,17 @@ class MobileFrameHandler(BaseHTTPRequestHandler):
         let stream = null;
         let sending = false;
         let frameCount = 0;
+        let inFlight = false;
+        
+        // Parámetros de envío; el receptor los ajusta en cada ack
+        let control = {{ fps: 10, width: 640, height: 480, quality: 0.8 }};
+        
+        // Identificador estable del dispositivo
+        let deviceId = localStorage.getItem('ipcamDeviceId');
+        if (!deviceId) {{
+            deviceId = 'mobile-' + Math.random().toString(36).slice(2, 10);
+            localStorage.setItem('ipcamDeviceId', deviceId);
+        }}
 
         async function startCamera() {{
             try {{
@@ -191,45 +242,58 @@ class MobileFrameHandler(BaseHTTPRequestHandler):
         function sendFrames(video) {{
             if (!sending) return;
 
+            // Siguiente frame según los fps pedidos por el receptor
+            setTimeout(() => sendFrames(video), 1000 / control.fps);
+            
+            // Si el frame anterior sigue en vuelo se omite este (no se encolan envíos)
+            if (inFlight) return;
+            inFlight = true;
+
             const canvas = document.createElement('canvas');
             const ctx = canvas.getContext('2d');
             
-            canvas.width = 640;
-            canvas.height = 480;
+            canvas.width = control.width;
+            canvas.height = control.height;
             
             ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
             
             canvas.toBlob(async (blob) => {{
-                if (blob && sending) {{
-                    const reader = new FileReader();
-                    reader.onload = async () => {{
-                        try {{
-                            const response = await fetch('/frame', {{
-                                method: 'POST',
-                                headers: {{
-                                    'Content-Type': 'application/json',
-                                }},
-                                body: JSON.stringify({{
-                                    frame: reader.result,
-                                    timestamp: Date.now(),
-                                    frameNumber: ++frameCount
-                                }})
-                            }});
-                            
-                            if (response.ok) {{
-                                document.getElementById('status').innerHTML = 
-                                    `📡 Transmitiendo - Frame: ${{frameCount}}`;
+                if (!blob || !sending) {{
+                    inFlight = false;
+                    return;
+                }}
+                const reader = new FileReader();
+                reader.onload = async () => {{
+                    try {{
+                        const response = await fetch('/frame', {{
+                            method: 'POST',
+                            headers: {{
+                                'Content-Type': 'application/json',
+                            }},
+                            body: JSON.stringify({{
+                                frame: reader.result,
+                                timestamp: Date.now(),
+                                frameNumber: ++frameCount,
+                                deviceId: deviceId
+                            }})
+                        }});
+                        
+                        if (response.ok) {{
+                            const ack = await response.json();
+                            if (ack.control) {{
+                                control = ack.control;
                             }}
-                        }} catch (error) {{
-                            console.error('Send error:', error);
+                            document.getElementById('status').innerHTML = 
+                                `📡 Transmitiendo - Frame: ${{frameCount}} (${{control.width}}x${{control.height}} @ ${{control.fps}} FPS)`;
                         }}
-                    }};
-                    reader.readAsDataURL(blob);
-                }}
-            }}, 'image/jpeg', 0.8);
-
-            // Siguiente frame
-            setTimeout(() => sendFrames(video), 100); // 10 FPS
+                    }} catch (error) {{
+                        console.error('Send error:', error);
+                    }} finally {{
+                        inFlight = false;
+                    }}
+                }};
+                reader.readAsDataURL(blob);
+            }}, 'image/jpeg', control.quality);
         }}
 
         function stopCamera() {{
@@ -262,7 +326,7 @@ class MobileFrameHandler(BaseHTTPRequestHandler):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'POST, GET, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-Timestamp, X-Frame-Number, X-Device-Id')
         self.end_headers()
     
     def log_message(self, format, *args):
@@ -275,13 +339,31 @@ class PCReceiverApp:
     
     def __init__(self):
         """Inicializa la app."""
-        self.current_frame = None
-        self.frame_count = 0
+        self.frame_slot = FrameSlot()
+        self.ingest = FrameIngest(self.frame_slot, target_size=(640, 480),
+                                  capture_path=capture_path_from_env())
+        self.request_parser = FrameRequestParser()
+        self.encoded_cache = EncodedFrameCache()
+        self.media_writer = MediaWriter()
+        self.broadcaster = MjpegBroadcaster(self.frame_slot, encoded_cache=self.encoded_cache)
+        # Modo producción: INGEST_WORKERS procesos aceptando en el mismo puerto
+        self.workers = ingest_workers_from_env()
+        self.multiprocess: Optional[MultiProcessIngest] = None
         self.server = None
         self.server_thread = None
         self.is_recording = False
-        self.video_writer = None
+        self.recorder: Optional[StreamRecorder] = None
         
+    @property
+    def current_frame(self):
+        """Último frame decodificado."""
+        return self.ingest.current_frame
+    
+    @property
+    def frame_count(self) -> int:
+        """Número de frames decodificados."""
+        return self.ingest.frame_count
+    
     def run(self, page: ft.Page):
         """Ejecuta la aplicación."""
         page.title = "🖥️ Receptor Cámara Móvil"
@@ -364,6 +446,13 @@ class PCReceiverApp:
             disabled=True
         )
         
+        self.burst_btn = ft.ElevatedButton(
+            "📸 Ráfaga",
+            icon=ft.Icons.BURST_MODE,
+            on_click=self._take_burst,
+            disabled=True
+        )
+        
         # Estado
         self.status_text = ft.Text(
             "⏸️ Servidor detenido",
@@ -419,7 +508,8 @@ class PCReceiverApp:
             # Controles grabación
             ft.Row([
                 self.record_btn,
-                self.photo_btn
+                self.photo_btn,
+                self.burst_btn
             ], alignment=ft.MainAxisAlignment.CENTER),
             
             # Estado
@@ -451,17 +541,24 @@ class PCReceiverApp:
     def _start_server(self, e):
         """Inicia el servidor HTTP."""
         try:
-            self.server = HTTPServer(('', 8080), MobileFrameHandler)
-            self.server.app = self  # Referencia a esta app
-            
-            self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
-            self.server_thread.start()
+            if self.workers > 0:
+                self.multiprocess = MultiProcessIngest(MobileFrameHandler, 'app', 8080,
+                                                       self.workers, self.ingest)
+                self.multiprocess.start()
+            else:
+                self.server = StreamingHTTPServer(('', 8080), MobileFrameHandler)
+                self.server.app = self  # Referencia a esta app
+                self.broadcaster.start()
+                
+                self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+                self.server_thread.start()
             
             # Actualizar UI
             self.start_btn.disabled = True
             self.stop_btn.disabled = False
             self.record_btn.disabled = False
             self.photo_btn.disabled = False
+            self.burst_btn.disabled = False
             
             local_ip = self._get_local_ip()
             self.status_text.value = f"🟢 Servidor activo en http://{local_ip}:8080"
@@ -476,9 +573,13 @@ class PCReceiverApp:
     
     def _stop_server(self, e):
         """Detiene el servidor."""
+        if self.multiprocess:
+            self.multiprocess.stop()
+            self.multiprocess = None
         if self.server:
             self.server.shutdown()
             self.server = None
+        self.broadcaster.stop()
         
         # Detener grabación si está activa
         if self.is_recording:
@@ -489,6 +590,7 @@ class PCReceiverApp:
         self.stop_btn.disabled = True
         self.record_btn.disabled = True
         self.photo_btn.disabled = True
+        self.burst_btn.disabled = True
         
         self.status_text.value = "⏸️ Servidor detenido"
         self.status_text.color = ft.Colors.GREY_600
@@ -503,17 +605,18 @@ class PCReceiverApp:
             filename = f"recordings/mobile_direct_{timestamp}.mp4"
             Path("recordings").mkdir(exist_ok=True)
             
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            self.video_writer = cv2.VideoWriter(filename, fourcc, 10.0, (640, 480))
+            # Grabación con pacing por timestamp del emisor
+            self.recorder = StreamRecorder(Path(filename), fps=10.0)
+            self.recorder.start((640, 480))
             
             self.is_recording = True
             self.record_btn.text = "⏹️ Detener Grabación"
             self.record_btn.style = ft.ButtonStyle(bgcolor=ft.Colors.RED_600, color=ft.Colors.WHITE)
         else:
             # Detener grabación
-            if self.video_writer:
-                self.video_writer.release()
-                self.video_writer = None
+            if self.recorder:
+                self.recorder.stop()
+                self.recorder = None
             
             self.is_recording = False
             self.record_btn.text = "🔴 Grabar"
@@ -522,67 +625,110 @@ class PCReceiverApp:
         self.page.update()
     
     def _take_photo(self, e):
-        """Captura foto."""
-        if self.current_frame is not None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"photos/mobile_direct_{timestamp}.jpg"
-            Path("photos").mkdir(exist_ok=True)
-            
-            cv2.imwrite(filename, self.current_frame)
-            
-            self.status_text.value = f"📸 Foto guardada: {filename}"
+        """Captura foto (la escritura se hace en segundo plano)."""
+        packet = self.frame_slot.latest()
+        if packet is not None:
+            # Reutiliza la codificación que ya hizo la UI para este frame
+            self._submit_photo(photo_path("photos", "mobile_direct"),
+                               lambda: self.encoded_cache.get(packet, 'jpeg', 95))
+    
+    def _take_burst(self, e):
+        """Captura una ráfaga con los próximos frames sin bloquear la UI."""
+        capture_burst(self.media_writer, self.frame_slot, "photos", "mobile_burst",
+                      count=BURST_SIZE, on_done=self._on_burst_done)
+        self.status_text.value = f"📸 Capturando ráfaga de {BURST_SIZE} fotos..."
+        self.status_text.color = ft.Colors.BLUE_600
+        self.page.update()
+    
+    def _submit_photo(self, filename, data):
+        """Encola una foto en el escritor en segundo plano."""
+        if self.media_writer.submit(filename, data, callback=self._on_photo_saved):
+            self.status_text.value = f"💾 Guardando foto: {filename}"
             self.status_text.color = ft.Colors.BLUE_600
+        else:
+            self.status_text.value = "⚠️ Cola de escritura llena, foto descartada"
+            self.status_text.color = ft.Colors.ORANGE_600
+        self.page.update()
+    
+    def _on_photo_saved(self, result):
+        """Notifica en la UI que la foto ya está en disco (hilo del escritor)."""
+        def update_status():
+            if result.success:
+                self.status_text.value = f"📸 Foto guardada: {result.path}"
+                self.status_text.color = ft.Colors.BLUE_600
+            else:
+                self.status_text.value = f"❌ Error guardando foto: {result.error}"
+                self.status_text.color = ft.Colors.RED_600
             self.page.update()
+        
+        self.page.invoke_later(update_status)
     
-    def process_frame(self, frame_data):
-        """Procesa frame recibido del móvil."""
-        try:
-            # Decodificar base64
-            if frame_data.startswith('data:image'):
-                frame_data = frame_data.split(',')[1]
-            
-            img_data = base64.b64decode(frame_data)
-            nparr = np.frombuffer(img_data, np.uint8)
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            if frame is not None:
-                self.current_frame = cv2.resize(frame, (640, 480))
-                self.frame_count += 1
-                return True
-                
-        except Exception as e:
-            print(f"Error procesando frame: {e}")
+    def _on_burst_done(self, saved, requested):
+        """Notifica en la UI el resultado de la ráfaga."""
+        def update_status():
+            self.status_text.value = f"📸 Ráfaga guardada: {saved}/{requested} fotos"
+            self.status_text.color = ft.Colors.BLUE_600 if saved == requested else ft.Colors.ORANGE_600
+            self.page.update()
+        
+        self.page.invoke_later(update_status)
+    
+    def process_frame(self, frame_data, timestamp=None, frame_number=None, device_id=""):
+        """
+        Procesa frame recibido del móvil.
         
-        return False
+        Args:
+            frame_data: Frame JPEG en bytes o en formato base64
+            timestamp: Timestamp del emisor en milisegundos (opcional)
+            frame_number: Número de frame del emisor (opcional)
+            device_id: Identificador del dispositivo de origen
+        """
+        return self.ingest.submit(frame_data, timestamp, frame_number, device_id)
     
     def _start_frame_updater(self):
-        """Inicia actualizador de frames."""
+        """Inicia actualizador de frames dirigido por nuevos frames."""
         def update_frames():
+            last_sequence = 0
+            
             while True:
                 try:
-                    if self.current_frame is not None:
-                        # Grabar si está activo
-                        if self.is_recording and self.video_writer:
-                            self.video_writer.write(self.current_frame)
-                        
-                        # Convertir a base64 para mostrar
-                        _, buffer = cv2.imencode('.jpg', self.current_frame)
-                        img_b64 = base64.b64encode(buffer).decode()
+                    # Esperar un frame nuevo (los bursts se coalescen al más reciente)
+                    packet = self.frame_slot.wait_for_next(last_sequence, timeout=1.0)
+                    if packet is None:
+                        continue
+                    
+                    last_sequence = packet.sequence
+                    frame = packet.frame
+                    
+                    # Grabar si está activo
+                    recorder = self.recorder
+                    if self.is_recording and recorder:
+                        recorder.write_frame_at(frame, packet.timestamp)
+                    
+                    # Convertir a base64 para mostrar
+                    jpeg = self.encoded_cache.get(packet, 'jpeg', 95)
+                    if jpeg is None:
+                        continue
+                    img_b64 = base64.b64encode(jpeg).decode()
+                    frame_count = self.frame_count
+                    jitter = self.ingest.get_totals()
+                    pool = self.ingest.decode_pool.get_stats()
+                    
+                    # Actualizar UI
+                    def update_ui():
+                        self.video_view.src_base64 = f"data:image/jpeg;base64,{img_b64}"
+                        self.video_view.update()
                         
-                        # Actualizar UI
-                        def update_ui():
-                            self.video_view.src_base64 = f"data:image/jpeg;base64,{img_b64}"
-                            self.video_view.update()
-                            
-                            self.status_text.value = "🔴 Recibiendo video del móvil"
-                            self.status_text.color = ft.Colors.RED_600
-                            
-                            self.stats_text.value = f"Frames recibidos: {self.frame_count}"
-                            self.stats_text.update()
+                        self.status_text.value = "🔴 Recibiendo video del móvil"
+                        self.status_text.color = ft.Colors.RED_600
                         
-                        self.page.invoke_later(update_ui)
+                        self.stats_text.value = (
+                            f"Frames recibidos: {frame_count} | Tarde: {jitter.late} | "
+                            f"Descartados: {jitter.dropped} | Reordenados: {jitter.reordered} | "
+                            f"Decodificación: {pool.utilization:.0%}"
+                        )
+                        self.stats_text.update()
                     
-                    time.sleep(0.033)  # ~30 FPS
+                    self.page.invoke_later(update_ui)
                     
                 except Exception as e:
                     print(f"Error en frame updater: {e}")
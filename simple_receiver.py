@@ -4,19 +4,38 @@ Receptor PC Simple - Conexión Directa
 
 Aplicación simple que muestra el stream desde tu móvil.
 Se conecta directamente al sistema que ya tienes funcionando.
+
+Los frames se reciben y decodifican (ya al tamaño de pantalla) fuera del
+hilo de Tk; la interfaz solo copia cada imagen sobre un único PhotoImage
+persistente. Si Tk va por detrás, los frames intermedios se descartan
+sin decodificarlos.
 """
 
 import tkinter as tk
 from tkinter import ttk, messagebox
+import base64
 import cv2
 import numpy as np
 from PIL import Image, ImageTk
 import threading
 import time
 import json
-import requests
-from datetime import datetime
+import queue
 from pathlib import Path
+from typing import Optional, Tuple, Union
+
+from src.camera.codec import get_codec
+from src.camera.frame_bus import FrameSlot
+from src.network.http_transport import get_session
+from src.network.relay_client import RelayClient, RelayFrame, RelaySubscription
+from src.utils.media_writer import MediaWriter, WriteResult, photo_path
+
+
+# Caja máxima del vídeo en pantalla (se mantiene la proporción del frame)
+DISPLAY_SIZE = (640, 480)
+
+# Cada cuánto revisa Tk si hay una imagen nueva que mostrar
+REFRESH_MS = 15
 
 
 class SimpleCameraReceiver:
@@ -31,6 +50,31 @@ class SimpleCameraReceiver:
         self.is_receiving = False
         self.current_frame = None
         self.frame_count = 0
+        self.displayed_count = 0
+        self.skipped_count = 0
+        self.worker_url = ""
+        
+        self.codec = get_codec()
+        self.session = get_session('simple_receiver')
+        self.subscription: Optional[RelaySubscription] = None
+        
+        # Las fotos se escriben en segundo plano; el resultado vuelve a Tk por cola
+        self.media_writer = MediaWriter()
+        self._photo_notices: "queue.Queue[str]" = queue.Queue()
+        
+        # Frames comprimidos (hilo de red) e imágenes listas (hilo de decodificación)
+        self.jpeg_slot = FrameSlot()
+        self.display_slot = FrameSlot()
+        self._displayed = threading.Event()
+        self._stop_event = threading.Event()
+        self._decoder: Optional[threading.Thread] = None
+        
+        # Único PhotoImage del vídeo: cada frame se copia encima con paste()
+        self._photo: Optional[ImageTk.PhotoImage] = None
+        self._shown_sequence = 0
+        self._refresh_job = None
+        self._stats_time = time.monotonic()
+        self._stats_displayed = 0
         
         self.setup_interface()
         
@@ -118,7 +162,7 @@ class SimpleCameraReceiver:
         
         # Test connection
         try:
-            response = requests.get(f"{url}/api/health", timeout=5)
+            response = self.session.get(f"{url}/api/health", timeout=5)
             if response.status_code != 200:
                 raise Exception("Worker no responde")
         except Exception as e:
@@ -136,8 +180,8 @@ class SimpleCameraReceiver:
         
         self.status_var.set("🟢 Conectado - Esperando frames...")
         
-        # Iniciar monitoreo
-        self.start_monitoring()
+        # Iniciar recepción
+        self.start_receiving()
         
         messagebox.showinfo("Conectado", 
                           f"✅ Conectado al Worker\n\n"
@@ -147,6 +191,7 @@ class SimpleCameraReceiver:
     def disconnect(self):
         """Desconecta del Worker."""
         self.is_receiving = False
+        self.stop_receiving()
         
         self.connect_btn.config(state=tk.NORMAL)
         self.disconnect_btn.config(state=tk.DISABLED)
@@ -155,51 +200,142 @@ class SimpleCameraReceiver:
         
         self.status_var.set("⏸️ Desconectado")
         self.video_label.config(image='', text="📱 Desconectado")
+        self._photo = None
+    
+    def start_receiving(self):
+        """Inicia la recepción, la decodificación y el refresco del vídeo."""
+        self.jpeg_slot = FrameSlot()
+        self.display_slot = FrameSlot()
+        self._shown_sequence = 0
+        self._displayed.set()
+        
+        # Evento nuevo por conexión: el decodificador anterior termina con el suyo
+        self._stop_event = threading.Event()
+        self._decoder = threading.Thread(target=self._decode_loop,
+                                         args=(self.jpeg_slot, self.display_slot, self._stop_event),
+                                         daemon=True, name="simple-receiver-decoder")
+        self._decoder.start()
+        
+        # Se pide al relay una variante del ancho mostrado
+        client = RelayClient(self.worker_url, self.session, width=DISPLAY_SIZE[0])
+        self.subscription = RelaySubscription(client, self._on_frame)
+        self.subscription.start()
+        
+        self._refresh_job = self.root.after(REFRESH_MS, self._refresh_display)
     
-    def start_monitoring(self):
-        """Inicia el monitoreo de frames."""
-        def monitor():
-            while self.is_receiving:
-                try:
-                    # Por ahora, como el Worker no almacena frames,
-                    # mostramos el estado de conexión
-                    response = requests.get(f"{self.worker_url}/api/health", timeout=2)
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        
-                        # Actualizar en hilo principal
-                        self.root.after(0, lambda: self.status_var.set(
-                            f"🟢 Worker activo - {data.get('status', 'unknown')}"
-                        ))
-                        
-                        # Simular frame count
-                        self.frame_count += 1
-                        self.root.after(0, lambda: self.stats_var.set(
-                            f"Checks: {self.frame_count} | Worker: {data.get('worker', 'unknown')}"
-                        ))
-                    
-                except Exception as e:
-                    self.root.after(0, lambda: self.status_var.set(f"❌ Error: {e}"))
-                
-                time.sleep(1)  # Check cada segundo
-        
-        thread = threading.Thread(target=monitor, daemon=True)
-        thread.start()
+    def stop_receiving(self):
+        """Detiene la recepción y la decodificación."""
+        if self.subscription:
+            self.subscription.stop()
+            self.subscription = None
+        self._stop_event.set()
+        self.jpeg_slot.close()
+        self.display_slot.close()
+        self._displayed.set()
+        if self._refresh_job is not None:
+            self.root.after_cancel(self._refresh_job)
+            self._refresh_job = None
+    
+    def _on_frame(self, frame: RelayFrame):
+        """Recibe un frame del relay (hilo de red): solo se guarda comprimido."""
+        self.frame_count += 1
+        self.jpeg_slot.publish(frame.payload, frame.timestamp, frame.frame_number or 0)
+    
+    def _decode_loop(self, jpeg_slot: FrameSlot, display_slot: FrameSlot, stop_event: threading.Event):
+        """Decodifica el último frame recibido al tamaño de pantalla."""
+        last_sequence = 0
+        while not stop_event.is_set():
+            # No decodificar otro frame hasta que Tk haya mostrado el anterior
+            if not self._displayed.wait(0.5):
+                continue
+            packet = jpeg_slot.wait_for_next(last_sequence, timeout=0.5)
+            if packet is None:
+                continue
+            if last_sequence:
+                self.skipped_count += packet.sequence - last_sequence - 1
+            last_sequence = packet.sequence
+            
+            jpeg = self._to_jpeg(packet.frame)
+            size = self._fit_size(self.codec.dimensions(jpeg))
+            frame = self.codec.decode_to_size(jpeg, size)
+            if frame is None:
+                continue
+            
+            image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            self._displayed.clear()
+            display_slot.publish(image, packet.timestamp, packet.frame_number, jpeg=jpeg)
+    
+    @staticmethod
+    def _to_jpeg(payload: Union[str, bytes]) -> bytes:
+        """Convierte el payload del relay (JPEG o data URL base64) en bytes JPEG."""
+        if isinstance(payload, str):
+            if payload.startswith('data:image'):
+                payload = payload.split(',', 1)[1]
+            return base64.b64decode(payload)
+        return payload
+    
+    @staticmethod
+    def _fit_size(size: Optional[Tuple[int, int]]) -> Optional[Tuple[int, int]]:
+        """Tamaño en pantalla de un frame: cabe en DISPLAY_SIZE sin ampliarlo."""
+        if size is None:
+            return DISPLAY_SIZE
+        width, height = size
+        scale = min(DISPLAY_SIZE[0] / width, DISPLAY_SIZE[1] / height, 1.0)
+        return max(1, round(width * scale)), max(1, round(height * scale))
+    
+    def _refresh_display(self):
+        """Muestra la última imagen decodificada (hilo de Tk)."""
+        if not self.is_receiving:
+            return
+        
+        packet = self.display_slot.latest()
+        if packet is not None and packet.sequence > self._shown_sequence:
+            self._shown_sequence = packet.sequence
+            self.current_frame = packet
+            image = packet.frame
+            
+            if self._photo is None or (self._photo.width(), self._photo.height()) != image.size:
+                self._photo = ImageTk.PhotoImage('RGB', image.size)
+                self.video_label.config(image=self._photo, text='')
+            self._photo.paste(image)
+            self.displayed_count += 1
+            self._displayed.set()
+        
+        while not self._photo_notices.empty():
+            self.status_var.set(self._photo_notices.get_nowait())
+        
+        now = time.monotonic()
+        if now - self._stats_time >= 1.0:
+            fps = (self.displayed_count - self._stats_displayed) / (now - self._stats_time)
+            self._stats_time = now
+            self._stats_displayed = self.displayed_count
+            mode = self.subscription.mode if self.subscription else ""
+            self.status_var.set(f"🟢 Recibiendo ({mode})" if self.displayed_count else
+                                "🟢 Conectado - Esperando frames...")
+            self.stats_var.set(f"Frames: {self.frame_count} | Mostrados: {self.displayed_count} | "
+                               f"Saltados: {self.skipped_count} | FPS: {fps:.1f}")
+        
+        self._refresh_job = self.root.after(REFRESH_MS, self._refresh_display)
     
     def take_photo(self):
-        """Captura foto (placeholder por ahora)."""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"photos/mobile_photo_{timestamp}.txt"
-        Path("photos").mkdir(exist_ok=True)
-        
-        # Por ahora guardamos info del estado
-        with open(filename, 'w') as f:
-            f.write(f"Photo captured from mobile at {timestamp}\n")
-            f.write(f"Worker URL: {self.worker_url}\n")
-            f.write(f"Status: Connected\n")
-        
-        self.status_var.set(f"📸 Info guardada: {filename}")
+        """Guarda el JPEG original del frame en pantalla."""
+        packet = self.current_frame
+        if packet is None or packet.jpeg is None:
+            self.status_var.set("❌ No hay frame disponible para capturar")
+            return
+        
+        filename = photo_path("photos", "mobile_photo")
+        if self.media_writer.submit(filename, packet.jpeg, callback=self._on_photo_saved):
+            self.status_var.set(f"💾 Guardando foto: {filename}")
+        else:
+            self.status_var.set("⚠️ Cola de escritura llena, foto descartada")
+    
+    def _on_photo_saved(self, result: WriteResult):
+        """Pasa el resultado de la foto a Tk (hilo del escritor)."""
+        if result.success:
+            self._photo_notices.put(f"📸 Foto guardada: {result.path}")
+        else:
+            self._photo_notices.put(f"❌ Error guardando foto: {result.error}")
     
     def run(self):
         """Ejecuta la aplicación."""
@@ -0,0 +1,243 @@
+"""
+Capa de codificación JPEG con backend intercambiable.
+
+Usa PyTurboJPEG cuando está instalado y OpenCV en caso contrario. Ambos
+backends soportan decodificación escalada en el dominio DCT (1/2, 1/4 y
+1/8), de modo que las previsualizaciones no pagan una decodificación a
+resolución completa seguida de un resize.
+"""
+
+import logging
+import threading
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    HAS_TURBOJPEG = True
+except ImportError:
+    TurboJPEG = None
+    TJPF_BGR = None
+    HAS_TURBOJPEG = False
+
+
+# Denominadores de escala soportados por libjpeg, de mayor a menor reducción
+SCALE_DENOMINATORS = (8, 4, 2, 1)
+
+# Marcadores SOF que contienen las dimensiones de la imagen
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Lee (ancho, alto) de la cabecera de un JPEG sin decodificarlo.
+
+    Args:
+        data: Imagen JPEG
+
+    Returns:
+        Tupla (ancho, alto) o None si no se encontró un marcador SOF
+    """
+    view = memoryview(data)
+    if len(view) < 4 or view[0] != 0xFF or view[1] != 0xD8:
+        return None
+
+    pos = 2
+    while pos + 4 <= len(view):
+        if view[pos] != 0xFF:
+            pos += 1
+            continue
+        marker = view[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+
+        length = (view[pos + 2] << 8) | view[pos + 3]
+        if marker in _SOF_MARKERS:
+            if pos + 9 > len(view):
+                return None
+            height = (view[pos + 5] << 8) | view[pos + 6]
+            width = (view[pos + 7] << 8) | view[pos + 8]
+            return width, height
+        pos += 2 + length
+
+    return None
+
+
+def choose_scale(size: Tuple[int, int], target_size: Tuple[int, int]) -> int:
+    """
+    Elige el denominador de escala más reducido que no baja del tamaño objetivo.
+
+    Args:
+        size: Tamaño (ancho, alto) de la imagen original
+        target_size: Tamaño (ancho, alto) mínimo deseado
+
+    Returns:
+        Denominador de escala (8, 4, 2 o 1)
+    """
+    width, height = size
+    target_width, target_height = target_size
+    for denominator in SCALE_DENOMINATORS:
+        # libjpeg redondea hacia arriba las dimensiones escaladas
+        scaled_width = -(-width // denominator)
+        scaled_height = -(-height // denominator)
+        if scaled_width >= target_width and scaled_height >= target_height:
+            return denominator
+    return 1
+
+
+class JpegCodec:
+    """Interfaz común de los backends JPEG."""
+
+    name = "base"
+
+    def decode(self, data: bytes, scale: int = 1) -> Optional[np.ndarray]:
+        """
+        Decodifica un JPEG a una imagen BGR.
+
+        Args:
+            data: Imagen JPEG
+            scale: Denominador de escala DCT (1, 2, 4 u 8)
+
+        Returns:
+            Imagen BGR o None si no se pudo decodificar
+        """
+        raise NotImplementedError
+
+    def encode(self, frame: np.ndarray, quality: int = 85) -> Optional[bytes]:
+        """
+        Codifica una imagen BGR a JPEG.
+
+        Args:
+            frame: Imagen BGR
+            quality: Calidad JPEG (1-100)
+
+        Returns:
+            Bytes JPEG o None si falló la codificación
+        """
+        raise NotImplementedError
+
+    def dimensions(self, data: bytes) -> Optional[Tuple[int, int]]:
+        """Obtiene (ancho, alto) de un JPEG sin decodificarlo."""
+        return jpeg_dimensions(data)
+
+    def decode_to_size(self, data: bytes, target_size: Optional[Tuple[int, int]]) -> Optional[np.ndarray]:
+        """
+        Decodifica un JPEG al tamaño indicado.
+
+        Decodifica a la escala DCT más pequeña que no baja del objetivo y
+        completa con un resize (que ya parte de una imagen reducida).
+
+        Args:
+            data: Imagen JPEG
+            target_size: Tamaño (ancho, alto) final, o None para tamaño original
+
+        Returns:
+            Imagen BGR o None si no se pudo decodificar
+        """
+        scale = 1
+        if target_size is not None:
+            size = self.dimensions(data)
+            if size is not None:
+                scale = choose_scale(size, target_size)
+
+        frame = self.decode(data, scale)
+        if frame is None or target_size is None:
+            return frame
+
+        if (frame.shape[1], frame.shape[0]) != tuple(target_size):
+            frame = cv2.resize(frame, target_size)
+        return frame
+
+
+class OpenCVJpegCodec(JpegCodec):
+    """Backend JPEG basado en OpenCV (IMREAD_REDUCED_* para escalar)."""
+
+    name = "opencv"
+
+    _REDUCED_FLAGS = {
+        1: cv2.IMREAD_COLOR,
+        2: cv2.IMREAD_REDUCED_COLOR_2,
+        4: cv2.IMREAD_REDUCED_COLOR_4,
+        8: cv2.IMREAD_REDUCED_COLOR_8,
+    }
+
+    def decode(self, data: bytes, scale: int = 1) -> Optional[np.ndarray]:
+        """Decodifica un JPEG con cv2.imdecode."""
+        nparr = np.frombuffer(data, np.uint8)
+        return cv2.imdecode(nparr, self._REDUCED_FLAGS.get(scale, cv2.IMREAD_COLOR))
+
+    def encode(self, frame: np.ndarray, quality: int = 85) -> Optional[bytes]:
+        """Codifica un JPEG con cv2.imencode."""
+        success, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+        return buffer.tobytes() if success else None
+
+
+class TurboJpegCodec(JpegCodec):
+    """Backend JPEG basado en libjpeg-turbo (PyTurboJPEG)."""
+
+    name = "turbojpeg"
+
+    def __init__(self):
+        """Carga la librería libjpeg-turbo."""
+        self._jpeg = TurboJPEG()
+
+    def decode(self, data: bytes, scale: int = 1) -> Optional[np.ndarray]:
+        """Decodifica un JPEG con tjDecompress (escalado en el dominio DCT)."""
+        try:
+            scaling_factor = (1, scale) if scale != 1 else None
+            return self._jpeg.decode(data, pixel_format=TJPF_BGR, scaling_factor=scaling_factor)
+        except (OSError, ValueError):
+            return None
+
+    def encode(self, frame: np.ndarray, quality: int = 85) -> Optional[bytes]:
+        """Codifica un JPEG con tjCompress."""
+        try:
+            return self._jpeg.encode(frame, quality=int(quality), pixel_format=TJPF_BGR)
+        except (OSError, ValueError):
+            return None
+
+    def dimensions(self, data: bytes) -> Optional[Tuple[int, int]]:
+        """Obtiene las dimensiones con tjDecompressHeader."""
+        try:
+            header = self._jpeg.decode_header(data)
+            return header[0], header[1]
+        except (OSError, ValueError):
+            return None
+
+
+_codec: Optional[JpegCodec] = None
+_codec_lock = threading.Lock()
+
+
+def create_codec(backend: Optional[str] = None) -> JpegCodec:
+    """
+    Crea un codec JPEG.
+
+    Args:
+        backend: 'turbojpeg', 'opencv' o None para elegir automáticamente
+
+    Returns:
+        Codec JPEG (OpenCV si libjpeg-turbo no está disponible)
+    """
+    if backend in (None, TurboJpegCodec.name) and HAS_TURBOJPEG:
+        try:
+            return TurboJpegCodec()
+        except (OSError, RuntimeError) as e:
+            logging.getLogger(__name__).warning(f"libjpeg-turbo no disponible: {e}")
+    return OpenCVJpegCodec()
+
+
+def get_codec() -> JpegCodec:
+    """Obtiene el codec JPEG compartido por la aplicación."""
+    global _codec
+    with _codec_lock:
+        if _codec is None:
+            _codec = create_codec()
+            logging.getLogger(__name__).info(f"Codec JPEG: {_codec.name}")
+        return _codec
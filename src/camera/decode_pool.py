@@ -0,0 +1,178 @@
+"""
+Pool de decodificación con coalescencia por dispositivo.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Hashable, Optional, Set, Tuple
+
+from src.utils.metrics import get_registry
+
+
+_metrics = get_registry()
+_frames_dropped = _metrics.counter(
+    "camera_frames_dropped_total", "Frames descartados antes de publicarse", ("device", "reason"))
+_pool_utilization = _metrics.gauge(
+    "camera_decode_pool_utilization", "Fracción de tiempo ocupada de los hilos de decodificación",
+    ("pool",))
+
+
+@dataclass
+class DecodePoolStats:
+    """Contadores del pool de decodificación."""
+    workers: int = 0
+    submitted: int = 0
+    completed: int = 0
+    coalesced: int = 0
+    failed: int = 0
+    pending: int = 0
+    utilization: float = 0.0
+
+
+class DecodePool:
+    """
+    Pool de hilos para decodificar frames fuera de los hilos HTTP.
+
+    OpenCV libera el GIL durante imdecode/resize, así que varios hilos
+    decodifican en paralelo. Los trabajos de un mismo dispositivo se
+    ejecutan de uno en uno y en orden; si llega un frame nuevo de ese
+    dispositivo antes de que empiece el pendiente, el pendiente se
+    descarta (solo interesa el más reciente).
+    """
+
+    UTILIZATION_WINDOW = 1.0
+
+    def __init__(self, workers: Optional[int] = None, name: str = "decode"):
+        """
+        Inicializa el pool.
+
+        Args:
+            workers: Número de hilos (núcleos de CPU si es None)
+            name: Prefijo del nombre de los hilos
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.name = name
+        self.logger = logging.getLogger(__name__)
+
+        self._condition = threading.Condition()
+        self._pending: Dict[Hashable, Tuple[Callable, tuple]] = {}
+        self._ready: Deque[Hashable] = deque()
+        self._running: Set[Hashable] = set()
+        self._threads = []
+        self._closed = False
+
+        self._stats = DecodePoolStats(workers=self.workers)
+        self._busy_seconds = 0.0
+        self._sample_time = time.monotonic()
+        self._sample_busy = 0.0
+
+        _pool_utilization.set_function(self._metric_utilization)
+
+    def submit(self, key: Hashable, func: Callable[..., Any], *args) -> bool:
+        """
+        Encola un trabajo para la clave (dispositivo) indicada.
+
+        Args:
+            key: Clave de coalescencia (normalmente el id del dispositivo)
+            func: Función a ejecutar en el pool
+            *args: Argumentos de la función
+
+        Returns:
+            False si el pool está cerrado
+        """
+        with self._condition:
+            if self._closed:
+                return False
+            self._ensure_threads()
+            self._stats.submitted += 1
+
+            if key in self._pending:
+                # Sustituye al trabajo que aún no empezó
+                self._stats.coalesced += 1
+                _frames_dropped.inc(device=key, reason="coalesced")
+            elif key not in self._running:
+                self._ready.append(key)
+            self._pending[key] = (func, args)
+            self._condition.notify()
+            return True
+
+    def pending_for(self, key: Hashable) -> int:
+        """Trabajos pendientes o en curso de una clave (0, 1 o 2)."""
+        with self._condition:
+            return int(key in self._pending) + int(key in self._running)
+
+    def get_stats(self) -> DecodePoolStats:
+        """
+        Obtiene los contadores y la utilización reciente del pool.
+
+        La utilización es la fracción de tiempo que los hilos pasaron
+        trabajando en la última ventana (~1 s).
+        """
+        with self._condition:
+            now = time.monotonic()
+            elapsed = now - self._sample_time
+            if elapsed >= self.UTILIZATION_WINDOW:
+                busy = self._busy_seconds - self._sample_busy
+                self._stats.utilization = min(1.0, busy / (elapsed * self.workers))
+                self._sample_time = now
+                self._sample_busy = self._busy_seconds
+
+            stats = DecodePoolStats(**vars(self._stats))
+            stats.pending = len(self._pending)
+            return stats
+
+    def close(self) -> None:
+        """Detiene los hilos; los trabajos pendientes se descartan."""
+        with self._condition:
+            self._closed = True
+            self._pending.clear()
+            self._ready.clear()
+            self._condition.notify_all()
+
+    def _metric_utilization(self) -> Dict[Tuple[str], float]:
+        """Utilización del pool para /metrics."""
+        return {(self.name,): self.get_stats().utilization}
+
+    def _ensure_threads(self) -> None:
+        """Arranca los hilos la primera vez que se usa el pool (requiere el lock)."""
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"{self.name}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _worker_loop(self) -> None:
+        """Ejecuta trabajos hasta que se cierre el pool."""
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._closed or self._ready)
+                if self._closed:
+                    return
+                key = self._ready.popleft()
+                func, args = self._pending.pop(key)
+                self._running.add(key)
+
+            started = time.monotonic()
+            try:
+                func(*args)
+                failed = False
+            except Exception as e:
+                self.logger.error(f"Error en el pool de decodificación: {e}")
+                failed = True
+            busy = time.monotonic() - started
+
+            with self._condition:
+                self._running.discard(key)
+                self._busy_seconds += busy
+                self._stats.completed += 1
+                if failed:
+                    self._stats.failed += 1
+                # Llegó otro frame del dispositivo mientras se decodificaba
+                if key in self._pending:
+                    self._ready.append(key)
+                    self._condition.notify()
@@ -0,0 +1,199 @@
+"""
+Caché de frames codificados compartida entre consumidores.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+import cv2
+
+from src.camera.codec import JpegCodec, get_codec
+from src.camera.frame_bus import FramePacket
+from src.utils.metrics import get_registry
+
+
+_metrics = get_registry()
+_encode_seconds = _metrics.histogram(
+    "camera_encode_seconds", "Latencia de codificación de frames", ("format",))
+_cache_lookups = _metrics.counter(
+    "camera_encoded_cache_lookups_total", "Consultas a la caché de frames codificados", ("result",))
+_cache_evictions = _metrics.counter(
+    "camera_encoded_cache_evictions_total", "Entradas expulsadas de la caché de frames codificados")
+_cache_bytes = _metrics.gauge(
+    "camera_encoded_cache_bytes", "Bytes ocupados por la caché de frames codificados")
+
+
+CacheKey = Tuple[int, str, Optional[int], Optional[Tuple[int, int]]]
+
+
+class _PendingEncode:
+    """Codificación en curso a la que esperan otros solicitantes."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Optional[bytes] = None
+
+
+class EncodedFrameCache:
+    """
+    Caché LRU, acotada en bytes, de las salidas codificadas de cada frame.
+
+    La clave es (secuencia, formato, calidad, tamaño). El primer consumidor
+    que pide una combinación la codifica; los que la piden mientras tanto
+    esperan a ese resultado en lugar de repetir el trabajo.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, codec: Optional[JpegCodec] = None):
+        """
+        Inicializa la caché.
+
+        Args:
+            max_bytes: Tamaño máximo total de las entradas en bytes
+            codec: Codec JPEG (el compartido de la aplicación si es None)
+        """
+        self.max_bytes = max_bytes
+        self.codec = codec or get_codec()
+        self.logger = logging.getLogger(__name__)
+
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._pending: Dict[Hashable, _PendingEncode] = {}
+        self._lock = threading.Lock()
+        self._size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+        _cache_lookups.set_function(self._metric_lookups)
+        _cache_evictions.set_function(self._metric_evictions)
+        _cache_bytes.set_function(self._metric_bytes)
+
+    def get(self, packet: FramePacket, fmt: str = 'jpeg', quality: Optional[int] = 85,
+            size: Optional[Tuple[int, int]] = None) -> Optional[bytes]:
+        """
+        Obtiene un frame codificado, codificándolo solo si nadie lo hizo antes.
+
+        Args:
+            packet: Paquete del FrameSlot
+            fmt: Formato de salida ('jpeg' o 'png')
+            quality: Calidad JPEG; None devuelve el JPEG original del emisor si existe
+            size: Tamaño (ancho, alto) de salida, o None para el tamaño del frame
+
+        Returns:
+            Bytes codificados o None si falló la codificación
+        """
+        if fmt == 'jpeg' and quality is None and size is None and packet.jpeg is not None:
+            return packet.jpeg
+
+        key: CacheKey = (packet.sequence, fmt, quality, tuple(size) if size else None)
+        return self.get_or_create(key, lambda: self._encode(packet, fmt, quality, size))
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Optional[bytes]]) -> Optional[bytes]:
+        """
+        Devuelve la entrada de la clave o la crea con `factory` (una sola vez).
+
+        Args:
+            key: Clave de la entrada
+            factory: Función que produce los bytes de la entrada
+
+        Returns:
+            Bytes de la entrada o None si la creación falló
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = _PendingEncode()
+                self._pending[key] = pending
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            pending.done.wait()
+            return pending.value
+
+        value = None
+        try:
+            value = factory()
+        except Exception as e:
+            self.logger.error(f"Error codificando frame: {e}")
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+                if value is not None:
+                    self._store(key, value)
+            pending.value = value
+            pending.done.set()
+        return value
+
+    def clear(self) -> None:
+        """Vacía la caché."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        """Obtiene los contadores de la caché."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._size,
+            }
+
+    def _metric_lookups(self) -> Dict[Tuple[str], int]:
+        """Aciertos, fallos y esperas a otra codificación para /metrics."""
+        with self._lock:
+            return {('hit',): self.hits, ('miss',): self.misses, ('coalesced',): self.coalesced}
+
+    def _metric_evictions(self) -> int:
+        """Entradas expulsadas para /metrics."""
+        return self.evictions
+
+    def _metric_bytes(self) -> int:
+        """Bytes en caché para /metrics."""
+        return self._size
+
+    def _store(self, key: Hashable, value: bytes) -> None:
+        """Guarda una entrada y expulsa las menos usadas (requiere el lock)."""
+        if len(value) > self.max_bytes:
+            return
+        self._entries[key] = value
+        self._size += len(value)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    def _encode(self, packet: FramePacket, fmt: str, quality: Optional[int],
+                size: Optional[Tuple[int, int]]) -> Optional[bytes]:
+        """Codifica el frame del paquete en el formato pedido."""
+        started = time.perf_counter()
+        frame = packet.frame
+        if size is not None and (frame.shape[1], frame.shape[0]) != tuple(size):
+            frame = cv2.resize(frame, tuple(size))
+
+        if fmt == 'jpeg':
+            encoded = self.codec.encode(frame, quality=quality if quality is not None else 95)
+        elif fmt == 'png':
+            success, buffer = cv2.imencode('.png', frame)
+            encoded = buffer.tobytes() if success else None
+        else:
+            raise ValueError(f"Formato no soportado: {fmt}")
+
+        _encode_seconds.observe(time.perf_counter() - started, format=fmt)
+        return encoded
@@ -0,0 +1,104 @@
+"""
+Bus de frames con número de secuencia para consumidores dirigidos por cambios.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+
+@dataclass
+class FramePacket:
+    """Frame publicado en el bus junto con sus metadatos."""
+    sequence: int
+    frame: Any
+    timestamp: Optional[float] = None
+    frame_number: int = 0
+    device_id: str = ""
+    received_at: float = 0.0
+    jpeg: Optional[bytes] = None
+
+
+class FrameSlot:
+    """
+    Contenedor del último frame con notificación por variable de condición.
+
+    Los productores publican frames y los consumidores esperan a que la
+    secuencia avance. Si llegan varios frames mientras un consumidor está
+    ocupado, al despertar solo recibe el más reciente (coalescencia).
+    """
+
+    def __init__(self):
+        """Inicializa el slot vacío."""
+        self._condition = threading.Condition()
+        self._packet: Optional[FramePacket] = None
+        self._sequence = 0
+        self._closed = False
+
+    @property
+    def sequence(self) -> int:
+        """Número de secuencia del último frame publicado."""
+        return self._sequence
+
+    def publish(self, frame: Any, timestamp: Optional[float] = None,
+                frame_number: int = 0, device_id: str = "",
+                jpeg: Optional[bytes] = None) -> FramePacket:
+        """
+        Publica un nuevo frame y despierta a los consumidores.
+
+        Args:
+            frame: Frame decodificado
+            timestamp: Timestamp del emisor en milisegundos (opcional)
+            frame_number: Número de frame asignado por el emisor
+            device_id: Identificador del dispositivo de origen
+            jpeg: JPEG original del emisor, si el frame llegó comprimido
+
+        Returns:
+            Paquete publicado con su número de secuencia
+        """
+        with self._condition:
+            self._sequence += 1
+            packet = FramePacket(
+                sequence=self._sequence,
+                frame=frame,
+                timestamp=timestamp,
+                frame_number=frame_number,
+                device_id=device_id,
+                received_at=time.time(),
+                jpeg=jpeg
+            )
+            self._packet = packet
+            self._condition.notify_all()
+        return packet
+
+    def latest(self) -> Optional[FramePacket]:
+        """Obtiene el último paquete publicado sin esperar."""
+        return self._packet
+
+    def wait_for_next(self, last_sequence: int,
+                      timeout: Optional[float] = None) -> Optional[FramePacket]:
+        """
+        Espera un frame con secuencia mayor a la indicada.
+
+        Args:
+            last_sequence: Última secuencia procesada por el consumidor
+            timeout: Tiempo máximo de espera en segundos
+
+        Returns:
+            Paquete más reciente o None si expiró el timeout o se cerró el slot
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._closed or self._sequence > last_sequence,
+                timeout
+            )
+            if self._sequence > last_sequence and self._packet is not None:
+                return self._packet
+            return None
+
+    def close(self) -> None:
+        """Cierra el slot y libera a todos los consumidores en espera."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
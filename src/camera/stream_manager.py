@@ -3,6 +3,7 @@ Gestor de streams de cámara mejorado basado en OpenCV.
 """
 
 import base64
+import math
 import threading
 import time
 import logging
@@ -16,7 +17,25 @@ from dataclasses import dataclass
 
 import flet as ft
 
+from src.camera.codec import get_codec
+from src.network.http_transport import get_session
 from src.utils.helpers import build_stream_url, format_duration, format_bytes
+from src.utils.metrics import get_registry
+
+
+_metrics = get_registry()
+_recorder_frames = _metrics.counter(
+    "camera_recorder_frames_total", "Frames procesados por los grabadores", ("result",))
+_recorder_write_seconds = _metrics.histogram(
+    "camera_recorder_write_seconds", "Duración de cada escritura en el grabador")
+_recorders_active = _metrics.gauge(
+    "camera_recorders_active", "Grabaciones en curso")
+_encode_seconds = _metrics.histogram(
+    "camera_encode_seconds", "Latencia de codificación de frames", ("format",))
+_stream_frames = _metrics.counter(
+    "camera_stream_frames_total", "Frames capturados de cámaras IP", ("stream",))
+_stream_fps = _metrics.gauge(
+    "camera_stream_fps", "Fps medidos de cada stream de cámara IP", ("stream",))
 
 
 @dataclass
@@ -35,7 +54,8 @@ class StreamInfo:
 class StreamRecorder:
     """Grabador de video para streams de cámara."""
     
-    def __init__(self, output_path: Path, fps: float = 15.0, codec: str = 'mp4v'):
+    def __init__(self, output_path: Path, fps: float = 15.0, codec: str = 'mp4v',
+                 max_gap: float = 5.0):
         """
         Inicializa el grabador.
         
@@ -43,14 +63,27 @@ class StreamRecorder:
             output_path: Ruta del archivo de salida
             fps: FPS de grabación
             codec: Codec de video
+            max_gap: Hueco máximo (segundos) que se rellena repitiendo frames
         """
         self.output_path = output_path
         self.fps = fps
         self.codec = codec
+        self.max_gap = max_gap
         self.writer: Optional[cv2.VideoWriter] = None
         self.is_recording = False
         self.start_time = None
         self.frame_count = 0
+        self.frames_repeated = 0
+        self.frames_dropped = 0
+        
+        # Estado del pacing por timestamp
+        self._lock = threading.Lock()
+        self._base_pts: Optional[float] = None
+        self._slots_written = 0
+        self._last_frame: Optional[np.ndarray] = None
+        self._last_write_time = 0.0
+        
+        _recorders_active.set_function(self._metric_active)
         
     def start(self, frame_size: tuple) -> bool:
         """
@@ -77,6 +110,11 @@ class StreamRecorder:
             self.is_recording = True
             self.start_time = time.time()
             self.frame_count = 0
+            self.frames_repeated = 0
+            self.frames_dropped = 0
+            self._base_pts = None
+            self._slots_written = 0
+            self._last_frame = None
             return True
             
         except Exception as e:
@@ -93,16 +131,97 @@ class StreamRecorder:
         Returns:
             True si se escribió correctamente
         """
-        if not self.is_recording or self.writer is None:
-            return False
+        with self._lock:
+            if not self.is_recording or self.writer is None:
+                return False
+                
+            try:
+                started = time.perf_counter()
+                self.writer.write(frame)
+                self.frame_count += 1
+                self._slots_written += 1
+                self._last_frame = frame
+                self._last_write_time = time.time()
+                _recorder_write_seconds.observe(time.perf_counter() - started)
+                _recorder_frames.inc(result="written")
+                return True
+            except Exception as e:
+                logging.error(f"Error al escribir frame: {e}")
+                return False
+    
+    def write_frame_at(self, frame: np.ndarray, timestamp_ms: Optional[float] = None) -> bool:
+        """
+        Escribe un frame en la posición que le corresponde según su timestamp.
+        
+        El contenedor tiene FPS fijo, así que cada frame ocupa la ranura
+        derivada de su timestamp de presentación: los huecos se rellenan
+        repitiendo el frame anterior y los frames que caen en una ranura ya
+        escrita se descartan. Así la duración del archivo sigue al reloj del
+        emisor y el trabajo de codificación escala con los frames reales.
+        
+        Args:
+            frame: Frame a escribir
+            timestamp_ms: Timestamp del emisor en milisegundos (reloj local si es None)
             
-        try:
-            self.writer.write(frame)
-            self.frame_count += 1
-            return True
-        except Exception as e:
-            logging.error(f"Error al escribir frame: {e}")
-            return False
+        Returns:
+            True si el frame se escribió
+        """
+        if timestamp_ms is None:
+            timestamp_ms = time.time() * 1000.0
+        
+        with self._lock:
+            if not self.is_recording or self.writer is None:
+                return False
+            
+            try:
+                slot_ms = 1000.0 / self.fps
+                max_slots = max(1, int(self.max_gap * self.fps))
+                
+                if self._base_pts is None:
+                    self._base_pts = timestamp_ms
+                
+                slot = int(math.floor((timestamp_ms - self._base_pts) / slot_ms + 0.5))
+                
+                if slot < self._slots_written - max_slots:
+                    # El reloj del emisor retrocedió: re-anclar en la ranura actual
+                    self._base_pts = timestamp_ms - self._slots_written * slot_ms
+                    slot = self._slots_written
+                elif slot < self._slots_written:
+                    self.frames_dropped += 1
+                    _recorder_frames.inc(result="dropped")
+                    return False
+                
+                gap = slot - self._slots_written
+                if gap > max_slots:
+                    # Pausa larga del emisor: no rellenar más que max_gap
+                    self._base_pts = timestamp_ms - (self._slots_written + max_slots) * slot_ms
+                    gap = max_slots
+                
+                started = time.perf_counter()
+                if self._last_frame is not None:
+                    for _ in range(gap):
+                        self.writer.write(self._last_frame)
+                    self.frames_repeated += gap
+                    self._slots_written += gap
+                    if gap:
+                        _recorder_frames.inc(gap, result="repeated")
+                
+                self.writer.write(frame)
+                self.frame_count += 1
+                self._slots_written += 1
+                self._last_frame = frame
+                self._last_write_time = time.time()
+                _recorder_write_seconds.observe(time.perf_counter() - started)
+                _recorder_frames.inc(result="written")
+                return True
+                
+            except Exception as e:
+                logging.error(f"Error al escribir frame: {e}")
+                return False
+    
+    def _metric_active(self) -> int:
+        """1 si la grabación está en curso (para /metrics)."""
+        return int(self.is_recording)
     
     def stop(self) -> Dict[str, Any]:
         """
@@ -114,13 +233,28 @@ class StreamRecorder:
         stats = {
             'duration': 0.0,
             'frames': self.frame_count,
+            'frames_repeated': self.frames_repeated,
+            'frames_dropped': self.frames_dropped,
             'file_size': 0,
             'success': False
         }
         
-        if self.writer is not None:
-            self.writer.release()
-            self.writer = None
+        with self._lock:
+            if self.writer is not None:
+                # Mantener el último frame en pantalla hasta el momento de parar
+                if self._base_pts is not None and self._last_frame is not None:
+                    tail = int((time.time() - self._last_write_time) * self.fps)
+                    tail = min(tail, max(1, int(self.max_gap * self.fps)))
+                    for _ in range(tail):
+                        self.writer.write(self._last_frame)
+                    self.frames_repeated += tail
+                    stats['frames_repeated'] = self.frames_repeated
+                
+                self.writer.release()
+                self.writer = None
+            
+            self.is_recording = False
+            self._last_frame = None
         
         if self.start_time:
             stats['duration'] = time.time() - self.start_time
@@ -129,7 +263,6 @@ class StreamRecorder:
             stats['file_size'] = self.output_path.stat().st_size
             stats['success'] = True
             
-        self.is_recording = False
         return stats
 
 
@@ -149,6 +282,8 @@ class StreamWorker:
         self.image_widget = image_widget
         self.status_callback = status_callback
         self.logger = logging.getLogger(__name__)
+        self.codec = get_codec()
+        self.session = get_session('stream')
         
         # Control de threading
         self._stop_event = threading.Event()
@@ -166,6 +301,8 @@ class StreamWorker:
         self._last_fps_time = time.time()
         self._fps_counter = 0
         
+        _stream_fps.set_function(self._metric_fps)
+        
     def start(self, url: str) -> None:
         """
         Inicia el stream de la cámara.
@@ -183,7 +320,7 @@ class StreamWorker:
                 # Verificar conectividad rápida
                 try:
                     base_url = url.split("/video")[0]
-                    response = requests.get(base_url, timeout=3)
+                    response = self.session.get(base_url, timeout=3)
                     response.raise_for_status()
                 except requests.RequestException:
                     pass  # Continuar de todos modos
@@ -368,22 +505,21 @@ class StreamWorker:
         try:
             # Grabar si está activo
             if self.recorder and self.recorder.is_recording:
-                self.recorder.write_frame(frame)
-            
-            # Convertir para mostrar en Flet
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                self.recorder.write_frame_at(frame)
             
-            # Codificar a PNG
-            success, buffer = cv2.imencode('.png', rgb_frame)
-            if not success:
+            # Codificar a JPEG para mostrar en Flet (mucho más barato que PNG)
+            started = time.perf_counter()
+            jpeg = self.codec.encode(frame, quality=85)
+            _encode_seconds.observe(time.perf_counter() - started, format="jpeg")
+            if jpeg is None:
                 return
                 
             # Convertir a base64
-            b64_string = base64.b64encode(buffer.tobytes()).decode('ascii')
+            b64_string = base64.b64encode(jpeg).decode('ascii')
             
             # Actualizar widget de imagen
             def update_image():
-                self.image_widget.src_base64 = f"data:image/png;base64,{b64_string}"
+                self.image_widget.src_base64 = f"data:image/jpeg;base64,{b64_string}"
                 self.image_widget.update()
                 
             self.page.invoke_later(update_image)
@@ -391,10 +527,17 @@ class StreamWorker:
         except Exception as e:
             self.logger.error(f"Error al procesar frame: {e}")
     
+    def _metric_fps(self) -> Dict[tuple, float]:
+        """Fps del stream para /metrics (nada si no está conectado)."""
+        if not self.is_connected:
+            return {}
+        return {(self.stream_info.url,): self.stream_info.fps}
+    
     def _update_statistics(self) -> None:
         """Actualiza las estadísticas del stream."""
         self.stream_info.frames_captured += 1
         self._fps_counter += 1
+        _stream_frames.inc(stream=self.stream_info.url)
         
         # Calcular FPS real cada segundo
         current_time = time.time()
@@ -12,6 +12,9 @@ from typing import List, Dict, Any, Callable, Optional
 from dataclasses import dataclass
 from ipaddress import IPv4Network
 
+from src.network.http_transport import get_session
+from src.utils.metrics import get_registry
+
 # Importación opcional de netifaces
 try:
     import netifaces
@@ -21,6 +24,14 @@ except ImportError:
     HAS_NETIFACES = False
 
 
+_metrics = get_registry()
+_scan_seconds = _metrics.histogram(
+    "camera_discovery_scan_seconds", "Duración del escaneo de cada red",
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0))
+_devices_found = _metrics.counter(
+    "camera_discovery_devices_found_total", "Dispositivos encontrados por los escaneos")
+
+
 @dataclass
 class CameraDevice:
     """Información de un dispositivo de cámara encontrado."""
@@ -49,6 +60,8 @@ class NetworkScanner:
     def __init__(self):
         """Inicializa el escáner."""
         self.logger = logging.getLogger(__name__)
+        # Sin reintentos: la mayoría de hosts escaneados no son cámaras
+        self.session = get_session('discovery', retries=0)
         
     def get_local_networks(self) -> List[str]:
         """
@@ -125,6 +138,7 @@ class NetworkScanner:
             ports = [8080, 8081, 80, 443, 554, 8554, 9999]  # Puertos comunes para cámaras IP
             
         devices = []
+        started = time.perf_counter()
         
         try:
             net = IPv4Network(network, strict=False)
@@ -156,7 +170,9 @@ class NetworkScanner:
                         
         except Exception as e:
             self.logger.error(f"Error escaneando red {network}: {e}")
-            
+        
+        _scan_seconds.observe(time.perf_counter() - started)
+        _devices_found.inc(len(devices))
         return devices
     
     def _scan_host(self, ip: str, ports: List[int]) -> Optional[CameraDevice]:
@@ -206,8 +222,8 @@ class NetworkScanner:
             start_time = time.time()
             
             try:
-                response = requests.get(f"http://{ip}:{port}", timeout=3.0, 
-                                     allow_redirects=False)
+                response = self.session.get(f"http://{ip}:{port}", timeout=3.0, 
+                                            allow_redirects=False)
                 
                 response_time = time.time() - start_time
                 
@@ -228,12 +244,13 @@ class NetworkScanner:
                 common_paths = ['/video', '/mjpeg', '/cam', '/stream']
                 for path in common_paths:
                     try:
-                        cam_response = requests.get(f"http://{ip}:{port}{path}", 
-                                                  timeout=2.0, stream=True)
-                        if cam_response.status_code == 200:
-                            content_type = cam_response.headers.get('content-type', '')
-                            if 'image' in content_type or 'video' in content_type:
-                                return True
+                        # Cerrar la respuesta sin leer el stream libera la conexión
+                        with self.session.get(f"http://{ip}:{port}{path}", 
+                                              timeout=2.0, stream=True) as cam_response:
+                            if cam_response.status_code == 200:
+                                content_type = cam_response.headers.get('content-type', '')
+                                if 'image' in content_type or 'video' in content_type:
+                                    return True
                     except:
                         continue
                         
@@ -254,7 +271,7 @@ class NetworkScanner:
         """
         try:
             start_time = time.time()
-            response = requests.get(device.url, timeout=3.0)
+            response = self.session.get(device.url, timeout=3.0)
             device.response_time = time.time() - start_time
             
             if response.status_code == 200:
@@ -278,8 +295,8 @@ class NetworkScanner:
                 
                 for endpoint in common_endpoints:
                     try:
-                        test_response = requests.head(f"{device.url}{endpoint}", 
-                                                    timeout=1.0)
+                        test_response = self.session.head(f"{device.url}{endpoint}", 
+                                                          timeout=1.0)
                         if test_response.status_code == 200:
                             device.services.append(endpoint)
                     except:
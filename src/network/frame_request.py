@@ -0,0 +1,333 @@
+"""
+Parser de peticiones de frame con buffers reutilizables y límite de tamaño.
+"""
+
+import binascii
+import json
+import threading
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, List, Mapping, Optional
+
+
+class FrameRequestError(ValueError):
+    """Petición de frame inválida."""
+
+
+class BodyTooLarge(FrameRequestError):
+    """El cuerpo de la petición supera el tamaño máximo permitido."""
+
+
+def parse_content_length(value: Optional[str]) -> Optional[int]:
+    """
+    Convierte la cabecera Content-Length en un entero.
+
+    Args:
+        value: Valor de la cabecera (None si no vino)
+
+    Returns:
+        Longitud del cuerpo, o None si no se indicó
+
+    Raises:
+        FrameRequestError: Si la cabecera no es un entero no negativo
+    """
+    if not value:
+        return None
+    try:
+        length = int(value)
+    except ValueError:
+        raise FrameRequestError(f"Content-Length inválido: {value!r}")
+    if length < 0:
+        raise FrameRequestError(f"Content-Length inválido: {value!r}")
+    return length
+
+
+def _parse_number(value: Any, kind: type, name: str) -> Any:
+    """Convierte un metadato numérico (None si no vino)."""
+    if value is None or value == "":
+        return None
+    try:
+        return kind(value)
+    except (TypeError, ValueError, OverflowError):
+        raise FrameRequestError(f"{name} inválido: {value!r}")
+
+
+@dataclass
+class FrameRequest:
+    """Frame extraído de una petición de ingesta."""
+    jpeg: bytes
+    timestamp: Optional[float] = None
+    frame_number: Optional[int] = None
+    device_id: str = ""
+    body_size: int = 0
+
+
+class BufferPool:
+    """
+    Pool de bytearrays reutilizables con tamaño máximo por buffer.
+
+    Los buffers crecen por bloques hasta el tamaño de las peticiones
+    habituales y se devuelven al pool tras cada petición, así que en
+    régimen estable no se reserva memoria para leer cuerpos.
+    """
+
+    GROW_STEP = 64 * 1024
+
+    def __init__(self, max_buffer_size: int, max_buffers: int = 8):
+        """
+        Inicializa el pool.
+
+        Args:
+            max_buffer_size: Tamaño máximo de cada buffer en bytes
+            max_buffers: Número máximo de buffers en uso simultáneo
+        """
+        self.max_buffer_size = max_buffer_size
+        self.max_buffers = max_buffers
+
+        self._free: List[bytearray] = []
+        self._in_use = 0
+        self._condition = threading.Condition()
+
+        self.bytes_in_flight = 0
+        self.peak_bytes_in_flight = 0
+        self.bytes_allocated = 0
+
+    def acquire(self, size: int, timeout: Optional[float] = 5.0) -> bytearray:
+        """
+        Obtiene un buffer con al menos `size` bytes.
+
+        Args:
+            size: Tamaño requerido
+            timeout: Espera máxima si todos los buffers están en uso
+
+        Returns:
+            Buffer reutilizable
+
+        Raises:
+            BodyTooLarge: Si el tamaño supera el máximo del pool
+            TimeoutError: Si no se liberó ningún buffer a tiempo
+        """
+        if size > self.max_buffer_size:
+            raise BodyTooLarge(f"Cuerpo de {size} bytes (máximo {self.max_buffer_size})")
+
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._in_use < self.max_buffers, timeout):
+                raise TimeoutError("No hay buffers de ingesta disponibles")
+            self._in_use += 1
+            buffer = self._free.pop() if self._free else bytearray()
+
+        if len(buffer) < size:
+            new_size = min(self.max_buffer_size,
+                           (size + self.GROW_STEP - 1) // self.GROW_STEP * self.GROW_STEP)
+            with self._condition:
+                self.bytes_allocated += new_size - len(buffer)
+            buffer.extend(bytes(new_size - len(buffer)))
+
+        with self._condition:
+            self.bytes_in_flight += len(buffer)
+            self.peak_bytes_in_flight = max(self.peak_bytes_in_flight, self.bytes_in_flight)
+        return buffer
+
+    def release(self, buffer: bytearray) -> None:
+        """Devuelve un buffer al pool."""
+        with self._condition:
+            self.bytes_in_flight -= len(buffer)
+            self._in_use -= 1
+            self._free.append(buffer)
+            self._condition.notify()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Obtiene las estadísticas de memoria del pool."""
+        with self._condition:
+            return {
+                'buffers_in_use': self._in_use,
+                'buffers_free': len(self._free),
+                'bytes_in_flight': self.bytes_in_flight,
+                'peak_bytes_in_flight': self.peak_bytes_in_flight,
+                'bytes_allocated': self.bytes_allocated,
+            }
+
+
+class FrameRequestParser:
+    """
+    Extrae el JPEG de una petición JSON {frame, timestamp, frameNumber, deviceId}.
+
+    El cuerpo se lee en un buffer del pool, la cadena base64 se localiza
+    directamente sobre los bytes (sin construir un str del documento) y se
+    decodifica con binascii.a2b_base64 desde una vista del buffer. Solo el
+    resto del JSON, que es pequeño, pasa por json.loads.
+
+    Las peticiones con Content-Type image/jpeg traen el JPEG binario en el
+    cuerpo y los metadatos en las cabeceras X-Timestamp, X-Frame-Number y
+    X-Device-Id; el cuerpo se lee también en un buffer del pool y el JPEG
+    se entrega con una única copia.
+    """
+
+    BINARY_CONTENT_TYPE = 'image/jpeg'
+
+    FRAME_KEY = b'"frame"'
+
+    def __init__(self, max_body_size: int = 4 * 1024 * 1024, max_in_flight: int = 8):
+        """
+        Inicializa el parser.
+
+        Args:
+            max_body_size: Tamaño máximo aceptado del cuerpo en bytes
+            max_in_flight: Peticiones que pueden parsearse a la vez
+        """
+        self.max_body_size = max_body_size
+        self.pool = BufferPool(max_body_size, max_in_flight)
+
+        self._lock = threading.Lock()
+        self.requests_parsed = 0
+        self.requests_rejected = 0
+        self.peak_decoded_bytes = 0
+
+    def parse(self, rfile: BinaryIO, content_length: Optional[int],
+              headers: Optional[Mapping[str, str]] = None) -> FrameRequest:
+        """
+        Lee y parsea el cuerpo de una petición de frame.
+
+        Args:
+            rfile: Stream de entrada de la petición
+            content_length: Valor de la cabecera Content-Length
+            headers: Cabeceras de la petición (para el formato binario)
+
+        Returns:
+            Frame extraído con sus metadatos
+
+        Raises:
+            BodyTooLarge: Si el cuerpo supera el máximo (antes de leerlo)
+            FrameRequestError: Si la petición no es válida
+        """
+        if content_length is None or content_length <= 0:
+            self._count_rejected()
+            raise FrameRequestError("Content-Length requerido")
+        if content_length > self.max_body_size:
+            self._count_rejected()
+            raise BodyTooLarge(f"Cuerpo de {content_length} bytes (máximo {self.max_body_size})")
+
+        content_type = (headers.get('Content-Type') or '') if headers is not None else ''
+        if content_type.startswith(self.BINARY_CONTENT_TYPE):
+            request = self._parse_binary(rfile, content_length, headers)
+            with self._lock:
+                self.requests_parsed += 1
+                self.peak_decoded_bytes = max(self.peak_decoded_bytes, len(request.jpeg))
+            return request
+
+        buffer = self.pool.acquire(content_length)
+        try:
+            # La vista debe liberarse antes de devolver el buffer: un
+            # bytearray con vistas vivas no puede crecer
+            with memoryview(buffer) as view:
+                self._read_exact(rfile, view[:content_length])
+                request = self._parse_body(buffer, view, content_length)
+        except FrameRequestError:
+            self._count_rejected()
+            raise
+        finally:
+            self.pool.release(buffer)
+
+        with self._lock:
+            self.requests_parsed += 1
+            self.peak_decoded_bytes = max(self.peak_decoded_bytes, len(request.jpeg))
+        return request
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obtiene las estadísticas del parser y de su pool de memoria."""
+        stats = self.pool.get_stats()
+        with self._lock:
+            stats.update({
+                'requests_parsed': self.requests_parsed,
+                'requests_rejected': self.requests_rejected,
+                'peak_decoded_bytes': self.peak_decoded_bytes,
+                'max_body_size': self.max_body_size,
+            })
+        return stats
+
+    def _read_exact(self, rfile: BinaryIO, target: memoryview) -> None:
+        """Lee exactamente len(target) bytes en el buffer."""
+        filled = 0
+        total = len(target)
+        while filled < total:
+            count = rfile.readinto(target[filled:])
+            if not count:
+                raise FrameRequestError("Cuerpo de la petición incompleto")
+            filled += count
+
+    def _parse_binary(self, rfile: BinaryIO, length: int, headers: Mapping[str, str]) -> FrameRequest:
+        """Lee un JPEG binario con los metadatos en cabeceras."""
+        try:
+            # Metadatos antes del cuerpo: una cabecera inválida no ocupa buffer
+            timestamp = _parse_number(headers.get('X-Timestamp'), float, "X-Timestamp")
+            frame_number = _parse_number(headers.get('X-Frame-Number'), int, "X-Frame-Number")
+
+            buffer = self.pool.acquire(length)
+            try:
+                with memoryview(buffer) as view:
+                    self._read_exact(rfile, view[:length])
+                    # Única copia: el JPEG que se entrega
+                    jpeg = bytes(view[:length])
+            finally:
+                self.pool.release(buffer)
+        except FrameRequestError:
+            self._count_rejected()
+            raise
+
+        return FrameRequest(
+            jpeg=jpeg,
+            timestamp=timestamp,
+            frame_number=frame_number,
+            device_id=headers.get('X-Device-Id') or "",
+            body_size=length
+        )
+
+    def _parse_body(self, buffer: bytearray, view: memoryview, length: int) -> FrameRequest:
+        """Localiza el payload base64 y los metadatos dentro del buffer."""
+        key_pos = buffer.find(self.FRAME_KEY, 0, length)
+        if key_pos < 0:
+            raise FrameRequestError("No frame data")
+
+        colon = buffer.find(b':', key_pos + len(self.FRAME_KEY), length)
+        value_start = buffer.find(b'"', colon + 1, length) if colon >= 0 else -1
+        if value_start < 0:
+            raise FrameRequestError("Valor de frame inválido")
+        value_end = buffer.find(b'"', value_start + 1, length)
+        if value_end < 0:
+            raise FrameRequestError("Valor de frame sin cerrar")
+
+        # Saltar el prefijo data URL (data:image/jpeg;base64,)
+        b64_start = value_start + 1
+        if buffer.startswith(b'data:', b64_start):
+            comma = buffer.find(b',', b64_start, value_end)
+            if comma < 0:
+                raise FrameRequestError("Data URL inválida")
+            b64_start = comma + 1
+
+        try:
+            jpeg = binascii.a2b_base64(view[b64_start:value_end])
+        except binascii.Error as e:
+            raise FrameRequestError(f"Base64 inválido: {e}")
+
+        # El resto del documento (sin el payload) es pequeño: JSON normal
+        try:
+            metadata = json.loads(bytes(view[:value_start + 1]) + bytes(view[value_end:length]))
+        except ValueError as e:
+            raise FrameRequestError(f"JSON inválido: {e}")
+
+        if not isinstance(metadata, dict):
+            raise FrameRequestError("El cuerpo no es un objeto JSON")
+        timestamp = metadata.get('timestamp')
+        if timestamp is not None and (isinstance(timestamp, bool) or not isinstance(timestamp, (int, float))):
+            raise FrameRequestError(f"timestamp inválido: {timestamp!r}")
+        return FrameRequest(
+            jpeg=jpeg,
+            timestamp=timestamp,
+            frame_number=_parse_number(metadata.get('frameNumber'), int, "frameNumber"),
+            device_id=str(metadata.get('deviceId') or ""),
+            body_size=length
+        )
+
+    def _count_rejected(self) -> None:
+        """Incrementa el contador de peticiones rechazadas."""
+        with self._lock:
+            self.requests_rejected += 1
@@ -0,0 +1,336 @@
+"""
+Transporte HTTP compartido por los clientes de la aplicación.
+
+Todas las sesiones comparten un único pool de conexiones keep-alive con
+tamaño por host, de modo que las peticiones repetidas (polling al relay,
+comprobaciones de salud, escaneos) reutilizan la conexión TCP en lugar de
+abrir una nueva cada vez. Cada sesión reintenta los fallos transitorios
+con backoff exponencial con jitter dentro de un presupuesto de tiempo por
+petición, y las métricas `camera_http_*` registran por cliente cuántas
+peticiones se hicieron y cuántas conexiones hubo que abrir.
+
+Uso:
+    session = get_session('relay', base_url=url, pool_size=6)
+    response = session.get(f"{url}/api/health")
+"""
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.poolmanager import PoolManager
+from urllib3.util.retry import Retry
+
+from src.utils.metrics import get_registry
+
+
+# Conexiones keep-alive que se conservan por host
+DEFAULT_POOL_SIZE = 4
+
+# Hosts con pool propio antes de descartar el menos usado
+MAX_HOSTS = 32
+
+# Reintentos de errores de conexión/lectura y de respuestas 502/503/504
+DEFAULT_RETRIES = 2
+RETRY_STATUSES = (502, 503, 504)
+
+# Backoff entre reintentos: factor * 2^n segundos, la mitad aleatoria
+BACKOFF_FACTOR = 0.2
+BACKOFF_MAX = 2.0
+
+
+_metrics = get_registry()
+_http_requests = _metrics.counter(
+    "camera_http_requests_total", "Peticiones HTTP de los clientes", ("client",))
+_http_connections = _metrics.counter(
+    "camera_http_connections_total", "Conexiones TCP abiertas por los clientes", ("client",))
+_http_retries = _metrics.counter(
+    "camera_http_retries_total", "Reintentos HTTP de los clientes", ("client",))
+
+# Cliente y plazo de la petición en curso en cada hilo (los reintentos y
+# las conexiones nuevas ocurren dentro de la llamada de requests)
+_context = threading.local()
+
+
+@dataclass(frozen=True)
+class TimeoutBudget:
+    """
+    Tiempos máximos de una petición.
+
+    `connect` y `read` son los timeouts de cada intento; `total` limita el
+    tiempo de la petición con todos sus reintentos: no se reintenta si la
+    espera del backoff no cabe en lo que queda.
+    """
+    connect: float = 3.05
+    read: float = 10.0
+    total: Optional[float] = 15.0
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """Timeout (conexión, lectura) para requests."""
+        return (self.connect, self.read)
+
+
+DEFAULT_BUDGET = TimeoutBudget()
+
+
+@dataclass
+class TransportStats:
+    """Contadores de un cliente del transporte."""
+    requests: int = 0
+    retries: int = 0
+    connections: int = 0
+
+    @property
+    def reuse_ratio(self) -> float:
+        """Fracción de intentos servidos por una conexión ya abierta."""
+        attempts = self.requests + self.retries
+        if not attempts:
+            return 0.0
+        return max(0.0, 1.0 - self.connections / attempts)
+
+
+def _record(field: str) -> None:
+    """Suma un evento al cliente de la petición en curso."""
+    state = getattr(_context, 'state', None)
+    if state is None:
+        return
+    transport, client, _deadline = state
+    transport._count(client, field)
+
+
+class _JitteredRetry(Retry):
+    """Retry de urllib3 con jitter en el backoff y plazo por petición."""
+
+    def get_backoff_time(self) -> float:
+        # La mitad de la espera es aleatoria: los clientes que fallan a la
+        # vez (el relay se reinicia) no reintentan todos al mismo tiempo
+        backoff = super().get_backoff_time()
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    def is_exhausted(self) -> bool:
+        state = getattr(_context, 'state', None)
+        deadline = state[2] if state is not None else None
+        if deadline is not None and time.monotonic() + Retry.get_backoff_time(self) >= deadline:
+            return True
+        return super().is_exhausted()
+
+    def increment(self, *args, **kwargs) -> Retry:
+        retry = super().increment(*args, **kwargs)
+        _record('retries')
+        return retry
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    """Pool HTTP que cuenta las conexiones nuevas."""
+
+    def _new_conn(self):
+        _record('connections')
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    """Pool HTTPS que cuenta las conexiones nuevas."""
+
+    def _new_conn(self):
+        _record('connections')
+        return super()._new_conn()
+
+
+class _SizedPoolManager(PoolManager):
+    """PoolManager con tamaño de pool configurable por host."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+        self.host_sizes: Dict[Tuple[str, int], int] = {}
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        size = self.host_sizes.get((host.lower(), port))
+        if size is not None:
+            request_context = dict(request_context if request_context is not None
+                                   else self.connection_pool_kw)
+            request_context['maxsize'] = size
+        return super()._new_pool(scheme, host, port, request_context)
+
+
+class _SharedPoolAdapter(HTTPAdapter):
+    """Adaptador de requests que usa el pool del transporte."""
+
+    def __init__(self, poolmanager: PoolManager, retry: Retry):
+        self._shared_poolmanager = poolmanager
+        super().__init__(max_retries=retry)
+
+    def init_poolmanager(self, *args, **kwargs):
+        self.poolmanager = self._shared_poolmanager
+
+    def close(self):
+        # El pool es del transporte: cerrar una sesión no cierra conexiones
+        # que usan las demás
+        pass
+
+
+class TransportSession(requests.Session):
+    """
+    Sesión de requests sobre el transporte compartido.
+
+    Admite el argumento extra `budget` (TimeoutBudget) en cada petición;
+    sin él se usa el presupuesto de la sesión, y si la petición no indica
+    `timeout` se toman los timeouts del presupuesto.
+    """
+
+    def __init__(self, transport: "HttpTransport", client: str,
+                 adapter: HTTPAdapter, budget: TimeoutBudget):
+        super().__init__()
+        self.transport = transport
+        self.client = client
+        self.budget = budget
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
+    def request(self, method, url, *args, budget: Optional[TimeoutBudget] = None, **kwargs):
+        budget = budget or self.budget
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = budget.timeout
+        deadline = time.monotonic() + budget.total if budget.total is not None else None
+
+        previous = getattr(_context, 'state', None)
+        _context.state = (self.transport, self.client, deadline)
+        try:
+            self.transport._count(self.client, 'requests')
+            return super().request(method, url, *args, **kwargs)
+        finally:
+            _context.state = previous
+
+    def close(self):
+        # Los adaptadores comparten el pool del transporte
+        self.adapters.clear()
+
+
+class HttpTransport:
+    """
+    Pool de conexiones HTTP compartido y fábrica de sesiones.
+
+    Las sesiones creadas con `session()` comparten el mismo PoolManager,
+    así que dos clientes del mismo host reutilizan conexiones entre sí.
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, max_hosts: int = MAX_HOSTS):
+        """
+        Inicializa el transporte.
+
+        Args:
+            pool_size: Conexiones keep-alive por host (salvo `size_pool`)
+            max_hosts: Hosts con pool propio como máximo
+        """
+        self.pool_size = pool_size
+        self.poolmanager = _SizedPoolManager(num_pools=max_hosts, maxsize=pool_size)
+        self._stats: Dict[str, TransportStats] = {}
+        self._lock = threading.Lock()
+
+    def size_pool(self, url: str, size: int) -> None:
+        """
+        Ajusta las conexiones keep-alive que se conservan para un host.
+
+        Los clientes con varias peticiones en vuelo hacia el mismo host
+        necesitan al menos tantas conexiones; con menos, las que sobran se
+        cierran al terminar y la siguiente petición abre otra. Se aplica a
+        los pools que se creen a partir de ahora, y nunca reduce un tamaño
+        ya configurado.
+
+        Args:
+            url: URL (o host:puerto) del servidor
+            size: Conexiones a conservar
+        """
+        parts = urlsplit(url if '//' in url else f"//{url}")
+        if not parts.hostname:
+            raise ValueError(f"URL sin host: {url}")
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.hostname.lower(), port)
+        with self._lock:
+            sizes = self.poolmanager.host_sizes
+            sizes[key] = max(size, sizes.get(key, self.pool_size))
+
+    def session(self, client: str, base_url: Optional[str] = None, pool_size: Optional[int] = None,
+                budget: TimeoutBudget = DEFAULT_BUDGET, retries: int = DEFAULT_RETRIES) -> TransportSession:
+        """
+        Crea una sesión sobre el pool compartido.
+
+        Args:
+            client: Nombre del cliente en las métricas
+            base_url: Servidor principal de la sesión (para `pool_size`)
+            pool_size: Conexiones a conservar para `base_url`
+            budget: Presupuesto de tiempo por defecto de cada petición
+            retries: Reintentos de fallos transitorios (0 = ninguno)
+
+        Returns:
+            Sesión de requests lista para usar
+        """
+        if base_url and pool_size:
+            self.size_pool(base_url, pool_size)
+        retry = _JitteredRetry(
+            total=retries, connect=retries, read=retries, status=retries,
+            status_forcelist=RETRY_STATUSES, backoff_factor=BACKOFF_FACTOR,
+            backoff_max=BACKOFF_MAX, raise_on_status=False
+        )
+        with self._lock:
+            self._stats.setdefault(client, TransportStats())
+        return TransportSession(self, client, _SharedPoolAdapter(self.poolmanager, retry), budget)
+
+    def get_stats(self) -> Dict[str, TransportStats]:
+        """Obtiene una copia de los contadores de cada cliente."""
+        with self._lock:
+            return {client: TransportStats(stats.requests, stats.retries, stats.connections)
+                    for client, stats in self._stats.items()}
+
+    def close(self) -> None:
+        """Cierra todas las conexiones del pool."""
+        self.poolmanager.clear()
+
+    def _count(self, client: str, field: str) -> None:
+        """Suma un evento a los contadores y métricas del cliente."""
+        with self._lock:
+            stats = self._stats.setdefault(client, TransportStats())
+            setattr(stats, field, getattr(stats, field) + 1)
+        if field == 'requests':
+            _http_requests.inc(client=client)
+        elif field == 'retries':
+            _http_retries.inc(client=client)
+        else:
+            _http_connections.inc(client=client)
+
+
+_transport: Optional[HttpTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> HttpTransport:
+    """Obtiene el transporte HTTP compartido de la aplicación."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = HttpTransport()
+        return _transport
+
+
+def get_session(client: str, **kwargs) -> TransportSession:
+    """
+    Crea una sesión sobre el transporte compartido.
+
+    Args:
+        client: Nombre del cliente en las métricas
+        **kwargs: Argumentos de `HttpTransport.session`
+
+    Returns:
+        Sesión de requests lista para usar
+    """
+    return get_transport().session(client, **kwargs)
@@ -0,0 +1,333 @@
+"""
+Capa de ingesta de frames enviados por los móviles.
+"""
+
+import base64
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from src.camera.codec import get_codec
+from src.camera.decode_pool import DecodePool
+from src.camera.frame_bus import FrameSlot
+from src.network.jitter_buffer import BufferedFrame, JitterBuffer, JitterConfig, JitterStats
+from src.network.rate_control import RateControlConfig, RateController
+from src.network.traffic_capture import TrafficRecorder
+from src.utils.metrics import get_registry
+
+
+_metrics = get_registry()
+_frames_received = _metrics.counter(
+    "camera_frames_received_total", "Frames recibidos por dispositivo", ("device",))
+_bytes_received = _metrics.counter(
+    "camera_bytes_received_total", "Bytes de frames recibidos por dispositivo", ("device",))
+_frames_published = _metrics.counter(
+    "camera_frames_published_total", "Frames decodificados y publicados", ("device",))
+_frames_dropped = _metrics.counter(
+    "camera_frames_dropped_total", "Frames descartados antes de publicarse", ("device", "reason"))
+_decode_seconds = _metrics.histogram(
+    "camera_decode_seconds", "Latencia de decodificación JPEG", ("device",))
+_device_fps = _metrics.gauge(
+    "camera_device_fps", "Tasa de llegada medida por dispositivo", ("device",))
+_target_fps = _metrics.gauge(
+    "camera_target_fps", "Fps pedidos al dispositivo por el control de tasa", ("device",))
+_queue_depth = _metrics.gauge(
+    "camera_queue_depth", "Frames pendientes por dispositivo y etapa", ("device", "stage"))
+
+
+class FrameIngest:
+    """
+    Recibe frames comprimidos, los reordena por dispositivo y publica el
+    resultado decodificado en un FrameSlot.
+
+    La decodificación se hace en un DecodePool, no en el hilo HTTP que
+    recibió el frame.
+    """
+
+    def __init__(self, frame_slot: FrameSlot, target_size: Optional[Tuple[int, int]] = None,
+                 jitter_config: Optional[JitterConfig] = None,
+                 rate_config: Optional[RateControlConfig] = None,
+                 decode_workers: Optional[int] = None,
+                 capture_path: Optional[str] = None):
+        """
+        Inicializa la capa de ingesta.
+
+        Args:
+            frame_slot: Slot donde se publican los frames decodificados
+            target_size: Tamaño (ancho, alto) de los frames publicados, o None
+                para resolución completa (se usa decodificación escalada)
+            jitter_config: Configuración del buffer de jitter
+            rate_config: Configuración del control de tasa de los emisores
+            decode_workers: Hilos de decodificación (núcleos de CPU si es None)
+            capture_path: Ruta donde capturar el tráfico recibido (None = sin captura)
+        """
+        self.frame_slot = frame_slot
+        self.target_size = target_size
+        self.jitter_config = jitter_config or JitterConfig()
+        self.rate_controller = RateController(rate_config)
+        self.codec = get_codec()
+        self.decode_pool = DecodePool(decode_workers)
+        self.logger = logging.getLogger(__name__)
+
+        self.current_frame: Optional[np.ndarray] = None
+        self.current_jpeg: Optional[bytes] = None
+        self.frame_count = 0
+
+        self._buffers: Dict[str, JitterBuffer] = {}
+        self._lock = threading.Lock()
+        self._deliver_lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._flush_thread: Optional[threading.Thread] = None
+
+        self.capture: Optional[TrafficRecorder] = None
+        if capture_path:
+            self.start_capture(capture_path)
+
+        _device_fps.set_function(self._metric_device_fps)
+        _target_fps.set_function(self._metric_target_fps)
+        _queue_depth.set_function(self._metric_queue_depth)
+        _frames_dropped.set_function(self._metric_jitter_drops)
+
+    def submit(self, frame_data: Union[str, bytes], timestamp: Optional[float] = None,
+               frame_number: Optional[int] = None, device_id: str = "") -> bool:
+        """
+        Entrega un frame recibido a la capa de ingesta.
+
+        Args:
+            frame_data: Frame en base64 (con o sin prefijo data URL) o JPEG en bytes
+            timestamp: Timestamp del emisor en milisegundos
+            frame_number: Número de frame del emisor
+            device_id: Identificador del dispositivo de origen
+
+        Returns:
+            True si el frame fue aceptado
+        """
+        if not frame_data:
+            return False
+
+        self.rate_controller.record_arrival(device_id)
+        _frames_received.inc(device=device_id)
+        _bytes_received.inc(len(frame_data), device=device_id)
+
+        capture = self.capture
+        if capture is not None:
+            capture.record(frame_data, timestamp, frame_number, device_id)
+
+        self.enqueue(frame_data, timestamp, frame_number, device_id)
+        return True
+
+    def enqueue(self, frame_data: Union[str, bytes], timestamp: Optional[float] = None,
+                frame_number: Optional[int] = None, device_id: str = "") -> None:
+        """
+        Pasa un frame por el buffer de jitter y el pool de decodificación.
+
+        A diferencia de `submit`, no cuenta la llegada ni la captura: lo
+        usa la ingesta multiproceso con los frames que ya registraron los
+        workers.
+
+        Args:
+            frame_data: Frame en base64 (con o sin prefijo data URL) o JPEG en bytes
+            timestamp: Timestamp del emisor en milisegundos
+            frame_number: Número de frame del emisor
+            device_id: Identificador del dispositivo de origen
+        """
+        if frame_number is None or not self.jitter_config.enabled:
+            self._deliver([BufferedFrame(frame_number or 0, timestamp, payload=frame_data)], device_id)
+            return
+
+        buffer = self._get_buffer(device_id)
+        with self._deliver_lock:
+            released = buffer.push(int(frame_number), timestamp, frame_data)
+            self._deliver(released, device_id)
+
+        if buffer.next_deadline() is not None:
+            self._ensure_flush_thread()
+            self._wakeup.set()
+
+    def start_capture(self, path: str) -> None:
+        """
+        Empieza a capturar los frames recibidos para reproducirlos después.
+
+        Args:
+            path: Ruta base de la captura (ver traffic_capture)
+        """
+        self.stop_capture()
+        self.capture = TrafficRecorder(path)
+        self.logger.info(f"Capturando el tráfico de ingesta en {path}")
+
+    def stop_capture(self) -> None:
+        """Cierra la captura en curso, si la hay."""
+        capture, self.capture = self.capture, None
+        if capture is not None:
+            capture.close()
+
+    def control_for(self, device_id: str) -> Dict[str, Any]:
+        """
+        Calcula los parámetros de envío que se devuelven al móvil en el ack.
+
+        Args:
+            device_id: Identificador del dispositivo
+
+        Returns:
+            Diccionario con fps, width, height y quality objetivo
+        """
+        with self._lock:
+            buffer = self._buffers.get(device_id)
+        queue_depth = buffer.pending if buffer is not None else 0
+        queue_depth += self.decode_pool.pending_for(device_id)
+        return self.rate_controller.update(device_id, queue_depth).to_dict()
+
+    def publish_decoded(self, frame: np.ndarray, timestamp: Optional[float] = None,
+                        frame_number: Optional[int] = None, device_id: str = "",
+                        jpeg: Optional[bytes] = None,
+                        decode_seconds: Optional[float] = None) -> None:
+        """
+        Publica un frame ya decodificado (p. ej. por otro proceso o etapa).
+
+        Args:
+            frame: Frame decodificado al tamaño de publicación
+            timestamp: Timestamp del emisor en milisegundos
+            frame_number: Número de frame del emisor
+            device_id: Identificador del dispositivo de origen
+            jpeg: JPEG original, si está disponible sin copiarlo
+            decode_seconds: Tiempo de decodificación para el control de tasa
+        """
+        if decode_seconds is not None:
+            self.rate_controller.record_decode(device_id, decode_seconds)
+            _decode_seconds.observe(decode_seconds, device=device_id)
+        _frames_published.inc(device=device_id)
+        with self._publish_lock:
+            self.current_frame = frame
+            self.current_jpeg = jpeg
+            self.frame_count += 1
+        self.frame_slot.publish(frame, timestamp=timestamp, frame_number=frame_number or 0,
+                                device_id=device_id, jpeg=jpeg)
+
+    def get_stats(self) -> Dict[str, JitterStats]:
+        """Obtiene los contadores del buffer de jitter por dispositivo."""
+        with self._lock:
+            buffers = dict(self._buffers)
+        return {device_id: buffer.get_stats() for device_id, buffer in buffers.items()}
+
+    def get_totals(self) -> JitterStats:
+        """Obtiene los contadores agregados de todos los dispositivos."""
+        totals = JitterStats()
+        for stats in self.get_stats().values():
+            totals.merge(stats)
+        return totals
+
+    def close(self) -> None:
+        """Detiene el hilo de vaciado, el pool de decodificación y la captura."""
+        self._stop_event.set()
+        self._wakeup.set()
+        self.decode_pool.close()
+        self.stop_capture()
+
+    def _get_buffer(self, device_id: str) -> JitterBuffer:
+        """Obtiene (o crea) el buffer de jitter de un dispositivo."""
+        with self._lock:
+            buffer = self._buffers.get(device_id)
+            if buffer is None:
+                buffer = JitterBuffer(self.jitter_config)
+                self._buffers[device_id] = buffer
+            return buffer
+
+    def _deliver(self, released, device_id: str) -> None:
+        """
+        Envía los frames liberados al pool de decodificación.
+
+        Solo se decodifica el más reciente de cada lote: los consumidores
+        coalescen igualmente al último frame. El pool descarta además los
+        frames del dispositivo que aún no empezaron a decodificarse.
+        """
+        if released:
+            if len(released) > 1:
+                _frames_dropped.inc(len(released) - 1, device=device_id, reason="superseded")
+            self.decode_pool.submit(device_id, self._decode_and_publish, released[-1], device_id)
+
+    def _decode_and_publish(self, item: BufferedFrame, device_id: str) -> bool:
+        """Decodifica un frame y lo publica en el slot."""
+        try:
+            started = time.perf_counter()
+            img_data = item.payload
+            if isinstance(img_data, str):
+                if img_data.startswith('data:image'):
+                    img_data = img_data.split(',', 1)[1]
+                img_data = base64.b64decode(img_data)
+
+            frame = self.codec.decode_to_size(img_data, self.target_size)
+            if frame is None:
+                return False
+
+            self.publish_decoded(frame, item.timestamp, item.frame_number, device_id,
+                                 jpeg=img_data, decode_seconds=time.perf_counter() - started)
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Error procesando frame: {e}")
+            return False
+
+    def _metric_device_fps(self) -> Dict[Tuple[str], float]:
+        """Tasa de llegada por dispositivo para /metrics."""
+        values = {}
+        for device_id in self.rate_controller.device_ids():
+            state = self.rate_controller.get_state(device_id)
+            if state is not None:
+                values[(device_id,)] = state.arrival_fps
+        return values
+
+    def _metric_target_fps(self) -> Dict[Tuple[str], float]:
+        """Fps objetivo por dispositivo para /metrics."""
+        values = {}
+        for device_id in self.rate_controller.device_ids():
+            state = self.rate_controller.get_state(device_id)
+            if state is not None:
+                values[(device_id,)] = state.target.fps
+        return values
+
+    def _metric_queue_depth(self) -> Dict[Tuple[str, str], float]:
+        """Profundidad del buffer de jitter y del pool por dispositivo para /metrics."""
+        with self._lock:
+            buffers = dict(self._buffers)
+        values = {}
+        for device_id, buffer in buffers.items():
+            values[(device_id, "jitter")] = buffer.pending
+            values[(device_id, "decode")] = self.decode_pool.pending_for(device_id)
+        return values
+
+    def _metric_jitter_drops(self) -> Dict[Tuple[str, str], float]:
+        """Frames descartados por el buffer de jitter (tardíos o duplicados)."""
+        values = {}
+        for device_id, stats in self.get_stats().items():
+            values[(device_id, "late")] = stats.late
+            values[(device_id, "duplicate")] = stats.dropped - stats.late
+        return values
+
+    def _ensure_flush_thread(self) -> None:
+        """Arranca el hilo que libera frames retenidos cuando vence su espera."""
+        with self._lock:
+            if self._flush_thread is None or not self._flush_thread.is_alive():
+                self._stop_event.clear()
+                self._flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+                self._flush_thread.start()
+
+    def _flush_loop(self) -> None:
+        """Espera al próximo vencimiento y libera los frames retenidos."""
+        while not self._stop_event.is_set():
+            with self._lock:
+                buffers = list(self._buffers.items())
+
+            deadlines = [d for d in (buffer.next_deadline() for _, buffer in buffers) if d is not None]
+            timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+            for device_id, buffer in buffers:
+                with self._deliver_lock:
+                    self._deliver(buffer.poll(), device_id)
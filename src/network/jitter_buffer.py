@@ -0,0 +1,211 @@
+"""
+Buffer de jitter para reordenar frames recibidos fuera de orden.
+"""
+
+import heapq
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+
+@dataclass
+class JitterConfig:
+    """Configuración del buffer de jitter."""
+    enabled: bool = True
+    min_delay_ms: float = 20.0
+    max_delay_ms: float = 200.0
+    max_frames: int = 8
+    jitter_factor: float = 3.0
+
+
+@dataclass
+class JitterStats:
+    """Contadores del buffer de jitter."""
+    received: int = 0
+    released: int = 0
+    late: int = 0
+    dropped: int = 0
+    reordered: int = 0
+    jitter_ms: float = 0.0
+    delay_ms: float = 0.0
+
+    def merge(self, other: "JitterStats") -> None:
+        """Acumula los contadores de otro buffer."""
+        self.received += other.received
+        self.released += other.released
+        self.late += other.late
+        self.dropped += other.dropped
+        self.reordered += other.reordered
+        self.jitter_ms = max(self.jitter_ms, other.jitter_ms)
+        self.delay_ms = max(self.delay_ms, other.delay_ms)
+
+
+@dataclass(order=True)
+class BufferedFrame:
+    """Frame retenido en el buffer, ordenado por número de frame."""
+    frame_number: int
+    timestamp: Optional[float] = field(compare=False, default=None)
+    arrival: float = field(compare=False, default=0.0)
+    payload: Any = field(compare=False, default=None)
+
+
+class JitterBuffer:
+    """
+    Buffer de jitter adaptativo por número de frame.
+
+    Los frames contiguos se liberan de inmediato; cuando falta un frame,
+    los siguientes se retienen como máximo el retardo objetivo, que se
+    calcula a partir del jitter de llegada medido (estimador de RFC 3550).
+    En redes sin jitter el retardo se queda en el mínimo configurado y los
+    frames contiguos no esperan nada.
+    """
+
+    def __init__(self, config: Optional[JitterConfig] = None):
+        """
+        Inicializa el buffer.
+
+        Args:
+            config: Configuración del buffer (valores por defecto si es None)
+        """
+        self.config = config or JitterConfig()
+        self.stats = JitterStats()
+
+        self._lock = threading.Lock()
+        self._heap: List[BufferedFrame] = []
+        self._pending_numbers = set()
+        self._last_released: Optional[int] = None
+        self._last_released_ts: Optional[float] = None
+        self._highest_seen: Optional[int] = None
+        self._prev_arrival: Optional[float] = None
+        self._prev_timestamp: Optional[float] = None
+        self._jitter_ms = 0.0
+
+    @property
+    def target_delay(self) -> float:
+        """Retardo objetivo actual en segundos."""
+        delay_ms = self.config.jitter_factor * self._jitter_ms
+        delay_ms = min(max(delay_ms, self.config.min_delay_ms), self.config.max_delay_ms)
+        return delay_ms / 1000.0
+
+    @property
+    def pending(self) -> int:
+        """Número de frames retenidos a la espera de ser liberados."""
+        return len(self._heap)
+
+    def push(self, frame_number: int, timestamp: Optional[float], payload: Any,
+             arrival: Optional[float] = None) -> List[BufferedFrame]:
+        """
+        Inserta un frame y devuelve los frames listos para mostrar, en orden.
+
+        Args:
+            frame_number: Número de frame del emisor
+            timestamp: Timestamp del emisor en milisegundos
+            payload: Datos del frame (sin decodificar)
+            arrival: Momento de llegada (time.monotonic() si es None)
+
+        Returns:
+            Lista de frames liberados en orden creciente
+        """
+        if arrival is None:
+            arrival = time.monotonic()
+
+        with self._lock:
+            self.stats.received += 1
+            self._update_jitter(arrival, timestamp)
+
+            if self._last_released is not None and frame_number <= self._last_released:
+                if (timestamp is not None and self._last_released_ts is not None
+                        and timestamp > self._last_released_ts):
+                    # Numeración reiniciada con reloj más nuevo: el emisor se reinició
+                    self._reset_sequence()
+                else:
+                    self.stats.late += 1
+                    self.stats.dropped += 1
+                    return []
+
+            if frame_number in self._pending_numbers:
+                self.stats.dropped += 1
+                return []
+
+            if self._highest_seen is not None and frame_number < self._highest_seen:
+                self.stats.reordered += 1
+            if self._highest_seen is None or frame_number > self._highest_seen:
+                self._highest_seen = frame_number
+
+            heapq.heappush(self._heap, BufferedFrame(frame_number, timestamp, arrival, payload))
+            self._pending_numbers.add(frame_number)
+
+            return self._release(arrival)
+
+    def poll(self, now: Optional[float] = None) -> List[BufferedFrame]:
+        """
+        Libera los frames cuyo tiempo de espera expiró.
+
+        Args:
+            now: Momento actual (time.monotonic() si es None)
+
+        Returns:
+            Lista de frames liberados en orden creciente
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            return self._release(now)
+
+    def next_deadline(self) -> Optional[float]:
+        """Momento (monotónico) en que expira el frame retenido más antiguo."""
+        with self._lock:
+            if not self._heap:
+                return None
+            return self._heap[0].arrival + self.target_delay
+
+    def get_stats(self) -> JitterStats:
+        """Obtiene una copia de los contadores actuales."""
+        with self._lock:
+            stats = JitterStats(**vars(self.stats))
+            stats.jitter_ms = self._jitter_ms
+            stats.delay_ms = self.target_delay * 1000.0
+            return stats
+
+    def _release(self, now: float) -> List[BufferedFrame]:
+        """Extrae los frames contiguos o vencidos (requiere el lock)."""
+        released = []
+        delay = self.target_delay
+
+        while self._heap:
+            head = self._heap[0]
+            contiguous = self._last_released is None or head.frame_number == self._last_released + 1
+            expired = now - head.arrival >= delay
+            overflow = len(self._heap) > self.config.max_frames
+
+            if not (contiguous or expired or overflow):
+                break
+
+            heapq.heappop(self._heap)
+            self._pending_numbers.discard(head.frame_number)
+            self._last_released = head.frame_number
+            if head.timestamp is not None:
+                self._last_released_ts = head.timestamp
+            self.stats.released += 1
+            released.append(head)
+
+        return released
+
+    def _update_jitter(self, arrival: float, timestamp: Optional[float]) -> None:
+        """Actualiza el estimador de jitter entre llegadas (requiere el lock)."""
+        if timestamp is None:
+            return
+        if self._prev_arrival is not None and self._prev_timestamp is not None:
+            transit_delta = (arrival - self._prev_arrival) * 1000.0 - (timestamp - self._prev_timestamp)
+            self._jitter_ms += (abs(transit_delta) - self._jitter_ms) / 16.0
+        self._prev_arrival = arrival
+        self._prev_timestamp = timestamp
+
+    def _reset_sequence(self) -> None:
+        """Descarta el estado de numeración tras un reinicio del emisor."""
+        self._heap.clear()
+        self._pending_numbers.clear()
+        self._last_released = None
+        self._last_released_ts = None
+        self._highest_seen = None
@@ -0,0 +1,288 @@
+"""
+Retransmisión MJPEG del último frame a múltiples visores.
+"""
+
+import asyncio
+import logging
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict, Optional, Set
+
+from src.camera.codec import get_codec
+from src.camera.encoded_cache import EncodedFrameCache
+from src.camera.frame_bus import FrameSlot
+
+
+BOUNDARY = "frame"
+
+# Buffer de envío del kernel por visor: acotarlo hace que un visor lento
+# se detecte en el buffer del transporte en lugar de acumular segundos de vídeo
+SEND_BUFFER_BYTES = 128 * 1024
+
+
+class StreamingHTTPServer(HTTPServer):
+    """
+    HTTPServer que permite ceder conexiones a otro propietario.
+
+    Las conexiones cedidas (p. ej. visores MJPEG) no se cierran al terminar
+    el handler: las gestiona el bucle de eventos del retransmisor.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._detached: Set[socket.socket] = set()
+        self._detached_lock = threading.Lock()
+
+    def detach_request(self, request: socket.socket) -> None:
+        """Marca una conexión como cedida para que el servidor no la cierre."""
+        with self._detached_lock:
+            self._detached.add(request)
+
+    def shutdown_request(self, request: socket.socket) -> None:
+        """Cierra la conexión salvo que haya sido cedida."""
+        with self._detached_lock:
+            if request in self._detached:
+                self._detached.discard(request)
+                return
+        super().shutdown_request(request)
+
+
+class _Viewer:
+    """Estado de un visor conectado al stream."""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.wakeup = asyncio.Event()
+        self.frames_sent = 0
+        self.frames_skipped = 0
+
+
+class MjpegBroadcaster:
+    """
+    Difunde el último JPEG a cualquier número de visores MJPEG.
+
+    Cada frame se empaqueta una sola vez (se reutiliza el JPEG original del
+    móvil cuando existe) y el mismo buffer se escribe a todos los visores
+    desde un único bucle asyncio. Un visor lento no frena a los demás: si su
+    buffer de escritura supera el límite se le saltan frames.
+    """
+
+    def __init__(self, frame_slot: FrameSlot, max_viewers: int = 32,
+                 max_buffered_bytes: int = 256 * 1024, quality: int = 85,
+                 encoded_cache: Optional[EncodedFrameCache] = None):
+        """
+        Inicializa el retransmisor.
+
+        Args:
+            frame_slot: Slot del que se leen los frames
+            max_viewers: Número máximo de visores simultáneos
+            max_buffered_bytes: Bytes pendientes a partir de los que se saltan frames
+            quality: Calidad JPEG para frames que no llegaron comprimidos
+            encoded_cache: Caché compartida de frames codificados (opcional)
+        """
+        self.frame_slot = frame_slot
+        self.max_viewers = max_viewers
+        self.max_buffered_bytes = max_buffered_bytes
+        self.quality = quality
+        self.encoded_cache = encoded_cache
+        self.codec = get_codec()
+        self.logger = logging.getLogger(__name__)
+
+        self.latest_jpeg: Optional[bytes] = None
+        self.frames_encoded = 0
+        self.frames_sent = 0
+        self.frames_skipped = 0
+
+        self._chunk: Optional[bytes] = None
+        self._viewers: Set[_Viewer] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._source_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def viewer_count(self) -> int:
+        """Número de visores conectados."""
+        return len(self._viewers)
+
+    def start(self) -> None:
+        """Arranca el bucle de eventos y el hilo que lee del slot."""
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._stop_event.clear()
+            self._loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+            self._loop_thread.start()
+            self._source_thread = threading.Thread(target=self._source_loop, daemon=True)
+            self._source_thread.start()
+
+    def stop(self) -> None:
+        """Desconecta a los visores y detiene el bucle de eventos."""
+        with self._lock:
+            loop = self._loop
+            self._loop = None
+        if loop is None:
+            return
+
+        self._stop_event.set()
+        asyncio.run_coroutine_threadsafe(self._close_viewers(), loop).result(timeout=2)
+        loop.call_soon_threadsafe(loop.stop)
+        if self._loop_thread:
+            self._loop_thread.join(timeout=2)
+        loop.close()
+
+    def serve_snapshot(self, handler: BaseHTTPRequestHandler) -> None:
+        """
+        Responde con el último JPEG (GET /snapshot.jpg).
+
+        Args:
+            handler: Handler HTTP de la petición
+        """
+        jpeg = self.latest_jpeg
+        if jpeg is None:
+            handler.send_error(503, 'No frame available')
+            return
+
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'image/jpeg')
+        handler.send_header('Content-Length', str(len(jpeg)))
+        handler.send_header('Cache-Control', 'no-cache')
+        handler.send_header('Access-Control-Allow-Origin', '*')
+        handler.end_headers()
+        handler.wfile.write(jpeg)
+
+    def serve_stream(self, handler: BaseHTTPRequestHandler) -> None:
+        """
+        Cede la conexión al bucle de eventos como visor MJPEG (GET /stream.mjpg).
+
+        Args:
+            handler: Handler HTTP de la petición (su servidor debe ser un
+                StreamingHTTPServer)
+        """
+        loop = self._loop
+        if loop is None or not isinstance(handler.server, StreamingHTTPServer):
+            handler.send_error(503, 'Stream not available')
+            return
+        if self.viewer_count >= self.max_viewers:
+            handler.send_error(503, 'Too many viewers')
+            return
+
+        handler.send_response(200)
+        handler.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+        handler.send_header('Cache-Control', 'no-cache, private')
+        handler.send_header('Pragma', 'no-cache')
+        handler.send_header('Connection', 'close')
+        handler.send_header('Access-Control-Allow-Origin', '*')
+        handler.end_headers()
+        handler.wfile.flush()
+
+        handler.close_connection = True
+        handler.server.detach_request(handler.connection)
+        asyncio.run_coroutine_threadsafe(self._serve_viewer(handler.connection), loop)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Obtiene las estadísticas acumuladas de la retransmisión."""
+        return {
+            'viewers': self.viewer_count,
+            'frames_encoded': self.frames_encoded,
+            'frames_sent': self.frames_sent,
+            'frames_skipped': self.frames_skipped,
+        }
+
+    def _source_loop(self) -> None:
+        """Empaqueta cada frame nuevo una vez y lo entrega al bucle de eventos."""
+        last_sequence = 0
+        while not self._stop_event.is_set():
+            packet = self.frame_slot.wait_for_next(last_sequence, timeout=1.0)
+            if packet is None:
+                continue
+            last_sequence = packet.sequence
+
+            jpeg = packet.jpeg
+            if jpeg is None:
+                if self.encoded_cache is not None:
+                    jpeg = self.encoded_cache.get(packet, 'jpeg', self.quality)
+                else:
+                    jpeg = self.codec.encode(packet.frame, quality=self.quality)
+                if jpeg is None:
+                    continue
+                self.frames_encoded += 1
+
+            self.latest_jpeg = jpeg
+            chunk = b''.join((
+                f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                f"Content-Length: {len(jpeg)}\r\n\r\n".encode('ascii'),
+                jpeg,
+                b"\r\n",
+            ))
+
+            loop = self._loop
+            if loop is not None:
+                try:
+                    loop.call_soon_threadsafe(self._broadcast, chunk)
+                except RuntimeError:
+                    break
+
+    def _broadcast(self, chunk: bytes) -> None:
+        """Publica un frame empaquetado y despierta a los visores (en el bucle)."""
+        self._chunk = chunk
+        for viewer in self._viewers:
+            viewer.wakeup.set()
+
+    async def _serve_viewer(self, sock: socket.socket) -> None:
+        """Envía frames a un visor hasta que se desconecte."""
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER_BYTES)
+            sock.setblocking(False)
+            reader, writer = await asyncio.open_connection(sock=sock)
+        except OSError as e:
+            self.logger.debug(f"No se pudo adoptar la conexión del visor: {e}")
+            sock.close()
+            return
+
+        viewer = _Viewer(writer)
+        self._viewers.add(viewer)
+        eof_task = asyncio.ensure_future(self._watch_disconnect(reader, viewer))
+        if self._chunk is not None:
+            viewer.wakeup.set()
+
+        try:
+            while not writer.is_closing():
+                await viewer.wakeup.wait()
+                viewer.wakeup.clear()
+                chunk = self._chunk
+                if chunk is None or writer.is_closing():
+                    continue
+
+                # Visor lento: saltar el frame en lugar de acumular
+                if writer.transport.get_write_buffer_size() > self.max_buffered_bytes:
+                    viewer.frames_skipped += 1
+                    self.frames_skipped += 1
+                    continue
+
+                writer.write(chunk)
+                viewer.frames_sent += 1
+                self.frames_sent += 1
+        finally:
+            self._viewers.discard(viewer)
+            eof_task.cancel()
+            writer.close()
+
+    async def _watch_disconnect(self, reader: asyncio.StreamReader, viewer: _Viewer) -> None:
+        """Detecta la desconexión del visor aunque no lleguen frames."""
+        try:
+            while await reader.read(1024):
+                pass
+        except (ConnectionError, OSError):
+            pass
+        viewer.writer.close()
+        viewer.wakeup.set()
+
+    async def _close_viewers(self) -> None:
+        """Cierra todas las conexiones de visores."""
+        for viewer in list(self._viewers):
+            viewer.writer.close()
+            viewer.wakeup.set()
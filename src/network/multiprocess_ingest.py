@@ -0,0 +1,379 @@
+"""
+Modo de ingesta multiproceso: workers con SO_REUSEPORT y bus en memoria compartida.
+"""
+
+import base64
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+from typing import List, Optional, Type, Union
+
+from src.camera.frame_bus import FrameSlot
+from src.network.frame_request import FrameRequestParser
+from src.network.ingest import FrameIngest
+from src.network.mjpeg_server import MjpegBroadcaster, StreamingHTTPServer
+from src.network.rate_control import RateTarget
+from src.network.shm_ring import SharedControlTable, SharedFrameRing
+from src.network.traffic_capture import TrafficRecorder, capture_path_from_env
+from src.utils.metrics import get_registry, metrics_port_from_env, start_metrics_server
+
+
+HAS_REUSEPORT = hasattr(socket, "SO_REUSEPORT")
+
+_metrics = get_registry()
+_frames_received = _metrics.counter(
+    "camera_frames_received_total", "Frames recibidos por dispositivo", ("device",))
+_bytes_received = _metrics.counter(
+    "camera_bytes_received_total", "Bytes de frames recibidos por dispositivo", ("device",))
+_frames_dropped = _metrics.counter(
+    "camera_frames_dropped_total", "Frames descartados antes de publicarse", ("device", "reason"))
+
+
+def ingest_workers_from_env(default: int = 0) -> int:
+    """
+    Lee el número de procesos worker de la variable INGEST_WORKERS.
+
+    Args:
+        default: Valor si la variable no está definida o no es válida
+
+    Returns:
+        Número de workers (0 = ingesta en el propio proceso)
+    """
+    try:
+        return max(0, int(os.environ.get("INGEST_WORKERS", default)))
+    except ValueError:
+        return default
+
+
+class ReusePortHTTPServer(StreamingHTTPServer):
+    """Servidor HTTP que comparte el puerto con otros procesos (SO_REUSEPORT)."""
+
+    def server_bind(self):
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+
+class _WorkerRateControl:
+    """
+    Control de tasa del worker (expuesto como `ingest` a los handlers).
+
+    Cada worker solo ve una parte de las llegadas y nada de la
+    decodificación, así que no decide: lee el objetivo que calcula el
+    proceso principal y publica en la tabla compartida.
+    """
+
+    def __init__(self, controls: SharedControlTable):
+        self.controls = controls
+
+    def control_for(self, device_id: str):
+        """Lee los parámetros de envío del dispositivo (los iniciales si aún no hay)."""
+        return self.controls.lookup(device_id) or RateTarget().to_dict()
+
+
+class WorkerContext:
+    """
+    Sustituye a la app/receptor dentro de un proceso worker.
+
+    Ofrece la misma interfaz que usan los handlers (request_parser,
+    process_frame, ingest.control_for y broadcaster), pero en lugar de
+    decodificar escribe el JPEG en el anillo de memoria compartida.
+    """
+
+    def __init__(self, ring: SharedFrameRing, controls: SharedControlTable, condition,
+                 index: int = 0):
+        """
+        Inicializa el contexto del worker.
+
+        Args:
+            ring: Anillo compartido donde se publican los frames
+            controls: Tabla de objetivos de envío que publica el proceso principal
+            condition: Condition entre procesos que protege la escritura
+            index: Índice del worker (sufijo de su fichero de captura)
+        """
+        self.ring = ring
+        self.condition = condition
+        self.request_parser = FrameRequestParser()
+        self.ingest = _WorkerRateControl(controls)
+        self.frame_slot = FrameSlot()
+        self.broadcaster = MjpegBroadcaster(self.frame_slot)
+        self.logger = logging.getLogger(__name__)
+        self._stop_event = threading.Event()
+
+        # Con INGEST_CAPTURE cada worker captura en su propio fichero
+        capture_path = capture_path_from_env()
+        self.capture = TrafficRecorder(f"{capture_path}.worker{index}") if capture_path else None
+
+    def process_frame(self, frame_data: Union[str, bytes], timestamp: Optional[float] = None,
+                      frame_number: Optional[int] = None, device_id: str = "") -> bool:
+        """Escribe el frame comprimido en el anillo y despierta a los lectores."""
+        if isinstance(frame_data, str):
+            if frame_data.startswith('data:image'):
+                frame_data = frame_data.split(',', 1)[1]
+            frame_data = base64.b64decode(frame_data)
+        if not frame_data:
+            return False
+
+        _frames_received.inc(device=device_id)
+        _bytes_received.inc(len(frame_data), device=device_id)
+        if self.capture is not None:
+            self.capture.record(frame_data, timestamp, frame_number, device_id)
+        try:
+            with self.condition:
+                self.ring.write(frame_data, timestamp, frame_number, device_id)
+                self.condition.notify_all()
+        except ValueError as e:
+            self.logger.warning(str(e))
+            _frames_dropped.inc(device=device_id, reason="oversize")
+            return False
+        return True
+
+    def start_mirror(self) -> None:
+        """Copia los frames del anillo al slot local para servir MJPEG desde el worker."""
+        self.broadcaster.start()
+        threading.Thread(target=self._mirror_loop, daemon=True).start()
+
+    def _mirror_loop(self) -> None:
+        """Publica en el slot local cada frame nuevo del anillo (solo bytes JPEG)."""
+        last_sequence = self.ring.sequence
+        while not self._stop_event.is_set():
+            with self.condition:
+                self.condition.wait_for(lambda: self.ring.sequence > last_sequence, 1.0)
+            sequence = self.ring.sequence
+            if sequence <= last_sequence:
+                continue
+            last_sequence = sequence
+
+            entry = self.ring.read(sequence)
+            if entry is None:
+                continue
+            jpeg = bytes(entry.payload)
+            entry.payload.release()
+            if self.ring.is_valid(entry):
+                self.frame_slot.publish(None, timestamp=entry.timestamp,
+                                        frame_number=entry.frame_number or 0,
+                                        device_id=entry.device_id, jpeg=jpeg)
+
+
+def _worker_main(handler_class: Type, server_attr: str, port: int, ring_name: str,
+                 slots: int, slot_size: int, controls_name: str, condition,
+                 index: int = 0) -> None:
+    """Punto de entrada de un proceso worker."""
+    logging.basicConfig(level=logging.INFO)
+    # Cada scrape de /metrics lo atiende un worker cualquiera: sus series se distinguen por etiqueta
+    get_registry().set_constant_labels(worker=index)
+    ring = SharedFrameRing(ring_name, slots, slot_size, create=False)
+    controls = SharedControlTable(controls_name, create=False)
+    # terminate() envía SIGTERM: salir ordenadamente para cerrar la captura
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    context = WorkerContext(ring, controls, condition, index)
+    context.start_mirror()
+
+    server = ReusePortHTTPServer(('', port), handler_class)
+    setattr(server, server_attr, context)
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        if context.capture is not None:
+            context.capture.close()
+
+
+class MultiProcessIngest:
+    """
+    Ingesta con N procesos worker aceptando en el mismo puerto.
+
+    Cada worker parsea las peticiones y escribe el JPEG recibido en un
+    anillo de memoria compartida. Este proceso (UI y grabación) lee todos
+    los slots nuevos, descarta los que se reescribieron durante la lectura
+    y entrega cada JPEG al FrameIngest de la app por el mismo camino que
+    la ingesta en proceso (buffer de jitter y pool de decodificación por
+    dispositivo), de modo que UI, grabación y fotos no cambian. El
+    control de tasa también se calcula aquí y se publica a los workers en
+    una tabla compartida.
+    """
+
+    def __init__(self, handler_class: Type, server_attr: str, port: int, workers: int,
+                 ingest: FrameIngest, slots: int = 16, slot_size: int = 2 * 1024 * 1024):
+        """
+        Inicializa el modo multiproceso.
+
+        Args:
+            handler_class: Handler HTTP que usarán los workers
+            server_attr: Atributo del servidor con el que el handler accede
+                a la app ('app' o 'receiver')
+            port: Puerto compartido por los workers
+            workers: Número de procesos worker
+            ingest: Capa de ingesta de este proceso donde publicar los frames
+            slots: Número de slots del anillo compartido
+            slot_size: Bytes máximos por frame comprimido
+        """
+        self.handler_class = handler_class
+        self.server_attr = server_attr
+        self.port = port
+        self.workers = workers
+        self.ingest = ingest
+        self.slots = slots
+        self.slot_size = slot_size
+        self.logger = logging.getLogger(__name__)
+
+        self.frames_read = 0
+        self.torn_reads = 0
+        self.overruns = 0
+
+        self._ring: Optional[SharedFrameRing] = None
+        self._controls: Optional[SharedControlTable] = None
+        self._condition = None
+        self._processes: List[multiprocessing.Process] = []
+        self._reader_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._metrics_server = None
+
+    def start(self) -> None:
+        """
+        Crea el anillo, arranca los workers y el hilo lector.
+
+        Raises:
+            RuntimeError: Si la plataforma no soporta SO_REUSEPORT
+        """
+        if not HAS_REUSEPORT:
+            raise RuntimeError("SO_REUSEPORT no está disponible en esta plataforma")
+
+        # spawn: no heredar hilos de la UI en los workers
+        mp_context = multiprocessing.get_context("spawn")
+        self._ring = SharedFrameRing(slots=self.slots, slot_size=self.slot_size)
+        self._controls = SharedControlTable()
+        self._condition = mp_context.Condition()
+        self._stop_event.clear()
+
+        for index in range(self.workers):
+            process = mp_context.Process(
+                target=_worker_main,
+                args=(self.handler_class, self.server_attr, self.port, self._ring.name,
+                      self.slots, self.slot_size, self._controls.name, self._condition, index),
+                daemon=True
+            )
+            process.start()
+            self._processes.append(process)
+
+        self._reader_thread = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader_thread.start()
+
+        # Las métricas de este proceso (decodificación, grabación) van por el puerto lateral
+        metrics_port = metrics_port_from_env()
+        if metrics_port:
+            self._metrics_server = start_metrics_server(metrics_port)
+        self.logger.info(f"Ingesta multiproceso: {self.workers} workers en el puerto {self.port}")
+
+    def stop(self) -> None:
+        """Detiene los workers y libera la memoria compartida."""
+        self._stop_event.set()
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.join(timeout=2)
+        self._processes.clear()
+
+        if self._reader_thread:
+            self._reader_thread.join(timeout=2)
+            self._reader_thread = None
+        if self._ring:
+            self._ring.close()
+            self._ring = None
+        if self._controls:
+            self._controls.close()
+            self._controls = None
+        if self._metrics_server:
+            self._metrics_server.shutdown()
+            self._metrics_server.server_close()
+            self._metrics_server = None
+
+    def get_stats(self):
+        """Obtiene las estadísticas del lector del anillo."""
+        return {
+            'workers': sum(1 for process in self._processes if process.is_alive()),
+            'frames_read': self.frames_read,
+            'torn_reads': self.torn_reads,
+            'overruns': self.overruns,
+        }
+
+    def _read_loop(self) -> None:
+        """Pasa a la ingesta cada frame nuevo del anillo, de todos los dispositivos."""
+        ring = self._ring
+        condition = self._condition
+        last_sequence = 0
+
+        while not self._stop_event.is_set():
+            # Timeout en el acquire: un worker terminado a mitad de escritura
+            # puede dejar el lock tomado y no debe bloquear el cierre
+            if condition.acquire(timeout=1.0):
+                try:
+                    condition.wait_for(
+                        lambda: self._stop_event.is_set() or ring.sequence > last_sequence, 1.0
+                    )
+                finally:
+                    condition.release()
+            if self._stop_event.is_set():
+                break
+
+            last_sequence = self._drain(ring, last_sequence)
+
+    def _drain(self, ring: SharedFrameRing, last_sequence: int) -> int:
+        """
+        Lee los frames escritos desde `last_sequence`, los entrega a la
+        ingesta y publica el control de tasa de sus dispositivos.
+
+        No se coalesce aquí: cada dispositivo pasa por su buffer de jitter
+        y el pool de decodificación solo descarta frames del mismo
+        dispositivo, así que un emisor rápido no oculta a los demás.
+
+        Args:
+            ring: Anillo compartido
+            last_sequence: Última secuencia ya leída
+
+        Returns:
+            Nueva última secuencia leída
+        """
+        sequence = ring.sequence
+        if sequence <= last_sequence:
+            return last_sequence
+
+        # Los slots más antiguos que el tamaño del anillo ya se reescribieron
+        first = max(last_sequence + 1, sequence - ring.slots + 1)
+        if first > last_sequence + 1:
+            self.overruns += first - last_sequence - 1
+
+        devices = set()
+        for current in range(first, sequence + 1):
+            entry = ring.read(current)
+            if entry is None:
+                self.torn_reads += 1
+                continue
+
+            # Copia del JPEG: el slot puede reescribirse antes de que el
+            # pool lo decodifique
+            try:
+                jpeg = bytes(entry.payload)
+            finally:
+                entry.payload.release()
+            if not ring.is_valid(entry):
+                self.torn_reads += 1
+                _frames_dropped.inc(device=entry.device_id, reason="torn")
+                continue
+
+            self.frames_read += 1
+            self.ingest.rate_controller.record_arrival(entry.device_id)
+            self.ingest.enqueue(jpeg, entry.timestamp, entry.frame_number, entry.device_id)
+            devices.add(entry.device_id)
+
+        # El control de tasa se decide aquí, con las llegadas de todos los
+        # workers y la decodificación de este proceso; los workers lo leen
+        if self._controls is not None:
+            for device_id in devices:
+                self._controls.publish(device_id, self.ingest.control_for(device_id))
+        return sequence
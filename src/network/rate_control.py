@@ -0,0 +1,236 @@
+"""
+Control de tasa dirigido por el receptor para los emisores móviles.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass
+class RateTarget:
+    """Parámetros de envío que el receptor pide al móvil."""
+    fps: float = 10.0
+    width: int = 640
+    height: int = 480
+    quality: float = 0.8
+
+    def to_dict(self) -> Dict[str, float]:
+        """Convierte el objetivo al formato enviado en el ack."""
+        data = asdict(self)
+        data['fps'] = round(self.fps, 1)
+        data['quality'] = round(self.quality, 2)
+        return data
+
+
+@dataclass
+class RateControlConfig:
+    """Límites y parámetros del controlador de tasa."""
+    min_fps: float = 2.0
+    max_fps: float = 15.0
+    min_quality: float = 0.4
+    max_quality: float = 0.85
+    resolutions: List[Tuple[int, int]] = field(
+        default_factory=lambda: [(320, 240), (480, 360), (640, 480)]
+    )
+    decode_budget: float = 0.5
+    max_queue_depth: int = 2
+    link_ratio: float = 0.7
+    update_interval: float = 1.0
+    stable_updates: int = 3
+    idle_timeout: float = 5.0
+
+
+@dataclass
+class DeviceRateState:
+    """Mediciones y objetivo actual de un dispositivo."""
+    target: RateTarget
+    decode_ms: float = 0.0
+    arrival_fps: float = 0.0
+    queue_depth: int = 0
+    arrivals: int = 0
+    window_start: float = 0.0
+    last_update: float = 0.0
+    last_arrival: float = 0.0
+    stable_count: int = 0
+
+
+class RateController:
+    """
+    Controlador de lazo cerrado que ajusta fps, resolución y calidad JPEG.
+
+    Por cada dispositivo mide el tiempo de decodificación, la profundidad de
+    cola y la tasa real de llegada. Con sobrecarga de CPU (decodificación
+    fuera de presupuesto o cola creciente) baja primero la resolución y
+    luego los fps; si el enlace no entrega la tasa pedida baja primero la
+    calidad. Tras varias mediciones estables recupera en orden inverso.
+
+    Los dispositivos que llevan `idle_timeout` segundos sin enviar frames
+    se olvidan y dejan de contar en el reparto del presupuesto.
+    """
+
+    def __init__(self, config: Optional[RateControlConfig] = None):
+        """
+        Inicializa el controlador.
+
+        Args:
+            config: Configuración del controlador (valores por defecto si es None)
+        """
+        self.config = config or RateControlConfig()
+        self._devices: Dict[str, DeviceRateState] = {}
+        self._lock = threading.Lock()
+
+    def record_arrival(self, device_id: str, now: Optional[float] = None) -> None:
+        """
+        Registra la llegada de un frame.
+
+        Args:
+            device_id: Identificador del dispositivo
+            now: Momento de llegada (time.monotonic() si es None)
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            state = self._get_state(device_id, now)
+            state.arrivals += 1
+            state.last_arrival = now
+
+    def record_decode(self, device_id: str, seconds: float) -> None:
+        """
+        Registra el tiempo de decodificación de un frame.
+
+        Args:
+            device_id: Identificador del dispositivo
+            seconds: Tiempo empleado en decodificar
+        """
+        with self._lock:
+            state = self._get_state(device_id, time.monotonic())
+            millis = seconds * 1000.0
+            state.decode_ms = millis if state.decode_ms == 0.0 else state.decode_ms * 0.8 + millis * 0.2
+
+    def update(self, device_id: str, queue_depth: int = 0,
+               now: Optional[float] = None) -> RateTarget:
+        """
+        Recalcula (como mucho una vez por intervalo) el objetivo del dispositivo.
+
+        Args:
+            device_id: Identificador del dispositivo
+            queue_depth: Frames pendientes de ese dispositivo en el receptor
+            now: Momento actual (time.monotonic() si es None)
+
+        Returns:
+            Objetivo de envío vigente
+        """
+        if now is None:
+            now = time.monotonic()
+
+        with self._lock:
+            state = self._get_state(device_id, now)
+            state.queue_depth = queue_depth
+            elapsed = now - state.window_start
+
+            if elapsed < self.config.update_interval:
+                return RateTarget(**asdict(state.target))
+
+            state.arrival_fps = state.arrivals / elapsed
+            state.arrivals = 0
+            state.window_start = now
+            state.last_update = now
+
+            # Presupuesto de decodificación repartido entre dispositivos activos
+            self._expire_idle(now, keep=device_id)
+            active = max(1, len(self._devices))
+            budget_ms = 1000.0 / state.target.fps * self.config.decode_budget / active
+
+            overloaded = state.decode_ms > budget_ms or queue_depth > self.config.max_queue_depth
+            link_limited = state.arrival_fps < state.target.fps * self.config.link_ratio
+
+            if overloaded:
+                state.stable_count = 0
+                self._degrade_for_cpu(state.target)
+            elif link_limited:
+                state.stable_count = 0
+                self._degrade_for_link(state.target)
+            else:
+                state.stable_count += 1
+                if state.stable_count >= self.config.stable_updates:
+                    state.stable_count = 0
+                    self._improve(state.target)
+
+            return RateTarget(**asdict(state.target))
+
+    def get_state(self, device_id: str) -> Optional[DeviceRateState]:
+        """Obtiene el estado de control de un dispositivo."""
+        with self._lock:
+            return self._devices.get(device_id)
+
+    def device_ids(self) -> List[str]:
+        """Dispositivos con estado de control."""
+        with self._lock:
+            return list(self._devices)
+
+    def forget(self, device_id: str) -> None:
+        """Elimina el estado de un dispositivo desconectado."""
+        with self._lock:
+            self._devices.pop(device_id, None)
+
+    def _expire_idle(self, now: float, keep: str) -> None:
+        """Olvida los dispositivos sin frames recientes salvo `keep` (requiere el lock)."""
+        idle = [device_id for device_id, state in self._devices.items()
+                if device_id != keep and now - state.last_arrival > self.config.idle_timeout]
+        for device_id in idle:
+            del self._devices[device_id]
+
+    def _get_state(self, device_id: str, now: float) -> DeviceRateState:
+        """Obtiene (o crea) el estado de un dispositivo (requiere el lock)."""
+        state = self._devices.get(device_id)
+        if state is None:
+            width, height = self.config.resolutions[-1]
+            target = RateTarget(fps=min(10.0, self.config.max_fps), width=width, height=height,
+                                quality=min(0.8, self.config.max_quality))
+            state = DeviceRateState(target=target, window_start=now, last_update=now, last_arrival=now)
+            self._devices[device_id] = state
+        return state
+
+    def _resolution_index(self, target: RateTarget) -> int:
+        """Posición de la resolución actual en la escalera configurada."""
+        resolutions = self.config.resolutions
+        for index, (width, height) in enumerate(resolutions):
+            if (width, height) == (target.width, target.height):
+                return index
+        return len(resolutions) - 1
+
+    def _set_resolution(self, target: RateTarget, index: int) -> None:
+        """Aplica un escalón de la escalera de resoluciones."""
+        target.width, target.height = self.config.resolutions[index]
+
+    def _degrade_for_cpu(self, target: RateTarget) -> None:
+        """Reduce el coste de decodificación: resolución y después fps."""
+        index = self._resolution_index(target)
+        if index > 0:
+            self._set_resolution(target, index - 1)
+        else:
+            target.fps = max(self.config.min_fps, target.fps * 0.75)
+
+    def _degrade_for_link(self, target: RateTarget) -> None:
+        """Reduce los bytes por frame: calidad, resolución y después fps."""
+        if target.quality > self.config.min_quality:
+            target.quality = max(self.config.min_quality, target.quality - 0.1)
+            return
+        index = self._resolution_index(target)
+        if index > 0:
+            self._set_resolution(target, index - 1)
+        else:
+            target.fps = max(self.config.min_fps, target.fps * 0.75)
+
+    def _improve(self, target: RateTarget) -> None:
+        """Recupera calidad en orden inverso a la degradación."""
+        if target.fps < self.config.max_fps:
+            target.fps = min(self.config.max_fps, target.fps + 1.0)
+            return
+        index = self._resolution_index(target)
+        if index < len(self.config.resolutions) - 1:
+            self._set_resolution(target, index + 1)
+            return
+        target.quality = min(self.config.max_quality, target.quality + 0.05)
@@ -0,0 +1,961 @@
+"""
+Cliente del relay de frames (Cloudflare Worker).
+
+El relay guarda los últimos frames recibidos del móvil y los sirve en
+`GET /api/frames`. El cliente mantiene un cursor con el último número de
+frame visto y pide solo los posteriores (`?after=<frameNumber>`), y lee
+el array `frames` de la respuesta elemento a elemento mientras llega, sin
+materializar el documento completo.
+
+Además del polling, el relay puede entregar los frames por push: reteniendo
+la petición hasta que llegue un frame nuevo (long-poll, `?wait=<ms>`) o
+como Server-Sent Events en `GET /api/frames/stream`. El modo preferido
+es el long-poll de `GET /api/latest-frame.jpg`, que entrega el JPEG
+binario con los metadatos en cabeceras, sin JSON ni base64.
+`RelaySubscription` usa el mejor modo que soporte el relay y reconecta
+tras los errores; en relays sin push, `AdaptivePoller` ajusta el ritmo
+del polling al del emisor y mantiene varias peticiones en vuelo.
+
+Con varios móviles, `iter_fleet` trae en una sola petición el último
+frame de cada dispositivo (`GET /api/devices/latest`).
+"""
+
+import codecs
+import json
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Union
+
+import requests
+
+from src.network.http_transport import get_session, get_transport
+
+
+# Tamaño de los bloques leídos de la respuesta
+CHUNK_SIZE = 64 * 1024
+
+# Timeout de lectura del stream de eventos (el relay envía un latido cada 15 s)
+SSE_READ_TIMEOUT = 45.0
+
+# Modos de entrega, del más eficiente al más compatible: long-poll del
+# JPEG binario, Server-Sent Events, long-poll JSON y polling
+DELIVERY_MODES = ('binary', 'sse', 'long-poll', 'poll')
+
+# Modo de varios dispositivos: long-poll de /api/devices/latest
+FLEET_MODE = 'fleet'
+
+# Peso de cada muestra en la estimación del intervalo entre frames del emisor
+FRAME_INTERVAL_SMOOTHING = 0.2
+
+_WHITESPACE = " \t\r\n"
+
+
+class RelayUnsupported(Exception):
+    """El relay no soporta el modo de entrega pedido."""
+
+
+@dataclass
+class RelayFrame:
+    """Frame servido por el relay (data URL base64 o JPEG binario)."""
+    frame: str
+    timestamp: Optional[float] = None
+    frame_number: Optional[int] = None
+    device_id: str = ""
+    jpeg: Optional[bytes] = None
+
+    @property
+    def payload(self) -> Union[str, bytes]:
+        """JPEG binario si llegó así, o la cadena base64."""
+        return self.jpeg if self.jpeg is not None else self.frame
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "RelayFrame":
+        """Crea el frame a partir de un elemento del array `frames`."""
+        frame_number = data.get('frameNumber')
+        return cls(
+            frame=data.get('frame') or "",
+            timestamp=data.get('timestamp'),
+            frame_number=int(frame_number) if frame_number is not None else None,
+            device_id=data.get('deviceId') or "",
+        )
+
+
+class _ChunkReader:
+    """Lee valores JSON de una secuencia de bloques a medida que llegan."""
+
+    def __init__(self, chunks: Iterable[Union[bytes, str]]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> None:
+        """Añade el siguiente bloque al buffer descartando lo ya consumido."""
+        if self._eof:
+            raise ValueError("Respuesta JSON incompleta")
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._eof = True
+            self._buffer = self._buffer[self._pos:] + self._utf8.decode(b"", final=True)
+            self._pos = 0
+            return
+        if isinstance(chunk, bytes):
+            chunk = self._utf8.decode(chunk)
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+
+    def _skip_whitespace(self) -> None:
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer) or self._eof:
+                return
+            self._fill()
+
+    def next_char(self) -> str:
+        """Consume y devuelve el siguiente carácter significativo."""
+        self._skip_whitespace()
+        if self._pos >= len(self._buffer):
+            raise ValueError("Respuesta JSON incompleta")
+        char = self._buffer[self._pos]
+        self._pos += 1
+        return char
+
+    def peek_char(self) -> str:
+        """Devuelve el siguiente carácter significativo sin consumirlo."""
+        self._skip_whitespace()
+        return self._buffer[self._pos] if self._pos < len(self._buffer) else ""
+
+    def expect(self, char: str) -> None:
+        """Consume un carácter concreto o falla."""
+        found = self.next_char()
+        if found != char:
+            raise ValueError(f"JSON inesperado: se esperaba '{char}' y llegó '{found}'")
+
+    def value(self) -> Any:
+        """Decodifica el siguiente valor JSON completo."""
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # Valor cortado al final del bloque: leer más
+                self._fill()
+                continue
+            if (end == len(self._buffer) and not self._eof
+                    and isinstance(value, (int, float)) and not isinstance(value, bool)):
+                # Un número al final del buffer puede seguir en el siguiente bloque
+                self._fill()
+                continue
+            self._pos = end
+            return value
+
+
+def iter_json_array(chunks: Iterable[Union[bytes, str]], key: str = 'frames',
+                    metadata: Optional[Dict[str, Any]] = None) -> Iterator[Any]:
+    """
+    Itera los elementos del array `key` de un objeto JSON mientras llega.
+
+    Cada elemento se entrega en cuanto está completo; el resto de claves
+    del objeto se guardan en `metadata` (las que vengan después del array
+    solo están disponibles al terminar la iteración).
+
+    Args:
+        chunks: Bloques del documento (bytes UTF-8 o texto)
+        key: Clave del array a iterar
+        metadata: Diccionario donde guardar las demás claves
+
+    Yields:
+        Elementos del array
+
+    Raises:
+        ValueError: Si el documento no es un objeto JSON válido
+    """
+    reader = _ChunkReader(chunks)
+    reader.expect('{')
+    if reader.peek_char() == '}':
+        return
+
+    while True:
+        name = reader.value()
+        reader.expect(':')
+        if name == key and reader.peek_char() == '[':
+            reader.expect('[')
+            if reader.peek_char() == ']':
+                reader.expect(']')
+            else:
+                while True:
+                    yield reader.value()
+                    separator = reader.next_char()
+                    if separator == ']':
+                        break
+                    if separator != ',':
+                        raise ValueError(f"JSON inesperado en el array '{key}': '{separator}'")
+        else:
+            item = reader.value()
+            if metadata is not None:
+                metadata[name] = item
+
+        separator = reader.next_char()
+        if separator == '}':
+            return
+        if separator != ',':
+            raise ValueError(f"JSON inesperado: '{separator}'")
+
+
+@dataclass
+class RelayClientStats:
+    """Contadores del cliente del relay."""
+    requests: int = 0
+    frames_received: int = 0
+    frames_skipped: int = 0
+    bytes_received: int = 0
+    resets: int = 0
+
+
+class RelayClient:
+    """
+    Cliente de `GET /api/frames` con cursor.
+
+    Solo se descargan los frames posteriores al cursor (0 = todo el
+    historial). Si el cursor va por delante del relay (el móvil recargó la
+    página y empezó de nuevo), el relay lo indica con `reset`, devuelve su
+    historial completo y el cursor se reinicia.
+
+    Con `width` se pide al relay (`?w=`) una variante reducida al ancho que
+    muestra el visor; los relays que no reescalan sirven el original.
+
+    Varias peticiones pueden estar en vuelo a la vez (AdaptivePoller): el
+    cursor y las estadísticas se actualizan bajo un lock y el cursor solo
+    avanza.
+    """
+
+    def __init__(self, base_url: str, session: Optional[requests.Session] = None,
+                 timeout: float = 5.0, width: Optional[int] = None):
+        """
+        Inicializa el cliente.
+
+        Args:
+            base_url: URL base del relay
+            session: Sesión HTTP a reutilizar (por defecto, una del transporte
+                compartido)
+            timeout: Timeout de cada petición en segundos
+            width: Ancho con el que se muestran los frames (None = original)
+        """
+        self.base_url = base_url.rstrip('/')
+        self.session = session or get_session('relay', base_url=self.base_url)
+        self.timeout = timeout
+        self.width = width
+        self.cursor = 0
+        # Cursores de iter_fleet, por dispositivo
+        self.device_cursors: Dict[str, int] = {}
+        self.stats = RelayClientStats()
+        self._lock = threading.Lock()
+        # Respuestas en curso, para poder cortarlas desde otro hilo
+        self._streams: Set[requests.Response] = set()
+
+    def iter_new_frames(self, wait: float = 0.0) -> Iterator[RelayFrame]:
+        """
+        Pide los frames posteriores al cursor y los entrega mientras llegan.
+
+        Args:
+            wait: Segundos que el relay puede retener la petición hasta que
+                haya un frame nuevo (long-poll); 0 responde en el acto
+
+        Yields:
+            Frames nuevos en orden de llegada al relay
+
+        Raises:
+            requests.RequestException: Si falla la petición
+            ValueError: Si la respuesta no es JSON válido
+            RelayUnsupported: Si se pidió long-poll y el relay no lo soporta
+        """
+        params = self._params()
+        timeout = self.timeout
+        if wait > 0:
+            params['wait'] = int(wait * 1000)
+            timeout = (self.timeout, self.timeout + wait)
+        metadata: Dict[str, Any] = {}
+
+        with self.session.get(f"{self.base_url}/api/frames", params=params,
+                              timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            self._count(requests=1)
+            self._open(response)
+
+            def chunks():
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    self._count(bytes_received=len(chunk))
+                    yield chunk
+
+            try:
+                for item in iter_json_array(chunks(), 'frames', metadata):
+                    # El relay envía `reset` antes del array
+                    self._apply_reset(metadata)
+                    frame = self._advance(RelayFrame.from_json(item))
+                    if frame is not None:
+                        yield frame
+            finally:
+                self._close(response)
+
+        self._apply_reset(metadata)
+        if wait > 0 and 'waited' not in metadata:
+            # Relay antiguo: ignora `wait` y responde en el acto
+            raise RelayUnsupported("El relay no soporta long-poll")
+
+    def iter_events(self, stop_event: Optional[threading.Event] = None) -> Iterator[RelayFrame]:
+        """
+        Recibe los frames como Server-Sent Events por una conexión persistente.
+
+        La conexión se abre con el cursor actual, así que al reconectar solo
+        llegan frames posteriores. Termina cuando el relay cierra el stream
+        o se activa `stop_event` (comprobado entre eventos y latidos).
+
+        Args:
+            stop_event: Evento para dejar de leer
+
+        Yields:
+            Frames en cuanto el relay los recibe
+
+        Raises:
+            requests.RequestException: Si falla la conexión
+            RelayUnsupported: Si el relay no tiene el endpoint de eventos
+        """
+        headers = {'Accept': 'text/event-stream', 'Last-Event-ID': str(self.cursor)}
+        # Timeout de lectura holgado respecto al latido del relay
+        timeout = (self.timeout, SSE_READ_TIMEOUT)
+
+        with self.session.get(f"{self.base_url}/api/frames/stream", params=self._params(),
+                              headers=headers, timeout=timeout, stream=True) as response:
+            content_type = response.headers.get('Content-Type', '')
+            if response.status_code == 404 or (response.ok and 'text/event-stream' not in content_type):
+                raise RelayUnsupported("El relay no soporta Server-Sent Events")
+            response.raise_for_status()
+            self._count(requests=1)
+            self._open(response)
+
+            try:
+                data_lines = []
+                event_type = "message"
+                for line in response.iter_lines(chunk_size=CHUNK_SIZE):
+                    if stop_event is not None and stop_event.is_set():
+                        return
+                    self._count(bytes_received=len(line) + 1)
+                    line = line.decode('utf-8')
+
+                    if line:
+                        if line.startswith(':'):
+                            # Comentario (latido del relay)
+                            continue
+                        name, _, value = line.partition(':')
+                        value = value[1:] if value.startswith(' ') else value
+                        if name == 'data':
+                            data_lines.append(value)
+                        elif name == 'event':
+                            event_type = value
+                        continue
+
+                    # Línea en blanco: fin del evento
+                    if data_lines and event_type in ('frame', 'message'):
+                        frame = RelayFrame.from_json(json.loads("\n".join(data_lines)))
+                        # El relay solo reenvía números menores si el emisor volvió a empezar
+                        frame = self._advance(frame, restart=True)
+                        if frame is not None:
+                            yield frame
+                    data_lines = []
+                    event_type = "message"
+            finally:
+                self._close(response)
+
+    def _params(self) -> Dict[str, Any]:
+        """Parámetros comunes: el cursor y, si se indicó, el ancho de la variante."""
+        params: Dict[str, Any] = {'after': self.cursor}
+        if self.width:
+            params['w'] = self.width
+        return params
+
+    def interrupt(self) -> None:
+        """Corta las peticiones bloqueantes activas (stream de eventos o long-poll)."""
+        with self._lock:
+            streams = list(self._streams)
+        for stream in streams:
+            # Cerrar la respuesta desde otro hilo espera al lock del lector
+            # bloqueado en recv(); apagar el socket lo despierta en el acto
+            sock = getattr(getattr(stream.raw, 'connection', None), 'sock', None)
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def _open(self, response: requests.Response) -> None:
+        """Registra una respuesta en curso para interrupt()."""
+        with self._lock:
+            self._streams.add(response)
+
+    def _close(self, response: requests.Response) -> None:
+        """Olvida una respuesta terminada."""
+        with self._lock:
+            self._streams.discard(response)
+
+    def _count(self, **deltas: int) -> None:
+        """Suma a las estadísticas (p. ej. `requests=1`)."""
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self.stats, name, getattr(self.stats, name) + delta)
+
+    def _advance(self, frame: RelayFrame, restart: bool = False,
+                 count_skipped: bool = False) -> Optional[RelayFrame]:
+        """
+        Avanza el cursor con un frame recibido.
+
+        Args:
+            frame: Frame recibido
+            restart: Un número no posterior al cursor indica que el emisor
+                volvió a empezar (en vez de un frame ya visto)
+            count_skipped: Contar como saltados los números entre el cursor
+                y el frame
+
+        Returns:
+            El frame, o None si ya se vio
+        """
+        with self._lock:
+            if frame.frame_number is not None:
+                if frame.frame_number <= self.cursor:
+                    if not restart:
+                        # Relay sin soporte de cursor o respuesta de una
+                        # petición anterior: frame ya visto
+                        return None
+                    self.cursor = 0
+                    self.stats.resets += 1
+                elif count_skipped and self.cursor:
+                    self.stats.frames_skipped += frame.frame_number - self.cursor - 1
+                self.cursor = max(self.cursor, frame.frame_number)
+            self.stats.frames_received += 1
+        return frame
+
+    def _apply_reset(self, metadata: Dict[str, Any]) -> None:
+        """Reinicia el cursor si el relay indica que el emisor volvió a empezar."""
+        if metadata.pop('reset', False):
+            with self._lock:
+                self.cursor = 0
+                self.stats.resets += 1
+
+    def fetch_latest_jpeg(self, wait: float = 0.0) -> Optional[RelayFrame]:
+        """
+        Pide el último frame como JPEG binario si es posterior al cursor.
+
+        Args:
+            wait: Espera máxima del long-poll en segundos (0 = sin espera)
+
+        Returns:
+            Frame con `jpeg` o None si no hay un frame nuevo
+
+        Raises:
+            requests.RequestException: Si falla la petición
+            RelayUnsupported: Si el relay no tiene el endpoint binario
+        """
+        params = self._params()
+        timeout = self.timeout
+        if wait > 0:
+            params['wait'] = int(wait * 1000)
+            timeout = (self.timeout, self.timeout + wait)
+
+        with self.session.get(f"{self.base_url}/api/latest-frame.jpg", params=params,
+                              timeout=timeout, stream=True) as response:
+            if response.status_code == 404:
+                raise RelayUnsupported("El relay no soporta frames binarios")
+            response.raise_for_status()
+            self._count(requests=1)
+            if response.status_code == 204:
+                return None
+
+            self._open(response)
+            try:
+                jpeg = response.content
+            finally:
+                self._close(response)
+            self._count(bytes_received=len(jpeg))
+            headers = response.headers
+
+        if headers.get('X-Reset'):
+            self._apply_reset({'reset': True})
+
+        frame_number = headers.get('X-Frame-Number')
+        timestamp = headers.get('X-Timestamp')
+        frame = RelayFrame(
+            frame="",
+            timestamp=float(timestamp) if timestamp else None,
+            frame_number=int(frame_number) if frame_number else None,
+            device_id=headers.get('X-Device-Id', ""),
+            jpeg=jpeg,
+        )
+        # El relay solo envía el último: los intermedios se saltan sin descargarlos
+        return self._advance(frame, count_skipped=True)
+
+    def fetch_latest(self, wait: float = 0.0) -> Optional[RelayFrame]:
+        """
+        Pide los frames nuevos y devuelve solo el más reciente.
+
+        Los anteriores ya están superados, así que se descartan sin
+        decodificar.
+
+        Args:
+            wait: Espera máxima del long-poll en segundos (0 = sin espera)
+
+        Returns:
+            Frame más reciente o None si no hay frames nuevos
+        """
+        latest = None
+        for frame in self.iter_new_frames(wait):
+            if latest is not None:
+                self._count(frames_skipped=1)
+            latest = frame
+        return latest
+
+    def fetch_devices(self) -> List[Dict[str, Any]]:
+        """
+        Lista los dispositivos que han enviado frames al relay.
+
+        Returns:
+            Un diccionario por dispositivo (id, frameNumber, timestamp,
+            receivedAt, framesReceived)
+
+        Raises:
+            requests.RequestException: Si falla la petición
+            RelayUnsupported: Si el relay no distingue dispositivos
+        """
+        response = self.session.get(f"{self.base_url}/api/devices", timeout=self.timeout)
+        if response.status_code == 404:
+            raise RelayUnsupported("El relay no soporta varios dispositivos")
+        response.raise_for_status()
+        self._count(requests=1)
+        return response.json().get('devices', [])
+
+    def iter_fleet(self, wait: float = 0.0, ids: Optional[Iterable[str]] = None) -> Iterator[RelayFrame]:
+        """
+        Pide en una sola petición el último frame nuevo de cada dispositivo.
+
+        Cada dispositivo tiene su cursor en `device_cursors`; los que el
+        relay conoce y el cliente no aparecen con su último frame.
+
+        Args:
+            wait: Segundos que el relay puede retener la petición hasta que
+                algún dispositivo tenga un frame nuevo (0 = sin espera)
+            ids: Dispositivos a seguir (None = todos)
+
+        Yields:
+            El frame más reciente de cada dispositivo con frames nuevos
+
+        Raises:
+            requests.RequestException: Si falla la petición
+            ValueError: Si la respuesta no es JSON válido
+            RelayUnsupported: Si el relay no distingue dispositivos
+        """
+        params: Dict[str, Any] = {}
+        if self.device_cursors:
+            params['after'] = ','.join(f"{device}:{cursor}" for device, cursor in self.device_cursors.items())
+        if ids is not None:
+            params['ids'] = ','.join(ids)
+        if self.width:
+            params['w'] = self.width
+        timeout = self.timeout
+        if wait > 0:
+            params['wait'] = int(wait * 1000)
+            timeout = (self.timeout, self.timeout + wait)
+
+        with self.session.get(f"{self.base_url}/api/devices/latest", params=params,
+                              timeout=timeout, stream=True) as response:
+            if response.status_code == 404:
+                raise RelayUnsupported("El relay no soporta varios dispositivos")
+            response.raise_for_status()
+            self._count(requests=1)
+            self._open(response)
+
+            def chunks():
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    self._count(bytes_received=len(chunk))
+                    yield chunk
+
+            try:
+                for item in iter_json_array(chunks(), 'devices'):
+                    device_id = item.get('id', "")
+                    frame = RelayFrame.from_json(item.get('frame') or {})
+                    frame.device_id = device_id
+                    with self._lock:
+                        previous = self.device_cursors.get(device_id, 0)
+                        self.device_cursors[device_id] = int(item.get('cursor') or frame.frame_number or 0)
+
+                        if item.get('reset'):
+                            self.stats.resets += 1
+                        elif previous and frame.frame_number is not None:
+                            # Solo llega el último: los intermedios se saltan sin descargarlos
+                            self.stats.frames_skipped += max(0, frame.frame_number - previous - 1)
+                        self.stats.frames_received += 1
+                    yield frame
+            finally:
+                self._close(response)
+
+    def reset(self) -> None:
+        """Olvida los cursores (la siguiente petición trae el historial completo)."""
+        with self._lock:
+            self.cursor = 0
+            self.device_cursors.clear()
+
+
+class ConditionalFetcher:
+    """
+    GET condicional con `If-None-Match`.
+
+    Recuerda el ETag de la última respuesta de cada URL y lo envía en la
+    siguiente petición; si el recurso no cambió el servidor responde 304
+    sin cuerpo y no hay nada que descargar ni decodificar. Admite llamadas
+    desde varios hilos.
+    """
+
+    def __init__(self, session: requests.Session):
+        """
+        Inicializa el fetcher.
+
+        Args:
+            session: Sesión HTTP con la que se hacen las peticiones
+        """
+        self.session = session
+        self.requests = 0
+        self.not_modified = 0
+        self._etags: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str, **kwargs) -> Optional[requests.Response]:
+        """
+        Hace un GET condicional.
+
+        Args:
+            url: URL del recurso
+            **kwargs: Argumentos adicionales para `session.get`
+
+        Returns:
+            La respuesta, o None si el recurso no cambió (304)
+        """
+        headers = dict(kwargs.pop('headers', None) or {})
+        etag = self._etags.get(url)
+        if etag:
+            headers['If-None-Match'] = etag
+
+        response = self.session.get(url, headers=headers, **kwargs)
+        with self._lock:
+            self.requests += 1
+            if response.status_code == 304:
+                self.not_modified += 1
+                return None
+
+            if response.ok and response.headers.get('ETag'):
+                self._etags[url] = response.headers['ETag']
+            else:
+                self._etags.pop(url, None)
+        return response
+
+    @property
+    def hit_rate(self) -> float:
+        """Fracción de peticiones resueltas con 304."""
+        return self.not_modified / self.requests if self.requests else 0.0
+
+    def reset(self) -> None:
+        """Olvida los ETags guardados."""
+        self._etags.clear()
+
+
+class AdaptivePoller:
+    """
+    Polling con intervalo adaptativo y varias peticiones en vuelo.
+
+    Con una sola petición seguida de una pausa fija el ritmo máximo es
+    1 / (RTT + pausa). Aquí cada petición sale al ritmo estimado del
+    emisor (a partir de los timestamps y números de frame recibidos) sin
+    esperar a que termine la anterior, con hasta `max_in_flight` a la vez
+    sobre la misma sesión keep-alive: el ritmo máximo pasa a ser
+    min(1 / intervalo, max_in_flight / RTT). Las respuestas que llegan
+    desordenadas con un frame anterior al ya entregado se descartan.
+    """
+
+    def __init__(self, fetch: Callable[[], Optional[RelayFrame]], max_in_flight: int = 4,
+                 interval: float = 0.1, min_interval: float = 0.02, max_interval: float = 1.0):
+        """
+        Inicializa el poller.
+
+        Args:
+            fetch: Función que pide el último frame (None si no hay nuevo);
+                se llama desde varios hilos a la vez
+            max_in_flight: Peticiones simultáneas como máximo
+            interval: Intervalo inicial, hasta estimar el del emisor
+            min_interval: Intervalo mínimo entre peticiones
+            max_interval: Intervalo máximo (emisor parado)
+        """
+        self.fetch = fetch
+        self.max_in_flight = max(1, max_in_flight)
+        self.initial_interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+        self.frame_interval: Optional[float] = None
+        self.requests = 0
+        self.delivered = 0
+        self.stale = 0
+        self.errors = 0
+
+        self._lock = threading.Lock()
+        self._newest: Optional[RelayFrame] = None
+        self._last_new = time.monotonic()
+        self._consecutive_errors = 0
+        self._last_error: Optional[BaseException] = None
+
+    @property
+    def interval(self) -> float:
+        """Intervalo actual entre peticiones."""
+        base = self.frame_interval or self.initial_interval
+        idle = time.monotonic() - self._last_new
+        if idle > 4 * base:
+            # Emisor parado: espaciar las peticiones hasta que vuelva
+            base = idle / 4
+        return min(max(base, self.min_interval), self.max_interval)
+
+    def run(self, deliver: Callable[[RelayFrame], Any], stop_event: threading.Event) -> None:
+        """
+        Hace polling hasta que se active `stop_event`.
+
+        Args:
+            deliver: Función llamada con cada frame nuevo, en orden y
+                nunca desde dos hilos a la vez
+            stop_event: Evento que detiene el polling
+
+        Raises:
+            Exception: El último error si fallan `max_in_flight`
+                peticiones seguidas (el llamante aplica el backoff)
+        """
+        slots = threading.BoundedSemaphore(self.max_in_flight)
+        executor = ThreadPoolExecutor(self.max_in_flight, thread_name_prefix="relay-poll")
+        self._consecutive_errors = 0
+
+        def done(future: Future) -> None:
+            slots.release()
+            try:
+                frame = future.result()
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                    self._consecutive_errors += 1
+                    self._last_error = e
+                return
+            with self._lock:
+                self._consecutive_errors = 0
+                if frame is not None and not stop_event.is_set() and self._accept(frame):
+                    deliver(frame)
+
+        try:
+            next_due = time.monotonic()
+            while not stop_event.is_set():
+                if self._consecutive_errors >= self.max_in_flight:
+                    raise self._last_error
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    stop_event.wait(delay)
+                    continue
+                # Todas las peticiones en vuelo: esperar a que vuelva alguna
+                if not slots.acquire(timeout=0.05):
+                    continue
+                self.requests += 1
+                executor.submit(self.fetch).add_done_callback(done)
+                next_due = time.monotonic() + self.interval
+        finally:
+            executor.shutdown(wait=False)
+
+    def _accept(self, frame: RelayFrame) -> bool:
+        """Registra un frame si es posterior al último entregado (con el lock)."""
+        newest = self._newest
+        if newest is not None:
+            if frame.timestamp is not None and newest.timestamp is not None:
+                is_newer = frame.timestamp > newest.timestamp
+            elif frame.frame_number is not None and newest.frame_number is not None:
+                is_newer = frame.frame_number > newest.frame_number
+            else:
+                is_newer = True
+            if not is_newer:
+                self.stale += 1
+                return False
+            self._update_frame_interval(newest, frame)
+
+        self._newest = frame
+        self._last_new = time.monotonic()
+        self.delivered += 1
+        return True
+
+    def _update_frame_interval(self, previous: RelayFrame, frame: RelayFrame) -> None:
+        """Actualiza la estimación del intervalo entre frames del emisor."""
+        if frame.timestamp is None or previous.timestamp is None:
+            return
+        # Si se saltaron frames, el hueco entre timestamps abarca varios
+        frames = 1
+        if frame.frame_number is not None and previous.frame_number is not None:
+            frames = frame.frame_number - previous.frame_number
+            if frames <= 0:
+                # El emisor volvió a empezar la numeración
+                return
+        sample = (frame.timestamp - previous.timestamp) / 1000.0 / frames
+        if sample <= 0:
+            return
+        if self.frame_interval is None:
+            self.frame_interval = sample
+        else:
+            self.frame_interval += FRAME_INTERVAL_SMOOTHING * (sample - self.frame_interval)
+
+    def reset(self) -> None:
+        """Olvida el último frame entregado y la estimación del emisor."""
+        with self._lock:
+            self._newest = None
+            self.frame_interval = None
+            self._last_new = time.monotonic()
+
+
+class RelaySubscription:
+    """
+    Entrega los frames del relay a un callback con el mejor modo disponible.
+
+    Prueba por orden el long-poll binario, Server-Sent Events, el long-poll
+    JSON y el polling periódico; si el relay no soporta un modo (relays
+    antiguos) pasa al siguiente. Los errores de red se reintentan con
+    backoff exponencial sin cambiar de modo, y el stream de eventos se
+    reabre en cuanto el relay lo cierra.
+    El polling usa un `AdaptivePoller` con varias peticiones en vuelo.
+
+    Con `fleet=True` se siguen todos los dispositivos (o los de `devices`)
+    con el long-poll de varios dispositivos, y en relays que no lo
+    soportan se vuelve a los modos de un solo dispositivo.
+    """
+
+    def __init__(self, client: RelayClient, on_frame: Callable[[RelayFrame], Any],
+                 poll: Optional[Callable[[], Optional[RelayFrame]]] = None,
+                 mode: str = 'auto', poll_interval: float = 0.1, wait: float = 25.0,
+                 max_backoff: float = 5.0, max_in_flight: int = 4, fleet: bool = False,
+                 devices: Optional[Iterable[str]] = None):
+        """
+        Inicializa la suscripción.
+
+        Args:
+            client: Cliente del relay
+            on_frame: Función llamada con cada frame nuevo
+            poll: Función de polling para el último modo (por defecto
+                `client.fetch_latest`); debe admitir llamadas concurrentes
+            mode: 'auto', FLEET_MODE o uno de DELIVERY_MODES para fijarlo
+            poll_interval: Intervalo inicial del polling en segundos (luego
+                se ajusta al ritmo del emisor)
+            wait: Espera máxima de cada long-poll en segundos
+            max_backoff: Espera máxima entre reintentos tras un error
+            max_in_flight: Peticiones de polling simultáneas como máximo
+            fleet: Recibir los frames de todos los dispositivos
+            devices: Dispositivos a seguir en modo fleet (None = todos)
+        """
+        if mode != 'auto' and mode != FLEET_MODE and mode not in DELIVERY_MODES:
+            raise ValueError(f"Modo de entrega desconocido: {mode}")
+
+        self.client = client
+        self.on_frame = on_frame
+        self.poll = poll or client.fetch_latest
+        self.poller = AdaptivePoller(self.poll, max_in_flight, interval=poll_interval)
+        # Una conexión keep-alive por petición en vuelo, más una para las
+        # peticiones sueltas (salud, fotos) de la aplicación
+        get_transport().size_pool(client.base_url, max_in_flight + 1)
+        if mode == 'auto':
+            self.modes = ([FLEET_MODE] if fleet else []) + list(DELIVERY_MODES)
+        else:
+            self.modes = [mode]
+        self.devices = list(devices) if devices is not None else None
+        self.poll_interval = poll_interval
+        self.wait = wait
+        self.max_backoff = max_backoff
+
+        self.mode = self.modes[0]
+        self.reconnects = 0
+        self.errors = 0
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.logger = logging.getLogger(__name__)
+
+    def start(self) -> None:
+        """Arranca el hilo de recepción."""
+        # Evento nuevo por arranque: un hilo anterior aún bloqueado en un
+        # long-poll sigue viendo el suyo activado y no entrega nada
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop_event,),
+                                        daemon=True, name="relay-subscription")
+        self._thread.start()
+
+    def stop(self, timeout: float = 0.5) -> None:
+        """
+        Detiene la recepción y cierra la conexión persistente.
+
+        Un long-poll en curso no se puede cortar antes de que el relay
+        responda; el hilo termina entonces sin entregar el frame.
+        """
+        self._stop_event.set()
+        self.client.interrupt()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    @property
+    def is_running(self) -> bool:
+        """Indica si el hilo de recepción está activo."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def _deliver(self, frame: Optional[RelayFrame], stop_event: threading.Event) -> None:
+        """Entrega un frame salvo que la suscripción ya se haya detenido."""
+        if frame is not None and not stop_event.is_set():
+            self.on_frame(frame)
+
+    def _run(self, stop_event: threading.Event) -> None:
+        backoff = self.poll_interval
+        while not stop_event.is_set():
+            try:
+                if self.mode == FLEET_MODE:
+                    for frame in self.client.iter_fleet(wait=self.wait, ids=self.devices):
+                        self._deliver(frame, stop_event)
+                elif self.mode == 'binary':
+                    frame = self.client.fetch_latest_jpeg(wait=self.wait)
+                    self._deliver(frame, stop_event)
+                elif self.mode == 'sse':
+                    for frame in self.client.iter_events(stop_event):
+                        self._deliver(frame, stop_event)
+                    # El relay cerró el stream (límite de duración): reabrir
+                    self.reconnects += 1
+                elif self.mode == 'long-poll':
+                    frame = self.client.fetch_latest(wait=self.wait)
+                    self._deliver(frame, stop_event)
+                else:
+                    self.poller.run(lambda frame: self._deliver(frame, stop_event), stop_event)
+                backoff = self.poll_interval
+
+            except RelayUnsupported as e:
+                position = self.modes.index(self.mode)
+                if position + 1 >= len(self.modes):
+                    self.logger.error(f"{e}; sin modos de entrega alternativos")
+                    stop_event.wait(self.max_backoff)
+                    continue
+                self.mode = self.modes[position + 1]
+                self.logger.info(f"{e}; usando {self.mode}")
+
+            except Exception as e:
+                if stop_event.is_set():
+                    break
+                self.errors += 1
+                self.logger.warning(f"Error recibiendo del relay ({self.mode}): {e}; "
+                                    f"reintento en {backoff:.1f} s")
+                stop_event.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                self.reconnects += 1
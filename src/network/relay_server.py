@@ -0,0 +1,970 @@
+"""
+Relay de frames autoalojado (asyncio).
+=====================================
+
+Implementa en Python el mismo contrato HTTP que worker.js, para usarlo
+on-premise, como sustituto local del Worker en pruebas de integración y
+benchmarks, o para apuntar cloudflare_receiver.py a él sin cambios:
+
+- `POST /api/frame`: JSON {frame, timestamp, frameNumber, deviceId} o JPEG
+  binario (image/jpeg) con metadatos en cabeceras X-*.
+- `GET /api/frames` (con `?after=` y `&wait=`), `GET /api/frames/stream`
+  (Server-Sent Events), `GET /api/latest-frame` (con ETag) y
+  `GET /api/latest-frame.jpg`.
+- `GET /api/devices` (dispositivos conocidos) y `GET /api/devices/latest`
+  (último frame de cada dispositivo posterior a su cursor, en una sola
+  petición y con long-poll).
+- `GET /api/health` y `GET /metrics`.
+
+Las rutas `/api/devices/<id>/<ruta>` equivalen a `/api/<ruta>?device=<id>`.
+
+Los endpoints de lectura aceptan `?w=<ancho>`: el visor indica el ancho que
+muestra y recibe una variante reducida del frame (el ancho se redondea
+hacia arriba a un escalón de VARIANT_WIDTHS). Cada variante se genera una
+sola vez por frame, fuera del bucle de eventos, y se guarda junto al
+original.
+
+Cada dispositivo tiene su propio anillo con los últimos frames comprimidos
+(bytes JPEG). Las representaciones JSON y SSE de un frame se generan una
+sola vez y se comparten entre todos los visores; un visor lento por SSE
+recibe solo el último frame en lugar de acumular retraso. Sin parámetro
+`device` las lecturas usan el dispositivo que envió el último frame.
+
+Uso:
+    python -m src.network.relay_server --port 8787
+    python cloudflare_receiver.py   # con http://<host>:8787 como URL del Worker
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import logging
+import re
+import threading
+import time
+import urllib.parse
+from collections import deque
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.client import HTTPMessage, parse_headers
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from src.camera.codec import get_codec, jpeg_dimensions
+from src.network.frame_request import BodyTooLarge, FrameRequest, FrameRequestError, FrameRequestParser
+from src.utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, get_registry
+
+
+# Frames guardados por dispositivo (igual que el historial del Worker)
+HISTORY_SIZE = 10
+
+# Retroceso en la numeración a partir del cual se asume que el emisor se
+# reinició aunque su reloj no haya avanzado
+RESTART_GAP = 100
+
+# Espera máxima de un long-poll
+MAX_WAIT_MS = 25000
+
+# Latido y duración máxima de un stream de eventos (el cliente reconecta)
+STREAM_HEARTBEAT = 15.0
+STREAM_MAX_SECONDS = 5 * 60
+
+# Escalones de ancho de las variantes reducidas (?w=) y su calidad JPEG
+VARIANT_WIDTHS = (160, 320, 480, 640, 960, 1280)
+VARIANT_QUALITY = 80
+
+# Rutas con el dispositivo en el path: /api/devices/<id>/<ruta>
+_DEVICE_ROUTE = re.compile(r'^/api/devices/([^/]+)/(.+)$')
+
+# Tamaño máximo de las cabeceras de una petición
+MAX_HEADER_SIZE = 64 * 1024
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization, If-None-Match, '
+                                    'X-Frame-Number, X-Timestamp, X-Device-Id',
+    'Access-Control-Expose-Headers': 'ETag, X-Frame-Number, X-Timestamp, X-Received-At, '
+                                     'X-Device-Id, X-Reset, X-Width',
+    'Access-Control-Max-Age': '86400',
+}
+
+_metrics = get_registry()
+_relay_frames = _metrics.counter(
+    "camera_relay_frames_total", "Frames recibidos por el relay", ("device",))
+_relay_late = _metrics.counter(
+    "camera_relay_late_frames_total", "Frames descartados por llegar tarde", ("device",))
+_relay_bytes = _metrics.counter(
+    "camera_relay_bytes_total", "Bytes de JPEG recibidos por el relay", ("device",))
+_relay_requests = _metrics.counter(
+    "camera_relay_requests_total", "Peticiones atendidas por el relay", ("endpoint", "status"))
+_relay_viewers = _metrics.gauge(
+    "camera_relay_viewers", "Visores esperando frames (SSE y long-poll)")
+_relay_variants = _metrics.counter(
+    "camera_relay_variants_total", "Variantes reducidas generadas por el relay", ("width",))
+
+
+def _now_ms() -> int:
+    """Instante actual en milisegundos (como Date.now() en el Worker)."""
+    return int(time.time() * 1000)
+
+
+class StoredFrame:
+    """
+    Frame guardado en el relay: el JPEG y sus metadatos.
+
+    Las representaciones JSON y SSE se construyen la primera vez que un
+    visor las pide y se reutilizan para el resto. Las variantes reducidas
+    son a su vez StoredFrame con el mismo número de frame, guardadas en
+    `variants` por ancho.
+    """
+
+    __slots__ = ('jpeg', 'timestamp', 'frame_number', 'device_id', 'received_at', 'width',
+                 'variants', '_size', '_json', '_event')
+
+    def __init__(self, jpeg: bytes, timestamp: Optional[float], frame_number: int, device_id: str = "",
+                 width: int = 0):
+        self.jpeg = jpeg
+        self.timestamp = timestamp
+        self.frame_number = frame_number
+        self.device_id = device_id
+        self.received_at = _now_ms()
+        # Ancho de la variante (0 = frame original)
+        self.width = width
+        self.variants: Dict[int, "asyncio.Future[StoredFrame]"] = {}
+        self._size: Optional[Tuple[int, int]] = None
+        self._json: Optional[bytes] = None
+        self._event: Optional[bytes] = None
+
+    @property
+    def etag(self) -> str:
+        """ETag del frame (mismo formato que el Worker, con el ancho si es una variante)."""
+        if self.width:
+            return f'"{self.frame_number}-{self.received_at}-w{self.width}"'
+        return f'"{self.frame_number}-{self.received_at}"'
+
+    @property
+    def size(self) -> Optional[Tuple[int, int]]:
+        """(ancho, alto) del JPEG, leído de su cabecera."""
+        if self._size is None:
+            self._size = jpeg_dimensions(self.jpeg)
+        return self._size
+
+    def variant_width(self, requested: Optional[int]) -> int:
+        """
+        Escalón de ancho que corresponde a un ancho pedido.
+
+        Args:
+            requested: Ancho que muestra el visor (None = original)
+
+        Returns:
+            Ancho de la variante, o 0 si hay que servir el original
+        """
+        size = self.size
+        if not requested or requested <= 0 or size is None:
+            return 0
+        width = next((step for step in VARIANT_WIDTHS if step >= requested), 0)
+        return width if 0 < width < size[0] else 0
+
+    def scaled(self, width: int) -> "StoredFrame":
+        """
+        Genera la variante reducida a un ancho (operación bloqueante).
+
+        Returns:
+            La variante, o el propio frame si no se pudo decodificar
+        """
+        source_width, source_height = self.size
+        height = max(1, round(source_height * width / source_width))
+        codec = get_codec()
+        image = codec.decode_to_size(self.jpeg, (width, height))
+        jpeg = codec.encode(image, VARIANT_QUALITY) if image is not None else None
+        if jpeg is None:
+            return self
+
+        variant = StoredFrame(jpeg, self.timestamp, self.frame_number, self.device_id, width)
+        variant.received_at = self.received_at
+        variant._size = (width, height)
+        _relay_variants.inc(width=str(width))
+        return variant
+
+    def to_json(self) -> bytes:
+        """Frame serializado como en el Worker, con el JPEG en data URL base64."""
+        if self._json is None:
+            metadata = {
+                'timestamp': self.timestamp,
+                'frameNumber': self.frame_number,
+                'receivedAt': self.received_at,
+            }
+            if self.device_id:
+                metadata['deviceId'] = self.device_id
+            if self.width:
+                metadata['width'] = self.width
+            self._json = b''.join((
+                b'{"frame":"data:image/jpeg;base64,',
+                base64.b64encode(self.jpeg),
+                b'",',
+                json.dumps(metadata)[1:].encode(),
+            ))
+        return self._json
+
+    def to_event(self) -> bytes:
+        """Frame como evento SSE."""
+        if self._event is None:
+            self._event = b''.join((
+                f"id: {self.frame_number}\nevent: frame\ndata: ".encode(),
+                self.to_json(),
+                b"\n\n",
+            ))
+        return self._event
+
+
+class DeviceRing:
+    """Últimos frames comprimidos de un dispositivo."""
+
+    def __init__(self, device_id: str, size: int = HISTORY_SIZE):
+        """
+        Inicializa el anillo.
+
+        Args:
+            device_id: Identificador del dispositivo
+            size: Número de frames que se conservan
+        """
+        self.device_id = device_id
+        self.frames: Deque[StoredFrame] = deque(maxlen=size)
+        self.latest: Optional[StoredFrame] = None
+        self.frames_received = 0
+        self.frames_late = 0
+        self.bytes_received = 0
+
+    def store(self, frame: StoredFrame) -> bool:
+        """
+        Añade un frame; numera los que llegan sin número.
+
+        Un número que no avanza solo se toma como reinicio del emisor si el
+        timestamp es más nuevo que el del último frame o si el retroceso
+        supera RESTART_GAP (igual que JitterBuffer); si no, es un frame
+        retrasado y se descarta.
+
+        Returns:
+            True si el frame se guardó, False si se descartó por tardío
+        """
+        previous = self.latest
+        if not frame.frame_number:
+            frame.frame_number = previous.frame_number + 1 if previous else 1
+
+        if previous and frame.frame_number <= previous.frame_number:
+            restarted = (
+                (frame.timestamp is not None and previous.timestamp is not None
+                 and frame.timestamp > previous.timestamp)
+                or previous.frame_number - frame.frame_number > RESTART_GAP
+            )
+            if not restarted:
+                self.frames_late += 1
+                return False
+            # El móvil empezó una sesión nueva: los frames anteriores ya no
+            # son comparables con los cursores
+            self.frames.clear()
+
+        self.frames.append(frame)
+        self.latest = frame
+        self.frames_received += 1
+        self.bytes_received += len(frame.jpeg)
+        return True
+
+    def frames_after(self, cursor: Optional[int]) -> Tuple[int, bool, List[StoredFrame]]:
+        """
+        Frames posteriores a un cursor.
+
+        Args:
+            cursor: Último número de frame visto por el cliente (None si
+                no es un número válido)
+
+        Returns:
+            (número del frame más reciente, reset, frames)
+        """
+        newest = self.latest.frame_number if self.latest else 0
+        # Cursor por delante del relay: el emisor volvió a empezar
+        reset = cursor is None or cursor > newest
+        if reset:
+            return newest, True, list(self.frames)
+        return newest, False, [frame for frame in self.frames if frame.frame_number > cursor]
+
+
+_EMPTY_RING = DeviceRing("")
+
+
+class _Waiter:
+    """Visor esperando frames de un dispositivo (o de cualquiera)."""
+
+    __slots__ = ('device', 'wakeup')
+
+    def __init__(self, device: Optional[str]):
+        self.device = device
+        self.wakeup = asyncio.Event()
+
+
+class FrameRelay:
+    """
+    Estado del relay: un anillo por dispositivo y los visores en espera.
+
+    Solo se usa desde el bucle de eventos del servidor.
+    """
+
+    def __init__(self, history_size: int = HISTORY_SIZE):
+        """
+        Inicializa el relay.
+
+        Args:
+            history_size: Frames guardados por dispositivo
+        """
+        self.history_size = history_size
+        self.rings: Dict[str, DeviceRing] = {}
+        self.current: Optional[DeviceRing] = None
+        self._waiters: Set[_Waiter] = set()
+        _relay_viewers.set_function(self.viewer_count)
+
+    def viewer_count(self) -> int:
+        """Visores esperando frames."""
+        return len(self._waiters)
+
+    def store(self, request: FrameRequest) -> StoredFrame:
+        """
+        Guarda un frame recibido y despierta a los visores en espera.
+
+        Args:
+            request: Frame extraído de la petición
+
+        Returns:
+            Frame recibido (con su número asignado); si llegó tarde no se
+            guarda ni despierta a nadie
+        """
+        device_id = request.device_id
+        ring = self.rings.get(device_id)
+        if ring is None:
+            ring = self.rings[device_id] = DeviceRing(device_id, self.history_size)
+
+        frame = StoredFrame(request.jpeg, request.timestamp, request.frame_number or 0, device_id)
+        if not ring.store(frame):
+            _relay_late.inc(device=device_id)
+            return frame
+        self.current = ring
+        _relay_frames.inc(device=device_id)
+        _relay_bytes.inc(len(frame.jpeg), device=device_id)
+
+        for waiter in self._waiters:
+            if waiter.device is None or waiter.device == device_id:
+                waiter.wakeup.set()
+        return frame
+
+    def ring(self, device: Optional[str] = None) -> DeviceRing:
+        """
+        Anillo de un dispositivo.
+
+        Args:
+            device: Identificador, o None para el que envió el último frame
+
+        Returns:
+            El anillo (vacío si el dispositivo no ha enviado nada)
+        """
+        if device is None:
+            return self.current or _EMPTY_RING
+        return self.rings.get(device, _EMPTY_RING)
+
+    def latest(self, device: Optional[str] = None) -> Optional[StoredFrame]:
+        """Último frame de un dispositivo (o del último que envió)."""
+        return self.ring(device).latest
+
+    def devices_after(self, cursors: Dict[str, int],
+                      wanted: Optional[Set[str]] = None) -> List[Tuple[DeviceRing, int, bool, StoredFrame]]:
+        """
+        Último frame de cada dispositivo con frames posteriores a su cursor.
+
+        Args:
+            cursors: Último número de frame visto por dispositivo (los que
+                faltan cuentan como 0, así aparecen los dispositivos nuevos)
+            wanted: Dispositivos a considerar (None = todos)
+
+        Returns:
+            (anillo, número del frame más reciente, reset, último frame)
+        """
+        updates = []
+        for device_id, ring in self.rings.items():
+            if wanted is not None and device_id not in wanted:
+                continue
+            newest, reset, frames = ring.frames_after(cursors.get(device_id, 0))
+            if frames:
+                updates.append((ring, newest, reset, frames[-1]))
+        return updates
+
+    async def wait(self, device: Optional[str], timeout: float) -> bool:
+        """
+        Espera a que llegue un frame del dispositivo.
+
+        Args:
+            device: Identificador, o None para cualquier dispositivo
+            timeout: Espera máxima en segundos
+
+        Returns:
+            True si llegó un frame antes del timeout
+        """
+        waiter = _Waiter(device)
+        self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter.wakeup.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiters.discard(waiter)
+
+    def subscribe(self, device: Optional[str]) -> _Waiter:
+        """Registra un visor persistente (SSE)."""
+        waiter = _Waiter(device)
+        self._waiters.add(waiter)
+        return waiter
+
+    def unsubscribe(self, waiter: _Waiter) -> None:
+        """Da de baja un visor persistente."""
+        self._waiters.discard(waiter)
+
+
+@dataclass
+class RelayRequest:
+    """Petición HTTP recibida por el relay."""
+    method: str
+    path: str
+    query: Dict[str, str]
+    headers: HTTPMessage
+    body: bytes = b""
+    keep_alive: bool = True
+
+
+@dataclass
+class RelayResponse:
+    """Respuesta HTTP del relay."""
+    status: int
+    body: bytes = b""
+    content_type: Optional[str] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+def _json_response(data: dict, status: int = 200, headers: Optional[Dict[str, str]] = None) -> RelayResponse:
+    return RelayResponse(status, json.dumps(data).encode(), 'application/json', headers or {})
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comprueba si una cabecera If-None-Match incluye el ETag dado."""
+    if not if_none_match:
+        return False
+    return any(tag.strip() in ('*', etag, f"W/{etag}") for tag in if_none_match.split(','))
+
+
+def _parse_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RelayServer:
+    """
+    Servidor HTTP asyncio del relay.
+
+    Atiende conexiones keep-alive en un único bucle de eventos, que puede
+    ejecutarse en un hilo propio (`start`/`stop`, como MjpegBroadcaster) o
+    en el hilo principal (`serve_forever`).
+    """
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 8787, history_size: int = HISTORY_SIZE,
+                 max_body_size: int = 4 * 1024 * 1024):
+        """
+        Inicializa el servidor.
+
+        Args:
+            host: Dirección de escucha
+            port: Puerto de escucha (0 = uno libre)
+            history_size: Frames guardados por dispositivo
+            max_body_size: Tamaño máximo del cuerpo de un POST
+        """
+        self.host = host
+        self.port = port
+        self.relay = FrameRelay(history_size)
+        self.parser = FrameRequestParser(max_body_size=max_body_size)
+        self.logger = logging.getLogger(__name__)
+        self.started_at = time.time()
+
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._connections: Set[asyncio.Task] = set()
+
+    # --- Ciclo de vida ---
+
+    async def open(self) -> None:
+        """Empieza a escuchar (dentro del bucle de eventos)."""
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                                  limit=MAX_HEADER_SIZE)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.logger.info(f"Relay escuchando en {self.host}:{self.port}")
+
+    async def close(self) -> None:
+        """Deja de escuchar y cierra las conexiones abiertas."""
+        if self._server is not None:
+            self._server.close()
+        connections = list(self._connections)
+        for task in connections:
+            task.cancel()
+        await asyncio.gather(*connections, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+            self._server = None
+
+    def serve_forever(self) -> None:
+        """Ejecuta el relay en el hilo actual hasta Ctrl+C."""
+        async def main():
+            await self.open()
+            try:
+                await asyncio.Event().wait()
+            finally:
+                await self.close()
+
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            pass
+
+    def start(self) -> None:
+        """Arranca el relay en un hilo propio (vuelve cuando ya escucha)."""
+        loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=loop.run_forever, daemon=True, name="frame-relay")
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.open(), loop).result(timeout=5)
+
+    def stop(self) -> None:
+        """Detiene el relay arrancado con `start`."""
+        loop = self._loop
+        if loop is None or self._thread is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.close(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=2)
+        loop.close()
+        self._loop = None
+        self._thread = None
+
+    # --- HTTP ---
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Atiende las peticiones de una conexión keep-alive."""
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request = await self._read_request(reader, writer)
+                if request is None:
+                    break
+                if not await self._dispatch(request, writer):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Cierre del servidor: la conexión termina sin error
+            pass
+        except Exception as e:
+            self.logger.error(f"Error en conexión del relay: {e}")
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> Optional[RelayRequest]:
+        """Lee una petición completa, o None si el cliente cerró o era inválida."""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            await self._write_response(writer, _json_response({'error': 'Headers too large'}, 431), False)
+            return None
+
+        request_line, _, header_block = head.partition(b"\r\n")
+        try:
+            method, target, version = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            await self._write_response(writer, _json_response({'error': 'Bad request'}, 400), False)
+            return None
+        headers = parse_headers(io.BytesIO(header_block))
+
+        connection = (headers.get('Connection') or '').lower()
+        keep_alive = 'close' not in connection if version == 'HTTP/1.1' else 'keep-alive' in connection
+
+        url = urllib.parse.urlsplit(target)
+        query = {key: values[0] for key, values in urllib.parse.parse_qs(url.query).items()}
+        request = RelayRequest(method.upper(), url.path, query, headers, keep_alive=keep_alive)
+
+        length = _parse_int(headers.get('Content-Length')) or 0
+        if length > self.parser.max_body_size:
+            # El cuerpo no se lee: responder y cerrar la conexión
+            await self._write_response(writer, _json_response(
+                {'error': 'Frame too large', 'max': self.parser.max_body_size}, 413), False)
+            return None
+        if length:
+            request.body = await reader.readexactly(length)
+        return request
+
+    async def _write_response(self, writer: asyncio.StreamWriter, response: RelayResponse,
+                              keep_alive: bool) -> None:
+        """Escribe una respuesta completa."""
+        headers = dict(CORS_HEADERS)
+        headers.update(response.headers)
+        if response.content_type:
+            headers['Content-Type'] = response.content_type
+        if response.status not in (204, 304):
+            headers['Content-Length'] = str(len(response.body))
+        headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+
+        head = f"HTTP/1.1 {response.status} {HTTPStatus(response.status).phrase}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in headers.items()) + "\r\n"
+        # Cabecera y cuerpo en una sola escritura, sin concatenar el JPEG
+        writer.writelines((head.encode('latin-1'), response.body))
+        await writer.drain()
+
+    async def _dispatch(self, request: RelayRequest, writer: asyncio.StreamWriter) -> bool:
+        """
+        Atiende una petición.
+
+        Returns:
+            Si la conexión puede seguir usándose
+        """
+        device_route = _DEVICE_ROUTE.match(request.path)
+        if device_route:
+            request.query['device'] = urllib.parse.unquote(device_route.group(1))
+            request.path = '/api/' + device_route.group(2)
+
+        path = request.path
+        if request.method == 'OPTIONS':
+            response = RelayResponse(204)
+        elif path == '/api/frames/stream' and request.method == 'GET':
+            _relay_requests.inc(endpoint=path, status="200")
+            await self._stream_frames(request, writer)
+            return request.keep_alive
+        elif path == '/api/frame' and request.method == 'POST':
+            response = self._post_frame(request)
+        elif path == '/api/frames' and request.method == 'GET':
+            response = await self._get_frames(request)
+        elif path == '/api/latest-frame.jpg' and request.method == 'GET':
+            response = await self._get_latest_jpeg(request)
+        elif path == '/api/latest-frame' and request.method == 'GET':
+            response = await self._get_latest_frame(request)
+        elif path == '/api/devices' and request.method == 'GET':
+            response = self._get_devices()
+        elif path == '/api/devices/latest' and request.method == 'GET':
+            response = await self._get_devices_latest(request)
+        elif path == '/api/health' and request.method == 'GET':
+            response = self._get_health()
+        elif path == '/metrics' and request.method == 'GET':
+            response = RelayResponse(200, _metrics.render().encode(), METRICS_CONTENT_TYPE)
+        elif path.startswith('/api/'):
+            response = _json_response({'error': 'API endpoint not found', 'path': path,
+                                       'method': request.method}, 404)
+        else:
+            response = _json_response({'error': 'Not found', 'path': path}, 404)
+
+        endpoint = path if path.startswith('/api/') or path == '/metrics' else 'other'
+        _relay_requests.inc(endpoint=endpoint, status=str(response.status))
+        await self._write_response(writer, response, request.keep_alive)
+        return request.keep_alive
+
+    # --- Endpoints ---
+
+    def _post_frame(self, request: RelayRequest) -> RelayResponse:
+        """POST /api/frame: JSON con data URL o JPEG binario."""
+        try:
+            frame_request = self.parser.parse(io.BytesIO(request.body), len(request.body), request.headers)
+        except BodyTooLarge as e:
+            return _json_response({'error': 'Frame too large', 'message': str(e)}, 413)
+        except FrameRequestError as e:
+            return _json_response({'error': 'Invalid frame data', 'message': str(e),
+                                   'required': ['frame', 'timestamp']}, 400)
+        except TimeoutError as e:
+            return _json_response({'error': 'Relay busy', 'message': str(e)}, 503)
+
+        if frame_request.timestamp is None:
+            frame_request.timestamp = _now_ms()
+        frame = self.relay.store(frame_request)
+        return _json_response({
+            'status': 'success',
+            'message': 'Frame received',
+            'frameNumber': frame.frame_number,
+            'timestamp': _now_ms(),
+        })
+
+    async def _frames_after(self, request: RelayRequest) -> Tuple[int, bool, List[StoredFrame], int]:
+        """Frames posteriores al cursor, esperando si se pidió long-poll."""
+        device = request.query.get('device')
+        cursor = _parse_int(request.query.get('after'))
+        wait = min(_parse_int(request.query.get('wait')) or 0, MAX_WAIT_MS)
+
+        newest, reset, frames = self.relay.ring(device).frames_after(cursor)
+        waited = 0
+        if wait > 0 and not reset and not frames:
+            started = time.monotonic()
+            await self.relay.wait(device, wait / 1000.0)
+            waited = int((time.monotonic() - started) * 1000)
+            newest, reset, frames = self.relay.ring(device).frames_after(cursor)
+        return newest, reset, frames, waited
+
+    async def _sized(self, frame: StoredFrame, request: RelayRequest) -> StoredFrame:
+        """
+        Frame al ancho pedido con ?w= (o el original).
+
+        La variante se genera en el executor la primera vez que se pide;
+        las peticiones simultáneas esperan a la misma generación.
+        """
+        width = frame.variant_width(_parse_int(request.query.get('w')))
+        if not width:
+            return frame
+        future = frame.variants.get(width)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = frame.variants[width] = loop.run_in_executor(None, frame.scaled, width)
+        # shield: si este visor se desconecta, la generación sigue para los demás
+        return await asyncio.shield(future)
+
+    async def _sized_all(self, frames: List[StoredFrame], request: RelayRequest) -> List[StoredFrame]:
+        """Aplica `_sized` a una lista de frames."""
+        if 'w' not in request.query:
+            return frames
+        return list(await asyncio.gather(*(self._sized(frame, request) for frame in frames)))
+
+    async def _get_frames(self, request: RelayRequest) -> RelayResponse:
+        """GET /api/frames: historial completo o, con ?after=, los frames nuevos."""
+        if 'after' not in request.query:
+            ring = self.relay.ring(request.query.get('device'))
+            frames = await self._sized_all(list(ring.frames), request)
+            latest = await self._sized(ring.latest, request) if ring.latest else None
+            body = b''.join((
+                b'{"frames":[', b','.join(frame.to_json() for frame in frames), b'],',
+                b'"latestFrame":', latest.to_json() if latest else b'null', b',',
+                json.dumps({
+                    'count': len(frames),
+                    'timestamp': _now_ms(),
+                    'message': 'Frames available from mobile device' if frames else 'No frames received yet',
+                })[1:].encode(),
+            ))
+            return RelayResponse(200, body, 'application/json')
+
+        newest, reset, frames, waited = await self._frames_after(request)
+        frames = await self._sized_all(frames, request)
+        # Metadatos antes del array para que el cliente los lea en streaming
+        metadata = json.dumps({
+            'cursor': newest,
+            'reset': reset,
+            'waited': waited,
+            'count': len(frames),
+            'timestamp': _now_ms(),
+        })
+        body = b''.join((
+            metadata[:-1].encode(), b',"frames":[',
+            b','.join(frame.to_json() for frame in frames), b']}',
+        ))
+        return RelayResponse(200, body, 'application/json', {'Cache-Control': 'no-store'})
+
+    async def _get_latest_frame(self, request: RelayRequest) -> RelayResponse:
+        """GET /api/latest-frame: último frame en JSON con ETag."""
+        latest = self.relay.latest(request.query.get('device'))
+        if latest is None:
+            return _json_response({'success': False, 'message': 'No frame available yet',
+                                   'timestamp': _now_ms()})
+        # Un 304 implica que el visor ya recibió esta variante: está en caché
+        latest = await self._sized(latest, request)
+
+        headers = {
+            'ETag': latest.etag,
+            'X-Frame-Number': str(latest.frame_number),
+            'Cache-Control': 'no-cache',
+        }
+        if _etag_matches(request.headers.get('If-None-Match'), latest.etag):
+            return RelayResponse(304, headers=headers)
+
+        body = b''.join((b'{"success":true,"frame":', latest.to_json(),
+                         f',"timestamp":{_now_ms()}}}'.encode()))
+        return RelayResponse(200, body, 'application/json', headers)
+
+    async def _get_latest_jpeg(self, request: RelayRequest) -> RelayResponse:
+        """GET /api/latest-frame.jpg: último frame como JPEG binario."""
+        reset = False
+        if 'after' in request.query:
+            newest, reset, frames, _ = await self._frames_after(request)
+            if not reset and not frames:
+                return RelayResponse(204, headers={'X-Frame-Number': str(newest),
+                                                   'Cache-Control': 'no-store'})
+
+        latest = self.relay.latest(request.query.get('device'))
+        if latest is None:
+            return RelayResponse(204, headers={'Cache-Control': 'no-store'})
+        latest = await self._sized(latest, request)
+
+        headers = {
+            'ETag': latest.etag,
+            'X-Frame-Number': str(latest.frame_number),
+            'X-Timestamp': str(latest.timestamp),
+            'X-Received-At': str(latest.received_at),
+            'Cache-Control': 'no-cache',
+        }
+        if latest.device_id:
+            headers['X-Device-Id'] = latest.device_id
+        if latest.width:
+            headers['X-Width'] = str(latest.width)
+        if reset:
+            headers['X-Reset'] = '1'
+        if _etag_matches(request.headers.get('If-None-Match'), latest.etag):
+            return RelayResponse(304, headers=headers)
+        return RelayResponse(200, latest.jpeg, 'image/jpeg', headers)
+
+    def _get_devices(self) -> RelayResponse:
+        """GET /api/devices: dispositivos con los metadatos de su último frame."""
+        devices = []
+        for ring in self.relay.rings.values():
+            latest = ring.latest
+            devices.append({
+                'id': ring.device_id,
+                'frameNumber': latest.frame_number if latest else 0,
+                'timestamp': latest.timestamp if latest else None,
+                'receivedAt': latest.received_at if latest else None,
+                'framesReceived': ring.frames_received,
+            })
+        return _json_response({'devices': devices, 'count': len(devices), 'timestamp': _now_ms()},
+                              headers={'Cache-Control': 'no-store'})
+
+    async def _get_devices_latest(self, request: RelayRequest) -> RelayResponse:
+        """
+        GET /api/devices/latest: último frame de varios dispositivos.
+
+        `?after=<id>:<frameNumber>,...` da el cursor de cada dispositivo,
+        `?ids=<id>,...` limita los dispositivos y `&wait=<ms>` retiene la
+        petición hasta que alguno tenga un frame nuevo.
+        """
+        cursors: Dict[str, int] = {}
+        for entry in (request.query.get('after') or '').split(','):
+            device_id, separator, cursor = entry.rpartition(':')
+            if separator:
+                cursors[device_id] = _parse_int(cursor) or 0
+        ids = request.query.get('ids')
+        wanted = set(ids.split(',')) if ids else None
+        wait = min(_parse_int(request.query.get('wait')) or 0, MAX_WAIT_MS) / 1000.0
+
+        started = time.monotonic()
+        updates = self.relay.devices_after(cursors, wanted)
+        while wait > 0 and not updates:
+            remaining = wait - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            # Cualquier dispositivo despierta la espera; se vuelve a filtrar
+            await self.relay.wait(None, remaining)
+            updates = self.relay.devices_after(cursors, wanted)
+
+        frames = await self._sized_all([frame for _, _, _, frame in updates], request)
+        entries = [
+            b''.join((
+                json.dumps({'id': ring.device_id, 'cursor': newest, 'reset': reset})[:-1].encode(),
+                b',"frame":', frame.to_json(), b'}',
+            ))
+            for (ring, newest, reset, _), frame in zip(updates, frames)
+        ]
+        metadata = json.dumps({
+            'waited': int((time.monotonic() - started) * 1000),
+            'count': len(entries),
+            'timestamp': _now_ms(),
+        })
+        body = b''.join((metadata[:-1].encode(), b',"devices":[', b','.join(entries), b']}'))
+        return RelayResponse(200, body, 'application/json', {'Cache-Control': 'no-store'})
+
+    def _get_health(self) -> RelayResponse:
+        """GET /api/health."""
+        latest = self.relay.latest()
+        return _json_response({
+            'status': 'healthy',
+            'timestamp': _now_ms(),
+            'worker': 'ip-camera-relay-python',
+            'version': '2.1.0',
+            'framesReceived': len(self.relay.ring().frames),
+            'latestFrameAvailable': latest is not None,
+            'lastFrameTime': latest.received_at if latest else None,
+            'devices': len(self.relay.rings),
+            'viewers': self.relay.viewer_count(),
+            'variants': list(VARIANT_WIDTHS),
+            'uptime': round(time.time() - self.started_at, 1),
+        })
+
+    async def _stream_frames(self, request: RelayRequest, writer: asyncio.StreamWriter) -> None:
+        """GET /api/frames/stream: Server-Sent Events con codificación chunked."""
+        device = request.query.get('device')
+        cursor = _parse_int(request.query.get('after') or request.headers.get('Last-Event-ID')) or 0
+
+        headers = dict(CORS_HEADERS)
+        headers.update({
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            'Transfer-Encoding': 'chunked',
+            'Connection': 'keep-alive' if request.keep_alive else 'close',
+        })
+        head = "HTTP/1.1 200 OK\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        writer.write(head.encode('latin-1'))
+
+        def write_chunk(data: bytes) -> None:
+            writer.writelines((f"{len(data):x}\r\n".encode(), data, b"\r\n"))
+
+        write_chunk(b"retry: 1000\n\n")
+
+        # Al conectar solo se envía el frame más reciente posterior al cursor
+        _, _, frames = self.relay.ring(device).frames_after(cursor)
+        sent = frames[-1] if frames else self.relay.latest(device)
+        if frames:
+            write_chunk((await self._sized(sent, request)).to_event())
+        await writer.drain()
+
+        waiter = self.relay.subscribe(device)
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        try:
+            while time.monotonic() < deadline and not writer.is_closing():
+                try:
+                    await asyncio.wait_for(waiter.wakeup.wait(), STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    write_chunk(b": ping\n\n")
+                    await writer.drain()
+                    continue
+                waiter.wakeup.clear()
+
+                # Mientras este visor esperaba a vaciar su buffer pudieron
+                # llegar varios frames: se envía solo el último
+                latest = self.relay.latest(device)
+                if latest is None or latest is sent:
+                    continue
+                sent = latest
+                write_chunk((await self._sized(latest, request)).to_event())
+                await writer.drain()
+            # Fin del stream (el cliente reconecta)
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            self.relay.unsubscribe(waiter)
+
+
+def main():
+    """Arranca el relay desde la línea de comandos."""
+    parser = argparse.ArgumentParser(description="Relay de frames compatible con el Worker de Cloudflare")
+    parser.add_argument('--host', default="0.0.0.0", help="Dirección de escucha")
+    parser.add_argument('--port', type=int, default=8787, help="Puerto de escucha")
+    parser.add_argument('--history', type=int, default=HISTORY_SIZE, help="Frames guardados por dispositivo")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(f"🌐 Relay de frames en http://{args.host}:{args.port}")
+    RelayServer(args.host, args.port, history_size=args.history).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
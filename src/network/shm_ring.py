@@ -0,0 +1,289 @@
+"""
+Anillo de frames comprimidos y tabla de control en memoria compartida entre procesos.
+"""
+
+import math
+import struct
+from collections import OrderedDict
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Dict, Optional
+
+
+# Cabecera global: secuencia del último frame escrito
+_HEADER = struct.Struct("<Q")
+_HEADER_SIZE = 64
+
+# Cabecera de slot: versión (seqlock), secuencia, longitud, número de frame,
+# timestamp del emisor y dispositivo
+_SLOT_HEADER = struct.Struct("<QQIqd32s")
+_SLOT_HEADER_SIZE = 128
+
+_NO_FRAME_NUMBER = -1
+
+# Entrada de la tabla de control: versión (seqlock), dispositivo, fps,
+# ancho, alto y calidad
+_CONTROL_ENTRY = struct.Struct("<Q32sdIId")
+
+
+@dataclass
+class RingEntry:
+    """Frame leído del anillo; `payload` apunta directamente a la memoria compartida."""
+    sequence: int
+    version: int
+    slot: int
+    payload: memoryview
+    frame_number: Optional[int] = None
+    timestamp: Optional[float] = None
+    device_id: str = ""
+
+
+class SharedFrameRing:
+    """
+    Anillo de slots de tamaño fijo en multiprocessing.shared_memory.
+
+    Los escritores (procesos worker) serializan la escritura con un lock
+    entre procesos; los lectores no toman ningún lock: cada slot lleva un
+    contador de versión (seqlock) que es impar mientras se escribe. El
+    lector usa el payload directamente desde la memoria compartida y
+    después comprueba con `is_valid` que la versión no cambió.
+    """
+
+    def __init__(self, name: Optional[str] = None, slots: int = 8,
+                 slot_size: int = 2 * 1024 * 1024, create: bool = True):
+        """
+        Crea o abre un anillo.
+
+        Args:
+            name: Nombre del bloque de memoria compartida (None para generar uno)
+            slots: Número de slots
+            slot_size: Bytes máximos de payload por slot
+            create: True para crear el bloque, False para abrir uno existente
+        """
+        self.slots = slots
+        self.slot_size = slot_size
+        self._stride = _SLOT_HEADER_SIZE + int(math.ceil(slot_size / 64.0)) * 64
+        total = _HEADER_SIZE + self._stride * slots
+
+        if create:
+            # El bloque nuevo está a cero: secuencia 0 y todas las versiones pares
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=total)
+        else:
+            # Los workers (spawn) comparten el resource tracker del creador,
+            # que es quien libera el bloque en close()
+            self._shm = shared_memory.SharedMemory(name=name, create=False)
+
+        self._owner = create
+        self._buf = self._shm.buf
+
+    @property
+    def name(self) -> str:
+        """Nombre del bloque de memoria compartida."""
+        return self._shm.name
+
+    @property
+    def sequence(self) -> int:
+        """Secuencia del último frame escrito."""
+        return _HEADER.unpack_from(self._buf, 0)[0]
+
+    def write(self, payload, timestamp: Optional[float] = None,
+              frame_number: Optional[int] = None, device_id: str = "") -> int:
+        """
+        Escribe un frame en el siguiente slot.
+
+        Debe llamarse con el lock de escritura compartido por los workers.
+
+        Args:
+            payload: Frame comprimido (bytes-like)
+            timestamp: Timestamp del emisor en milisegundos
+            frame_number: Número de frame del emisor
+            device_id: Identificador del dispositivo
+
+        Returns:
+            Secuencia asignada al frame
+
+        Raises:
+            ValueError: Si el payload no cabe en un slot
+        """
+        length = len(payload)
+        if length > self.slot_size:
+            raise ValueError(f"Frame de {length} bytes (máximo por slot {self.slot_size})")
+
+        sequence = self.sequence + 1
+        slot = sequence % self.slots
+        offset = self._slot_offset(slot)
+        version = _SLOT_HEADER.unpack_from(self._buf, offset)[0]
+
+        # Versión impar: slot en escritura
+        struct.pack_into("<Q", self._buf, offset, version + 1)
+        data_offset = offset + _SLOT_HEADER_SIZE
+        self._buf[data_offset:data_offset + length] = payload
+        _SLOT_HEADER.pack_into(
+            self._buf, offset, version + 1, sequence, length,
+            _NO_FRAME_NUMBER if frame_number is None else int(frame_number),
+            math.nan if timestamp is None else float(timestamp),
+            device_id.encode('utf-8')[:32]
+        )
+        struct.pack_into("<Q", self._buf, offset, version + 2)
+
+        _HEADER.pack_into(self._buf, 0, sequence)
+        return sequence
+
+    def read(self, sequence: int) -> Optional[RingEntry]:
+        """
+        Obtiene el frame con la secuencia indicada sin copiar el payload.
+
+        Args:
+            sequence: Secuencia a leer (normalmente `self.sequence`)
+
+        Returns:
+            Entrada del anillo o None si el slot se está escribiendo o ya
+            contiene un frame más nuevo
+        """
+        if sequence <= 0:
+            return None
+        slot = sequence % self.slots
+        offset = self._slot_offset(slot)
+        version, slot_sequence, length, frame_number, timestamp, device = \
+            _SLOT_HEADER.unpack_from(self._buf, offset)
+
+        if version % 2 == 1 or slot_sequence != sequence:
+            return None
+
+        data_offset = offset + _SLOT_HEADER_SIZE
+        return RingEntry(
+            sequence=slot_sequence,
+            version=version,
+            slot=slot,
+            payload=self._buf[data_offset:data_offset + length],
+            frame_number=None if frame_number == _NO_FRAME_NUMBER else frame_number,
+            timestamp=None if math.isnan(timestamp) else timestamp,
+            device_id=device.rstrip(b'\x00').decode('utf-8', errors='replace')
+        )
+
+    def is_valid(self, entry: RingEntry) -> bool:
+        """Comprueba que el slot no se reescribió mientras se usaba la entrada."""
+        version = struct.unpack_from("<Q", self._buf, self._slot_offset(entry.slot))[0]
+        return version == entry.version
+
+    def close(self) -> None:
+        """Cierra el anillo (y libera el bloque si este proceso lo creó)."""
+        self._buf = None
+        if self._owner:
+            self._shm.unlink()
+        try:
+            self._shm.close()
+        except BufferError:
+            # Quedan vistas vivas del payload: el mapeo se libera con ellas
+            pass
+
+    def _slot_offset(self, slot: int) -> int:
+        """Desplazamiento del slot dentro del bloque."""
+        return _HEADER_SIZE + slot * self._stride
+
+
+class SharedControlTable:
+    """
+    Objetivos de envío por dispositivo en multiprocessing.shared_memory.
+
+    Solo escribe el proceso principal, que es quien decodifica y conoce
+    las colas; los workers la leen para responder el ack de cada frame.
+    Cada entrada lleva el mismo contador de versión (seqlock) que los
+    slots del anillo. Con la tabla llena, el dispositivo publicado hace
+    más tiempo cede su entrada.
+    """
+
+    def __init__(self, name: Optional[str] = None, devices: int = 64, create: bool = True):
+        """
+        Crea o abre una tabla.
+
+        Args:
+            name: Nombre del bloque de memoria compartida (None para generar uno)
+            devices: Número máximo de dispositivos (solo al crearla)
+            create: True para crear el bloque, False para abrir uno existente
+        """
+        if create:
+            self._shm = shared_memory.SharedMemory(name=name, create=True,
+                                                   size=_CONTROL_ENTRY.size * devices)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name, create=False)
+        # Al abrir una tabla existente la capacidad sale de su tamaño
+        self.devices = self._shm.size // _CONTROL_ENTRY.size
+        self._owner = create
+        self._buf = self._shm.buf
+        # Solo en el proceso que escribe: entrada de cada dispositivo, de
+        # la publicada hace más tiempo a la más reciente
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+
+    @property
+    def name(self) -> str:
+        """Nombre del bloque de memoria compartida."""
+        return self._shm.name
+
+    def publish(self, device_id: str, control: Dict[str, float]) -> None:
+        """
+        Publica el objetivo de envío de un dispositivo.
+
+        Args:
+            device_id: Identificador del dispositivo
+            control: Diccionario con fps, width, height y quality
+        """
+        index = self._entries.pop(device_id, None)
+        if index is None:
+            if len(self._entries) < self.devices:
+                index = len(self._entries)
+            else:
+                _, index = self._entries.popitem(last=False)
+        self._entries[device_id] = index
+
+        offset = index * _CONTROL_ENTRY.size
+        version = struct.unpack_from("<Q", self._buf, offset)[0]
+        # Versión impar: entrada en escritura
+        struct.pack_into("<Q", self._buf, offset, version + 1)
+        _CONTROL_ENTRY.pack_into(
+            self._buf, offset, version + 1, device_id.encode('utf-8')[:32],
+            float(control['fps']), int(control['width']), int(control['height']),
+            float(control['quality'])
+        )
+        struct.pack_into("<Q", self._buf, offset, version + 2)
+
+    def lookup(self, device_id: str) -> Optional[Dict[str, float]]:
+        """
+        Lee el objetivo de envío de un dispositivo.
+
+        Args:
+            device_id: Identificador del dispositivo
+
+        Returns:
+            Diccionario con fps, width, height y quality, o None si el
+            dispositivo no tiene objetivo publicado
+        """
+        key = device_id.encode('utf-8')[:32]
+        for _ in range(3):
+            busy = False
+            for index in range(self.devices):
+                offset = index * _CONTROL_ENTRY.size
+                version, device, fps, width, height, quality = \
+                    _CONTROL_ENTRY.unpack_from(self._buf, offset)
+                if version == 0:
+                    continue
+                if version % 2 == 1:
+                    busy = True
+                    continue
+                if device.rstrip(b'\x00') != key:
+                    continue
+                if struct.unpack_from("<Q", self._buf, offset)[0] != version:
+                    busy = True
+                    continue
+                return {'fps': fps, 'width': width, 'height': height, 'quality': quality}
+            # Sin entradas a medio escribir: el dispositivo no está
+            if not busy:
+                return None
+        return None
+
+    def close(self) -> None:
+        """Cierra la tabla (y libera el bloque si este proceso la creó)."""
+        self._buf = None
+        if self._owner:
+            self._shm.unlink()
+        self._shm.close()
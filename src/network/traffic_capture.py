@@ -0,0 +1,293 @@
+"""
+Captura y reproducción del tráfico de ingesta.
+
+Una captura son dos ficheros de solo anexado:
+
+- `<ruta>.frames`: cada frame comprimido precedido de su longitud (uint32 LE).
+- `<ruta>.index`: una línea JSON por frame con la llegada, el desplazamiento
+  en `.frames`, la longitud, el timestamp y número de frame del emisor y el
+  dispositivo. La primera línea es una cabecera con la versión.
+
+Reproducir la misma captura contra `process_frame` o por HTTP en loopback
+permite medir regresiones con una entrada idéntica.
+"""
+
+import base64
+import heapq
+import http.client
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Union
+
+
+FORMAT_VERSION = 1
+
+_LENGTH = struct.Struct("<I")
+
+
+def capture_path_from_env() -> Optional[str]:
+    """
+    Lee la ruta de captura de la variable INGEST_CAPTURE.
+
+    Returns:
+        Ruta base de la captura o None si no se debe capturar
+    """
+    return os.environ.get("INGEST_CAPTURE") or None
+
+
+@dataclass
+class CapturedFrame:
+    """Frame leído de una captura."""
+    arrival: float
+    jpeg: bytes
+    timestamp: Optional[float] = None
+    frame_number: Optional[int] = None
+    device_id: str = ""
+
+
+class TrafficRecorder:
+    """
+    Graba los frames comprimidos tal y como llegan a la ingesta.
+
+    La escritura es un anexado a ficheros con buffer bajo un lock, así que
+    el coste en el hilo que recibe el frame es una copia en memoria.
+    """
+
+    def __init__(self, path: Union[str, Path], buffer_size: int = 1024 * 1024):
+        """
+        Abre (o continúa) una captura.
+
+        Args:
+            path: Ruta base; se crean `<ruta>.frames` y `<ruta>.index`
+            buffer_size: Tamaño del buffer de escritura de los frames
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger(__name__)
+
+        self._frames = open(f"{self.path}.frames", 'ab', buffering=buffer_size)
+        self._index = open(f"{self.path}.index", 'a', encoding='utf-8')
+        self._offset = self._frames.tell()
+        self._lock = threading.Lock()
+        self.frames = 0
+
+        if self._index.tell() == 0:
+            self._index.write(json.dumps({'version': FORMAT_VERSION, 'started': time.time()}) + "\n")
+
+    def record(self, payload: Union[str, bytes], timestamp: Optional[float] = None,
+               frame_number: Optional[int] = None, device_id: str = "") -> None:
+        """
+        Añade un frame a la captura.
+
+        Args:
+            payload: JPEG en bytes o en base64 (con o sin prefijo data URL)
+            timestamp: Timestamp del emisor en milisegundos
+            frame_number: Número de frame del emisor
+            device_id: Identificador del dispositivo
+        """
+        arrival = time.time()
+        if isinstance(payload, str):
+            if payload.startswith('data:image'):
+                payload = payload.split(',', 1)[1]
+            payload = base64.b64decode(payload)
+
+        entry = {
+            't': arrival,
+            'length': len(payload),
+            'timestamp': timestamp,
+            'frame_number': frame_number,
+            'device_id': device_id,
+        }
+        with self._lock:
+            if self._frames.closed:
+                return
+            entry['offset'] = self._offset + _LENGTH.size
+            self._frames.write(_LENGTH.pack(len(payload)))
+            self._frames.write(payload)
+            self._offset += _LENGTH.size + len(payload)
+            self._index.write(json.dumps(entry) + "\n")
+            self.frames += 1
+
+    def close(self) -> None:
+        """Vuelca y cierra los ficheros."""
+        with self._lock:
+            if self._frames.closed:
+                return
+            self._frames.close()
+            self._index.close()
+        self.logger.info(f"Captura cerrada: {self.frames} frames en {self.path}")
+
+
+def read_capture(path: Union[str, Path]) -> Iterator[CapturedFrame]:
+    """
+    Lee una captura en orden de llegada.
+
+    Args:
+        path: Ruta base de la captura
+
+    Yields:
+        Frames capturados
+    """
+    with open(f"{path}.index", encoding='utf-8') as index, open(f"{path}.frames", 'rb') as frames:
+        header = json.loads(index.readline() or "{}")
+        if header.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Versión de captura no soportada: {header.get('version')}")
+
+        for line in index:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            frames.seek(entry['offset'])
+            jpeg = frames.read(entry['length'])
+            if len(jpeg) < entry['length']:
+                # Último frame incompleto (captura interrumpida)
+                break
+            yield CapturedFrame(entry['t'], jpeg, entry.get('timestamp'),
+                                entry.get('frame_number'), entry.get('device_id') or "")
+
+
+def read_captures(paths: List[Union[str, Path]]) -> Iterator[CapturedFrame]:
+    """Mezcla varias capturas (p. ej. una por worker) por momento de llegada."""
+    return heapq.merge(*(read_capture(path) for path in paths), key=lambda frame: frame.arrival)
+
+
+@dataclass
+class ReplayStats:
+    """Resultado de una reproducción."""
+    frames: int = 0
+    accepted: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+    max_lag_ms: float = 0.0
+
+    @property
+    def fps(self) -> float:
+        """Frames enviados por segundo."""
+        return self.frames / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class TrafficReplayer:
+    """
+    Reproduce una captura respetando los tiempos originales o sin esperas.
+
+    `speed` escala los intervalos entre llegadas: 1.0 es tiempo real, 2.0
+    el doble de rápido y 0 lo más rápido posible.
+    """
+
+    def __init__(self, paths: Union[str, Path, List[Union[str, Path]]], speed: float = 1.0):
+        """
+        Inicializa el reproductor.
+
+        Args:
+            paths: Ruta base de una captura o lista de capturas a mezclar
+            speed: Factor de velocidad (0 = sin esperas)
+        """
+        self.paths = paths if isinstance(paths, list) else [paths]
+        self.speed = speed
+
+    def replay(self, sink: Callable[[CapturedFrame], bool],
+               stop_event: Optional[threading.Event] = None) -> ReplayStats:
+        """
+        Entrega cada frame a `sink` en el momento que le corresponde.
+
+        Args:
+            sink: Función que recibe el frame y devuelve si fue aceptado
+            stop_event: Evento para interrumpir la reproducción
+
+        Returns:
+            Estadísticas de la reproducción
+        """
+        stats = ReplayStats()
+        first_arrival = None
+        started = time.perf_counter()
+
+        for frame in read_captures(self.paths):
+            if stop_event is not None and stop_event.is_set():
+                break
+            if first_arrival is None:
+                first_arrival = frame.arrival
+
+            if self.speed > 0:
+                due = started + (frame.arrival - first_arrival) / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    stats.max_lag_ms = max(stats.max_lag_ms, -delay * 1000.0)
+
+            stats.frames += 1
+            try:
+                if sink(frame):
+                    stats.accepted += 1
+                else:
+                    stats.errors += 1
+            except Exception as e:
+                logging.getLogger(__name__).debug(f"Error reproduciendo frame: {e}")
+                stats.errors += 1
+
+        stats.elapsed = time.perf_counter() - started
+        return stats
+
+    def replay_to(self, process_frame: Callable[..., bool], **kwargs) -> ReplayStats:
+        """
+        Reproduce directamente contra `process_frame(jpeg, timestamp, frame_number, device_id)`.
+
+        Returns:
+            Estadísticas de la reproducción
+        """
+        def sink(frame: CapturedFrame) -> bool:
+            result = process_frame(frame.jpeg, frame.timestamp, frame.frame_number, frame.device_id)
+            return result is not False
+
+        return self.replay(sink, **kwargs)
+
+    def replay_http(self, url: str, timeout: float = 5.0, **kwargs) -> ReplayStats:
+        """
+        Reproduce por HTTP con el mismo JSON que envía la página móvil.
+
+        Args:
+            url: URL de ingesta del receptor
+            timeout: Timeout de cada petición
+
+        Returns:
+            Estadísticas de la reproducción
+        """
+        target = urllib.parse.urlsplit(url)
+        state = {'connection': None}
+
+        def sink(frame: CapturedFrame) -> bool:
+            body = json.dumps({
+                'frame': "data:image/jpeg;base64," + base64.b64encode(frame.jpeg).decode('ascii'),
+                'timestamp': frame.timestamp,
+                'frameNumber': frame.frame_number,
+                'deviceId': frame.device_id,
+            }).encode()
+            if state['connection'] is None:
+                state['connection'] = http.client.HTTPConnection(target.hostname, target.port or 80,
+                                                                 timeout=timeout)
+            connection = state['connection']
+            try:
+                connection.request('POST', target.path or '/', body, {'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                response.read()
+                if response.will_close:
+                    connection.close()
+                    state['connection'] = None
+                return response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                state['connection'] = None
+                raise
+
+        try:
+            return self.replay(sink, **kwargs)
+        finally:
+            if state['connection'] is not None:
+                state['connection'].close()
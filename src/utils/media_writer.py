@@ -0,0 +1,341 @@
+"""
+Escritura de fotos y ficheros en segundo plano.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Set, Union
+
+from src.camera.codec import get_codec
+from src.utils.metrics import get_registry
+
+
+_metrics = get_registry()
+_encode_seconds = _metrics.histogram(
+    "camera_encode_seconds", "Latencia de codificación de frames", ("format",))
+_files_written = _metrics.counter(
+    "camera_media_files_total", "Ficheros procesados por el escritor en segundo plano", ("result",))
+_writer_backlog = _metrics.gauge(
+    "camera_media_writer_backlog", "Trabajos pendientes en la cola del escritor")
+_fsync_seconds = _metrics.histogram(
+    "camera_media_fsync_seconds", "Duración del fsync de cada lote de escritura")
+
+
+@dataclass
+class WriteResult:
+    """Resultado de una escritura."""
+    path: Path
+    success: bool
+    size: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class _WriteJob:
+    """Trabajo pendiente en la cola del escritor."""
+    path: Path
+    data: Any
+    quality: int
+    callback: Optional[Callable[[WriteResult], None]]
+
+
+class MediaWriter:
+    """
+    Servicio que escribe ficheros en un hilo propio.
+
+    Los trabajos entran en una cola acotada (si está llena, `submit`
+    devuelve False en lugar de bloquear). Los ficheros escritos se
+    sincronizan con fsync por lotes: se acumulan mientras haya trabajos
+    en cola y se sincronizan juntos (más el directorio una sola vez), y
+    entonces se invocan las callbacks de finalización.
+    """
+
+    def __init__(self, max_queue: int = 64, batch_size: int = 16, fsync: bool = True):
+        """
+        Inicializa el escritor.
+
+        Args:
+            max_queue: Trabajos máximos en cola
+            batch_size: Ficheros máximos por lote de fsync
+            fsync: Si es False, no se fuerza la sincronización a disco
+        """
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.logger = logging.getLogger(__name__)
+
+        self._queue: "queue.Queue[Optional[_WriteJob]]" = queue.Queue(maxsize=max_queue)
+        self._created_dirs: Set[Path] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.written = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batches = 0
+
+        _writer_backlog.set_function(self._metric_backlog)
+
+    @property
+    def backlog(self) -> int:
+        """Trabajos pendientes de escribir."""
+        return self._queue.qsize()
+
+    def submit(self, path: Union[str, Path], data: Any, quality: int = 95,
+               callback: Optional[Callable[[WriteResult], None]] = None) -> bool:
+        """
+        Encola la escritura de un fichero.
+
+        Args:
+            path: Ruta de destino (el directorio se crea si no existe)
+            data: Bytes, frame BGR (se codifica a JPEG en el hilo del escritor)
+                o función sin argumentos que devuelve los bytes
+            quality: Calidad JPEG si `data` es un frame
+            callback: Función llamada con el WriteResult tras el fsync
+
+        Returns:
+            False si la cola está llena
+        """
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(_WriteJob(Path(path), data, quality, callback))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            _files_written.inc(result="rejected")
+            return False
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """Termina de escribir lo pendiente y detiene el hilo."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+        self._thread = None
+
+    def get_stats(self) -> dict:
+        """Obtiene los contadores del escritor."""
+        with self._lock:
+            return {
+                'written': self.written,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'batches': self.batches,
+                'backlog': self.backlog,
+            }
+
+    def _metric_backlog(self) -> int:
+        """Trabajos pendientes para /metrics."""
+        return self.backlog
+
+    def _ensure_thread(self) -> None:
+        """Arranca el hilo escritor la primera vez."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="media-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        """Bucle del hilo escritor: escribe lotes y los sincroniza juntos."""
+        running = True
+        while running:
+            job = self._queue.get()
+            if job is None:
+                break
+
+            batch = [job]
+            # Agrupar lo que ya esté en cola sin esperar más
+            while len(batch) < self.batch_size:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    running = False
+                    break
+                batch.append(job)
+
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[_WriteJob]) -> None:
+        """Escribe un lote, hace fsync de todos los ficheros y notifica."""
+        results: List[WriteResult] = []
+        open_files = []
+        directories: Set[Path] = set()
+
+        for job in batch:
+            handle = None
+            try:
+                payload = self._materialize(job)
+                self._ensure_dir(job.path.parent)
+                handle = open(job.path, 'wb')
+                handle.write(payload)
+                open_files.append((len(results), handle))
+                directories.add(job.path.parent)
+                results.append(WriteResult(job.path, True, len(payload)))
+            except Exception as e:
+                if handle is not None:
+                    self._close_quietly(handle)
+                results.append(WriteResult(job.path, False, error=str(e)))
+
+        started = time.perf_counter()
+        # Un fallo de un fichero solo marca ese resultado: el resto del lote
+        # se sincroniza y cierra igualmente
+        for index, handle in open_files:
+            try:
+                handle.flush()
+                if self.fsync:
+                    os.fsync(handle.fileno())
+                handle.close()
+            except OSError as e:
+                self._close_quietly(handle)
+                results[index] = WriteResult(results[index].path, False, error=str(e))
+        if self.fsync:
+            for directory in directories:
+                self._fsync_dir(directory)
+            _fsync_seconds.observe(time.perf_counter() - started)
+
+        with self._lock:
+            self.batches += 1
+            for result in results:
+                if result.success:
+                    self.written += 1
+                else:
+                    self.failed += 1
+        for result in results:
+            _files_written.inc(result="written" if result.success else "failed")
+
+        for job, result in zip(batch, results):
+            if not result.success:
+                self.logger.error(f"Error guardando {result.path}: {result.error}")
+            if job.callback:
+                try:
+                    job.callback(result)
+                except Exception as e:
+                    self.logger.error(f"Error en callback de escritura: {e}")
+
+    def _materialize(self, job: _WriteJob) -> bytes:
+        """Convierte los datos del trabajo en bytes."""
+        data = job.data
+        if callable(data):
+            data = data()
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            return bytes(data)
+        if data is None:
+            raise ValueError("Sin datos que escribir")
+
+        started = time.perf_counter()
+        encoded = get_codec().encode(data, quality=job.quality)
+        _encode_seconds.observe(time.perf_counter() - started, format="jpeg")
+        if encoded is None:
+            raise ValueError("No se pudo codificar el frame")
+        return encoded
+
+    def _ensure_dir(self, directory: Path) -> None:
+        """Crea el directorio una sola vez por proceso."""
+        if directory not in self._created_dirs:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._created_dirs.add(directory)
+
+    def _close_quietly(self, handle) -> None:
+        """Cierra un fichero ignorando el error (ya se informa de otro)."""
+        try:
+            handle.close()
+        except OSError:
+            pass
+
+    def _fsync_dir(self, directory: Path) -> None:
+        """Sincroniza la entrada de directorio (no soportado en Windows)."""
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def photo_path(directory: Union[str, Path], prefix: str, index: Optional[int] = None) -> Path:
+    """
+    Genera la ruta de una foto con marca de tiempo.
+
+    Args:
+        directory: Directorio de destino
+        prefix: Prefijo del nombre de fichero
+        index: Índice dentro de una ráfaga (añade milisegundos y contador)
+
+    Returns:
+        Ruta del fichero .jpg
+    """
+    now = datetime.now()
+    if index is None:
+        return Path(directory) / f"{prefix}_{now.strftime('%Y%m%d_%H%M%S')}.jpg"
+    return Path(directory) / f"{prefix}_{now.strftime('%Y%m%d_%H%M%S_%f')[:-3]}_{index:03d}.jpg"
+
+
+def capture_burst(writer: MediaWriter, frame_slot, directory: Union[str, Path], prefix: str,
+                  count: int = 10, to_data: Optional[Callable[[Any], Any]] = None,
+                  on_done: Optional[Callable[[int, int], None]] = None,
+                  timeout: float = 2.0) -> threading.Thread:
+    """
+    Captura en segundo plano los próximos `count` frames nuevos de un FrameSlot.
+
+    Args:
+        writer: Escritor al que se envían las fotos
+        frame_slot: Slot del que se toman los frames
+        directory: Directorio de destino
+        prefix: Prefijo de los ficheros
+        count: Número de fotos de la ráfaga
+        to_data: Función que convierte un FramePacket en los datos a escribir
+            (por defecto el JPEG original o, si no existe, el frame)
+        on_done: Función llamada con (guardadas, solicitadas) al terminar
+        timeout: Espera máxima por cada frame nuevo
+
+    Returns:
+        Hilo de captura (ya arrancado)
+    """
+    if to_data is None:
+        to_data = lambda packet: packet.jpeg if packet.jpeg is not None else packet.frame
+
+    def run():
+        remaining = [count]
+        saved = [0]
+        lock = threading.Lock()
+
+        def finished(result: WriteResult):
+            with lock:
+                remaining[0] -= 1
+                if result.success:
+                    saved[0] += 1
+                done = remaining[0] == 0
+            if done and on_done:
+                on_done(saved[0], count)
+
+        packet = frame_slot.latest()
+        last_sequence = packet.sequence - 1 if packet is not None else 0
+        for index in range(count):
+            packet = frame_slot.wait_for_next(last_sequence, timeout=timeout)
+            if packet is None or not writer.submit(photo_path(directory, prefix, index),
+                                                   to_data(packet), callback=finished):
+                # Sin frames nuevos o cola llena: contar el resto como no guardadas
+                with lock:
+                    remaining[0] -= count - index
+                    done = remaining[0] == 0
+                if done and on_done:
+                    on_done(saved[0], count)
+                return
+            last_sequence = packet.sequence
+
+    thread = threading.Thread(target=run, name="burst-capture", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,409 @@
+"""
+Registro de métricas con exposición en formato de texto de Prometheus.
+
+Los contadores e histogramas escriben en un shard propio de cada hilo, sin
+locks en el camino caliente; los shards se suman al generar `/metrics`.
+Los shards de hilos terminados se consolidan para que la memoria no crezca
+con los hilos efímeros de ThreadingHTTPServer.
+"""
+
+import bisect
+import logging
+import math
+import os
+import threading
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Cubos por defecto en segundos (latencias de decodificación/codificación)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Shards de hilos muertos que se toleran antes de consolidarlos sin esperar al scrape
+_MAX_SHARDS = 64
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    """Formatea un valor como lo espera Prometheus."""
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    """Escapa el valor de una etiqueta."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Genera el bloque {nombre="valor",...} de una muestra."""
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    """Base de las métricas: nombre, ayuda, etiquetas y funciones de lectura."""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._functions: List[Callable[[], Optional[Callable]]] = []
+        self._lock = threading.Lock()
+
+    def set_function(self, func: Callable[[], Any]) -> None:
+        """
+        Registra una función que se evalúa en cada scrape.
+
+        La función devuelve un número (métrica sin etiquetas) o un
+        diccionario {tupla de valores de etiqueta: número}. Los métodos
+        ligados se guardan con referencia débil: no mantienen vivo al
+        objeto y dejan de leerse cuando este se destruye.
+
+        Args:
+            func: Función sin argumentos
+        """
+        if hasattr(func, "__self__"):
+            ref = weakref.WeakMethod(func)
+        else:
+            ref = lambda: func
+        with self._lock:
+            self._functions.append(ref)
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        """Convierte las etiquetas de una llamada en la clave interna."""
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _function_values(self) -> Dict[LabelValues, float]:
+        """Evalúa las funciones registradas y descarta las de objetos destruidos."""
+        values: Dict[LabelValues, float] = {}
+        with self._lock:
+            functions = list(self._functions)
+        alive = []
+        for ref in functions:
+            func = ref()
+            if func is None:
+                continue
+            alive.append(ref)
+            try:
+                result = func()
+            except Exception as e:
+                logging.getLogger(__name__).debug(f"Error leyendo métrica {self.name}: {e}")
+                continue
+            if isinstance(result, dict):
+                for key, value in result.items():
+                    key = key if isinstance(key, tuple) else (str(key),)
+                    values[key] = values.get(key, 0.0) + value
+            elif result is not None:
+                values[()] = values.get((), 0.0) + result
+        if len(alive) != len(functions):
+            alive_ids = {id(ref) for ref in alive}
+            with self._lock:
+                self._functions = [ref for ref in self._functions if id(ref) in alive_ids]
+        return values
+
+    def samples(self) -> Iterable[Tuple[str, Sequence[str], Sequence[str], float]]:
+        """Muestras (nombre, etiquetas, valores, valor) de la métrica."""
+        raise NotImplementedError
+
+
+class _ShardedMetric(_Metric):
+    """Métrica acumulativa con un shard por hilo."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._local = threading.local()
+        self._shards: List[Tuple[weakref.ref, dict]] = []
+        self._retired: Dict[LabelValues, Any] = {}
+
+    def _shard(self) -> dict:
+        """Shard del hilo actual (se crea en su primera escritura)."""
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            self._local.shard = shard
+            with self._lock:
+                if len(self._shards) >= _MAX_SHARDS:
+                    self._retire_dead()
+                self._shards.append((weakref.ref(threading.current_thread()), shard))
+        return shard
+
+    def _retire_dead(self) -> None:
+        """Consolida los shards de hilos terminados (requiere el lock)."""
+        alive = []
+        for thread_ref, shard in self._shards:
+            thread = thread_ref()
+            if thread is not None and thread.is_alive():
+                alive.append((thread_ref, shard))
+            else:
+                for key, value in shard.items():
+                    self._retired[key] = self._merge(self._retired.get(key), value)
+        self._shards = alive
+
+    def _merged(self) -> Dict[LabelValues, Any]:
+        """Suma de todos los shards."""
+        with self._lock:
+            self._retire_dead()
+            merged = {key: self._merge(None, value) for key, value in self._retired.items()}
+            shards = [shard for _, shard in self._shards]
+        for shard in shards:
+            # dict() copia de forma atómica respecto al hilo propietario
+            for key, value in dict(shard).items():
+                merged[key] = self._merge(merged.get(key), value)
+        return merged
+
+    def _merge(self, total: Any, value: Any) -> Any:
+        """Acumula `value` sobre `total` (None si aún no hay total)."""
+        raise NotImplementedError
+
+
+class Counter(_ShardedMetric):
+    """Contador monótono."""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """
+        Incrementa el contador.
+
+        Args:
+            amount: Incremento (no negativo)
+            **labels: Valores de las etiquetas declaradas
+        """
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def _merge(self, total: Any, value: Any) -> Any:
+        return value if total is None else total + value
+
+    def samples(self):
+        values = self._merged()
+        for key, value in self._function_values().items():
+            values[key] = values.get(key, 0.0) + value
+        for key, value in sorted(values.items()):
+            yield self.name, self.labelnames, key, value
+
+
+class Histogram(_ShardedMetric):
+    """Histograma acumulativo con cubos fijos."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        """
+        Registra una observación.
+
+        Args:
+            value: Valor observado (segundos para las latencias)
+            **labels: Valores de las etiquetas declaradas
+        """
+        shard = self._shard()
+        key = self._key(labels)
+        state = shard.get(key)
+        if state is None:
+            # Cubos no acumulados + suma + número de observaciones
+            state = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            shard[key] = state
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def _merge(self, total: Any, value: Any) -> Any:
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+    def samples(self):
+        for key, state in sorted(self._merged().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), state):
+                cumulative += count
+                yield (f"{self.name}_bucket", self.labelnames + ("le",),
+                       key + (_format_value(bound),), cumulative)
+            yield f"{self.name}_sum", self.labelnames, key, state[-2]
+            yield f"{self.name}_count", self.labelnames, key, state[-1]
+
+
+class Gauge(_Metric):
+    """Valor instantáneo (se fija directamente o se lee con una función)."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        """Fija el valor para las etiquetas dadas."""
+        self._values[self._key(labels)] = value
+
+    def remove(self, **labels) -> None:
+        """Elimina la serie de las etiquetas dadas."""
+        self._values.pop(self._key(labels), None)
+
+    def samples(self):
+        values = dict(self._values)
+        values.update(self._function_values())
+        for key, value in sorted(values.items()):
+            yield self.name, self.labelnames, key, value
+
+
+class MetricsRegistry:
+    """
+    Conjunto de métricas de un proceso.
+
+    Pedir dos veces una métrica con el mismo nombre devuelve la misma
+    instancia, de modo que varios módulos pueden instrumentar la misma
+    serie (p. ej. la latencia de codificación de la caché y del escritor).
+    """
+
+    def __init__(self):
+        """Inicializa el registro vacío."""
+        self._metrics: Dict[str, _Metric] = {}
+        self._const_labels: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Obtiene (o crea) un contador."""
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Obtiene (o crea) un gauge."""
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Obtiene (o crea) un histograma."""
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def set_constant_labels(self, **labels) -> None:
+        """Etiquetas añadidas a todas las muestras (p. ej. el worker que responde)."""
+        self._const_labels = {name: str(value) for name, value in labels.items()}
+
+    def render(self) -> str:
+        """
+        Genera la exposición en formato de texto de Prometheus.
+
+        Returns:
+            Texto con una sección HELP/TYPE por métrica
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        const_names = tuple(self._const_labels)
+        const_values = tuple(self._const_labels.values())
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for name, labelnames, labelvalues, value in metric.samples():
+                labels = _format_labels(const_names + tuple(labelnames),
+                                        const_values + tuple(labelvalues))
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        """Devuelve la métrica existente o la registra."""
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, documentation, labelnames, **kwargs)
+                self._metrics[name] = metric
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"La métrica {name} ya existe con otro tipo o etiquetas")
+            return metric
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """Obtiene el registro de métricas del proceso."""
+    return _registry
+
+
+def serve_metrics(handler: BaseHTTPRequestHandler, registry: Optional[MetricsRegistry] = None) -> None:
+    """
+    Responde a un GET /metrics desde un handler HTTP existente.
+
+    Args:
+        handler: Handler de la petición
+        registry: Registro a exponer (el del proceso si es None)
+    """
+    body = (registry or _registry).render().encode("utf-8")
+    handler.send_response(200)
+    handler.send_header("Content-Type", CONTENT_TYPE)
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Handler del puerto lateral de métricas."""
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] == "/metrics":
+            serve_metrics(self, self.server.registry)
+        else:
+            self.send_error(404, "Not found")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def metrics_port_from_env(default: int = 0) -> int:
+    """
+    Lee el puerto lateral de métricas de la variable METRICS_PORT.
+
+    Args:
+        default: Valor si la variable no está definida o no es válida
+
+    Returns:
+        Puerto (0 = sin puerto lateral)
+    """
+    try:
+        return max(0, int(os.environ.get("METRICS_PORT", default)))
+    except ValueError:
+        return default
+
+
+def start_metrics_server(port: int, registry: Optional[MetricsRegistry] = None,
+                         host: str = "") -> ThreadingHTTPServer:
+    """
+    Arranca un servidor HTTP que solo sirve /metrics.
+
+    Args:
+        port: Puerto de escucha
+        registry: Registro a exponer (el del proceso si es None)
+        host: Dirección de escucha
+
+    Returns:
+        Servidor en marcha (detener con shutdown())
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry or _registry
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logging.getLogger(__name__).info(f"Métricas en http://{host or '0.0.0.0'}:{port}/metrics")
+    return server
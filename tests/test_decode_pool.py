@@ -0,0 +1,103 @@
+"""
+Pruebas de la coalescencia por dispositivo de DecodePool.
+"""
+
+import threading
+import time
+
+import pytest
+
+from src.camera.decode_pool import DecodePool
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condición no alcanzada")
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def pool():
+    pool = DecodePool(workers=2, name="test-decode")
+    yield pool
+    pool.close()
+
+
+def _blocker(started: threading.Event, release: threading.Event):
+    def run(*_args):
+        started.set()
+        release.wait(2.0)
+    return run
+
+
+def test_pending_frames_of_a_device_are_coalesced(pool):
+    started, release = threading.Event(), threading.Event()
+    done = []
+    pool.submit("phone", _blocker(started, release))
+    assert started.wait(2.0)
+
+    for index in range(4):
+        pool.submit("phone", done.append, index)
+    assert pool.pending_for("phone") == 2
+    release.set()
+
+    _wait_for(lambda: pool.get_stats().completed == 2)
+    assert done == [3]
+    assert pool.get_stats().coalesced == 3
+
+
+def test_devices_do_not_coalesce_each_other(pool):
+    started, release = threading.Event(), threading.Event()
+    done = []
+    pool.submit("a", _blocker(started, release))
+    assert started.wait(2.0)
+
+    pool.submit("b", done.append, "b")
+    pool.submit("c", done.append, "c")
+    _wait_for(lambda: len(done) == 2)
+    release.set()
+
+    assert sorted(done) == ["b", "c"]
+    assert pool.get_stats().coalesced == 0
+
+
+def test_jobs_of_one_device_never_overlap(pool):
+    running = []
+    overlaps = []
+    lock = threading.Lock()
+
+    def job(_index):
+        with lock:
+            if running:
+                overlaps.append(_index)
+            running.append(_index)
+        time.sleep(0.005)
+        with lock:
+            running.remove(_index)
+
+    for index in range(20):
+        pool.submit("phone", job, index)
+        time.sleep(0.001)
+
+    _wait_for(lambda: pool.pending_for("phone") == 0)
+    assert overlaps == []
+
+
+def test_failed_job_does_not_stop_the_pool(pool):
+    done = []
+
+    def fail():
+        raise ValueError("jpeg corrupto")
+
+    pool.submit("phone", fail)
+    _wait_for(lambda: pool.get_stats().failed == 1)
+    pool.submit("phone", done.append, 1)
+    _wait_for(lambda: done == [1])
+
+
+def test_closed_pool_rejects_jobs(pool):
+    pool.close()
+
+    assert not pool.submit("phone", lambda: None)
@@ -0,0 +1,103 @@
+"""Pruebas de la caché de frames codificados (single-flight y límite LRU)."""
+
+import threading
+import time
+
+import numpy as np
+
+from src.camera.encoded_cache import EncodedFrameCache
+from src.camera.frame_bus import FramePacket
+
+
+def test_concurrent_requests_share_one_encode():
+    cache = EncodedFrameCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def factory():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return b'encoded'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_create('k', factory)))
+               for _ in range(8)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    # Los demás hilos quedan esperando a la codificación en curso
+    deadline = time.monotonic() + 5
+    while cache.get_stats()['coalesced'] < 7 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == [b'encoded'] * 8
+    stats = cache.get_stats()
+    assert (stats['misses'], stats['coalesced']) == (1, 7)
+
+
+def test_cached_value_is_a_hit():
+    cache = EncodedFrameCache()
+    cache.get_or_create('k', lambda: b'v')
+
+    assert cache.get_or_create('k', lambda: b'otro') == b'v'
+    assert cache.get_stats()['hits'] == 1
+
+
+def test_failed_encode_is_not_cached():
+    cache = EncodedFrameCache()
+
+    def fail():
+        raise RuntimeError("sin codec")
+
+    assert cache.get_or_create('k', fail) is None
+    assert cache.get_or_create('k', lambda: b'v') == b'v'
+    assert cache.get_stats()['entries'] == 1
+
+
+def test_byte_bound_evicts_least_recently_used():
+    cache = EncodedFrameCache(max_bytes=30)
+    cache.get_or_create('a', lambda: b'a' * 10)
+    cache.get_or_create('b', lambda: b'b' * 10)
+    cache.get_or_create('c', lambda: b'c' * 10)
+    # 'a' pasa a ser la más reciente: la expulsada es 'b'
+    cache.get_or_create('a', lambda: None)
+    cache.get_or_create('d', lambda: b'd' * 10)
+
+    stats = cache.get_stats()
+    assert stats['bytes'] == 30
+    assert stats['evictions'] == 1
+    assert cache.get_or_create('b', lambda: None) is None
+    assert cache.get_or_create('a', lambda: None) == b'a' * 10
+
+
+def test_entry_larger_than_bound_is_not_stored():
+    cache = EncodedFrameCache(max_bytes=10)
+
+    assert cache.get_or_create('big', lambda: b'x' * 11) == b'x' * 11
+    assert cache.get_stats()['bytes'] == 0
+
+
+def test_original_jpeg_is_served_without_encoding():
+    cache = EncodedFrameCache()
+    packet = FramePacket(sequence=1, frame=np.zeros((8, 8, 3), np.uint8), jpeg=b'original')
+
+    assert cache.get(packet, quality=None) == b'original'
+    assert cache.get_stats()['misses'] == 0
+
+
+def test_frames_are_encoded_per_size():
+    cache = EncodedFrameCache()
+    packet = FramePacket(sequence=1, frame=np.zeros((48, 64, 3), np.uint8))
+
+    full = cache.get(packet)
+    small = cache.get(packet, size=(32, 24))
+    assert full[:2] == small[:2] == b'\xff\xd8'
+    assert full != small
+    assert cache.get(packet) is full
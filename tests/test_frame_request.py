@@ -0,0 +1,124 @@
+"""Pruebas del parser de peticiones de frame (límites y cuerpos inválidos)."""
+
+import base64
+import io
+import json
+
+import pytest
+
+from src.network.frame_request import (
+    BodyTooLarge, BufferPool, FrameRequestError, FrameRequestParser, parse_content_length
+)
+
+
+JPEG = b'\xff\xd8\xff\xe0' + bytes(range(64)) + b'\xff\xd9'
+BINARY = {'Content-Type': 'image/jpeg'}
+
+
+def parse(parser, body, headers=None, length=None):
+    return parser.parse(io.BytesIO(body), len(body) if length is None else length, headers or {})
+
+
+def json_body(**fields):
+    fields.setdefault('frame', 'data:image/jpeg;base64,' + base64.b64encode(JPEG).decode())
+    return json.dumps(fields).encode()
+
+
+def test_json_body_is_decoded():
+    parser = FrameRequestParser()
+    request = parse(parser, json_body(timestamp=1234, frameNumber=7, deviceId='phone'))
+
+    assert request.jpeg == JPEG
+    assert request.timestamp == 1234
+    assert request.frame_number == 7
+    assert request.device_id == 'phone'
+
+
+def test_binary_body_uses_headers_and_pool():
+    parser = FrameRequestParser()
+    headers = dict(BINARY, **{'X-Timestamp': '12.5', 'X-Frame-Number': '3', 'X-Device-Id': 'a'})
+    request = parse(parser, JPEG, headers)
+
+    assert request.jpeg == JPEG
+    assert (request.timestamp, request.frame_number, request.device_id) == (12.5, 3, 'a')
+    stats = parser.get_stats()
+    assert stats['bytes_allocated'] > 0
+    assert stats['buffers_in_use'] == 0
+
+
+def test_body_over_limit_is_rejected_before_reading():
+    parser = FrameRequestParser(max_body_size=100)
+    body = io.BytesIO(b'x' * 200)
+
+    with pytest.raises(BodyTooLarge):
+        parser.parse(body, 200, BINARY)
+    assert body.tell() == 0
+    assert parser.get_stats()['requests_rejected'] == 1
+
+
+@pytest.mark.parametrize('length', [None, 0, -1])
+def test_missing_content_length_is_rejected(length):
+    with pytest.raises(FrameRequestError):
+        FrameRequestParser().parse(io.BytesIO(b'{}'), length)
+
+
+def test_truncated_body_is_rejected():
+    with pytest.raises(FrameRequestError):
+        parse(FrameRequestParser(), JPEG, BINARY, length=len(JPEG) + 10)
+
+
+@pytest.mark.parametrize('body', [
+    b'{"timestamp": 1}',
+    b'{"frame": 12}',
+    b'{"frame": "abc',
+    b'{"frame": "data:image/jpeg;base64"}',
+    b'{"frame": "/9j/", "timestamp": }',
+    json_body(frameNumber='abc'),
+    json_body(frameNumber=float('inf')).replace(b'Infinity', b'1.5e400'),
+    json_body(timestamp='ayer'),
+])
+def test_malformed_json_bodies_raise_frame_request_error(body):
+    parser = FrameRequestParser()
+    with pytest.raises(FrameRequestError):
+        parse(parser, body)
+    assert parser.get_stats()['buffers_in_use'] == 0
+
+
+@pytest.mark.parametrize('header, value', [
+    ('X-Frame-Number', 'abc'),
+    ('X-Frame-Number', '1.5'),
+    ('X-Timestamp', 'nan?'),
+])
+def test_malformed_binary_headers_raise_frame_request_error(header, value):
+    with pytest.raises(FrameRequestError):
+        parse(FrameRequestParser(), JPEG, dict(BINARY, **{header: value}))
+
+
+@pytest.mark.parametrize('value, expected', [(None, None), ('', None), ('42', 42)])
+def test_parse_content_length(value, expected):
+    assert parse_content_length(value) == expected
+
+
+@pytest.mark.parametrize('value', ['abc', '-5', '1e3'])
+def test_parse_content_length_rejects_invalid_values(value):
+    with pytest.raises(FrameRequestError):
+        parse_content_length(value)
+
+
+def test_buffer_pool_bounds_buffers_in_flight():
+    pool = BufferPool(max_buffer_size=1024, max_buffers=1)
+    buffer = pool.acquire(10)
+
+    with pytest.raises(TimeoutError):
+        pool.acquire(10, timeout=0.01)
+    pool.release(buffer)
+    assert pool.acquire(10, timeout=0.01) is buffer
+
+
+def test_buffers_are_reused_between_requests():
+    parser = FrameRequestParser()
+    for _ in range(5):
+        parse(parser, json_body())
+    stats = parser.get_stats()
+    assert stats['buffers_free'] == 1
+    assert stats['bytes_allocated'] == BufferPool.GROW_STEP
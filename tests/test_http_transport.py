@@ -0,0 +1,158 @@
+"""Pruebas del transporte HTTP compartido (reintentos, presupuesto y reutilización)."""
+
+import http.server
+import threading
+import time
+
+import pytest
+from urllib3.util.retry import Retry
+
+from src.network import http_transport
+from src.network.http_transport import HttpTransport, TimeoutBudget, _JitteredRetry
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self):
+        server = self.server
+        server.hits[self.path] = server.hits.get(self.path, 0) + 1
+        status = 200
+        if self.path == '/flaky' and server.hits[self.path] <= server.failures:
+            status = 503
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.daemon_threads = True
+    httpd.hits = {}
+    httpd.failures = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def transport():
+    transport = HttpTransport()
+    yield transport
+    transport.close()
+
+
+def test_backoff_is_jittered_within_bounds():
+    retry = _JitteredRetry(total=5, backoff_factor=0.2, backoff_max=2.0)
+    for _ in range(3):
+        retry = retry.increment(method='GET', url='/x', error=ConnectionError())
+
+    upper = Retry.get_backoff_time(retry)
+    samples = {retry.get_backoff_time() for _ in range(50)}
+    assert upper == 0.8
+    assert all(upper / 2 <= sample <= upper for sample in samples)
+    assert len(samples) > 1
+
+
+def test_new_keeps_the_retry_class():
+    retry = _JitteredRetry(total=2).new(total=1)
+    assert isinstance(retry, _JitteredRetry)
+
+
+def test_deadline_exhausts_retries(monkeypatch):
+    retry = _JitteredRetry(total=5, backoff_factor=10.0, backoff_max=10.0)
+    retry = retry.increment(method='GET', url='/x', error=ConnectionError())
+    retry = retry.increment(method='GET', url='/x', error=ConnectionError())
+    assert not retry.is_exhausted()
+
+    # Queda menos tiempo que la espera del siguiente backoff
+    monkeypatch.setattr(http_transport._context, 'state', (None, 'test', time.monotonic() + 1.0),
+                        raising=False)
+    assert retry.is_exhausted()
+
+
+def test_connections_are_reused(server, transport):
+    session = transport.session('reuse', base_url=server.url, pool_size=2)
+    for _ in range(10):
+        assert session.get(f"{server.url}/x").content == b'ok'
+
+    stats = transport.get_stats()['reuse']
+    assert (stats.requests, stats.connections) == (10, 1)
+    assert stats.reuse_ratio == 0.9
+
+
+def test_sessions_share_the_pool(server, transport):
+    transport.session('a').get(f"{server.url}/x")
+    transport.session('b').get(f"{server.url}/x")
+
+    stats = transport.get_stats()
+    assert stats['a'].connections + stats['b'].connections == 1
+
+
+def test_transient_status_is_retried(server, transport):
+    server.failures = 2
+    response = transport.session('retry').get(f"{server.url}/flaky")
+
+    assert response.status_code == 200
+    assert server.hits['/flaky'] == 3
+    assert transport.get_stats()['retry'].retries == 2
+
+
+def test_retries_stop_when_exhausted(server, transport):
+    server.failures = 10
+    response = transport.session('retry', retries=1).get(f"{server.url}/flaky")
+
+    assert response.status_code == 503
+    assert server.hits['/flaky'] == 2
+
+
+def test_total_budget_limits_retries(server, transport):
+    server.failures = 10
+    response = transport.session('budget').get(f"{server.url}/flaky", budget=TimeoutBudget(total=0.05))
+
+    assert response.status_code == 503
+    assert server.hits['/flaky'] <= 2
+
+
+def test_post_is_not_retried(server, transport):
+    server.failures = 10
+    response = transport.session('post').post(f"{server.url}/flaky", data=b'frame')
+
+    assert response.status_code == 503
+    assert server.hits['/flaky'] == 1
+
+
+def test_budget_provides_default_timeout(server, transport, monkeypatch):
+    session = transport.session('timeout', budget=TimeoutBudget(connect=1.0, read=2.0))
+    seen = []
+    original = http_transport.requests.Session.request
+
+    def spy(self, method, url, *args, **kwargs):
+        seen.append(kwargs.get('timeout'))
+        return original(self, method, url, *args, **kwargs)
+
+    monkeypatch.setattr(http_transport.requests.Session, 'request', spy)
+    session.get(f"{server.url}/x")
+    session.get(f"{server.url}/x", timeout=7)
+    assert seen == [(1.0, 2.0), 7]
+
+
+def test_pool_size_is_per_host(transport):
+    transport.size_pool('http://camera.local:8080', 6)
+    transport.size_pool('camera.local:8080', 3)
+
+    assert transport.poolmanager.host_sizes == {('camera.local', 8080): 6}
+    pool = transport.poolmanager.connection_from_host('camera.local', 8080, 'http')
+    assert pool.pool.maxsize == 6
+    assert transport.poolmanager.connection_from_host('other', 80, 'http').pool.maxsize == 4
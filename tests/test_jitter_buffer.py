@@ -0,0 +1,87 @@
+"""Pruebas del buffer de jitter (reordenación y frames tardíos)."""
+
+from src.network.jitter_buffer import JitterBuffer, JitterConfig
+
+
+def numbers(frames):
+    return [frame.frame_number for frame in frames]
+
+
+def test_contiguous_frames_are_released_immediately():
+    buffer = JitterBuffer()
+    assert numbers(buffer.push(1, 0.0, 'a', arrival=0.0)) == [1]
+    assert numbers(buffer.push(2, 33.0, 'b', arrival=0.033)) == [2]
+    assert buffer.pending == 0
+
+
+def test_out_of_order_frames_are_reordered():
+    buffer = JitterBuffer()
+    buffer.push(1, 0.0, None, arrival=0.0)
+    assert buffer.push(3, 66.0, None, arrival=0.066) == []
+    assert buffer.pending == 1
+
+    assert numbers(buffer.push(2, 33.0, None, arrival=0.070)) == [2, 3]
+    assert buffer.get_stats().reordered == 1
+
+
+def test_gap_is_released_after_target_delay():
+    buffer = JitterBuffer(JitterConfig(min_delay_ms=20.0))
+    buffer.push(1, 0.0, None, arrival=0.0)
+    buffer.push(3, 66.0, None, arrival=0.066)
+    deadline = buffer.next_deadline()
+    assert deadline == 0.066 + buffer.target_delay
+
+    assert buffer.poll(now=deadline - 0.005) == []
+    assert numbers(buffer.poll(now=deadline + 0.001)) == [3]
+
+
+def test_late_frame_after_release_is_dropped():
+    buffer = JitterBuffer()
+    buffer.push(1, 0.0, None, arrival=0.0)
+    buffer.push(3, 66.0, None, arrival=0.0)
+    buffer.poll(now=1.0)
+
+    assert buffer.push(2, 33.0, None, arrival=1.0) == []
+    stats = buffer.get_stats()
+    assert stats.late == 1
+    assert stats.dropped == 1
+
+
+def test_duplicate_pending_frame_is_dropped():
+    buffer = JitterBuffer()
+    buffer.push(1, 0.0, None, arrival=0.0)
+    buffer.push(3, 66.0, None, arrival=0.0)
+
+    assert buffer.push(3, 66.0, None, arrival=0.001) == []
+    assert buffer.get_stats().dropped == 1
+
+
+def test_overflow_releases_oldest_without_waiting():
+    buffer = JitterBuffer(JitterConfig(max_frames=2))
+    buffer.push(1, 0.0, None, arrival=0.0)
+    buffer.push(3, 66.0, None, arrival=0.0)
+    buffer.push(4, 99.0, None, arrival=0.0)
+
+    assert numbers(buffer.push(5, 132.0, None, arrival=0.0)) == [3, 4, 5]
+
+
+def test_sender_restart_resets_sequence():
+    buffer = JitterBuffer()
+    buffer.push(10, 1000.0, None, arrival=0.0)
+
+    # Numeración reiniciada con un timestamp más nuevo
+    assert numbers(buffer.push(1, 5000.0, None, arrival=1.0)) == [1]
+    assert buffer.get_stats().late == 0
+
+
+def test_target_delay_tracks_jitter_within_limits():
+    config = JitterConfig(min_delay_ms=20.0, max_delay_ms=200.0)
+    buffer = JitterBuffer(config)
+    assert buffer.target_delay == 0.020
+
+    # Llegadas muy irregulares para frames enviados cada 33 ms
+    arrival = 0.0
+    for number in range(1, 60):
+        arrival += 0.001 if number % 2 else 0.150
+        buffer.push(number, number * 33.0, None, arrival=arrival)
+    assert buffer.target_delay == 0.200
@@ -0,0 +1,120 @@
+"""
+Pruebas del escritor de ficheros en segundo plano.
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from src.utils.media_writer import MediaWriter
+
+
+class _Results:
+    """Recoge los WriteResult de las callbacks."""
+
+    def __init__(self, expected: int):
+        self.expected = expected
+        self.items = []
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, result):
+        with self._lock:
+            self.items.append(result)
+            if len(self.items) == self.expected:
+                self.done.set()
+
+    def by_name(self):
+        assert self.done.wait(5.0), "faltan callbacks de escritura"
+        return {result.path.name: result for result in self.items}
+
+
+@pytest.fixture
+def writer():
+    writer = MediaWriter(max_queue=8)
+    yield writer
+    writer.close()
+
+
+def test_writes_bytes_callables_and_frames(writer, tmp_path):
+    results = _Results(3)
+    frame = np.zeros((16, 16, 3), dtype=np.uint8)
+
+    assert writer.submit(tmp_path / "a" / "raw.jpg", b"\xff\xd8raw", callback=results)
+    assert writer.submit(tmp_path / "a" / "lazy.jpg", lambda: b"lazy", callback=results)
+    assert writer.submit(tmp_path / "b" / "frame.jpg", frame, callback=results)
+
+    written = results.by_name()
+    assert all(result.success for result in written.values())
+    assert (tmp_path / "a" / "raw.jpg").read_bytes() == b"\xff\xd8raw"
+    assert (tmp_path / "a" / "lazy.jpg").read_bytes() == b"lazy"
+    assert (tmp_path / "b" / "frame.jpg").read_bytes()[:2] == b"\xff\xd8"
+    assert written["frame.jpg"].size == (tmp_path / "b" / "frame.jpg").stat().st_size
+    assert writer.get_stats()['written'] == 3
+
+
+def test_missing_data_fails_only_that_file(writer, tmp_path):
+    results = _Results(2)
+
+    writer.submit(tmp_path / "none.jpg", None, callback=results)
+    writer.submit(tmp_path / "ok.jpg", b"ok", callback=results)
+
+    written = results.by_name()
+    assert not written["none.jpg"].success
+    assert written["ok.jpg"].success
+    assert writer.get_stats()['failed'] == 1
+
+
+def test_full_queue_rejects_instead_of_blocking(tmp_path):
+    writer = MediaWriter(max_queue=1, batch_size=1)
+    release = threading.Event()
+    results = _Results(2)
+
+    def slow():
+        release.wait(5.0)
+        return b"slow"
+
+    try:
+        assert writer.submit(tmp_path / "slow.jpg", slow, callback=results)
+        # Esperar a que el hilo tome el primer trabajo y la cola quede libre
+        for _ in range(200):
+            if writer.backlog == 0:
+                break
+            release.wait(0.005)
+        assert writer.submit(tmp_path / "queued.jpg", b"q", callback=results)
+        assert not writer.submit(tmp_path / "rejected.jpg", b"r")
+        assert writer.get_stats()['rejected'] == 1
+    finally:
+        release.set()
+    assert set(results.by_name()) == {"slow.jpg", "queued.jpg"}
+    writer.close()
+
+
+def test_fsync_failure_fails_only_that_file(writer, tmp_path, monkeypatch):
+    import src.utils.media_writer as media_writer
+
+    real_fsync = media_writer.os.fsync
+
+    def fsync(fd):
+        # Falla solo el fichero de 3 bytes
+        if media_writer.os.fstat(fd).st_size == 3:
+            raise OSError(5, "Input/output error")
+        real_fsync(fd)
+
+    monkeypatch.setattr(media_writer.os, "fsync", fsync)
+    results = _Results(3)
+
+    writer.submit(tmp_path / "first.jpg", b"first", callback=results)
+    writer.submit(tmp_path / "bad.jpg", b"bad", callback=results)
+    writer.submit(tmp_path / "last.jpg", b"last!", callback=results)
+
+    written = results.by_name()
+    assert not written["bad.jpg"].success
+    assert written["first.jpg"].success
+    assert written["last.jpg"].success
+
+    # El hilo escritor sigue vivo
+    after = _Results(1)
+    writer.submit(tmp_path / "after.jpg", b"after", callback=after)
+    assert after.by_name()["after.jpg"].success
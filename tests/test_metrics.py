@@ -0,0 +1,109 @@
+"""
+Pruebas del registro de métricas y de su formato de texto de Prometheus.
+"""
+
+import gc
+import threading
+import urllib.request
+
+import pytest
+
+from src.utils.metrics import CONTENT_TYPE, MetricsRegistry, start_metrics_server
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def _lines(registry):
+    return registry.render().splitlines()
+
+
+def test_counter_shards_of_all_threads_are_merged(registry):
+    counter = registry.counter("test_events_total", "Eventos", ("kind",))
+
+    def work():
+        for _ in range(1000):
+            counter.inc(kind="a")
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc(2.5, kind="b")
+
+    # Los shards de los hilos terminados se consolidan sin perder cuentas
+    assert 'test_events_total{kind="a"} 8000' in _lines(registry)
+    assert 'test_events_total{kind="b"} 2.5' in _lines(registry)
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    histogram = registry.histogram("test_latency_seconds", "Latencia", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+
+    lines = _lines(registry)
+    assert 'test_latency_seconds_bucket{le="0.1"} 2' in lines
+    assert 'test_latency_seconds_bucket{le="1"} 3' in lines
+    assert 'test_latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert 'test_latency_seconds_sum 3.65' in lines
+    assert 'test_latency_seconds_count 4' in lines
+
+
+def test_render_has_help_type_and_escaped_labels(registry):
+    gauge = registry.gauge("test_temperature", "Temperatura", ("sensor",))
+    gauge.set(21.5, sensor='sala "norte"\\1')
+
+    assert _lines(registry) == [
+        "# HELP test_temperature Temperatura",
+        "# TYPE test_temperature gauge",
+        'test_temperature{sensor="sala \\"norte\\"\\\\1"} 21.5',
+    ]
+
+
+def test_constant_labels_prefix_every_sample(registry):
+    registry.counter("test_requests_total", "Peticiones", ("route",)).inc(route="/x")
+    registry.set_constant_labels(worker="2")
+
+    assert 'test_requests_total{worker="2",route="/x"} 1' in _lines(registry)
+
+
+def test_gauge_functions_of_destroyed_objects_are_dropped(registry):
+    gauge = registry.gauge("test_backlog", "Pendientes")
+
+    class Owner:
+        def value(self):
+            return 7
+
+    owner = Owner()
+    gauge.set_function(owner.value)
+    assert "test_backlog 7" in _lines(registry)
+
+    del owner
+    gc.collect()
+    assert not any(line.startswith("test_backlog ") for line in _lines(registry))
+
+
+def test_same_name_returns_the_same_metric(registry):
+    first = registry.counter("test_shared_total", "Compartida", ("a",))
+
+    assert registry.counter("test_shared_total", "Compartida", ("a",)) is first
+    with pytest.raises(ValueError):
+        registry.gauge("test_shared_total", "Compartida", ("a",))
+
+
+def test_metrics_server_serves_the_registry(registry):
+    registry.counter("test_scrapes_total", "Scrapes").inc()
+    server = start_metrics_server(0, registry=registry, host="127.0.0.1")
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = response.read().decode("utf-8")
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert "test_scrapes_total 1" in body.splitlines()
@@ -0,0 +1,140 @@
+"""Pruebas del lector del anillo y del control de tasa de la ingesta multiproceso."""
+
+import struct
+
+import pytest
+
+from src.camera.frame_bus import FrameSlot
+from src.network.ingest import FrameIngest
+from src.network.multiprocess_ingest import MultiProcessIngest, WorkerContext
+from src.network.rate_control import RateController, RateTarget
+from src.network.shm_ring import SharedControlTable, SharedFrameRing
+
+
+class RecordingIngest:
+    """FrameIngest mínimo que guarda lo que recibe."""
+
+    def __init__(self):
+        self.frames = []
+        self.rate_controller = RateController()
+
+    def control_for(self, device_id):
+        return self.rate_controller.update(device_id).to_dict()
+
+    def enqueue(self, frame_data, timestamp=None, frame_number=None, device_id=""):
+        self.frames.append((device_id, frame_number, frame_data))
+
+
+@pytest.fixture
+def ring():
+    ring = SharedFrameRing(slots=4, slot_size=1024)
+    yield ring
+    ring.close()
+
+
+@pytest.fixture
+def controls():
+    controls = SharedControlTable(devices=4)
+    yield controls
+    controls.close()
+
+
+def reader(ingest):
+    return MultiProcessIngest(None, 'app', 0, 0, ingest)
+
+
+def test_every_device_reaches_the_ingest(ring):
+    ingest = RecordingIngest()
+    multiprocess = reader(ingest)
+    ring.write(b'a1', 1.0, 1, 'a')
+    ring.write(b'b1', 1.0, 1, 'b')
+    ring.write(b'a2', 2.0, 2, 'a')
+
+    assert multiprocess._drain(ring, 0) == 3
+    # Un dispositivo no oculta a otro aunque escriba el último
+    assert ingest.frames == [('a', 1, b'a1'), ('b', 1, b'b1'), ('a', 2, b'a2')]
+    assert multiprocess.get_stats()['frames_read'] == 3
+
+
+def test_only_new_sequences_are_read(ring):
+    ingest = RecordingIngest()
+    multiprocess = reader(ingest)
+    last = multiprocess._drain(ring, ring.write(b'old', 1.0, 1, 'a'))
+    ring.write(b'new', 2.0, 2, 'a')
+
+    assert multiprocess._drain(ring, last) == 2
+    assert ingest.frames == [('a', 2, b'new')]
+
+
+def test_overwritten_slots_count_as_overruns(ring):
+    ingest = RecordingIngest()
+    multiprocess = reader(ingest)
+    for number in range(1, 7):
+        ring.write(b'x%d' % number, float(number), number, 'a')
+
+    multiprocess._drain(ring, 0)
+
+    assert [number for _, number, _ in ingest.frames] == [3, 4, 5, 6]
+    assert multiprocess.overruns == 2
+
+
+def test_slot_being_written_is_skipped(ring):
+    ingest = RecordingIngest()
+    multiprocess = reader(ingest)
+    ring.write(b'a1', 1.0, 1, 'a')
+    sequence = ring.write(b'a2', 2.0, 2, 'a')
+    offset = ring._slot_offset(sequence % ring.slots)
+    version = struct.unpack_from("<Q", ring._shm.buf, offset)[0]
+    struct.pack_into("<Q", ring._shm.buf, offset, version + 1)
+
+    multiprocess._drain(ring, 0)
+
+    assert [number for _, number, _ in ingest.frames] == [1]
+    assert multiprocess.torn_reads == 1
+
+
+def test_ring_frames_use_the_per_device_jitter_buffers(ring):
+    ingest = FrameIngest(FrameSlot(), decode_workers=1)
+    multiprocess = reader(ingest)
+    try:
+        ring.write(b'a1', 0.0, 1, 'a')
+        ring.write(b'b1', 0.0, 1, 'b')
+        ring.write(b'a3', 66.0, 3, 'a')
+
+        multiprocess._drain(ring, 0)
+
+        stats = ingest.get_stats()
+        assert set(stats) == {'a', 'b'}
+        # El 3 de 'a' espera al 2 en su buffer; 'b' no se ve afectado
+        assert (stats['a'].received, stats['a'].released) == (2, 1)
+        assert (stats['b'].received, stats['b'].released) == (1, 1)
+    finally:
+        ingest.close()
+
+
+def test_parent_publishes_the_control_it_computes(ring, controls):
+    ingest = RecordingIngest()
+    multiprocess = reader(ingest)
+    multiprocess._controls = controls
+    ring.write(b'a1', 1.0, 1, 'a')
+    ring.write(b'b1', 1.0, 1, 'b')
+
+    multiprocess._drain(ring, 0)
+
+    assert controls.lookup('a') == RateTarget().to_dict()
+    assert ingest.rate_controller.device_ids() == ['a', 'b']
+
+    # Un objetivo degradado en el proceso principal llega a los workers
+    degraded = RateTarget(fps=4.0, width=320, height=240, quality=0.5)
+    ingest.control_for = lambda device_id: degraded.to_dict()
+    ring.write(b'a2', 2.0, 2, 'a')
+    multiprocess._drain(ring, 2)
+
+    worker_controls = SharedControlTable(controls.name, create=False)
+    try:
+        worker = WorkerContext(ring, worker_controls, None)
+        assert worker.ingest.control_for('a') == degraded.to_dict()
+        assert worker.ingest.control_for('b') == RateTarget().to_dict()
+        assert worker.ingest.control_for('unknown') == RateTarget().to_dict()
+    finally:
+        worker_controls.close()
@@ -0,0 +1,101 @@
+"""
+Pruebas de las decisiones de RateController.
+"""
+
+import pytest
+
+from src.network.rate_control import RateControlConfig, RateController
+
+
+def _arrivals(controller, device_id, fps, start, seconds=1.0):
+    """Registra llegadas a `fps` durante `seconds` desde `start`."""
+    count = int(fps * seconds)
+    for index in range(count):
+        controller.record_arrival(device_id, now=start + index * seconds / count)
+    return start + seconds
+
+
+def _controller():
+    controller = RateController(RateControlConfig())
+    controller.record_arrival("phone", now=0.0)
+    return controller
+
+
+def test_slow_link_lowers_quality_first():
+    controller = _controller()
+    now = _arrivals(controller, "phone", 3, 0.0)
+
+    target = controller.update("phone", now=now)
+
+    assert target.quality == pytest.approx(0.7)
+    assert (target.width, target.height) == (640, 480)
+    assert target.fps == 10.0
+
+
+def test_slow_decode_lowers_resolution_first():
+    controller = _controller()
+    controller.record_decode("phone", 0.2)
+    now = _arrivals(controller, "phone", 10, 0.0)
+
+    target = controller.update("phone", now=now)
+
+    assert (target.width, target.height) == (480, 360)
+    assert target.fps == 10.0
+    assert target.quality == 0.8
+
+
+def test_deep_queue_counts_as_cpu_overload():
+    controller = _controller()
+    now = _arrivals(controller, "phone", 10, 0.0)
+
+    target = controller.update("phone", queue_depth=5, now=now)
+
+    assert (target.width, target.height) == (480, 360)
+
+
+def test_cpu_overload_at_lowest_resolution_lowers_fps():
+    controller = _controller()
+    controller.record_decode("phone", 0.5)
+    now = 0.0
+    for _ in range(3):
+        now = _arrivals(controller, "phone", 10, now)
+        target = controller.update("phone", now=now)
+
+    assert (target.width, target.height) == (320, 240)
+    assert target.fps == 7.5
+
+
+def test_stable_link_recovers_fps():
+    controller = _controller()
+    now = 0.0
+    for _ in range(3):
+        now = _arrivals(controller, "phone", 10, now)
+        target = controller.update("phone", now=now)
+
+    assert target.fps == 11.0
+
+
+def test_updates_are_rate_limited_to_the_interval():
+    controller = _controller()
+    now = _arrivals(controller, "phone", 3, 0.0)
+    first = controller.update("phone", now=now)
+
+    second = controller.update("phone", now=now + 0.5)
+
+    assert second == first
+
+
+def test_idle_devices_stop_sharing_the_decode_budget():
+    controller = RateController(RateControlConfig())
+    controller.record_arrival("old", now=0.0)
+    controller.record_arrival("phone", now=5.0)
+    # 30 ms por frame: dentro del presupuesto de un dispositivo (50 ms),
+    # fuera del de dos (25 ms)
+    controller.record_decode("phone", 0.03)
+    now = 5.0
+    for _ in range(3):
+        now = _arrivals(controller, "phone", 10, now)
+        target = controller.update("phone", now=now)
+
+    assert controller.device_ids() == ["phone"]
+    assert (target.width, target.height) == (640, 480)
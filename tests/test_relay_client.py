@@ -0,0 +1,265 @@
+"""Pruebas del cliente del relay: lector incremental de JSON, polling y fleet."""
+
+import io
+import json
+import threading
+import time
+
+import pytest
+import requests
+from PIL import Image
+
+from src.network.relay_client import (
+    AdaptivePoller, RelayClient, RelayFrame, RelaySubscription, iter_json_array
+)
+from src.network.relay_server import RelayServer
+
+
+DOCUMENT = {
+    'cursor': 12,
+    'reset': False,
+    'frames': [
+        {'frame': 'data:image/jpeg;base64,/9j/AAAA', 'timestamp': 1.5, 'frameNumber': 11},
+        {'frame': 'ñandú "comillas" \\ barra', 'timestamp': 2, 'frameNumber': 12},
+    ],
+    'count': 2,
+}
+
+
+def chunked(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, 100000])
+def test_any_chunking_yields_the_same_elements(size):
+    metadata = {}
+    data = json.dumps(DOCUMENT, ensure_ascii=False).encode('utf-8')
+
+    items = list(iter_json_array(chunked(data, size), 'frames', metadata))
+
+    assert items == DOCUMENT['frames']
+    assert metadata == {'cursor': 12, 'reset': False, 'count': 2}
+
+
+def test_elements_are_yielded_before_the_document_ends():
+    def chunks():
+        yield b'{"cursor": 3, "frames": [{"frameNumber": 1},'
+        yield b' {"frameNumber": 2}'
+        raise AssertionError("se leyó más de lo necesario")
+
+    items = iter_json_array(chunks())
+    assert next(items) == {'frameNumber': 1}
+    assert next(items) == {'frameNumber': 2}
+
+
+def test_number_split_across_chunks_is_not_truncated():
+    items = list(iter_json_array([b'{"frames": [12', b'34, 5', b'6]}']))
+    assert items == [1234, 56]
+
+
+def test_text_chunks_are_accepted():
+    assert list(iter_json_array(['{"frames"', ': [1, 2]}'])) == [1, 2]
+
+
+@pytest.mark.parametrize('document', [b'{}', b'{"frames": []}', b'{"cursor": 1}'])
+def test_missing_or_empty_array_yields_nothing(document):
+    assert list(iter_json_array([document])) == []
+
+
+def test_other_key_is_iterated():
+    metadata = {}
+    items = list(iter_json_array([b'{"waited": true, "devices": [{"id": "a"}]}'], 'devices', metadata))
+    assert items == [{'id': 'a'}]
+    assert metadata == {'waited': True}
+
+
+@pytest.mark.parametrize('document', [
+    b'[1, 2]',
+    b'{"frames": [1, 2',
+    b'{"frames": [1; 2]}',
+    b'{"frames": [1] "count": 1}',
+])
+def test_invalid_documents_raise_value_error(document):
+    with pytest.raises(ValueError):
+        list(iter_json_array([document]))
+
+
+def test_relay_frame_from_json():
+    frame = RelayFrame.from_json({'frame': 'abc', 'timestamp': 1.0, 'frameNumber': '4', 'deviceId': 'x'})
+    assert (frame.payload, frame.timestamp, frame.frame_number, frame.device_id) == ('abc', 1.0, 4, 'x')
+
+
+def _frame(number: int) -> RelayFrame:
+    return RelayFrame(frame=f"f{number}", timestamp=1000.0 + number * 100, frame_number=number)
+
+
+def _poll(poller: AdaptivePoller, until, timeout: float = 3.0):
+    """Ejecuta el poller hasta que `until(entregados)` sea cierto."""
+    delivered = []
+    stop = threading.Event()
+
+    def deliver(frame):
+        delivered.append(frame.frame_number)
+        if until(delivered):
+            stop.set()
+
+    runner = threading.Thread(target=poller.run, args=(deliver, stop), daemon=True)
+    runner.start()
+    stop.wait(timeout)
+    stop.set()
+    runner.join(timeout)
+    return delivered
+
+
+def test_poller_discards_responses_older_than_the_delivered_frame():
+    # La primera petición tarda más que la segunda y llega desordenada
+    responses = [(0.2, _frame(1)), (0.0, _frame(2)), (0.3, _frame(3))]
+    lock = threading.Lock()
+
+    def fetch():
+        with lock:
+            delay, frame = responses.pop(0) if responses else (0.0, None)
+        time.sleep(delay)
+        return frame
+
+    poller = AdaptivePoller(fetch, max_in_flight=3, interval=0.02, min_interval=0.01)
+    delivered = _poll(poller, lambda delivered: 3 in delivered)
+
+    assert delivered == [2, 3]
+    assert poller.stale == 1
+
+
+def test_poller_follows_the_sender_rate():
+    numbers = iter(range(1, 1000))
+
+    def fetch():
+        # Emisor a 20 fps (50 ms entre timestamps) que pierde un frame de cada dos
+        number = next(numbers) * 2
+        return RelayFrame(frame="", timestamp=number * 50.0, frame_number=number)
+
+    poller = AdaptivePoller(fetch, max_in_flight=1, interval=0.01, min_interval=0.01)
+    _poll(poller, lambda delivered: len(delivered) >= 5)
+
+    assert poller.frame_interval == pytest.approx(0.05)
+    assert poller.stale == 0
+
+
+def test_poller_raises_after_consecutive_errors():
+    def fetch():
+        raise ConnectionError("relay caído")
+
+    poller = AdaptivePoller(fetch, max_in_flight=2, interval=0.01, min_interval=0.01)
+
+    with pytest.raises(ConnectionError):
+        poller.run(lambda frame: None, threading.Event())
+    assert poller.errors >= 2
+
+
+def _jpeg() -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), (10, 120, 200)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+JPEG = _jpeg()
+
+
+@pytest.fixture
+def relay():
+    server = RelayServer('127.0.0.1', 0, history_size=5)
+    server.start()
+    yield f"http://127.0.0.1:{server.port}"
+    server.stop()
+
+
+def _send(url: str, number: int, device: str) -> None:
+    response = requests.post(f"{url}/api/frame", data=JPEG, timeout=5, headers={
+        'Content-Type': 'image/jpeg',
+        'X-Frame-Number': str(number),
+        'X-Timestamp': str(1000.0 + number),
+        'X-Device-Id': device,
+    })
+    assert response.status_code == 200
+
+
+def test_concurrent_fetches_deliver_each_frame_once(relay):
+    client = RelayClient(relay)
+    for number in range(1, 6):
+        _send(relay, number, 'phone')
+
+    barrier = threading.Barrier(8)
+    delivered = []
+
+    def fetch():
+        barrier.wait()
+        frame = client.fetch_latest_jpeg()
+        if frame is not None:
+            delivered.append(frame.frame_number)
+
+    threads = [threading.Thread(target=fetch) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5.0)
+
+    assert delivered == [5]
+    assert client.cursor == 5
+    assert client.stats.requests == 8
+    assert client.stats.frames_received == 1
+
+    # Una respuesta atrasada no hace retroceder el cursor
+    _send(relay, 6, 'phone')
+    assert client.fetch_latest_jpeg().frame_number == 6
+    assert client.stats.frames_skipped == 0
+    assert client._advance(RelayFrame(frame="", timestamp=None, frame_number=5)) is None
+    assert client.cursor == 6
+
+
+def test_iter_fleet_keeps_a_cursor_per_device(relay):
+    client = RelayClient(relay)
+    _send(relay, 1, 'a')
+    _send(relay, 1, 'b')
+    _send(relay, 2, 'a')
+
+    frames = {frame.device_id: frame.frame_number for frame in client.iter_fleet()}
+    assert frames == {'a': 2, 'b': 1}
+    assert client.device_cursors == {'a': 2, 'b': 1}
+
+    # Solo 'b' tiene algo nuevo; los intermedios no se descargan
+    _send(relay, 2, 'b')
+    _send(relay, 3, 'b')
+    assert [(f.device_id, f.frame_number) for f in client.iter_fleet()] == [('b', 3)]
+    assert client.stats.frames_skipped == 1
+    assert list(client.iter_fleet()) == []
+
+
+def test_iter_fleet_filters_devices(relay):
+    client = RelayClient(relay)
+    _send(relay, 1, 'a')
+    _send(relay, 1, 'b')
+
+    assert [frame.device_id for frame in client.iter_fleet(ids=['b'])] == ['b']
+    assert client.device_cursors == {'b': 1}
+
+
+def test_fleet_subscription_routes_frames_of_every_device(relay):
+    received = {}
+    done = threading.Event()
+
+    def on_frame(frame):
+        received.setdefault(frame.device_id, []).append(frame.frame_number)
+        if received.get('a', [])[-1:] == [2] and received.get('b', [])[-1:] == [1]:
+            done.set()
+
+    subscription = RelaySubscription(RelayClient(relay), on_frame, fleet=True, wait=1.0)
+    subscription.start()
+    try:
+        _send(relay, 1, 'a')
+        _send(relay, 1, 'b')
+        _send(relay, 2, 'a')
+        assert done.wait(5.0)
+        assert subscription.mode == 'fleet'
+    finally:
+        subscription.stop()
+
+    assert set(received) == {'a', 'b'}
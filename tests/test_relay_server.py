@@ -0,0 +1,193 @@
+"""Pruebas del contrato HTTP del relay asyncio (el mismo que el del Worker)."""
+
+import io
+import time
+
+import pytest
+import requests
+from PIL import Image
+
+from src.network.relay_server import RelayServer
+
+
+def make_jpeg(width=640, height=480, color=(200, 30, 30)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+JPEG = make_jpeg()
+
+
+@pytest.fixture
+def relay():
+    server = RelayServer('127.0.0.1', 0, history_size=5)
+    server.start()
+    yield f"http://127.0.0.1:{server.port}"
+    server.stop()
+
+
+def send(url, number, device='phone', jpeg=JPEG, timestamp=None):
+    response = requests.post(f"{url}/api/frame", data=jpeg, timeout=5, headers={
+        'Content-Type': 'image/jpeg',
+        'X-Frame-Number': str(number),
+        'X-Timestamp': str(1000.0 + number if timestamp is None else timestamp),
+        'X-Device-Id': device,
+    })
+    assert response.status_code == 200
+    return response
+
+
+def test_frames_after_cursor(relay):
+    for number in range(1, 4):
+        send(relay, number)
+
+    data = requests.get(f"{relay}/api/frames", params={'after': 1}, timeout=5).json()
+    assert [frame['frameNumber'] for frame in data['frames']] == [2, 3]
+    assert data['cursor'] == 3
+    assert data['reset'] is False
+
+    data = requests.get(f"{relay}/api/frames", params={'after': 3}, timeout=5).json()
+    assert data['frames'] == []
+    assert data['count'] == 0
+
+
+def test_cursor_ahead_of_relay_resets(relay):
+    send(relay, 1)
+
+    data = requests.get(f"{relay}/api/frames", params={'after': 50}, timeout=5).json()
+    assert data['reset'] is True
+    assert [frame['frameNumber'] for frame in data['frames']] == [1]
+
+
+def test_history_is_bounded(relay):
+    for number in range(1, 9):
+        send(relay, number)
+
+    data = requests.get(f"{relay}/api/frames", timeout=5).json()
+    assert [frame['frameNumber'] for frame in data['frames']] == [4, 5, 6, 7, 8]
+
+
+def test_late_frame_does_not_replace_latest(relay):
+    for number in range(1, 4):
+        send(relay, number)
+    # Frame 2 repetido con su timestamp original: llegó tarde, no es un reinicio
+    send(relay, 2)
+
+    data = requests.get(f"{relay}/api/frames", params={'after': 0}, timeout=5).json()
+    assert [frame['frameNumber'] for frame in data['frames']] == [1, 2, 3]
+    assert data['cursor'] == 3
+
+
+def test_sender_restart_clears_history(relay):
+    for number in range(1, 4):
+        send(relay, number)
+    # Numeración reiniciada con un reloj más nuevo
+    send(relay, 1, timestamp=5000.0)
+
+    data = requests.get(f"{relay}/api/frames", params={'after': 0}, timeout=5).json()
+    assert [frame['frameNumber'] for frame in data['frames']] == [1]
+    assert data['cursor'] == 1
+
+
+def test_latest_frame_etag_and_304(relay):
+    send(relay, 1)
+
+    response = requests.get(f"{relay}/api/latest-frame", timeout=5)
+    etag = response.headers['ETag']
+    assert response.json()['frame']['frameNumber'] == 1
+
+    response = requests.get(f"{relay}/api/latest-frame", headers={'If-None-Match': etag}, timeout=5)
+    assert response.status_code == 304
+    assert response.content == b''
+
+    send(relay, 2)
+    response = requests.get(f"{relay}/api/latest-frame", headers={'If-None-Match': etag}, timeout=5)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_latest_jpeg_is_served_raw(relay):
+    send(relay, 7, device='a')
+
+    response = requests.get(f"{relay}/api/latest-frame.jpg", timeout=5)
+    assert response.content == JPEG
+    assert response.headers['Content-Type'] == 'image/jpeg'
+    assert response.headers['X-Frame-Number'] == '7'
+    assert response.headers['X-Device-Id'] == 'a'
+
+
+def test_latest_jpeg_long_poll(relay):
+    send(relay, 1)
+
+    started = time.monotonic()
+    response = requests.get(f"{relay}/api/latest-frame.jpg", params={'after': 1, 'wait': 200}, timeout=5)
+    assert response.status_code == 204
+    assert time.monotonic() - started >= 0.15
+
+
+def test_width_variant(relay):
+    send(relay, 1)
+
+    original = requests.get(f"{relay}/api/latest-frame.jpg", timeout=5)
+    response = requests.get(f"{relay}/api/latest-frame.jpg", params={'w': 300}, timeout=5)
+
+    # 300 se redondea al escalón 320 de la escalera de variantes
+    assert response.headers['X-Width'] == '320'
+    assert '-w320' in response.headers['ETag']
+    assert response.headers['ETag'] != original.headers['ETag']
+    assert Image.open(io.BytesIO(response.content)).size == (320, 240)
+    assert len(response.content) < len(original.content)
+
+    data = requests.get(f"{relay}/api/latest-frame", params={'w': 300}, timeout=5).json()
+    assert data['frame']['width'] == 320
+
+
+def test_width_wider_than_frame_serves_original(relay):
+    send(relay, 1, jpeg=make_jpeg(160, 120))
+
+    response = requests.get(f"{relay}/api/latest-frame.jpg", params={'w': 640}, timeout=5)
+    assert Image.open(io.BytesIO(response.content)).size == (160, 120)
+
+
+def test_device_routes(relay):
+    send(relay, 1, device='a')
+    send(relay, 1, device='b')
+    send(relay, 2, device='a')
+
+    devices = requests.get(f"{relay}/api/devices", timeout=5).json()
+    assert {device['id']: device['framesReceived'] for device in devices['devices']} == {'a': 2, 'b': 1}
+
+    scoped = requests.get(f"{relay}/api/devices/b/latest-frame.jpg", timeout=5)
+    assert scoped.headers['X-Device-Id'] == 'b'
+    query = requests.get(f"{relay}/api/latest-frame.jpg", params={'device': 'b'}, timeout=5)
+    assert query.headers['ETag'] == scoped.headers['ETag']
+
+    frames = requests.get(f"{relay}/api/devices/a/frames", timeout=5).json()
+    assert [frame['frameNumber'] for frame in frames['frames']] == [1, 2]
+
+    # Las rutas sin dispositivo siguen al último que envió
+    assert requests.get(f"{relay}/api/latest-frame.jpg", timeout=5).headers['X-Device-Id'] == 'a'
+
+
+def test_devices_latest_uses_per_device_cursors(relay):
+    send(relay, 3, device='a')
+    send(relay, 5, device='b')
+
+    data = requests.get(f"{relay}/api/devices/latest", params={'after': 'a:3'}, timeout=5).json()
+    # 'a' no tiene nada nuevo; 'b' no viene en `after` y cuenta como cursor 0
+    assert [(entry['id'], entry['cursor']) for entry in data['devices']] == [('b', 5)]
+
+    data = requests.get(f"{relay}/api/devices/latest", params={'ids': 'a'}, timeout=5).json()
+    assert [entry['id'] for entry in data['devices']] == ['a']
+    assert data['devices'][0]['frame']['frameNumber'] == 3
+
+
+def test_unknown_route_is_404(relay):
+    assert requests.get(f"{relay}/api/nope", timeout=5).status_code == 404
+
+
+def test_invalid_upload_is_400(relay):
+    response = requests.post(f"{relay}/api/frame", data=b'x', timeout=5,
+                             headers={'Content-Type': 'image/jpeg', 'X-Frame-Number': 'abc'})
+    assert response.status_code == 400
@@ -0,0 +1,130 @@
+"""Pruebas del anillo de frames y de la tabla de control en memoria compartida."""
+
+import struct
+
+import pytest
+
+from src.network.shm_ring import SharedControlTable, SharedFrameRing
+
+
+@pytest.fixture
+def ring():
+    ring = SharedFrameRing(slots=4, slot_size=1024)
+    yield ring
+    ring.close()
+
+
+def test_write_and_read_round_trip(ring):
+    sequence = ring.write(b'jpeg-1', timestamp=123.5, frame_number=7, device_id='phone')
+    entry = ring.read(sequence)
+
+    assert ring.sequence == sequence == 1
+    assert bytes(entry.payload) == b'jpeg-1'
+    assert (entry.timestamp, entry.frame_number, entry.device_id) == (123.5, 7, 'phone')
+    assert ring.is_valid(entry)
+    entry.payload.release()
+
+
+def test_missing_metadata_reads_as_none(ring):
+    entry = ring.read(ring.write(b'x'))
+
+    assert entry.timestamp is None
+    assert entry.frame_number is None
+    assert entry.device_id == ""
+    entry.payload.release()
+
+
+def test_slot_being_written_is_not_read(ring):
+    sequence = ring.write(b'frame')
+    offset = ring._slot_offset(sequence % ring.slots)
+    version = struct.unpack_from("<Q", ring._shm.buf, offset)[0]
+
+    # Versión impar: un escritor está a mitad del slot
+    struct.pack_into("<Q", ring._shm.buf, offset, version + 1)
+    assert ring.read(sequence) is None
+
+    struct.pack_into("<Q", ring._shm.buf, offset, version + 2)
+    entry = ring.read(sequence)
+    assert entry is not None
+    entry.payload.release()
+
+
+def test_overwritten_entry_is_detected(ring):
+    first = ring.read(ring.write(b'old'))
+    for number in range(ring.slots):
+        ring.write(b'new-%d' % number)
+
+    # El slot se reutilizó mientras el lector tenía la entrada
+    assert not ring.is_valid(first)
+    assert ring.read(first.sequence) is None
+    first.payload.release()
+
+
+def test_unread_sequences_are_rejected(ring):
+    assert ring.read(0) is None
+    assert ring.read(ring.write(b'a') + 1) is None
+
+
+def test_payload_larger_than_slot_is_rejected(ring):
+    with pytest.raises(ValueError):
+        ring.write(b'x' * (ring.slot_size + 1))
+
+
+def test_second_handle_sees_writes(ring):
+    reader = SharedFrameRing(ring.name, slots=4, slot_size=1024, create=False)
+    try:
+        sequence = ring.write(b'shared', device_id='a')
+        entry = reader.read(reader.sequence)
+        assert entry.sequence == sequence
+        assert bytes(entry.payload) == b'shared'
+        entry.payload.release()
+    finally:
+        reader.close()
+
+
+CONTROL = {'fps': 10.0, 'width': 640, 'height': 480, 'quality': 0.8}
+
+
+@pytest.fixture
+def controls():
+    controls = SharedControlTable(devices=2)
+    yield controls
+    controls.close()
+
+
+def test_control_is_read_from_another_handle(controls):
+    reader = SharedControlTable(controls.name, create=False)
+    try:
+        assert reader.lookup('a') is None
+        controls.publish('a', CONTROL)
+        controls.publish('', dict(CONTROL, fps=5.0))
+        assert reader.lookup('a') == CONTROL
+        assert reader.lookup('')['fps'] == 5.0
+
+        controls.publish('a', dict(CONTROL, width=320, height=240))
+        assert (reader.lookup('a')['width'], reader.lookup('a')['height']) == (320, 240)
+    finally:
+        reader.close()
+
+
+def test_full_table_reuses_the_oldest_entry(controls):
+    controls.publish('a', CONTROL)
+    controls.publish('b', CONTROL)
+    controls.publish('a', dict(CONTROL, fps=8.0))
+    controls.publish('c', CONTROL)
+
+    # 'b' es el publicado hace más tiempo
+    assert controls.lookup('b') is None
+    assert controls.lookup('a')['fps'] == 8.0
+    assert controls.lookup('c') == CONTROL
+
+
+def test_control_being_written_is_not_read(controls):
+    controls.publish('a', CONTROL)
+    version = struct.unpack_from("<Q", controls._shm.buf, 0)[0]
+
+    struct.pack_into("<Q", controls._shm.buf, 0, version + 1)
+    assert controls.lookup('a') is None
+
+    struct.pack_into("<Q", controls._shm.buf, 0, version + 2)
+    assert controls.lookup('a') == CONTROL
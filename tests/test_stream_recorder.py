@@ -0,0 +1,104 @@
+"""
+Pruebas del pacing por timestamp de StreamRecorder.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.camera.stream_manager import StreamRecorder
+
+
+class _FakeWriter:
+    """VideoWriter en memoria que guarda los frames escritos."""
+
+    def __init__(self):
+        self.frames = []
+
+    def write(self, frame):
+        self.frames.append(int(frame[0, 0]))
+
+    def release(self):
+        pass
+
+
+def _frame(value: int) -> np.ndarray:
+    return np.full((2, 2), value, dtype=np.uint8)
+
+
+@pytest.fixture
+def recorder():
+    # 10 fps: una ranura cada 100 ms; max_gap de 1 s = 10 ranuras
+    rec = StreamRecorder(Path("unused.mp4"), fps=10.0, max_gap=1.0)
+    rec.writer = _FakeWriter()
+    rec.is_recording = True
+    return rec
+
+
+def test_steady_frames_fill_one_slot_each(recorder):
+    for index in range(5):
+        assert recorder.write_frame_at(_frame(index), 1000.0 + index * 100)
+
+    assert recorder.writer.frames == [0, 1, 2, 3, 4]
+    assert recorder.frames_repeated == 0
+    assert recorder.frames_dropped == 0
+
+
+def test_small_jitter_rounds_to_nearest_slot(recorder):
+    for index, offset in enumerate((0, 140, 190, 310)):
+        assert recorder.write_frame_at(_frame(index), offset)
+
+    assert recorder.writer.frames == [0, 1, 2, 3]
+    assert recorder.frames_repeated == 0
+
+
+def test_gap_repeats_previous_frame(recorder):
+    recorder.write_frame_at(_frame(1), 0)
+    recorder.write_frame_at(_frame(2), 300)
+
+    assert recorder.writer.frames == [1, 1, 1, 2]
+    assert recorder.frames_repeated == 2
+    assert recorder.frame_count == 2
+
+
+def test_frame_in_written_slot_is_dropped(recorder):
+    recorder.write_frame_at(_frame(1), 0)
+    recorder.write_frame_at(_frame(2), 100)
+
+    assert not recorder.write_frame_at(_frame(3), 130)
+    assert recorder.writer.frames == [1, 2]
+    assert recorder.frames_dropped == 1
+
+
+def test_long_pause_is_capped_at_max_gap(recorder):
+    recorder.write_frame_at(_frame(1), 0)
+    recorder.write_frame_at(_frame(2), 60_000)
+
+    assert recorder.frames_repeated == 10
+    assert recorder.writer.frames == [1] * 11 + [2]
+
+    # La ranura se re-ancla: el siguiente frame no repite nada
+    recorder.write_frame_at(_frame(3), 60_100)
+    assert recorder.frames_repeated == 10
+    assert recorder.writer.frames[-1] == 3
+
+
+def test_clock_going_back_reanchors(recorder):
+    for index in range(20):
+        recorder.write_frame_at(_frame(index), 10_000 + index * 100)
+
+    # El emisor se reinicia con un reloj muy anterior
+    assert recorder.write_frame_at(_frame(99), 0)
+    assert recorder.write_frame_at(_frame(100), 100)
+
+    assert recorder.frames_dropped == 0
+    assert recorder.frames_repeated == 0
+    assert recorder.writer.frames[-2:] == [99, 100]
+
+
+def test_not_recording_writes_nothing():
+    rec = StreamRecorder(Path("unused.mp4"), fps=10.0)
+
+    assert not rec.write_frame_at(_frame(1), 0)
+    assert rec.frame_count == 0
@@ -0,0 +1,129 @@
+"""
+Pruebas de la captura y reproducción del tráfico de ingesta.
+"""
+
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from src.network.traffic_capture import TrafficRecorder, TrafficReplayer, read_capture, read_captures
+
+
+def _record(path, frames, spacing=0.0):
+    recorder = TrafficRecorder(path)
+    for jpeg, number in frames:
+        recorder.record(jpeg, timestamp=1000.0 + number, frame_number=number, device_id="phone")
+        if spacing:
+            time.sleep(spacing)
+    recorder.close()
+
+
+def test_round_trip_keeps_payload_and_metadata(tmp_path):
+    path = tmp_path / "capture"
+    recorder = TrafficRecorder(path)
+    recorder.record(b"\xff\xd8one", timestamp=1.5, frame_number=1, device_id="a")
+    recorder.record("data:image/jpeg;base64," + base64.b64encode(b"\xff\xd8two").decode(),
+                    timestamp=2.5, frame_number=2, device_id="b")
+    recorder.close()
+
+    frames = list(read_capture(path))
+
+    assert [frame.jpeg for frame in frames] == [b"\xff\xd8one", b"\xff\xd8two"]
+    assert [(f.timestamp, f.frame_number, f.device_id) for f in frames] == [(1.5, 1, "a"), (2.5, 2, "b")]
+    assert frames[0].arrival <= frames[1].arrival
+
+
+def test_reopened_capture_appends(tmp_path):
+    path = tmp_path / "capture"
+    _record(path, [(b"first", 1)])
+    _record(path, [(b"second", 2)])
+
+    assert [frame.jpeg for frame in read_capture(path)] == [b"first", b"second"]
+
+
+def test_truncated_capture_stops_at_last_complete_frame(tmp_path):
+    path = tmp_path / "capture"
+    _record(path, [(b"a" * 100, 1), (b"b" * 100, 2)])
+    frames_file = tmp_path / "capture.frames"
+    frames_file.write_bytes(frames_file.read_bytes()[:-10])
+
+    assert [frame.frame_number for frame in read_capture(path)] == [1]
+
+
+def test_captures_are_merged_by_arrival(tmp_path):
+    first, second = tmp_path / "w0", tmp_path / "w1"
+    recorders = [TrafficRecorder(first), TrafficRecorder(second)]
+    for number in range(6):
+        recorders[number % 2].record(b"x", frame_number=number)
+        time.sleep(0.002)
+    for recorder in recorders:
+        recorder.close()
+
+    assert [frame.frame_number for frame in read_captures([first, second])] == list(range(6))
+
+
+def test_replay_to_process_frame_as_fast_as_possible(tmp_path):
+    path = tmp_path / "capture"
+    _record(path, [(b"a", 1), (b"b", 2), (b"c", 3)])
+    calls = []
+
+    def process_frame(jpeg, timestamp, frame_number, device_id):
+        calls.append((jpeg, timestamp, frame_number, device_id))
+        return frame_number != 2
+
+    stats = TrafficReplayer(path, speed=0).replay_to(process_frame)
+
+    assert calls == [(b"a", 1001.0, 1, "phone"), (b"b", 1002.0, 2, "phone"), (b"c", 1003.0, 3, "phone")]
+    assert (stats.frames, stats.accepted, stats.errors) == (3, 2, 1)
+
+
+def test_replay_keeps_original_spacing_scaled_by_speed(tmp_path):
+    path = tmp_path / "capture"
+    _record(path, [(b"a", 1), (b"b", 2), (b"c", 3)], spacing=0.05)
+    frames = list(read_capture(path))
+    span = frames[-1].arrival - frames[0].arrival
+
+    stats = TrafficReplayer(path, speed=2.0).replay(lambda frame: True)
+
+    assert stats.elapsed >= span / 2.0 - 0.005
+    assert stats.accepted == 3
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        self.server.bodies.append(json.loads(self.rfile.read(length)))
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def receiver():
+    server = HTTPServer(('127.0.0.1', 0), _Handler)
+    server.bodies = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_replay_http_sends_the_mobile_json(tmp_path, receiver):
+    path = tmp_path / "capture"
+    _record(path, [(b"\xff\xd8a", 1), (b"\xff\xd8b", 2)])
+    url = f"http://127.0.0.1:{receiver.server_address[1]}/upload"
+
+    stats = TrafficReplayer(path, speed=0).replay_http(url)
+
+    assert stats.accepted == 2
+    first = receiver.bodies[0]
+    assert first['frame'] == "data:image/jpeg;base64," + base64.b64encode(b"\xff\xd8a").decode()
+    assert (first['timestamp'], first['frameNumber'], first['deviceId']) == (1001.0, 1, "phone")
@@ -3,6 +3,20 @@
  * Maneja requests y sirve la aplicación Python Flet
  */
 
+// Espera máxima de un long-poll en /api/frames?wait=<ms>
+const MAX_WAIT_MS = 25000;
+
+// Latido y duración máxima de un stream de eventos (el cliente reconecta)
+const STREAM_HEARTBEAT_MS = 15000;
+const STREAM_MAX_MS = 5 * 60 * 1000;
+
+// Frames guardados por dispositivo
+const HISTORY_SIZE = 10;
+
+// Retroceso en la numeración a partir del cual se asume que el emisor se
+// reinició aunque su reloj no haya avanzado
+const RESTART_GAP = 100;
+
 export default {
   async fetch(request, env) {
     const url = new URL(request.url);
@@ -12,7 +26,8 @@ export default {
     const corsHeaders = {
       'Access-Control-Allow-Origin': '*',
       'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-      'Access-Control-Allow-Headers': 'Content-Type, Authorization',
+      'Access-Control-Allow-Headers': 'Content-Type, Authorization, If-None-Match, X-Frame-Number, X-Timestamp, X-Device-Id',
+      'Access-Control-Expose-Headers': 'ETag, X-Frame-Number, X-Timestamp, X-Received-At, X-Device-Id, X-Reset, X-Width',
       'Access-Control-Max-Age': '86400',
     };
 
@@ -64,47 +79,78 @@ export default {
  */
 async function handleAPI(request, env, corsHeaders) {
   const url = new URL(request.url);
-  const path = url.pathname;
+  let path = url.pathname;
+
+  // Cada móvil (X-Device-Id / deviceId) tiene su propio historial. Las
+  // rutas /api/devices/<id>/<ruta> equivalen a /api/<ruta> para ese
+  // dispositivo (también con ?device=<id>); sin dispositivo se usa el
+  // último que envió un frame
+  const deviceRoute = path.match(/^\/api\/devices\/([^/]+)\/(.+)$/);
+  let deviceId = url.searchParams.get('device');
+  if (deviceRoute) {
+    deviceId = decodeURIComponent(deviceRoute[1]);
+    path = '/api/' + deviceRoute[2];
+  }
+  const device = () => deviceId !== null ? findDevice(deviceId) : currentDevice();
 
-  // Endpoint para recibir frames de cámara móvil
+  // Endpoint para recibir frames de cámara móvil: JSON con data URL base64
+  // o el JPEG binario (Content-Type: image/jpeg) con metadatos en cabeceras
   if (path === '/api/frame' && request.method === 'POST') {
     try {
-      const frameData = await request.json();
-      
-      // Validar datos del frame
-      if (!frameData.frame || !frameData.timestamp) {
-        return new Response(JSON.stringify({
-          error: 'Invalid frame data',
-          required: ['frame', 'timestamp']
-        }), {
-          status: 400,
-          headers: {
-            'Content-Type': 'application/json',
-            ...corsHeaders
-          }
+      let stored;
+
+      if ((request.headers.get('Content-Type') || '').startsWith('image/jpeg')) {
+        const jpeg = new Uint8Array(await request.arrayBuffer());
+        if (jpeg.length === 0) {
+          return new Response(JSON.stringify({
+            error: 'Invalid frame data',
+            required: ['JPEG body']
+          }), {
+            status: 400,
+            headers: {
+              'Content-Type': 'application/json',
+              ...corsHeaders
+            }
+          });
+        }
+
+        stored = new StoredFrame({
+          jpeg: jpeg,
+          timestamp: Number(request.headers.get('X-Timestamp')) || Date.now(),
+          frameNumber: parseInt(request.headers.get('X-Frame-Number'), 10) || 0,
+          deviceId: request.headers.get('X-Device-Id') || ''
+        });
+      } else {
+        const frameData = await request.json();
+        
+        // Validar datos del frame
+        if (!frameData.frame || !frameData.timestamp) {
+          return new Response(JSON.stringify({
+            error: 'Invalid frame data',
+            required: ['frame', 'timestamp']
+          }), {
+            status: 400,
+            headers: {
+              'Content-Type': 'application/json',
+              ...corsHeaders
+            }
+          });
+        }
+
+        stored = new StoredFrame({
+          dataUrl: frameData.frame,
+          timestamp: frameData.timestamp,
+          frameNumber: frameData.frameNumber || 0,
+          deviceId: frameData.deviceId || ''
         });
       }
 
       // Almacenar frame temporalmente en memoria (para el último frame)
       // Esto permite que el PC pueda obtener el frame más reciente
-      global.latestFrame = {
-        frame: frameData.frame,
-        timestamp: frameData.timestamp,
-        frameNumber: frameData.frameNumber || 0,
-        receivedAt: Date.now()
-      };
-      
-      // Mantener solo el último frame para streaming en tiempo real
-      global.frameHistory = global.frameHistory || [];
-      global.frameHistory.push(global.latestFrame);
-      
-      // Mantener solo los últimos 10 frames
-      if (global.frameHistory.length > 10) {
-        global.frameHistory = global.frameHistory.slice(-10);
-      }
+      storeFrame(stored);
 
       // Log para debugging
-      console.log(`Frame received: ${frameData.frameNumber || 'unknown'} at ${new Date(frameData.timestamp).toISOString()}`);
+      console.log(`Frame received: ${stored.frameNumber} at ${new Date(stored.timestamp).toISOString()}`);
 
       return new Response(JSON.stringify({
         status: 'success',
@@ -133,12 +179,53 @@ async function handleAPI(request, env, corsHeaders) {
     }
   }
 
+  // Stream de frames como Server-Sent Events
+  if (path === '/api/frames/stream' && request.method === 'GET') {
+    return streamFrames(request, url, deviceId, corsHeaders);
+  }
+
   // Endpoint para obtener frames recientes
   if (path === '/api/frames' && request.method === 'GET') {
     try {
       // Obtener frames desde memoria temporal
-      const frames = global.frameHistory || [];
-      const latestFrame = global.latestFrame || null;
+      const frames = device().frameHistory;
+      const latestFrame = device().latestFrame;
+
+      // Con ?after=<frameNumber> solo se devuelven los frames posteriores
+      // al cursor del cliente (sin latestFrame duplicado). Los metadatos van
+      // antes del array para que el cliente los tenga al leerlo en streaming
+      // Con ?wait=<ms> la petición se retiene hasta que haya un frame
+      // posterior al cursor (long-poll); `waited` indica que se soporta
+      const after = url.searchParams.get('after');
+      if (after !== null) {
+        const cursor = parseInt(after, 10);
+        const wait = Math.min(parseInt(url.searchParams.get('wait'), 10) || 0, MAX_WAIT_MS);
+        let result = framesAfter(device(), cursor);
+        let waited = 0;
+
+        if (wait > 0 && !result.reset && result.frames.length === 0) {
+          const started = Date.now();
+          await waitForFrame(wait, deviceId);
+          waited = Date.now() - started;
+          result = framesAfter(device(), cursor);
+        }
+
+        return new Response(JSON.stringify({
+          cursor: result.newest,
+          reset: result.reset,
+          waited: waited,
+          count: result.frames.length,
+          timestamp: Date.now(),
+          frames: result.frames
+        }), {
+          status: 200,
+          headers: {
+            'Content-Type': 'application/json',
+            'Cache-Control': 'no-store',
+            ...corsHeaders
+          }
+        });
+      }
       
       // Respuesta con frames disponibles
       return new Response(JSON.stringify({
@@ -170,12 +257,101 @@ async function handleAPI(request, env, corsHeaders) {
     }
   }
 
+  // Último frame como JPEG binario con los metadatos en cabeceras. Con
+  // ?after=<frameNumber> responde 204 si no hay uno posterior al cursor y,
+  // con &wait=<ms>, espera a que llegue (long-poll).
+  // Los endpoints de lectura aceptan ?w=<ancho> como el tamaño que muestra
+  // el visor; el Worker no puede reescalar JPEG y sirve el original (sin
+  // X-Width). `variants` en /api/health lista los anchos que sí genera un relay
+  if (path === '/api/latest-frame.jpg' && request.method === 'GET') {
+    const after = url.searchParams.get('after');
+    let reset = false;
+
+    if (after !== null) {
+      const cursor = parseInt(after, 10);
+      const wait = Math.min(parseInt(url.searchParams.get('wait'), 10) || 0, MAX_WAIT_MS);
+      let result = framesAfter(device(), cursor);
+      if (wait > 0 && !result.reset && result.frames.length === 0) {
+        await waitForFrame(wait, deviceId);
+        result = framesAfter(device(), cursor);
+      }
+      if (!result.reset && result.frames.length === 0) {
+        return new Response(null, {
+          status: 204,
+          headers: {
+            'X-Frame-Number': String(result.newest),
+            'Cache-Control': 'no-store',
+            ...corsHeaders
+          }
+        });
+      }
+      reset = result.reset;
+    }
+
+    const latestFrame = device().latestFrame;
+    if (!latestFrame) {
+      return new Response(null, {
+        status: 204,
+        headers: {
+          'Cache-Control': 'no-store',
+          ...corsHeaders
+        }
+      });
+    }
+
+    const frameHeaders = {
+      'ETag': latestFrame.etag,
+      'X-Frame-Number': String(latestFrame.frameNumber),
+      'X-Timestamp': String(latestFrame.timestamp),
+      'X-Received-At': String(latestFrame.receivedAt),
+      'Cache-Control': 'no-cache',
+      ...corsHeaders
+    };
+    if (latestFrame.deviceId) {
+      frameHeaders['X-Device-Id'] = latestFrame.deviceId;
+    }
+    if (reset) {
+      frameHeaders['X-Reset'] = '1';
+    }
+
+    if (etagMatches(request.headers.get('If-None-Match'), latestFrame.etag)) {
+      return new Response(null, {
+        status: 304,
+        headers: frameHeaders
+      });
+    }
+
+    return new Response(latestFrame.bytes, {
+      status: 200,
+      headers: {
+        'Content-Type': 'image/jpeg',
+        ...frameHeaders
+      }
+    });
+  }
+
   // Endpoint para obtener solo el último frame (más eficiente)
   if (path === '/api/latest-frame' && request.method === 'GET') {
     try {
-      const latestFrame = global.latestFrame || null;
+      const latestFrame = device().latestFrame;
       
       if (latestFrame) {
+        // El ETag identifica el frame: si el cliente ya lo tiene, 304 sin cuerpo
+        const etag = latestFrame.etag;
+        const frameHeaders = {
+          'ETag': etag,
+          'X-Frame-Number': String(latestFrame.frameNumber),
+          'Cache-Control': 'no-cache',
+          ...corsHeaders
+        };
+
+        if (etagMatches(request.headers.get('If-None-Match'), etag)) {
+          return new Response(null, {
+            status: 304,
+            headers: frameHeaders
+          });
+        }
+
         return new Response(JSON.stringify({
           success: true,
           frame: latestFrame,
@@ -184,7 +360,7 @@ async function handleAPI(request, env, corsHeaders) {
           status: 200,
           headers: {
             'Content-Type': 'application/json',
-            ...corsHeaders
+            ...frameHeaders
           }
         });
       } else {
@@ -215,10 +391,60 @@ async function handleAPI(request, env, corsHeaders) {
     }
   }
 
+  // Dispositivos que han enviado frames, con los metadatos de su último frame
+  if (path === '/api/devices' && request.method === 'GET') {
+    const devices = [...(global.devices || new Map()).values()].map(describeDevice);
+    return new Response(JSON.stringify({
+      devices: devices,
+      count: devices.length,
+      timestamp: Date.now()
+    }), {
+      status: 200,
+      headers: {
+        'Content-Type': 'application/json',
+        'Cache-Control': 'no-store',
+        ...corsHeaders
+      }
+    });
+  }
+
+  // Último frame de varios dispositivos en una sola petición. Con
+  // ?after=<id>:<frameNumber>,... solo se incluyen los dispositivos con un
+  // frame posterior a su cursor (los no listados usan cursor 0, así que
+  // aparecen los móviles nuevos); ?ids=<id>,... limita los dispositivos y
+  // &wait=<ms> retiene la petición hasta que alguno tenga un frame nuevo
+  if (path === '/api/devices/latest' && request.method === 'GET') {
+    const cursors = parseDeviceCursors(url.searchParams.get('after'));
+    const ids = url.searchParams.get('ids');
+    const wanted = ids ? new Set(ids.split(',')) : null;
+    const wait = Math.min(parseInt(url.searchParams.get('wait'), 10) || 0, MAX_WAIT_MS);
+
+    const started = Date.now();
+    let updates = devicesAfter(cursors, wanted);
+    while (wait > 0 && updates.length === 0 && Date.now() - started < wait) {
+      await waitForFrame(wait - (Date.now() - started));
+      updates = devicesAfter(cursors, wanted);
+    }
+
+    return new Response(JSON.stringify({
+      waited: Date.now() - started,
+      count: updates.length,
+      timestamp: Date.now(),
+      devices: updates
+    }), {
+      status: 200,
+      headers: {
+        'Content-Type': 'application/json',
+        'Cache-Control': 'no-store',
+        ...corsHeaders
+      }
+    });
+  }
+
   // Endpoint para health check
   if (path === '/api/health' && request.method === 'GET') {
-    const framesCount = global.frameHistory ? global.frameHistory.length : 0;
-    const hasLatestFrame = !!global.latestFrame;
+    const framesCount = currentDevice().frameHistory.length;
+    const hasLatestFrame = !!currentDevice().latestFrame;
     
     return new Response(JSON.stringify({
       status: 'healthy',
@@ -227,7 +453,9 @@ async function handleAPI(request, env, corsHeaders) {
       version: '2.1.0',
       framesReceived: framesCount,
       latestFrameAvailable: hasLatestFrame,
-      lastFrameTime: global.latestFrame ? global.latestFrame.receivedAt : null
+      lastFrameTime: hasLatestFrame ? currentDevice().latestFrame.receivedAt : null,
+      devices: global.devices ? global.devices.size : 0,
+      variants: []
     }), {
       status: 200,
       headers: {
@@ -251,6 +479,308 @@ async function handleAPI(request, env, corsHeaders) {
   });
 }
 
+/**
+ * Frame guardado en el relay.
+ *
+ * Conserva el formato en que llegó (JPEG binario o data URL base64) y
+ * solo convierte al otro cuando un cliente lo pide, una vez por frame.
+ */
+class StoredFrame {
+  constructor({ jpeg = null, dataUrl = null, timestamp, frameNumber, deviceId = '' }) {
+    this.jpeg = jpeg;
+    this.dataUrl = dataUrl;
+    this.timestamp = timestamp;
+    this.frameNumber = frameNumber;
+    this.deviceId = deviceId;
+    this.receivedAt = Date.now();
+  }
+
+  // JPEG en bytes (para /api/latest-frame.jpg)
+  get bytes() {
+    if (!this.jpeg) {
+      const base64 = this.dataUrl.includes(',') ? this.dataUrl.split(',', 2)[1] : this.dataUrl;
+      const binary = atob(base64);
+      this.jpeg = new Uint8Array(binary.length);
+      for (let i = 0; i < binary.length; i++) {
+        this.jpeg[i] = binary.charCodeAt(i);
+      }
+    }
+    return this.jpeg;
+  }
+
+  // Data URL base64 (para las respuestas JSON)
+  get frame() {
+    if (!this.dataUrl) {
+      let binary = '';
+      for (let i = 0; i < this.jpeg.length; i += 0x8000) {
+        binary += String.fromCharCode.apply(null, this.jpeg.subarray(i, i + 0x8000));
+      }
+      this.dataUrl = 'data:image/jpeg;base64,' + btoa(binary);
+    }
+    return this.dataUrl;
+  }
+
+  get etag() {
+    return `"${this.frameNumber}-${this.receivedAt}"`;
+  }
+
+  toJSON() {
+    const json = {
+      frame: this.frame,
+      timestamp: this.timestamp,
+      frameNumber: this.frameNumber,
+      receivedAt: this.receivedAt
+    };
+    if (this.deviceId) {
+      json.deviceId = this.deviceId;
+    }
+    return json;
+  }
+}
+
+/**
+ * Estado de un dispositivo: su último frame y su historial
+ */
+function newDevice(id) {
+  return { id: id, latestFrame: null, frameHistory: [], framesReceived: 0, framesLate: 0 };
+}
+
+/**
+ * Estado de un dispositivo (vacío si nunca envió frames)
+ */
+function findDevice(id) {
+  return (global.devices && global.devices.get(id)) || newDevice(id);
+}
+
+/**
+ * Dispositivo que envió el último frame
+ */
+function currentDevice() {
+  return global.currentDevice || newDevice('');
+}
+
+/**
+ * Metadatos de un dispositivo para /api/devices
+ */
+function describeDevice(device) {
+  const latest = device.latestFrame;
+  return {
+    id: device.id,
+    frameNumber: latest ? latest.frameNumber : 0,
+    timestamp: latest ? latest.timestamp : null,
+    receivedAt: latest ? latest.receivedAt : null,
+    framesReceived: device.framesReceived
+  };
+}
+
+/**
+ * Guarda un frame como el último de su dispositivo y en su historial, y
+ * avisa a los suscriptores.
+ *
+ * Un número que no avanza solo es un reinicio del emisor si el timestamp es
+ * más nuevo que el del último frame o si el retroceso supera RESTART_GAP;
+ * si no, el frame llegó tarde y se descarta. Devuelve false en ese caso.
+ */
+function storeFrame(stored) {
+  global.devices = global.devices || new Map();
+  let device = global.devices.get(stored.deviceId);
+  if (!device) {
+    device = newDevice(stored.deviceId);
+    global.devices.set(stored.deviceId, device);
+  }
+
+  const previous = device.latestFrame;
+  if (!stored.frameNumber) {
+    stored.frameNumber = previous ? previous.frameNumber + 1 : 1;
+  }
+
+  if (previous && stored.frameNumber <= previous.frameNumber) {
+    const restarted = stored.timestamp > previous.timestamp
+      || previous.frameNumber - stored.frameNumber > RESTART_GAP;
+    if (!restarted) {
+      device.framesLate++;
+      return false;
+    }
+    // El móvil empezó una sesión nueva: los frames anteriores ya no son
+    // comparables con los cursores
+    device.frameHistory = [];
+  }
+
+  device.latestFrame = stored;
+  device.framesReceived++;
+  global.currentDevice = device;
+
+  device.frameHistory.push(stored);
+
+  // Mantener solo los últimos frames
+  if (device.frameHistory.length > HISTORY_SIZE) {
+    device.frameHistory = device.frameHistory.slice(-HISTORY_SIZE);
+  }
+
+  // Despertar long-polls y streams de eventos a la espera
+  notifySubscribers(stored);
+  return true;
+}
+
+/**
+ * Comprueba si una cabecera If-None-Match incluye el ETag dado
+ */
+function etagMatches(ifNoneMatch, etag) {
+  if (!ifNoneMatch) {
+    return false;
+  }
+  return ifNoneMatch.split(',').some(tag => {
+    const value = tag.trim();
+    return value === '*' || value === etag || value === `W/${etag}`;
+  });
+}
+
+/**
+ * Frames del historial de un dispositivo posteriores a un cursor
+ */
+function framesAfter(device, cursor) {
+  const frames = device.frameHistory;
+  const newest = device.latestFrame ? device.latestFrame.frameNumber : 0;
+  // Cursor por delante del relay: el emisor volvió a empezar
+  const reset = !Number.isFinite(cursor) || cursor > newest;
+  return {
+    newest: newest,
+    reset: reset,
+    frames: reset ? frames : frames.filter(f => f.frameNumber > cursor)
+  };
+}
+
+/**
+ * Cursores por dispositivo de ?after=<id>:<frameNumber>,...
+ */
+function parseDeviceCursors(value) {
+  const cursors = new Map();
+  for (const entry of (value || '').split(',')) {
+    const separator = entry.lastIndexOf(':');
+    if (separator >= 0) {
+      cursors.set(entry.slice(0, separator), parseInt(entry.slice(separator + 1), 10) || 0);
+    }
+  }
+  return cursors;
+}
+
+/**
+ * Último frame de cada dispositivo con frames posteriores a su cursor
+ */
+function devicesAfter(cursors, wanted) {
+  const updates = [];
+  for (const device of (global.devices || new Map()).values()) {
+    if (wanted && !wanted.has(device.id)) {
+      continue;
+    }
+    const result = framesAfter(device, cursors.get(device.id) || 0);
+    if (result.frames.length > 0) {
+      updates.push({
+        id: device.id,
+        cursor: result.newest,
+        reset: result.reset,
+        frame: result.frames[result.frames.length - 1]
+      });
+    }
+  }
+  return updates;
+}
+
+/**
+ * Avisa de un frame nuevo a los long-polls y streams en espera
+ */
+function notifySubscribers(frame) {
+  const subscribers = global.frameSubscribers;
+  if (!subscribers) {
+    return;
+  }
+  for (const subscriber of [...subscribers]) {
+    subscriber(frame);
+  }
+}
+
+/**
+ * Espera hasta el próximo frame (del dispositivo indicado, o de cualquiera
+ * si es null) o hasta que pasen `ms` milisegundos
+ */
+function waitForFrame(ms, deviceId = null) {
+  global.frameSubscribers = global.frameSubscribers || new Set();
+  const subscribers = global.frameSubscribers;
+
+  return new Promise(resolve => {
+    const done = () => {
+      clearTimeout(timer);
+      subscribers.delete(subscriber);
+      resolve();
+    };
+    const subscriber = (frame) => {
+      if (deviceId === null || frame.deviceId === deviceId) {
+        done();
+      }
+    };
+    const timer = setTimeout(done, ms);
+    subscribers.add(subscriber);
+  });
+}
+
+/**
+ * Envía los frames como Server-Sent Events mientras el cliente siga conectado
+ */
+function streamFrames(request, url, deviceId, corsHeaders) {
+  global.frameSubscribers = global.frameSubscribers || new Set();
+  const subscribers = global.frameSubscribers;
+
+  // Cursor de ?after o de Last-Event-ID (reconexión de EventSource)
+  const after = url.searchParams.get('after') ?? request.headers.get('Last-Event-ID') ?? '0';
+  const cursor = parseInt(after, 10) || 0;
+
+  const { readable, writable } = new TransformStream();
+  const writer = writable.getWriter();
+  const encoder = new TextEncoder();
+  let closed = false;
+
+  const close = () => {
+    if (closed) {
+      return;
+    }
+    closed = true;
+    clearInterval(heartbeat);
+    clearTimeout(expiry);
+    subscribers.delete(subscriber);
+    writer.close().catch(() => {});
+  };
+
+  // Un write que falla indica que el cliente se desconectó
+  const write = (text) => writer.write(encoder.encode(text)).catch(close);
+  const send = (frame) => write(`id: ${frame.frameNumber}\nevent: frame\ndata: ${JSON.stringify(frame)}\n\n`);
+  const subscriber = (frame) => {
+    if (deviceId === null || frame.deviceId === deviceId) {
+      send(frame);
+    }
+  };
+
+  const heartbeat = setInterval(() => write(': ping\n\n'), STREAM_HEARTBEAT_MS);
+  const expiry = setTimeout(close, STREAM_MAX_MS);
+
+  // Al conectar solo se envía el frame más reciente (los anteriores ya
+  // están superados); después, cada frame según llega
+  write(`retry: 1000\n\n`);
+  const initial = framesAfter(deviceId !== null ? findDevice(deviceId) : currentDevice(), cursor);
+  if (initial.frames.length > 0) {
+    send(initial.frames[initial.frames.length - 1]);
+  }
+  subscribers.add(subscriber);
+
+  return new Response(readable, {
+    status: 200,
+    headers: {
+      'Content-Type': 'text/event-stream',
+      'Cache-Control': 'no-cache',
+      ...corsHeaders
+    }
+  });
+}
+
 /**
  * Sirve la aplicación Flet principal
  */
@@ -357,6 +887,13 @@ async function serveApp(request, env, corsHeaders) {
         let capturing = false;
         let frameCount = 0;
 
+        // Identificador estable del móvil: cada uno tiene su historial en el relay
+        let deviceId = localStorage.getItem('ipcamDeviceId');
+        if (!deviceId) {
+            deviceId = 'mobile-' + Math.random().toString(36).slice(2, 10);
+            localStorage.setItem('ipcamDeviceId', deviceId);
+        }
+
         async function startCamera() {
             try {
                 const statusDiv = document.getElementById('status-display');
@@ -408,11 +945,8 @@ async function serveApp(request, env, corsHeaders) {
             
             canvas.toBlob(async (blob) => {
                 if (blob) {
-                    const reader = new FileReader();
-                    reader.onload = async () => {
-                        await sendFrame(reader.result);
-                    };
-                    reader.readAsDataURL(blob);
+                    // El JPEG se envía binario, sin pasar a base64
+                    await sendFrame(blob);
                 }
             }, 'image/jpeg', 0.8);
 
@@ -420,18 +954,17 @@ async function serveApp(request, env, corsHeaders) {
             setTimeout(() => captureFrames(video), 100);
         }
 
-        async function sendFrame(frameData) {
+        async function sendFrame(blob) {
             try {
                 const response = await fetch('/api/frame', {
                     method: 'POST',
                     headers: {
-                        'Content-Type': 'application/json',
+                        'Content-Type': 'image/jpeg',
+                        'X-Timestamp': String(Date.now()),
+                        'X-Frame-Number': String(++frameCount),
+                        'X-Device-Id': deviceId
                     },
-                    body: JSON.stringify({
-                        frame: frameData,
-                        timestamp: Date.now(),
-                        frameNumber: ++frameCount
-                    })
+                    body: blob
                 });
 
                 if (!response.ok) {